@@ -1,3 +1,6 @@
+from unittest.mock import AsyncMock, patch
+
+
 class TestSearchAirlines:
     def test_success_by_iata(self, client, login_user):
         token, user_id, email = login_user
@@ -25,7 +28,8 @@ class TestSearchAirlines:
         assert data["entities"][0]["icao"] == "HSK"
         assert data["entities"][0]["name"] == "Db Test SkyEurope Airlines"
 
-    def test_no_results(self, client, login_user):
+    @patch("app.modules.trips.airlabs_api.AirLabsApi.get_airline", new_callable=AsyncMock, return_value=None)
+    def test_no_results(self, mock_airlabs, client, login_user):
         token, user_id, email = login_user
         response = client.get(
             "/trips/airlines?iata=xx",
@@ -34,6 +38,19 @@ class TestSearchAirlines:
         assert response.status_code == 200
         data = response.json()
         assert len(data["entities"]) == 0
+        mock_airlabs.assert_awaited_once_with("xx")
+
+    @patch("app.modules.trips.airlabs_api.AirLabsApi.get_airline", new_callable=AsyncMock, return_value=None)
+    def test_partial_iata_code(self, mock_airlabs, client, login_user):
+        token, user_id, email = login_user
+        response = client.get(
+            "/trips/airlines?iata=5",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "5P" in [airline["iata"] for airline in data["entities"]]
+        mock_airlabs.assert_not_awaited()
 
     def test_invalid_iata_code(self, client, login_user):
         token, user_id, email = login_user
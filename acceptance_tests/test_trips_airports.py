@@ -2,9 +2,8 @@ from unittest.mock import AsyncMock, patch
 
 
 class TestGetAirportData:
-    @patch("app.modules.trips.airports.GeminiApi")
-    def test_success_from_db(self, mock_gemini_api, client, login_user):
-        mock_gemini_api.return_value.generate_json = AsyncMock(return_value={...})
+    @patch("app.modules.ai.gemini_api.GeminiApi.generate_json", new_callable=AsyncMock)
+    def test_success_from_db(self, mock_generate_json, client, login_user):
         token, user_id, email = login_user
         response = client.get(
             "/trips/airports/?iata=BUD",
@@ -19,20 +18,20 @@ class TestGetAirportData:
         assert data["country"] == "Hungary"
         assert data["lat"] == 47.4369
         assert data["lng"] == 19.2556
+        mock_generate_json.assert_not_awaited()
 
-    @patch("app.modules.trips.airports.GeminiApi")
-    def test_success_from_gemini(self, mock_gemini_api, client, login_user):
-        mock_gemini_api.return_value.generate_json = AsyncMock(
-            return_value={
-                "iata": "CPH",
-                "icao": "EKCH",
-                "name": "AI Test Kastrup Airport",
-                "city": "Copenhagen",
-                "country": "Denmark",
-                "lat": 55.617,
-                "lng": 12.6561,
-            }
-        )
+    @patch("app.modules.trips.airlabs_api.AirLabsApi.get_airport", new_callable=AsyncMock, return_value=None)
+    @patch("app.modules.ai.gemini_api.GeminiApi.generate_json", new_callable=AsyncMock)
+    def test_success_from_gemini(self, mock_generate_json, mock_airlabs, client, login_user):
+        mock_generate_json.return_value = {
+            "iata": "CPH",
+            "icao": "EKCH",
+            "name": "AI Test Kastrup Airport",
+            "city": "Copenhagen",
+            "country": "Denmark",
+            "lat": 55.617,
+            "lng": 12.6561,
+        }
         token, user_id, email = login_user
         response = client.get(
             "/trips/airports/?iata=CPH",
@@ -68,3 +67,61 @@ class TestGetAirportData:
         data = response.json()
         assert "detail" in data
         assert "Invalid token" in data["detail"]
+
+
+class TestGetNearestAirports:
+    def test_nearest_airport_from_index(self, client, login_user):
+        token, *_ = login_user
+        response = client.get(
+            "/trips/airports/nearest?lat=47.5&lng=19.04",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+        entities = response.json()["entities"]
+        assert entities[0]["iata"] == "BUD"
+        assert 10 < entities[0]["distanceKm"] < 25
+
+    def test_invalid_latitude(self, client, login_user):
+        token, *_ = login_user
+        response = client.get(
+            "/trips/airports/nearest?lat=91&lng=19.04",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 422
+
+
+class TestGetAirportsBatch:
+    @patch("app.modules.trips.airlabs_api.AirLabsApi.get_airport", new_callable=AsyncMock, return_value=None)
+    @patch("app.modules.ai.gemini_api.GeminiApi.generate_json_list", new_callable=AsyncMock)
+    def test_db_hits_and_one_gemini_call_for_misses(self, mock_generate_json_list, mock_airlabs, client, login_user):
+        mock_generate_json_list.return_value = [
+            {
+                "iata": "AMS",
+                "icao": "EHAM",
+                "name": "AI Test Schiphol Airport",
+                "city": "Amsterdam",
+                "country": "Netherlands",
+                "lat": 52.3105,
+                "lng": 4.7683,
+            }
+        ]
+        token, *_ = login_user
+        response = client.post(
+            "/trips/airports/batch",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"iata": ["BUD", "AMS", "QQQ"]},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [a["iata"] for a in data["airports"]] == ["BUD", "AMS"]
+        assert data["notFound"] == ["QQQ"]
+        mock_generate_json_list.assert_awaited_once()
+
+    def test_too_many_codes(self, client, login_user):
+        token, *_ = login_user
+        response = client.post(
+            "/trips/airports/batch",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"iata": ["BUD"] * 51},
+        )
+        assert response.status_code == 422
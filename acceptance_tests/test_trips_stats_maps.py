@@ -466,3 +466,144 @@ class TestGetUserTrips:
         _, user_id, _ = login_user
         response = client.get(f"/trips/{user_id}?year=24")
         assert response.status_code == 422
+
+
+# ── POST /trips/overview (auth-protected) ────────────────────────────────────
+
+class TestTripsOverviewAuth:
+    def test_returns_stats_and_maps_of_completed_flights_and_visits(self, client, login_user):
+        token, user_id, _ = login_user
+        create_flight(client, token, FLIGHT_FRA_JFK)
+        create_flight(client, token, FLIGHT_LHR_CDG_2023)
+        create_flight(client, token, FLIGHT_PLANNED)  # should be excluded
+        create_visit(client, token, VISIT_PARIS_2023)
+        create_visit(client, token, VISIT_TOKYO_NO_YEAR)
+
+        response = client.post(
+            "/trips/overview",
+            headers={"Authorization": f"Bearer {token}"},
+            json={},
+        )
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["flightsStats"]["totalCount"] == 2
+        assert data["flightsStats"]["totalAirports"] == 4
+        assert data["visitsStats"]["citiesCount"] == 2
+        assert len(data["flightsMap"]["routes"]) == 2
+        assert len(data["flightsMap"]["markers"]) == 4
+        assert len(data["visitsMap"]["markers"]) == 2
+
+    def test_flight_ids_filter_applies_to_stats_and_map(self, client, login_user):
+        token, user_id, _ = login_user
+        flight = create_flight(client, token, FLIGHT_FRA_JFK)
+        create_flight(client, token, FLIGHT_LHR_CDG_2023)
+
+        response = client.post(
+            "/trips/overview",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"flightIds": [flight["id"]]},
+        )
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["flightsStats"]["totalCount"] == 1
+        assert len(data["flightsMap"]["routes"]) == 1
+
+    def test_no_auth_returns_401(self, client):
+        response = client.post("/trips/overview", json={})
+        assert response.status_code == 401
+
+
+# ── POST /trips/{user_id}/overview (public) ──────────────────────────────────
+
+class TestUserTripsOverviewPublic:
+    def test_year_filter_restricts_flights_and_visits(self, client, login_user):
+        token, user_id, _ = login_user
+        create_flight(client, token, FLIGHT_FRA_JFK)       # 2024
+        create_flight(client, token, FLIGHT_LHR_CDG_2023)  # 2023
+        create_visit(client, token, VISIT_PARIS_2023)
+        create_visit(client, token, VISIT_BERLIN_2024)
+
+        response = client.post(f"/trips/{user_id}/overview", json={"year": ["2023"]})
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["flightsStats"]["totalCount"] == 1
+        assert data["flightsStats"]["years"] == ["2023"]
+        assert len(data["flightsMap"]["routes"]) == 1
+        assert len(data["visitsMap"]["markers"]) == 1
+
+    def test_invalid_year_format_returns_422(self, client, login_user):
+        _, user_id, _ = login_user
+        response = client.post(f"/trips/{user_id}/overview", json={"year": ["24"]})
+        assert response.status_code == 422
+
+
+# ── GET /trips/cache/metrics ──────────────────────────────────────────────────
+
+class TestTripsCacheMetrics:
+    def test_repeated_request_is_served_from_cache(self, client, login_user):
+        token, user_id, _ = login_user
+        create_flight(client, token, FLIGHT_FRA_JFK)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        before = client.get("/trips/cache/metrics", headers=headers).json()
+        first = client.post("/trips/stats", headers=headers, json={"year": ["2024"]})
+        second = client.post("/trips/stats", headers=headers, json={"year": ["2024"]})
+        after = client.get("/trips/cache/metrics", headers=headers).json()
+
+        assert first.json() == second.json()
+        assert after["misses"] == before["misses"] + 1
+        assert after["memoryHits"] == before["memoryHits"] + 1
+
+    def test_flight_write_invalidates_cached_stats(self, client, login_user):
+        token, user_id, _ = login_user
+        headers = {"Authorization": f"Bearer {token}"}
+        create_flight(client, token, FLIGHT_FRA_JFK)
+
+        first = client.post("/trips/stats", headers=headers, json={}).json()
+        create_flight(client, token, FLIGHT_LHR_CDG_2023)
+        second = client.post("/trips/stats", headers=headers, json={}).json()
+
+        assert first["flights"]["totalCount"] == 1
+        assert second["flights"]["totalCount"] == 2
+
+    def test_no_auth_returns_401(self, client):
+        response = client.get("/trips/cache/metrics")
+        assert response.status_code == 401
+
+
+# ── POST /trips/maps with clustering ─────────────────────────────────────────
+
+class TestTripsMapsClustering:
+    def test_zoom_clusters_nearby_markers(self, client, login_user):
+        token, user_id, _ = login_user
+        create_visit(client, token, VISIT_PARIS_2023)
+        create_visit(client, token, VISIT_BERLIN_2024)
+        create_visit(client, token, VISIT_TOKYO_NO_YEAR)
+
+        response = client.post(f"/trips/{user_id}/maps", json={"zoom": 1})
+        assert response.status_code == 200
+        markers = response.json()["visits"]["markers"]
+
+        assert len(markers) == 2  # Paris + Berlin, Tokyo
+        assert sorted(m["count"] for m in markers) == [1, 2]
+
+    def test_viewport_limits_markers(self, client, login_user):
+        token, user_id, _ = login_user
+        create_visit(client, token, VISIT_PARIS_2023)
+        create_visit(client, token, VISIT_TOKYO_NO_YEAR)
+
+        response = client.post(
+            f"/trips/{user_id}/maps",
+            json={"zoom": 10, "viewport": {"south": 20, "west": 100, "north": 50, "east": 150}},
+        )
+        assert response.status_code == 200
+        markers = response.json()["visits"]["markers"]
+        assert [m["popup"] for m in markers] == ["Tokyo"]
+
+    def test_invalid_zoom_returns_422(self, client, login_user):
+        _, user_id, _ = login_user
+        response = client.post(f"/trips/{user_id}/maps", json={"zoom": 30})
+        assert response.status_code == 422
@@ -556,3 +556,48 @@ class TestQueryVisits:
             json={"year": ["not-a-year"]},
         )
         assert response.status_code == 422
+
+
+class TestGeoQueryVisits:
+    @pytest.fixture(autouse=True)
+    def setup_visits(self, client, login_user):
+        self.token, _, _ = login_user
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+
+        visits = [
+            {"city": "Paris", "country": "France", "lat": 48.8566, "lng": 2.3522, "year": "2022"},
+            {"city": "Lyon", "country": "France", "lat": 45.748, "lng": 4.847, "year": "2023"},
+            {"city": "Seoul", "country": "Korea", "lat": 37.5665, "lng": 126.978, "year": "2023"},
+        ]
+        for v in visits:
+            client.post("/visits/", headers=self.headers, json=v)
+
+        self.client = client
+
+    def test_within_bounding_box(self):
+        response = self.client.get(
+            "/visits/within",
+            headers=self.headers,
+            params={"south": 40, "west": -5, "north": 52, "east": 10},
+        )
+        assert response.status_code == 200
+        cities = {v["city"] for v in response.json()["entities"]}
+        assert cities == {"Paris", "Lyon"}
+
+    def test_invalid_bounding_box(self):
+        response = self.client.get(
+            "/visits/within",
+            headers=self.headers,
+            params={"south": 52, "west": -5, "north": 40, "east": 10},
+        )
+        assert response.status_code == 422
+
+    def test_near_is_sorted_by_distance(self):
+        response = self.client.get(
+            "/visits/near",
+            headers=self.headers,
+            params={"lat": 45.76, "lng": 4.84, "radiusKm": 500},
+        )
+        assert response.status_code == 200
+        cities = [v["city"] for v in response.json()["entities"]]
+        assert cities == ["Lyon", "Paris"]
@@ -15,3 +15,17 @@ allow_origins = [
     "http://localhost:5656",  # sso
     "http://localhost:5757",  # apps-central
 ]
+
+# Response headers readable by the browser apps above, e.g. the metadata of the binary Strava routemap
+expose_headers = [
+    "X-Routemap-Count",
+    "X-Routemap-Scale",
+    "X-Routemap-After",
+    "X-Routemap-Before",
+    "X-Activity-Count",
+    "X-Activity-Types",
+    "X-Route-Points",
+    "X-Route-Points-Simplified",
+    "X-Tile-Size",
+    "ETag",
+]
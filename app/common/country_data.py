@@ -1,14 +1,13 @@
 import json
+from functools import cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
 
+_static_data_path = Path(__file__).resolve().parents[2] / "app" / "static_data"
 
-class CountryData:
-    """
-    Class to handle country data, including names and continents.
-    Uses a JSON file to store country information.
-    """
-
-    continents = {
+CONTINENTS: Mapping[str, str] = MappingProxyType(
+    {
         "AF": "Africa",
         "AN": "Antartica",
         "AS": "Asia",
@@ -17,32 +16,72 @@ class CountryData:
         "OC": "Oceania",
         "SA": "South America",
     }
+)
+
+
+class CountryData:
+    """
+    Read-only registry of country names and continents with O(1) lookups.
+    Built from `countries.json` (by country code) and `continents.json` (by country name, including
+    common aliases like "USA"), use the process-wide instance from `get_country_data`.
+    """
+
+    continents = CONTINENTS
 
-    def __init__(self):
-        project_root = Path(__file__).resolve().parents[2]
-        self.countries_path = project_root / "app" / "static_data" / "countries.json"
+    def __init__(
+        self,
+        countries: Mapping[str, Mapping[str, str]] | None = None,
+        continents_by_country_name: Mapping[str, str] | None = None,
+    ):
+        if countries is None:
+            with open(_static_data_path / "countries.json", "r") as f:
+                countries = json.load(f)
+        if continents_by_country_name is None:
+            with open(_static_data_path / "continents.json", "r") as f:
+                continents_by_country_name = json.load(f)
+
+        self._countries: Mapping[str, Mapping[str, str]] = MappingProxyType(
+            {code.upper(): MappingProxyType(dict(country)) for code, country in countries.items()}
+        )
+        self._codes_by_name: Mapping[str, str] = MappingProxyType(
+            {country["name"].lower(): code for code, country in self._countries.items()}
+        )
+        self._continents_by_country_name: Mapping[str, str] = MappingProxyType(
+            dict(continents_by_country_name)
+        )
+
+    def _get_country(self, country_code: str) -> Mapping[str, str]:
+        country_code = country_code.upper()
+        if country_code not in self._countries:
+            raise ValueError(f"Country {country_code} not found.")
+        return self._countries[country_code]
 
     def get_name(self, country_code: str) -> str:
         """
         Get the name of the country by its code.
         """
-        with open(self.countries_path, "r") as f:
-            countries = json.load(f)
-            country_code = country_code.upper()
-            if country_code in countries:
-                return countries[country_code]["name"]
-            else:
-                raise ValueError(f"Country {country_code} not found.")
+        return self._get_country(country_code)["name"]
 
     def get_continent(self, country_code: str) -> str:
         """
         Get the continent of the country by its code.
         """
-        with open(self.countries_path, "r") as f:
-            countries = json.load(f)
-            country_code = country_code.upper()
-            if country_code in countries:
-                continent_code = countries[country_code]["continent"]
-                return self.continents.get(continent_code, "Unknown")
-            else:
-                raise ValueError(f"Country {country_code} not found.")
+        return self.continents.get(self._get_country(country_code)["continent"], "Unknown")
+
+    def get_code(self, country_name: str) -> str | None:
+        """
+        Get the code of the country by its name, case-insensitive.
+        """
+        return self._codes_by_name.get(country_name.lower())
+
+    def get_continent_by_name(self, country_name: str) -> str:
+        """
+        Get the continent of the country by its name as used in flights and visits.
+        """
+        return self._continents_by_country_name.get(country_name, "Unknown")
+
+
+@cache
+def get_country_data() -> CountryData:
+    """The process-wide country registry, loaded on the first call (preloaded at startup)."""
+    return CountryData()
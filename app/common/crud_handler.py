@@ -90,9 +90,11 @@ class CrudHandler[T]:
         body: PkBaseModel,
         mapper_fn: Callable[[dict], T],
         create_timestamp: bool = False,
+        extra_fields: dict | None = None,
     ) -> T:
         """
         Create a new entity for the current user.
+        `extra_fields` are stored along with the body, e.g. derived fields used for querying.
         """
         try:
             entity_data = body.model_dump(
@@ -102,6 +104,8 @@ class CrudHandler[T]:
             entity_data["user_id"] = self.user.id
             if create_timestamp:
                 entity_data["created_at"] = datetime.now(timezone.utc).isoformat()
+            if extra_fields:
+                entity_data.update(extra_fields)
 
             result = await self.collection.insert_one(entity_data)
             if not result.acknowledged:
@@ -130,15 +134,22 @@ class CrudHandler[T]:
             )
 
     async def update(
-        self, id: str, body: PkBaseModel, mapper_fn: Callable[[dict], T]
+        self,
+        id: str,
+        body: PkBaseModel,
+        mapper_fn: Callable[[dict], T],
+        extra_fields: dict | None = None,
     ) -> T:
         """
         Update an existing entity for the current user.
+        `extra_fields` are set along with the body, e.g. derived fields used for querying.
         """
         try:
             entity_data = body.model_dump(
                 exclude_none=False, exclude_unset=True, mode="json"
             )
+            if extra_fields:
+                entity_data.update(extra_fields)
             result = await self.collection.find_one_and_update(
                 {"user_id": self.user.id, "id": id},
                 {"$set": entity_data},
@@ -164,6 +175,50 @@ class CrudHandler[T]:
                 f"An error occurred while updating the {self.entity_name}: " + str(e)
             )
 
+    async def update_with_previous(
+        self,
+        id: str,
+        body: PkBaseModel,
+        mapper_fn: Callable[[dict], T],
+        extra_fields: dict | None = None,
+    ) -> tuple[T, T]:
+        """
+        Update an existing entity for the current user, like `update`.
+        Returns the entity as it was before the update and the updated entity.
+        The previous state comes from the same atomic write, so no concurrent change can slip in between.
+        """
+        try:
+            entity_data = body.model_dump(
+                exclude_none=False, exclude_unset=True, mode="json"
+            )
+            if extra_fields:
+                entity_data.update(extra_fields)
+            previous = await self.collection.find_one_and_update(
+                {"user_id": self.user.id, "id": id},
+                {"$set": entity_data},
+                return_document=ReturnDocument.BEFORE,
+            )
+
+            if not previous:
+                raise NotFoundException(resource=self.entity_name)
+
+            # $set only replaces top-level fields, so the updated document is the merge of both
+            response = mapper_fn({**previous, **entity_data})
+            self.logger.info(
+                f"OK response: Updated {self.entity_name} {id} for user {self.user.id}"
+            )
+            return mapper_fn(previous), response
+
+        except NotFoundException as e:
+            raise e
+        except Exception as e:
+            self.logger.error(
+                f"Error updating {self.entity_name} {id} for user {self.user.id}: {e}"
+            )
+            raise InternalServerErrorException(
+                f"An error occurred while updating the {self.entity_name}: " + str(e)
+            )
+
     async def delete(self, id: str) -> IdResponse:
         """
         Delete an entity by ID for the current user.
@@ -187,3 +242,30 @@ class CrudHandler[T]:
             raise InternalServerErrorException(
                 f"An error occurred while deleting the {self.entity_name}: " + str(e)
             )
+
+    async def delete_with_previous(
+        self, id: str, mapper_fn: Callable[[dict], T]
+    ) -> tuple[T, IdResponse]:
+        """
+        Delete an entity by ID for the current user, like `delete`.
+        Returns the deleted entity, read by the same atomic write.
+        """
+        try:
+            previous = await self.collection.find_one_and_delete(
+                {"user_id": self.user.id, "id": id}
+            )
+
+            if not previous:
+                raise NotFoundException(resource=self.entity_name)
+
+            return mapper_fn(previous), IdResponse(id=id)
+
+        except NotFoundException as e:
+            raise e
+        except Exception as e:
+            self.logger.error(
+                f"Error deleting {self.entity_name} {id} for user {self.user.id}: {e}"
+            )
+            raise InternalServerErrorException(
+                f"An error occurred while deleting the {self.entity_name}: " + str(e)
+            )
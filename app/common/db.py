@@ -1,6 +1,6 @@
 from enum import Enum
 from logging import Logger
-from pymongo import AsyncMongoClient
+from pymongo import ASCENDING, GEOSPHERE, AsyncMongoClient, IndexModel
 from pymongo.server_api import ServerApi
 
 from app.common.environment import PkCentralEnv
@@ -20,12 +20,76 @@ class DbCollection(str, Enum):
     REDDIT = "reddit"
     DOCUMENTS = "documents"
     API_KEYS = "api_keys"
+    # Derived data collections
+    FLIGHT_STATS_ROLLUPS = "flight_stats_rollups"
+    TRIPS_DATA_VERSIONS = "trips_data_versions"
+    TRIPS_RESULTS_CACHE = "trips_results_cache"
+    GEMINI_RESPONSE_CACHE = "gemini_response_cache"
     # Static data collections
     AIRLINES = "airlines"
     AIRPORTS = "airports"
     AIRCRAFTS = "aircrafts"
 
 
+class StravaDbCollection(str, Enum):
+    """
+    Collections of the separate Strava database, see `StravaDbManager`.
+    """
+
+    ACTIVITIES = "activities"
+    SYNC_META = "sync_metadata"
+    SYNC_JOBS = "sync_jobs"
+
+
+STRAVA_DB_NAME = "strava"
+STRAVA_DB_MAX_POOL_SIZE = 20
+STRAVA_DB_MAX_IDLE_TIME_MS = 5 * 60 * 1000
+
+STRAVA_DB_INDEXES: dict[StravaDbCollection, list[IndexModel]] = {
+    StravaDbCollection.ACTIVITIES: [
+        # An activity is stored once per user, a batch resumed after a restart skips the stored ones
+        IndexModel([("user_id", ASCENDING), ("strava_id", ASCENDING)], unique=True),
+        # Routemaps of a bounding box only read the activities crossing it
+        IndexModel([("user_id", ASCENDING), ("bbox", GEOSPHERE)]),
+        IndexModel([("user_id", ASCENDING), ("start_point", GEOSPHERE)]),
+    ],
+    StravaDbCollection.SYNC_JOBS: [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # At most one active sync job per user
+        IndexModel([("user_id", ASCENDING)], unique=True, partialFilterExpression={"active": True}),
+    ],
+}
+
+TRIPS_RESULTS_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+GEMINI_RESPONSE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+DB_INDEXES: dict[DbCollection, list[IndexModel]] = {
+    DbCollection.FLIGHTS: [
+        IndexModel([("user_id", ASCENDING), ("year", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("date_ts", ASCENDING)]),
+    ],
+    DbCollection.VISITS: [
+        IndexModel([("user_id", ASCENDING), ("year", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("location", GEOSPHERE)]),
+    ],
+    DbCollection.AIRPORTS: [
+        IndexModel([("location", GEOSPHERE)]),
+    ],
+    DbCollection.FLIGHT_STATS_ROLLUPS: [
+        IndexModel([("user_id", ASCENDING), ("year", ASCENDING)], unique=True),
+    ],
+    DbCollection.TRIPS_DATA_VERSIONS: [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    DbCollection.TRIPS_RESULTS_CACHE: [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=TRIPS_RESULTS_CACHE_TTL_SECONDS),
+    ],
+    DbCollection.GEMINI_RESPONSE_CACHE: [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=GEMINI_RESPONSE_CACHE_TTL_SECONDS),
+    ],
+}
+
+
 class MongoDbManager:
     """
     This class handles the connection to MongoDB, provides access to the database,
@@ -46,6 +110,22 @@ class MongoDbManager:
 
         return self.db
 
+    async def ensure_indexes(self):
+        """
+        Create the indexes defined in `DB_INDEXES`. Existing indexes are left untouched.
+        Failures are logged but don't prevent the application from starting.
+        """
+        if self.db is None:
+            raise ValueError("No MongoDB instance to create indexes on.")
+
+        for collection_name, indexes in DB_INDEXES.items():
+            try:
+                await self.db.get_collection(collection_name).create_indexes(indexes)
+            except Exception as e:
+                self.logger.error(f"Failed to create indexes for {collection_name.value}: {e}")
+
+        self.logger.info("MongoDB indexes ensured.")
+
     async def close(self):
         if self.mongo_client:
             await self.mongo_client.close()
@@ -72,3 +152,84 @@ class MongoDbManager:
             raise
 
         self.logger.info(f"Connected to MongoDB database: {mongodb_name}")
+
+
+class StravaDbManager:
+    """
+    This class handles the connection to the separate Strava database (`STRAVA_DB_URI`).
+    It is connected once at startup, so the Strava endpoints share its connection pool
+    instead of connecting on every request.
+    The application still starts if the Strava database is unreachable, only the Strava endpoints fail.
+    `reachable` is the result of the last ping, so the startup can skip the work that would wait for the
+    server selection timeout.
+    """
+
+    def __init__(
+        self,
+        env: PkCentralEnv,
+        logger: Logger,
+        max_pool_size: int = STRAVA_DB_MAX_POOL_SIZE,
+        max_idle_time_ms: int = STRAVA_DB_MAX_IDLE_TIME_MS,
+    ):
+        self.logger = logger
+        self.env = env
+        self.max_pool_size = max_pool_size
+        self.max_idle_time_ms = max_idle_time_ms
+        self.mongo_client = None
+        self.db = None
+        self.reachable = False
+
+    async def connect(self) -> AsyncDatabase:
+        strava_db_uri = self.env.STRAVA_DB_URI
+        if not strava_db_uri:
+            raise ValueError("STRAVA_DB_URI environment variable is not set.")
+
+        self.logger.info("Connecting to Strava MongoDB...")
+        self.mongo_client = AsyncMongoClient(
+            host=strava_db_uri,
+            connectTimeoutMS=5000,
+            maxPoolSize=self.max_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
+            server_api=ServerApi("1"),
+        )
+        self.db = self.mongo_client.get_database(STRAVA_DB_NAME)
+
+        if await self.ping():
+            self.logger.info(f"Connected to Strava MongoDB database: {STRAVA_DB_NAME}")
+        return self.db
+
+    async def ensure_indexes(self):
+        """
+        Create the indexes defined in `STRAVA_DB_INDEXES`, failures are logged.
+        Skipped if the database was unreachable at the last ping.
+        """
+        if self.db is None:
+            raise ValueError("No Strava MongoDB instance to create indexes on.")
+        if not self.reachable:
+            self.logger.warning("Strava MongoDB is unreachable, skipping the index creation.")
+            return
+
+        for collection_name, indexes in STRAVA_DB_INDEXES.items():
+            try:
+                await self.db.get_collection(collection_name).create_indexes(indexes)
+            except Exception as e:
+                self.logger.error(f"Failed to create Strava indexes for {collection_name.value}: {e}")
+
+    async def ping(self) -> bool:
+        """
+        Health check of the Strava database, the result is kept in `reachable`, failures are logged.
+        """
+        if self.mongo_client is None:
+            return False
+        try:
+            await self.mongo_client.admin.command("ping")
+            self.reachable = True
+        except Exception as e:
+            self.logger.error(f"Failed to connect to Strava MongoDB: {e}")
+            self.reachable = False
+        return self.reachable
+
+    async def close(self):
+        if self.mongo_client:
+            await self.mongo_client.close()
+            self.logger.info("Strava MongoDB connection closed.")
@@ -41,6 +41,7 @@ class PkCentralEnv:
         aws_cognito_user_pool_id: str,
         aws_cognito_app_client_id: str,
         pk_env: str,
+        trips_cache_persistent: bool = False,
     ):
         self.ROOT_PATH = root_path
         self.MONGODB_URI = mongodb_uri
@@ -79,6 +80,7 @@ class PkCentralEnv:
         self.AWS_COGNITO_USER_POOL_ID = aws_cognito_user_pool_id
         self.AWS_COGNITO_APP_CLIENT_ID = aws_cognito_app_client_id
         self.PK_ENV = pk_env
+        self.TRIPS_CACHE_PERSISTENT = trips_cache_persistent
 
 
 def load_environment() -> PkCentralEnv:
@@ -244,6 +246,9 @@ def load_environment() -> PkCentralEnv:
     if not pk_env:
         raise ValueError("Missing required environment variable: PK_ENV")
 
+    # Optional, the MongoDB tier of the trips results cache is disabled by default
+    trips_cache_persistent = os.getenv("TRIPS_CACHE_PERSISTENT", "false").lower() == "true"
+
     return PkCentralEnv(
         root_path=root_path,
         mongodb_uri=mongodb_uri,
@@ -282,4 +287,5 @@ def load_environment() -> PkCentralEnv:
         aws_cognito_user_pool_id=aws_cognito_user_pool_id,
         aws_cognito_app_client_id=aws_cognito_app_client_id,
         pk_env=pk_env,
+        trips_cache_persistent=trips_cache_persistent,
     )
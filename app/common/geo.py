@@ -0,0 +1,112 @@
+from typing import Self
+from pydantic import Field, model_validator
+
+from app.common.types import PkBaseModel
+
+# Bounding boxes are split into chunks of at most this width, to keep every polygon
+# well within a hemisphere, and their edges along parallels are densified with this step,
+# so the geodesic polygon edges closely follow the parallels.
+_BBOX_MAX_CHUNK_WIDTH_DEG = 90.0
+_BBOX_EDGE_STEP_DEG = 1.0
+
+
+def to_geo_point(lat: float, lng: float) -> dict:
+    """GeoJSON point of the position, to be stored in a `location` field with a `2dsphere` index."""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def _box_polygon(south: float, west: float, north: float, east: float) -> dict:
+    steps = max(1, int((east - west) / _BBOX_EDGE_STEP_DEG))
+    lngs = [west + (east - west) * i / steps for i in range(steps + 1)]
+    ring = (
+        [[lng, south] for lng in lngs]
+        + [[lng, north] for lng in reversed(lngs)]
+        + [[west, south]]
+    )
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def bbox_geo_filter(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    field: str = "location",
+    intersects: bool = False,
+) -> dict:
+    """
+    Filter for documents with a GeoJSON point in the bounding box,
+    or with `intersects` a GeoJSON geometry crossing it, e.g. the bounding box of a route.
+    `west` > `east` means the box crosses the antimeridian.
+    """
+    operator = "$geoIntersects" if intersects else "$geoWithin"
+    ranges = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    chunks: list[tuple[float, float]] = []
+    for start, end in ranges:
+        while end - start > _BBOX_MAX_CHUNK_WIDTH_DEG:
+            chunks.append((start, start + _BBOX_MAX_CHUNK_WIDTH_DEG))
+            start += _BBOX_MAX_CHUNK_WIDTH_DEG
+        chunks.append((start, end))
+
+    clauses = [
+        {field: {operator: {"$geometry": _box_polygon(south, chunk_west, north, chunk_east)}}}
+        for chunk_west, chunk_east in chunks
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def radius_geo_filter(lat: float, lng: float, radius_km: float, field: str = "location") -> dict:
+    """
+    Filter for documents with a GeoJSON point within the radius, sorted by distance (nearest first).
+    """
+    return {
+        field: {
+            "$nearSphere": {
+                "$geometry": to_geo_point(lat, lng),
+                "$maxDistance": radius_km * 1000,
+            }
+        }
+    }
+
+
+class BoundingBoxQuery(PkBaseModel):
+    """Bounding box query parameters, `west` > `east` if the box crosses the antimeridian."""
+
+    south: float = Field(..., ge=-90, le=90)
+    west: float = Field(..., ge=-180, le=180)
+    north: float = Field(..., ge=-90, le=90)
+    east: float = Field(..., ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def check_latitudes(self) -> Self:
+        if self.south >= self.north:
+            raise ValueError("south must be less than north")
+        return self
+
+    def to_filter(self, field: str = "location", intersects: bool = False) -> dict:
+        return bbox_geo_filter(
+            self.south, self.west, self.north, self.east, field=field, intersects=intersects
+        )
+
+
+def parse_bbox(value: str | None) -> BoundingBoxQuery | None:
+    """
+    Parse a `west,south,east,north` bounding box, the order of GeoJSON and of Leaflet's `toBBoxString()`.
+    Raises `ValueError` if it is not four numbers of a valid box.
+    """
+    if value is None:
+        return None
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'west,south,east,north'")
+    west, south, east, north = (float(part) for part in parts)
+    return BoundingBoxQuery(south=south, west=west, north=north, east=east)
+
+
+class RadiusQuery(PkBaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    radius_km: float = Field(..., gt=0, le=20000)
+
+    def to_filter(self, field: str = "location") -> dict:
+        return radius_geo_filter(self.lat, self.lng, self.radius_km, field=field)
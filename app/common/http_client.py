@@ -0,0 +1,12 @@
+import httpx
+
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Pooled HTTP client shared by the outbound API clients, created in the lifespan as `app.state.http_client`.
+    Reusing connections avoids a new TCP and TLS handshake per request.
+    """
+    return httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
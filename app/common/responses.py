@@ -72,6 +72,12 @@ class ConflictException(BaseErrorResponse):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
 
 
+class TooManyRequestsException(BaseErrorResponse):
+    def __init__(self, detail: str | None = None):
+        detail = f"Too many requests: {detail}" if detail else "Too many requests"
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail)
+
+
 class InternalServerErrorException(BaseErrorResponse):
     def __init__(self, detail: str | None = None):
         detail = (
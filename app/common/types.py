@@ -1,7 +1,9 @@
 from pydantic import BaseModel, ConfigDict
+from pymongo.asynchronous.collection import AsyncCollection as AsyncMongoCollection
 from pymongo.asynchronous.database import AsyncDatabase as AsyncMongoDatabase
 
 AsyncDatabase = AsyncMongoDatabase
+AsyncCollection = AsyncMongoCollection
 
 
 def to_camel(string: str) -> str:
@@ -4,12 +4,15 @@ from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.common.config import allow_origins
-from app.common.db import MongoDbManager
+from app.common.config import allow_origins, expose_headers
+from app.common.country_data import get_country_data
+from app.common.db import MongoDbManager, StravaDbManager
 from app.common.environment import load_environment
+from app.common.http_client import create_http_client
 from app.common.logger import LoggingMiddleware, get_logger
 from app.common.version import get_version
 from app.modules.activities import activities
+from app.modules.ai.gemini_api import GeminiApi
 from app.modules.auth import auth
 from app.modules.birthdays import birthdays
 from app.modules.data_backup import data_backup
@@ -22,7 +25,16 @@ from app.modules.reddit import reddit
 from app.modules.shortcuts import shortcuts
 from app.modules.start_settings import start_settings
 from app.modules.strava import strava
+from app.modules.strava.heatmap_tiles import StravaHeatmapTiles
+from app.modules.strava.routemap_cache import StravaRoutemapCache
+from app.modules.strava.strava_rate_limiter import StravaRateLimiter
+from app.modules.strava.sync_jobs import StravaSyncJobs
 from app.modules.trips import trips
+from app.modules.trips.airlabs_api import AirLabsApi
+from app.modules.trips.airport_resolver import AirportResolver
+from app.modules.trips.airports_index import AirportsIndex
+from app.modules.trips.static_search import StaticDataSearch
+from app.modules.trips.trips_cache import TripsResultsCache
 from app.modules.visits import visits
 
 load_dotenv()
@@ -35,13 +47,57 @@ async def lifespan(app: FastAPI):
 
     db_manager = MongoDbManager(env, logger)
     db = await db_manager.connect()
+    await db_manager.ensure_indexes()
+    strava_db_manager = StravaDbManager(env, logger)
+    strava_db = await strava_db_manager.connect()
+    await strava_db_manager.ensure_indexes()
 
     app.state.db = db
+    app.state.strava_db = strava_db
+    app.state.strava_db_manager = strava_db_manager
     app.state.env = env
     app.state.logger = logger
+    app.state.trips_cache = TripsResultsCache(logger, persistent=env.TRIPS_CACHE_PERSISTENT)
+    app.state.airports_index = AirportsIndex()
+    await app.state.airports_index.load(db, logger)
+    app.state.http_client = create_http_client()
+    app.state.airlabs_api = AirLabsApi(
+        app.state.http_client,
+        airports_url=env.PROXY_AIRLABS_AIRPORTS_URL,
+        airlines_url=env.PROXY_AIRLABS_AIRLINES_URL,
+        api_key=env.AIRLABS_API_KEY,
+        logger=logger,
+    )
+    app.state.strava_rate_limiter = StravaRateLimiter(logger)
+    app.state.strava_routemap_cache = StravaRoutemapCache()
+    app.state.strava_heatmap_tiles = StravaHeatmapTiles(logger)
+    app.state.strava_sync_jobs = StravaSyncJobs(
+        strava_db,
+        logger,
+        app.state.http_client,
+        app.state.strava_rate_limiter,
+        routemap_cache=app.state.strava_routemap_cache,
+        heatmap_tiles=app.state.strava_heatmap_tiles,
+    )
+    if strava_db_manager.reachable:
+        await app.state.strava_sync_jobs.resume_interrupted()
+    else:
+        # Active jobs continue when their user starts the next sync
+        logger.warning("Strava MongoDB is unreachable, interrupted Strava sync jobs are not resumed.")
+    app.state.gemini_api = GeminiApi(api_key=env.GEMINI_API_KEY, logger=logger, db=db)
+    app.state.airport_resolver = AirportResolver(
+        db, logger, app.state.gemini_api, app.state.airports_index, airlabs=app.state.airlabs_api
+    )
+    # Preload the static country registry, so the first request doesn't parse the JSON files
+    get_country_data()
+    app.state.static_search = StaticDataSearch()
+    await app.state.static_search.load(db, logger)
 
     yield
 
+    await app.state.strava_sync_jobs.close()
+    await app.state.http_client.aclose()
+    await strava_db_manager.close()
     await db_manager.close()
 
 
@@ -59,6 +115,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=expose_headers,
 )
 
 app.add_middleware(LoggingMiddleware)
@@ -0,0 +1,16 @@
+from app.common.types import PkBaseModel
+
+
+class GeminiApiMetrics(PkBaseModel):
+    requests: int
+    cache_hits: int
+    cache_misses: int
+    hit_ratio: float
+    api_calls: int
+    errors: int
+    timeouts: int
+    prompt_tokens: int
+    response_tokens: int
+    total_tokens: int
+    saved_tokens: int
+    in_flight: int
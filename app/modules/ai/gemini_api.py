@@ -1,42 +1,201 @@
+import asyncio
+import hashlib
 import json
+from datetime import datetime, timezone
 from logging import Logger
 import re
+from typing import Any, Callable
 from google import genai
 from google.genai import Client
 from google.genai.types import (
     GenerateContentConfig,
+    GenerateContentResponseUsageMetadata,
     GoogleSearch,
     Tool,
 )
 
+from app.common.db import DbCollection
+from app.common.types import AsyncDatabase
+from app.modules.ai.ai_types import GeminiApiMetrics
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_MAX_CONCURRENCY = 4
+# Deadline of a call including the wait for a free slot, Gemini with search grounding can be slow
+GEMINI_TIMEOUT_SECONDS = 60
+
+
+def prompt_hash(prompt: str, model: str) -> str:
+    """Key of a prompt's answer in the response cache."""
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+
+def _token_count(usage: GenerateContentResponseUsageMetadata | None, field: str) -> int:
+    count = getattr(usage, field, None)
+    return count if isinstance(count, int) else 0
+
 
 class GeminiApi:
     """
     A class to interact with the Gemini API.
+    One instance is created at startup and shared through `app.state.gemini_api`.
+    At most `max_concurrency` calls run at a time, and each call has a deadline of `timeout_seconds`.
+    If a database is given, answers that could be parsed are cached in the `gemini_response_cache` collection
+    by the hash of the model and the prompt, so any prompt is cached without extra code.
+    Cached answers expire through a TTL index, see `GEMINI_RESPONSE_CACHE_TTL_SECONDS`.
     """
 
-    def __init__(self, api_key: str, logger: Logger):
+    def __init__(
+        self,
+        api_key: str,
+        logger: Logger,
+        db: AsyncDatabase | None = None,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        timeout_seconds: float = GEMINI_TIMEOUT_SECONDS,
+    ):
         self.client: Client = genai.Client(api_key=api_key)
         self.logger: Logger = logger
+        self.db = db
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.api_calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.total_tokens = 0
+        self.saved_tokens = 0
 
-    async def generate_json(self, prompt: str, model: str = "gemini-2.5-flash") -> dict:
+    async def generate_json(self, prompt: str, model: str = GEMINI_MODEL) -> dict:
         """
         Generate text in JSON format using the Gemini API.
         """
-        response = await self.client.aio.models.generate_content(
-            model=model,
-            contents=prompt,
-            config=GenerateContentConfig(
-                tools=[Tool(google_search=GoogleSearch())],
-            ),
+        return await self._generate(prompt, model, self.extract_json)
+
+    async def generate_json_list(self, prompt: str, model: str = GEMINI_MODEL) -> list:
+        """
+        Generate a JSON array using the Gemini API.
+        """
+        return await self._generate(prompt, model, self.extract_json_list)
+
+    async def invalidate(self, prompt: str, model: str = GEMINI_MODEL) -> None:
+        """
+        Remove the cached answer of the prompt, e.g. if the caller found its content invalid.
+        """
+        if self.db is None:
+            return
+        try:
+            await self.db.get_collection(DbCollection.GEMINI_RESPONSE_CACHE).delete_one(
+                {"_id": prompt_hash(prompt, model)}
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to invalidate cached Gemini response: {e}")
+
+    def metrics(self) -> GeminiApiMetrics:
+        requests = self.cache_hits + self.cache_misses
+        return GeminiApiMetrics(
+            requests=requests,
+            cache_hits=self.cache_hits,
+            cache_misses=self.cache_misses,
+            hit_ratio=self.cache_hits / requests if requests else 0.0,
+            api_calls=self.api_calls,
+            errors=self.errors,
+            timeouts=self.timeouts,
+            prompt_tokens=self.prompt_tokens,
+            response_tokens=self.response_tokens,
+            total_tokens=self.total_tokens,
+            saved_tokens=self.saved_tokens,
+            in_flight=self._in_flight,
         )
+
+    async def _generate[T](self, prompt: str, model: str, parse: Callable[[str], T]) -> T:
+        key = prompt_hash(prompt, model)
+        cached = await self._load(key)
+        if cached is not None:
+            try:
+                result = parse(cached["text"])
+                self.cache_hits += 1
+                self.saved_tokens += cached.get("total_tokens", 0)
+                return result
+            except ValueError:
+                # Answered again below, the new answer replaces this one
+                pass
+
+        self.cache_misses += 1
+        text, usage = await self._generate_text(prompt, model)
+        result = parse(text)
+        await self._store(key, model, text, usage)
+        return result
+
+    async def _generate_text(
+        self, prompt: str, model: str
+    ) -> tuple[str, GenerateContentResponseUsageMetadata | None]:
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                async with self._semaphore:
+                    self._in_flight += 1
+                    self.api_calls += 1
+                    try:
+                        response = await self.client.aio.models.generate_content(
+                            model=model,
+                            contents=prompt,
+                            config=GenerateContentConfig(
+                                tools=[Tool(google_search=GoogleSearch())],
+                            ),
+                        )
+                    finally:
+                        self._in_flight -= 1
+        except TimeoutError:
+            self.timeouts += 1
+            self.logger.error(f"Gemini API call timed out after {self.timeout_seconds} seconds.")
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+
+        usage = response.usage_metadata
+        self.prompt_tokens += _token_count(usage, "prompt_token_count")
+        self.response_tokens += _token_count(usage, "candidates_token_count")
+        self.total_tokens += _token_count(usage, "total_token_count")
+
         if not response.text:
-            self.logger.error(
-                "No response text received from the Gemini API.", str(response)
-            )
+            self.errors += 1
+            self.logger.error(f"No response text received from the Gemini API: {response}")
             raise ValueError("No response text received from the Gemini API.")
 
-        return self.extract_json(response.text)
+        return response.text, usage
+
+    async def _load(self, key: str) -> dict[str, Any] | None:
+        if self.db is None:
+            return None
+        try:
+            return await self.db.get_collection(DbCollection.GEMINI_RESPONSE_CACHE).find_one(
+                {"_id": key}
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to load cached Gemini response {key}: {e}")
+            return None
+
+    async def _store(
+        self, key: str, model: str, text: str, usage: GenerateContentResponseUsageMetadata | None
+    ) -> None:
+        if self.db is None:
+            return
+        try:
+            await self.db.get_collection(DbCollection.GEMINI_RESPONSE_CACHE).replace_one(
+                {"_id": key},
+                {
+                    "model": model,
+                    "text": text,
+                    "total_tokens": _token_count(usage, "total_token_count"),
+                    "created_at": datetime.now(timezone.utc),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to cache Gemini response {key}: {e}")
 
     def extract_json(self, text: str) -> dict:
         """
@@ -45,12 +204,31 @@ class GeminiApi:
         """
         match = re.search(r"\{.*?\}", text, re.DOTALL)
         if not match:
-            self.logger.error("No valid JSON found in the response:", text)
+            self.logger.error(f"No valid JSON found in the response: {text}")
             raise ValueError("No valid JSON found in the response.")
 
         json_str = match.group(0)
         try:
             return json.loads(json_str)
         except json.JSONDecodeError as e:
-            self.logger.error("Invalid JSON format:", str(e))
+            self.logger.error(f"Invalid JSON format: {e}")
             raise ValueError(f"Invalid JSON format: {e}")
+
+    def extract_json_list(self, text: str) -> list:
+        """
+        Extract a JSON array from the text response, from the first `[` to the last `]`.
+        """
+        match = re.search(r"\[.*\]", text, re.DOTALL)
+        if not match:
+            self.logger.error(f"No valid JSON array found in the response: {text}")
+            raise ValueError("No valid JSON array found in the response.")
+
+        try:
+            result = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Invalid JSON format: {e}")
+            raise ValueError(f"Invalid JSON format: {e}")
+
+        if not isinstance(result, list):
+            raise ValueError("The JSON in the response is not an array.")
+        return result
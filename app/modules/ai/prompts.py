@@ -13,3 +13,23 @@ You should find the following information about the airport:
 Make sure to respond in JSON format, for example:
 {{ "iata": "BUD", "icao": "LHBP", "name": "Liszt Ferenc International Airport", "city": "Budapest", "country": "Hungary", "lat": 19.223311, "lng": 41.1231123 }}
 """
+
+
+def airports_data_prompt(iata_codes: list[str]):
+    return f"""
+Please act as a travel professional and look for information about the airports that have the following IATA codes: {", ".join(iata_codes)}.
+Make sure the IATA code exactly matches the airport you are looking for. Only return an airport if its IATA code is exactly one of the listed codes, and leave out the codes you can't find.
+
+You should find the following information about each airport:
+- The ICAO code of the airport
+- Coordinates as latitude and longitude of the airport in number format with decimals
+- The official name of the airport in English if possible
+- The city the airport is located at, using its English name if possible. If there is no specific city then the nearest city or the region/state is also accepted.
+- The English name of the country the airport is located in.
+
+Make sure to respond with a JSON array containing one object per airport, for example:
+[
+  {{ "iata": "BUD", "icao": "LHBP", "name": "Liszt Ferenc International Airport", "city": "Budapest", "country": "Hungary", "lat": 47.436933, "lng": 19.255592 }},
+  {{ "iata": "CPH", "icao": "EKCH", "name": "Copenhagen Airport", "city": "Copenhagen", "country": "Denmark", "lat": 55.617917, "lng": 12.655972 }}
+]
+"""
@@ -7,9 +7,15 @@ from app.common.responses import IdResponse, ListResponse, ResponseDocs
 from app.modules.auth.auth_types import CurrentUser
 from app.modules.auth.auth_utils import auth_user_or_api_key
 from app.modules.flights.flights_types import Flight, FlightQuery, FlightRequest
-from app.modules.flights.flights_utils import to_flight, upsert_airports_from_flight
+from app.modules.flights.flights_utils import (
+    flight_date_fields,
+    to_flight,
+    upsert_airports_from_flight,
+)
 from app.modules.flights.get_flights import get_flights
 from app.modules.flights.query_flights import query_flights
+from app.modules.trips.stats_rollups import update_flight_stats_rollups
+from app.modules.trips.trips_cache import bump_trips_data_version
 
 
 router = APIRouter(tags=["Flights"], prefix="/flights")
@@ -74,8 +80,19 @@ async def post_create_flight(
         user=user,
         collection_name=DbCollection.FLIGHTS,
         entity_name="Flight",
-    ).create(body, mapper_fn=to_flight)
-    upsert_airports_from_flight(request.app.state.db, body, request.app.state.logger)
+    ).create(body, mapper_fn=to_flight, extra_fields=flight_date_fields(body.date))
+    upsert_airports_from_flight(
+        request.app.state.db,
+        body,
+        request.app.state.logger,
+        request.app.state.airports_index,
+    )
+    await update_flight_stats_rollups(
+        request.app.state.db, user.id, request.app.state.logger, added=result
+    )
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "flights", request.app.state.logger
+    )
     return result
 
 
@@ -94,13 +111,28 @@ async def put_update_flight(
     """
     Update an existing flight for the user.
     """
-    result = await CrudHandler[Flight](
+    previous, result = await CrudHandler[Flight](
         request=request,
         user=user,
         collection_name=DbCollection.FLIGHTS,
         entity_name="Flight",
-    ).update(id, body, mapper_fn=to_flight)
-    upsert_airports_from_flight(request.app.state.db, body, request.app.state.logger)
+    ).update_with_previous(id, body, mapper_fn=to_flight, extra_fields=flight_date_fields(body.date))
+    upsert_airports_from_flight(
+        request.app.state.db,
+        body,
+        request.app.state.logger,
+        request.app.state.airports_index,
+    )
+    await update_flight_stats_rollups(
+        request.app.state.db,
+        user.id,
+        request.app.state.logger,
+        removed=previous,
+        added=result,
+    )
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "flights", request.app.state.logger
+    )
     return result
 
 
@@ -118,9 +150,16 @@ async def delete_delete_flight(
     """
     Delete a flight for the user.
     """
-    return await CrudHandler[Flight](
+    previous, result = await CrudHandler[Flight](
         request=request,
         user=user,
         collection_name=DbCollection.FLIGHTS,
         entity_name="Flight",
-    ).delete(id)
+    ).delete_with_previous(id, mapper_fn=to_flight)
+    await update_flight_stats_rollups(
+        request.app.state.db, user.id, request.app.state.logger, removed=previous
+    )
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "flights", request.app.state.logger
+    )
+    return result
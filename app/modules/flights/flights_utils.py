@@ -1,25 +1,42 @@
 import asyncio
+from datetime import datetime, timezone
 from logging import Logger
 
 from app.common.db import DbCollection
+from app.common.geo import to_geo_point
 from app.common.types import AsyncDatabase
-from app.modules.flights.flights_types import Flight, FlightRequest
+from app.modules.flights.flights_types import Airport, Flight, FlightRequest
+from app.modules.trips.airports_index import AirportsIndex
 
 
-async def _upsert_airports(db: AsyncDatabase, body: FlightRequest, logger: Logger) -> None:
-    """Upsert departure and arrival airports into the airports collection."""
+def to_airport_doc(airport: Airport) -> dict:
+    """Document of the `airports` collection, with the GeoJSON location for geo queries."""
+    return {**airport.model_dump(mode="json"), "location": to_geo_point(airport.lat, airport.lng)}
+
+
+async def _upsert_airports(
+    db: AsyncDatabase,
+    body: FlightRequest,
+    logger: Logger,
+    airports_index: AirportsIndex | None = None,
+) -> None:
+    """
+    Upsert departure and arrival airports into the airports collection,
+    new airports are also added to the nearest-airport index.
+    """
     try:
         collection = db.get_collection(DbCollection.AIRPORTS)
         for airport in (body.departure_airport, body.arrival_airport):
             logger.info(f"Upserting airport: {airport.iata} ({airport.name})")
-            airport_doc = airport.model_dump(mode="json")
             result = await collection.update_one(
                 {"iata": airport.iata},
-                {"$setOnInsert": airport_doc},
+                {"$setOnInsert": to_airport_doc(airport)},
                 upsert=True,
             )
             if result.upserted_id is not None:
                 logger.info(f"New airport added: {airport.iata} ({airport.name})")
+                if airports_index is not None:
+                    airports_index.add(airport)
             else:
                 logger.info(f"Airport already exists, skipping: {airport.iata} ({airport.name})")
     except Exception as e:
@@ -27,9 +44,27 @@ async def _upsert_airports(db: AsyncDatabase, body: FlightRequest, logger: Logge
         logger.error(f"Failed to upsert airports for flight: {e}")
 
 
-def upsert_airports_from_flight(db: AsyncDatabase, body: FlightRequest, logger: Logger) -> None:
+def upsert_airports_from_flight(
+    db: AsyncDatabase,
+    body: FlightRequest,
+    logger: Logger,
+    airports_index: AirportsIndex | None = None,
+) -> None:
     """Schedule airport upserts as a fire-and-forget background task."""
-    asyncio.create_task(_upsert_airports(db, body, logger))
+    asyncio.create_task(_upsert_airports(db, body, logger, airports_index))
+
+
+def flight_date_fields(date: str) -> dict:
+    """
+    Derived, indexed fields of the `YYYY-MM-DD` flight date: `year` as int and `date_ts` as a BSON date.
+    """
+    date_ts = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return {"year": date_ts.year, "date_ts": date_ts}
+
+
+def flight_years_query(years: list[str]) -> dict:
+    """Filter on the derived `year` field for the given `YYYY` strings."""
+    return {"$in": [int(y) for y in years]}
 
 
 def to_flight(item: dict) -> Flight:
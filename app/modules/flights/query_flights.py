@@ -5,7 +5,7 @@ from app.common.responses import InternalServerErrorException, ListResponse
 from app.common.types import AsyncDatabase
 from app.modules.auth.auth_types import CurrentUser
 from app.modules.flights.flights_types import Flight, FlightQuery
-from app.modules.flights.flights_utils import to_flight
+from app.modules.flights.flights_utils import flight_years_query, to_flight
 
 
 async def query_flights(
@@ -22,8 +22,7 @@ async def query_flights(
         query: dict = {"user_id": user.id}
 
         if body.year:
-            year_pattern = "|".join(body.year)
-            query["date"] = {"$regex": f"^({year_pattern})"}
+            query["year"] = flight_years_query(body.year)
 
         if body.is_planned is not None:
             query["is_planned"] = body.is_planned
@@ -1,6 +1,6 @@
 from fastapi import Request
 
-from app.common.country_data import CountryData
+from app.common.country_data import get_country_data
 from app.common.environment import PkCentralEnv
 from app.common.responses import InternalServerErrorException, NotFoundException
 from app.modules.proxy.location.location_iq_api import LocationIqApi
@@ -32,8 +32,7 @@ async def get_city(request: Request, lat: float, lng: float) -> CityLocation:
         )
         country_code = address.get("country_code", "")
 
-        countries = CountryData()
-        country = countries.get_name(country_code)
+        country = get_country_data().get_name(country_code)
 
         return CityLocation(lat=lat, lng=lng, city=city, country=country)
 
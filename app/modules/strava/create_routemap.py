@@ -1,18 +1,47 @@
 from datetime import datetime
+from logging import Logger
 from typing import Any
-from fastapi import Request
-from pymongo import AsyncMongoClient
-from pymongo.server_api import ServerApi
+import numpy as np
+from fastapi import Request, Response
+from pymongo import UpdateOne
 
-from app.common.environment import PkCentralEnv
+from app.common.db import StravaDbCollection
+from app.common.geo import BoundingBoxQuery
 from app.common.responses import InternalServerErrorException
+from app.common.types import AsyncCollection, AsyncDatabase
 from app.modules.auth.auth_types import CurrentUser
+from app.modules.strava.route_codec import decode_route, encode_cells
+from app.modules.strava.route_simplify import simplification_stats, simplify_route
+from app.modules.strava.routemap_cache import CachedRoutemap, StravaRoutemapCache
 from app.modules.strava.strava_types import (
+    ACTIVITY_COUNT_HEADER,
+    ACTIVITY_TYPES_HEADER,
+    ROUTEMAP_AFTER_HEADER,
+    ROUTEMAP_BEFORE_HEADER,
+    ROUTEMAP_BINARY_MEDIA_TYPE,
+    ROUTEMAP_COUNT_HEADER,
+    ROUTEMAP_SCALE_HEADER,
+    ROUTE_POINTS_HEADER,
+    SIMPLIFIED_POINTS_HEADER,
     StravaActivityType,
-    StravaDbCollection,
+    StravaRouteSimplification,
     StravaRoutesResponse,
+    StravaSimplifyMethod,
 )
-from app.modules.strava.strava_utils import generate_routemap
+from app.modules.strava.strava_utils import (
+    ROUTEMAP_SCALE,
+    activity_cells,
+    cells_to_grid,
+    clip_cells,
+    route_cells,
+    routemap_from_cells,
+    unique_cells,
+)
+
+# The routes are not needed for the routemap, only the cells precomputed at sync time
+ROUTEMAP_PROJECTION = {"_id": 0, "route": 0}
+# Simplified routemaps are made from the routes, the precomputed cells are of the routes as synced
+SIMPLIFIED_ROUTEMAP_PROJECTION = {"_id": 0, "cells": 0}
 
 
 async def create_routemap(
@@ -21,51 +50,18 @@ async def create_routemap(
     before: datetime | None,
     after: datetime | None,
     types: list[StravaActivityType] | None = None,
+    tolerance: float | None = None,
+    method: StravaSimplifyMethod = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+    bbox: BoundingBoxQuery | None = None,
 ) -> StravaRoutesResponse:
-    env: PkCentralEnv = request.app.state.env
     logger = request.app.state.logger
-    db_client = AsyncMongoClient(
-        host=env.STRAVA_DB_URI, connectTimeoutMS=5000, server_api=ServerApi("1")
-    )
-    try:
-        await db_client.admin.command("ping")
-    except Exception as e:
-        logger.error(f"Error connecting to Strava database: {e}")
-        raise InternalServerErrorException(
-            detail="Failed to connect to Strava database. " + str(e)
-        )
 
     try:
-        db = db_client.get_database("strava")
-        activities_collection = db.get_collection(StravaDbCollection.ACTIVITIES)
-
-        if not types:
-            types = [
-                StravaActivityType.WALK,
-                StravaActivityType.RUN,
-                StravaActivityType.RIDE,
-            ]
-
-        filter_query: dict[str, Any] = {"user_id": user.id}
-
-        filter_query["type"] = {
-            "$in": [t.value if hasattr(t, "value") else t for t in types]
-        }
-
-        date_filter = {}
-        if after:
-            date_filter["$gte"] = after
-        if before:
-            date_filter["$lte"] = before
-        if date_filter:
-            filter_query["start_date"] = date_filter
-
-        logger.info(
-            f"Fetching routes for user: {user.id} with filters {str(filter_query)}"
+        cells, route_types, activity_count, simplification = await _get_routemap_cells(
+            request, user, before, after, types, tolerance, method, bbox
         )
-        routes = await activities_collection.find(filter_query).to_list()
 
-        if not routes:
+        if not activity_count:
             logger.info(f"No routes found for user {user.id}")
             return StravaRoutesResponse(
                 routemap=None,
@@ -76,17 +72,18 @@ async def create_routemap(
             )
 
         logger.info(
-            f"Found {len(routes)} routes for user {user.id}, generating routemap."
+            f"Found {activity_count} routes for user {user.id}, generating routemap."
         )
 
-        routemap = generate_routemap(activities=routes, logger=logger, sampling_rate=1)
+        routemap = routemap_from_cells(cells, logger=logger)
 
         return StravaRoutesResponse(
             routemap=routemap,
             after=after.isoformat() if after else None,
             before=before.isoformat() if before else None,
-            types=list(set(route["type"] for route in routes)),
-            activity_count=len(routes),
+            types=route_types,
+            activity_count=activity_count,
+            simplification=simplification,
         )
 
     except Exception as e:
@@ -95,6 +92,198 @@ async def create_routemap(
             detail=f"Could not create routemap: {str(e)}",
         )
 
-    finally:
-        await db_client.close()
-        logger.info("Strava routemap created, MongoDB connection closed.")
+
+async def create_routemap_binary(
+    request: Request,
+    user: CurrentUser,
+    before: datetime | None,
+    after: datetime | None,
+    types: list[StravaActivityType] | None = None,
+    tolerance: float | None = None,
+    method: StravaSimplifyMethod = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+    bbox: BoundingBoxQuery | None = None,
+) -> Response:
+    """
+    The routemap as packed little-endian int32 `(lat, lng)` pairs in units of `1 / X-Routemap-Scale` degrees,
+    the rest of the response is in the `X-Routemap-*`, `X-Activity-*` and `X-Route-Points-*` headers.
+    """
+    logger = request.app.state.logger
+
+    try:
+        cells, route_types, activity_count, simplification = await _get_routemap_cells(
+            request, user, before, after, types, tolerance, method, bbox
+        )
+        content = cells_to_grid(cells).astype("<i4").tobytes()
+        logger.info(f"Sending binary routemap with {len(cells)} points for user {user.id}")
+    except Exception as e:
+        logger.error(f"Error creating routemap for user {user.id}: {str(e)}")
+        raise InternalServerErrorException(
+            detail=f"Could not create routemap: {str(e)}",
+        )
+
+    headers = {
+        ROUTEMAP_COUNT_HEADER: str(len(cells)),
+        ROUTEMAP_SCALE_HEADER: str(ROUTEMAP_SCALE),
+        ACTIVITY_COUNT_HEADER: str(activity_count),
+        ACTIVITY_TYPES_HEADER: ",".join(route_types),
+    }
+    if after:
+        headers[ROUTEMAP_AFTER_HEADER] = after.isoformat()
+    if before:
+        headers[ROUTEMAP_BEFORE_HEADER] = before.isoformat()
+    if simplification:
+        headers[ROUTE_POINTS_HEADER] = str(simplification.original_points)
+        headers[SIMPLIFIED_POINTS_HEADER] = str(simplification.simplified_points)
+    return Response(content=content, media_type=ROUTEMAP_BINARY_MEDIA_TYPE, headers=headers)
+
+
+async def _get_routemap_cells(
+    request: Request,
+    user: CurrentUser,
+    before: datetime | None,
+    after: datetime | None,
+    types: list[StravaActivityType] | None,
+    tolerance: float | None = None,
+    method: StravaSimplifyMethod = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+    bbox: BoundingBoxQuery | None = None,
+) -> CachedRoutemap:
+    """
+    The routemap cells of the activities matching the filters, with their types and count,
+    and with the `tolerance` the cells of the simplified routes and the points dropped by the simplification.
+    With a `bbox`, only the activities crossing it are read, and their cells outside of it are dropped.
+    The unfiltered routemap is cached per user and per simplification.
+    """
+    db: AsyncDatabase = request.app.state.strava_db
+    logger = request.app.state.logger
+    routemap_cache: StravaRoutemapCache = request.app.state.strava_routemap_cache
+
+    if not types:
+        types = [
+            StravaActivityType.WALK,
+            StravaActivityType.RUN,
+            StravaActivityType.RIDE,
+        ]
+
+    type_values = [t.value if hasattr(t, "value") else t for t in types]
+    unfiltered = not after and not before and not bbox and set(type_values) >= set(StravaActivityType)
+
+    variant = (method, tolerance) if tolerance else None
+
+    cached = routemap_cache.get(user.id, variant) if unfiltered else None
+    if cached is not None:
+        logger.info(f"Using the cached routemap of user {user.id}")
+        return cached
+    # A sync storing activities while they are read makes the routemap outdated, it is then not cached
+    generation = routemap_cache.generation(user.id)
+
+    routes = await find_routemap_activities(
+        db, user.id, type_values, before, after, logger, with_routes=bool(tolerance), bbox=bbox
+    )
+
+    simplification = None
+    if tolerance:
+        activities_cells, simplification = _simplified_cells(routes, tolerance, method)
+        logger.info(
+            f"Simplified {simplification.original_points} route points to {simplification.simplified_points}"
+        )
+    else:
+        activities_cells = [activity_cells(r) for r in routes]
+
+    cells = unique_cells(np.concatenate([np.empty(0, dtype=np.int64)] + activities_cells))
+    if bbox:
+        cells = clip_cells(cells, bbox)
+    routemap = (cells, list(set(route["type"] for route in routes)), len(routes), simplification)
+    if unfiltered:
+        routemap_cache.set(user.id, routemap, variant, generation=generation)
+    return routemap
+
+
+def _simplified_cells(
+    activities: list[dict], tolerance: float, method: StravaSimplifyMethod
+) -> tuple[list[np.ndarray], StravaRouteSimplification]:
+    """The cells of the simplified route of each activity, and the points before and after simplifying."""
+    cells = []
+    original_points = simplified_points = 0
+    for activity in activities:
+        route = decode_route(activity.get("route"))
+        simplified = simplify_route(route, tolerance, method)
+        original_points += len(route)
+        simplified_points += len(simplified)
+        cells.append(route_cells(simplified))
+    return cells, simplification_stats(method, tolerance, original_points, simplified_points)
+
+
+async def find_routemap_activities(
+    db: AsyncDatabase,
+    user_id: str,
+    types: list[str],
+    before: datetime | None,
+    after: datetime | None,
+    logger: Logger,
+    with_routes: bool = False,
+    bbox: BoundingBoxQuery | None = None,
+) -> list[dict]:
+    """
+    The activities of the user matching the filters, without their routes but with their routemap cells,
+    or `with_routes` the other way around.
+    With a `bbox`, the activities with a bounding box crossing it, found with the `2dsphere` index.
+    """
+    activities_collection = db.get_collection(StravaDbCollection.ACTIVITIES)
+
+    filter_query: dict[str, Any] = {"user_id": user_id}
+
+    filter_query["type"] = {"$in": types}
+
+    date_filter = {}
+    if after:
+        date_filter["$gte"] = after
+    if before:
+        date_filter["$lte"] = before
+    if date_filter:
+        filter_query["start_date"] = date_filter
+
+    if bbox:
+        filter_query.update(bbox.to_filter("bbox", intersects=True))
+
+    logger.info(
+        f"Fetching routes for user: {user_id} with filters {str(filter_query)}"
+    )
+    if with_routes:
+        return await activities_collection.find(
+            filter_query, projection=SIMPLIFIED_ROUTEMAP_PROJECTION
+        ).to_list()
+
+    activities = await activities_collection.find(
+        filter_query, projection=ROUTEMAP_PROJECTION
+    ).to_list()
+    await _add_missing_cells(activities_collection, activities, logger)
+    return activities
+
+
+async def _add_missing_cells(
+    activities_collection: AsyncCollection, activities: list[dict], logger: Logger
+) -> None:
+    """
+    Compute the cells of the activities synced before they were precomputed, from their routes,
+    and store them so the next routemaps don't need the routes.
+    """
+    missing = {activity["id"]: activity for activity in activities if activity.get("cells") is None}
+    if not missing:
+        return
+
+    logger.info(f"Computing the routemap cells of {len(missing)} activities")
+    with_routes = await activities_collection.find(
+        {"id": {"$in": list(missing)}}, projection={"_id": 0, "id": 1, "route": 1}
+    ).to_list()
+    updates = []
+    for activity in with_routes:
+        cells = encode_cells(route_cells(activity["route"]))
+        missing[activity["id"]]["cells"] = cells
+        updates.append(UpdateOne({"id": activity["id"]}, {"$set": {"cells": cells}}))
+
+    try:
+        if updates:
+            await activities_collection.bulk_write(updates, ordered=False)
+    except Exception as e:
+        # The routemap is still returned, the cells are computed again next time
+        logger.error(f"Failed to store the routemap cells of {len(updates)} activities: {e}")
@@ -0,0 +1,52 @@
+from fastapi import Request
+
+from app.common.db import StravaDbCollection
+from app.common.responses import InternalServerErrorException, NotFoundException
+from app.common.types import AsyncDatabase
+from app.modules.auth.auth_types import CurrentUser
+from app.modules.strava.route_codec import decode_route
+from app.modules.strava.route_simplify import simplification_stats, simplify_route
+from app.modules.strava.strava_types import StravaActivityRoute, StravaSimplifyMethod
+
+
+async def get_activity_route(
+    request: Request,
+    user: CurrentUser,
+    strava_id: int,
+    tolerance: float | None = None,
+    method: StravaSimplifyMethod = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+) -> StravaActivityRoute:
+    """
+    The route of an activity of the user, simplified to within `tolerance` metres if given.
+    """
+    db: AsyncDatabase = request.app.state.strava_db
+    logger = request.app.state.logger
+
+    try:
+        activity = await db.get_collection(StravaDbCollection.ACTIVITIES).find_one(
+            {"user_id": user.id, "strava_id": strava_id}, projection={"_id": 0, "cells": 0}
+        )
+    except Exception as e:
+        logger.error(f"Error fetching route of activity {strava_id} for user {user.id}: {str(e)}")
+        raise InternalServerErrorException(detail=f"Could not fetch activity route: {str(e)}")
+
+    if activity is None:
+        raise NotFoundException("Activity")
+
+    route = decode_route(activity.get("route"))
+    simplification = None
+    if tolerance:
+        simplified = simplify_route(route, tolerance, method)
+        simplification = simplification_stats(method, tolerance, len(route), len(simplified))
+        logger.info(f"Simplified the route of activity {strava_id} from {len(route)} to {len(simplified)} points")
+        route = simplified
+
+    return StravaActivityRoute(
+        strava_id=activity["strava_id"],
+        name=activity["name"],
+        type=activity["type"],
+        start_date=activity["start_date"],
+        distance=activity["distance"],
+        route=[tuple(point) for point in route.tolist()],
+        simplification=simplification,
+    )
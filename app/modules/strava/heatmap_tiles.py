@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import math
+import struct
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from logging import Logger
+import numpy as np
+from cachetools import LRUCache
+from fastapi import Request, Response, status
+
+from app.common.responses import InternalServerErrorException, NotFoundException
+from app.common.types import AsyncDatabase
+from app.modules.auth.auth_types import CurrentUser
+from app.modules.strava.create_routemap import find_routemap_activities
+from app.modules.strava.strava_types import StravaActivityType, StravaTileFormat
+from app.modules.strava.strava_utils import ROUTEMAP_SCALE, activity_cells, cells_to_grid
+
+TILE_SIZE = 256
+MAX_TILE_ZOOM = 18
+# Points are kept as pixel coordinates of the world at the max zoom, 2^26 pixels wide
+_WORLD_BITS = MAX_TILE_ZOOM + 8
+_MAX_MERCATOR_LAT = 85.05112878
+_EQUATOR_PIXEL_METERS = 156_543.03
+# Size of a routemap cell, an activity crossing a pixel adds about this many cells per pixel width
+_CELL_METERS = 11.1
+# Heat at which a pixel has the full color, in activities crossing it
+HEAT_SATURATION = 30
+# Browsers revalidate every tile with its ETag, so tiles changed by a sync are not shown stale
+TILE_CACHE_CONTROL = "private, no-cache"
+PNG_MEDIA_TYPE = "image/png"
+RAW_MEDIA_TYPE = "application/octet-stream"
+
+TileKey = tuple[int, str, tuple[str, ...], datetime | None, datetime | None]
+
+
+def to_world_pixels(cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The routemap cells as Web Mercator pixel coordinates of the world at `MAX_TILE_ZOOM`, as uint32."""
+    grid = cells_to_grid(cells)
+    lat = np.clip(grid[:, 0] / ROUTEMAP_SCALE, -_MAX_MERCATOR_LAT, _MAX_MERCATOR_LAT)
+    lng = grid[:, 1] / ROUTEMAP_SCALE
+    world = 1 << _WORLD_BITS
+    xs = (lng + 180.0) / 360.0 * world
+    ys = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0 * world
+    return (
+        np.clip(xs, 0, world - 1).astype(np.uint32),
+        np.clip(ys, 0, world - 1).astype(np.uint32),
+    )
+
+
+def bin_tile(xs: np.ndarray, ys: np.ndarray, z: int, x: int, y: int) -> np.ndarray:
+    """
+    The number of points in each pixel of the tile, as a `(TILE_SIZE, TILE_SIZE)` uint32 array of rows.
+    The points must be sorted by `ys`, so the rows of the tile are a slice found by bisection.
+    """
+    shift = MAX_TILE_ZOOM - z
+    top, bottom = (y * TILE_SIZE) << shift, ((y + 1) * TILE_SIZE) << shift
+    start, end = np.searchsorted(ys, [top, bottom])
+    tile_xs, tile_ys = xs[start:end], ys[start:end]
+
+    left = (x * TILE_SIZE) << shift
+    in_tile = (tile_xs >= left) & (tile_xs < left + (TILE_SIZE << shift))
+    px = (tile_xs[in_tile] - left) >> shift
+    py = (tile_ys[in_tile] - top) >> shift
+    counts = np.bincount(
+        py.astype(np.int64) * TILE_SIZE + px.astype(np.int64), minlength=TILE_SIZE * TILE_SIZE
+    )
+    return counts.astype(np.uint32).reshape(TILE_SIZE, TILE_SIZE)
+
+
+def heat_to_rgba(counts: np.ndarray, z: int, y: int) -> np.ndarray:
+    """
+    Color the point counts of a tile: the counts are scaled to activities crossing each pixel
+    (at low zooms one activity adds many cells to a pixel), then mapped on a log scale up to `HEAT_SATURATION`
+    from transparent through orange to white.
+    """
+    n = math.pi * (1 - 2 * (y + 0.5) / (1 << z))
+    center_lat = math.atan(math.sinh(n))
+    pixel_meters = _EQUATOR_PIXEL_METERS * math.cos(center_lat) / (1 << z)
+    heat = counts / max(1.0, pixel_meters / _CELL_METERS)
+
+    t = np.clip(np.log1p(heat) / math.log1p(HEAT_SATURATION), 0.0, 1.0)
+    rgba = np.zeros((*counts.shape, 4), dtype=np.uint8)
+    rgba[..., 0] = 252
+    rgba[..., 1] = (82 + 173 * t**2).astype(np.uint8)
+    rgba[..., 2] = (255 * t**4).astype(np.uint8)
+    rgba[..., 3] = np.where(counts > 0, 96 + 159 * np.sqrt(t), 0).astype(np.uint8)
+    return rgba
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an `(height, width, 4)` uint8 array as an RGBA PNG, without filtering."""
+    height, width, _ = rgba.shape
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def date_buckets(
+    after: datetime | None, before: datetime | None
+) -> tuple[datetime | None, datetime | None]:
+    """The date range widened to whole days, so close ranges share their tiles."""
+    if after:
+        after = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    if before:
+        before = before.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            days=1, microseconds=-1
+        )
+    return after, before
+
+
+class StravaHeatmapTiles:
+    """
+    Renders heatmap tiles of the routes of a user on demand, from the routemap cells of their activities.
+    The points of a `(user, types, date range)` view are loaded once, projected and sorted, and kept
+    for the other tiles of the view, concurrent tiles of a view share the same load.
+    Rendered tiles are cached by `(user, types, date range, format, z/x/y)`, date ranges are widened to
+    whole days to share more tiles. A sync of the user invalidates both by bumping the user's generation,
+    which is part of every key and of the ETags of the tiles.
+    """
+
+    def __init__(self, logger: Logger, max_tiles: int = 4096, max_views: int = 8):
+        self.logger = logger
+        self._generations: dict[str, int] = {}
+        # Generations restart with the process, the ETags of an earlier process must not match
+        self._epoch = uuid.uuid4().hex
+        self._views: LRUCache[TileKey, tuple[np.ndarray, np.ndarray]] = LRUCache(maxsize=max_views)
+        self._tiles: LRUCache[tuple, bytes] = LRUCache(maxsize=max_tiles)
+        self._in_flight: dict[TileKey, asyncio.Task[tuple[np.ndarray, np.ndarray]]] = {}
+        self.tile_hits = 0
+        self.tiles_rendered = 0
+        self.views_loaded = 0
+
+    def invalidate(self, user_id: str) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def get_tile(
+        self,
+        db: AsyncDatabase,
+        user_id: str,
+        types: list[str],
+        after: datetime | None,
+        before: datetime | None,
+        z: int,
+        x: int,
+        y: int,
+        tile_format: StravaTileFormat,
+    ) -> bytes:
+        tile_key = self._tile_key(user_id, types, after, before, z, x, y, tile_format)
+        view: TileKey = tile_key[:5]
+
+        tile = self._tiles.get(tile_key)
+        if tile is not None:
+            self.tile_hits += 1
+            return tile
+
+        xs, ys = await self._get_view(db, view)
+        counts = bin_tile(xs, ys, z, x, y)
+        if tile_format == StravaTileFormat.RAW:
+            tile = counts.astype("<u4").tobytes()
+        else:
+            tile = encode_png(heat_to_rgba(counts, z, y))
+        self.tiles_rendered += 1
+        self._tiles[tile_key] = tile
+        return tile
+
+    def tile_etag(
+        self,
+        user_id: str,
+        types: list[str],
+        after: datetime | None,
+        before: datetime | None,
+        z: int,
+        x: int,
+        y: int,
+        tile_format: StravaTileFormat,
+    ) -> str:
+        """The ETag of a tile, known without rendering it, it changes when the user's tiles are invalidated."""
+        tile_key = self._tile_key(user_id, types, after, before, z, x, y, tile_format)
+        digest = hashlib.blake2b(repr((self._epoch, tile_key)).encode(), digest_size=12).hexdigest()
+        return f'"{digest}"'
+
+    def _tile_key(
+        self,
+        user_id: str,
+        types: list[str],
+        after: datetime | None,
+        before: datetime | None,
+        z: int,
+        x: int,
+        y: int,
+        tile_format: StravaTileFormat,
+    ) -> tuple:
+        after, before = date_buckets(after, before)
+        view: TileKey = (self._generations.get(user_id, 0), user_id, tuple(sorted(types)), after, before)
+        return (*view, tile_format, z, x, y)
+
+    async def _get_view(self, db: AsyncDatabase, view: TileKey) -> tuple[np.ndarray, np.ndarray]:
+        points = self._views.get(view)
+        if points is not None:
+            return points
+
+        task = self._in_flight.get(view)
+        if task is None:
+            task = asyncio.create_task(self._load_view(db, view))
+            self._in_flight[view] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(view, None))
+        # A cancelled tile request must not cancel the load shared with the other tiles
+        return await asyncio.shield(task)
+
+    async def _load_view(self, db: AsyncDatabase, view: TileKey) -> tuple[np.ndarray, np.ndarray]:
+        generation, user_id, types, after, before = view
+        activities = await find_routemap_activities(db, user_id, list(types), before, after, self.logger)
+        # Not deduplicated across activities, a cell crossed by more activities is hotter
+        cells = np.concatenate([np.empty(0, dtype=np.int64)] + [activity_cells(a) for a in activities])
+        xs, ys = to_world_pixels(cells)
+        order = np.argsort(ys, kind="stable")
+        points = (xs[order], ys[order])
+        self.views_loaded += 1
+        self.logger.info(
+            f"Loaded heatmap of {len(activities)} activities with {len(cells)} cells for user {user_id}"
+        )
+        if generation == self._generations.get(user_id, 0):
+            self._views[view] = points
+        return points
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether the `If-None-Match` header of the request matches the ETag, compared weakly."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def get_heatmap_tile(
+    request: Request,
+    user: CurrentUser,
+    z: int,
+    x: int,
+    y: int,
+    before: datetime | None,
+    after: datetime | None,
+    types: list[StravaActivityType] | None = None,
+    tile_format: StravaTileFormat = StravaTileFormat.PNG,
+) -> Response:
+    db: AsyncDatabase = request.app.state.strava_db
+    logger = request.app.state.logger
+    heatmap_tiles: StravaHeatmapTiles = request.app.state.strava_heatmap_tiles
+
+    if not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise NotFoundException("Tile")
+
+    if not types:
+        types = [
+            StravaActivityType.WALK,
+            StravaActivityType.RUN,
+            StravaActivityType.RIDE,
+        ]
+
+    type_values = [t.value if hasattr(t, "value") else t for t in types]
+    etag = heatmap_tiles.tile_etag(user.id, type_values, after, before, z, x, y, tile_format)
+    headers = {"Cache-Control": TILE_CACHE_CONTROL, "ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        tile = await heatmap_tiles.get_tile(
+            db,
+            user.id,
+            type_values,
+            after,
+            before,
+            z,
+            x,
+            y,
+            tile_format,
+        )
+    except Exception as e:
+        logger.error(f"Error creating heatmap tile {z}/{x}/{y} for user {user.id}: {str(e)}")
+        raise InternalServerErrorException(detail=f"Could not create heatmap tile: {str(e)}")
+
+    if tile_format == StravaTileFormat.RAW:
+        return Response(
+            content=tile,
+            media_type=RAW_MEDIA_TYPE,
+            headers={**headers, "X-Tile-Size": str(TILE_SIZE)},
+        )
+    return Response(content=tile, media_type=PNG_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,56 @@
+import numpy as np
+from bson import Binary
+
+# Coordinates are stored in millionths of a degree (about 0.1 m), the precision of the Strava streams
+ROUTE_SCALE = 1_000_000
+ROUTE_FORMAT_VERSION = 1
+_HEADER_SIZE = 2
+_INT16 = np.iinfo(np.int16)
+
+
+def encode_route(route: list[list[float]]) -> Binary:
+    """
+    Encode `[lat, lng]` pairs as quantized deltas, about 4 bytes per point instead of ~40 as a BSON array.
+    Layout: a version byte, the byte width of the deltas (2 or 4), the first point as two little-endian
+    int32, then the `(lat, lng)` deltas to the previous point, int16 if they all fit, int32 otherwise.
+    """
+    points = np.rint(np.asarray(route, dtype=np.float64).reshape(-1, 2) * ROUTE_SCALE).astype(np.int32)
+    deltas = np.diff(points, axis=0)
+    fits_int16 = deltas.size == 0 or (deltas.min() >= _INT16.min and deltas.max() <= _INT16.max)
+    dtype = np.dtype("<i2") if fits_int16 else np.dtype("<i4")
+
+    header = bytes([ROUTE_FORMAT_VERSION, dtype.itemsize])
+    body = points[:1].astype("<i4").tobytes() + deltas.astype(dtype).tobytes()
+    return Binary(header + body)
+
+
+def decode_route(route: bytes | list[list[float]] | np.ndarray | None) -> np.ndarray:
+    """
+    The route as an `(n, 2)` float array of `(lat, lng)`, from the encoded form, a not yet migrated list
+    or an already decoded array.
+    """
+    if route is None or len(route) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if not isinstance(route, (bytes, bytearray)):
+        return np.asarray(route, dtype=np.float64).reshape(-1, 2)
+
+    version, width = route[0], route[1]
+    if version != ROUTE_FORMAT_VERSION or width not in (2, 4):
+        raise ValueError(f"Unknown route format version {version} with width {width}")
+
+    first = np.frombuffer(route, dtype="<i4", count=2, offset=_HEADER_SIZE)
+    deltas = np.frombuffer(route, dtype=f"<i{width}", offset=_HEADER_SIZE + 8).reshape(-1, 2)
+    points = np.empty((len(deltas) + 1, 2), dtype=np.int64)
+    points[0] = first
+    np.cumsum(deltas, axis=0, dtype=np.int64, out=points[1:])
+    points[1:] += first
+    return points / ROUTE_SCALE
+
+
+def encode_cells(cells: np.ndarray) -> Binary:
+    """Encode the sorted packed routemap cells of an activity as little-endian int64."""
+    return Binary(np.ascontiguousarray(cells, dtype="<i8").tobytes())
+
+
+def decode_cells(cells: bytes) -> np.ndarray:
+    return np.frombuffer(cells, dtype="<i8").astype(np.int64)
@@ -0,0 +1,131 @@
+import heapq
+import math
+import numpy as np
+
+from app.modules.strava.strava_types import StravaRouteSimplification, StravaSimplifyMethod
+
+# Mean Earth radius, the projection is only used within a route, a few tens of km at most
+_EARTH_RADIUS_METERS = 6_371_008.8
+MAX_SIMPLIFY_TOLERANCE_METERS = 1000.0
+
+
+def to_local_meters(coords: np.ndarray) -> np.ndarray:
+    """The `(lat, lng)` coordinates as `(x, y)` metres, equirectangular around the middle of the route."""
+    if not len(coords):
+        return np.empty((0, 2), dtype=np.float64)
+    lat0, lng0 = coords.mean(axis=0)
+    radians = np.radians(coords - (lat0, lng0))
+    xy = np.empty_like(radians)
+    xy[:, 0] = radians[:, 1] * _EARTH_RADIUS_METERS * np.cos(np.radians(lat0))
+    xy[:, 1] = radians[:, 0] * _EARTH_RADIUS_METERS
+    return xy
+
+
+def _segment_distances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    Distances of the points to their segments, row by row,
+    to the ends of the segment for points beyond them or for a closed loop.
+    """
+    segment = end - start
+    offset = points - start
+    length_sq = np.einsum("ij,ij->i", segment, segment)
+    t = np.einsum("ij,ij->i", offset, segment) / np.where(length_sq == 0, 1.0, length_sq)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(*(offset - t[:, None] * segment).T)
+
+
+def douglas_peucker(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Indices of the points kept by Douglas-Peucker: a point is dropped if it is within `tolerance` metres
+    of the segment between the kept points around it.
+    The segments are split level by level, the distances of all the points of a level computed at once.
+    """
+    n = len(coords)
+    if n < 3:
+        return np.arange(n)
+    xy = to_local_meters(coords)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    firsts, lasts = np.array([0]), np.array([n - 1])
+    while len(firsts):
+        inner = lasts - firsts - 1
+        firsts, lasts, inner = firsts[inner > 0], lasts[inner > 0], inner[inner > 0]
+        if not len(firsts):
+            break
+        # The inner points of all the segments, with the segment they are in
+        segment_ids = np.repeat(np.arange(len(firsts)), inner)
+        segment_starts = np.cumsum(inner) - inner
+        points = np.arange(len(segment_ids)) - segment_starts[segment_ids] + firsts[segment_ids] + 1
+        distances = _segment_distances(xy[points], xy[firsts[segment_ids]], xy[lasts[segment_ids]])
+
+        farthest_distances = np.maximum.reduceat(distances, segment_starts)
+        is_farthest = distances == farthest_distances[segment_ids]
+        candidates = np.flatnonzero(is_farthest)
+        first_candidate = np.concatenate(([True], segment_ids[candidates[1:]] != segment_ids[candidates[:-1]]))
+        farthest = points[candidates[first_candidate]]
+
+        split = farthest_distances > tolerance
+        keep[farthest[split]] = True
+        firsts, lasts = (
+            np.concatenate((firsts[split], farthest[split])),
+            np.concatenate((farthest[split], lasts[split])),
+        )
+    return np.flatnonzero(keep)
+
+
+def visvalingam_whyatt(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Indices of the points kept by Visvalingam-Whyatt: the point making the smallest triangle with its
+    neighbours is dropped while that area is under `tolerance²`, the area of a triangle `tolerance` metres
+    off a base of twice the tolerance. The first areas are computed at once, then updated around each drop.
+    """
+    n = len(coords)
+    if n < 3:
+        return np.arange(n)
+    xy = to_local_meters(coords)
+    min_area = tolerance**2
+    ab, ac = xy[1:-1] - xy[:-2], xy[2:] - xy[:-2]
+    areas = [math.inf] + (0.5 * np.abs(ab[:, 0] * ac[:, 1] - ac[:, 0] * ab[:, 1])).tolist() + [math.inf]
+    # The updates are one triangle at a time, faster on floats than on NumPy scalars
+    xs, ys = xy[:, 0].tolist(), xy[:, 1].tolist()
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    removed = [False] * n
+
+    heap = [(area, i) for i, area in enumerate(areas) if area < min_area]
+    heapq.heapify(heap)
+    while heap:
+        area, i = heapq.heappop(heap)
+        if removed[i] or area != areas[i]:
+            continue
+        removed[i] = True
+        before, after = previous[i], following[i]
+        following[before], previous[after] = after, before
+        for j in (before, after):
+            if 0 < j < n - 1:
+                a, c = previous[j], following[j]
+                triangle = 0.5 * abs((xs[j] - xs[a]) * (ys[c] - ys[a]) - (xs[c] - xs[a]) * (ys[j] - ys[a]))
+                # An area is never smaller than the one removed before it, so the order of removals is kept
+                areas[j] = max(area, triangle)
+                if areas[j] < min_area:
+                    heapq.heappush(heap, (areas[j], j))
+    return np.flatnonzero(~np.array(removed))
+
+
+def simplify_route(coords: np.ndarray, tolerance: float, method: StravaSimplifyMethod) -> np.ndarray:
+    """The `(lat, lng)` route simplified with the method, the first and last points are always kept."""
+    if method == StravaSimplifyMethod.VISVALINGAM_WHYATT:
+        return coords[visvalingam_whyatt(coords, tolerance)]
+    return coords[douglas_peucker(coords, tolerance)]
+
+
+def simplification_stats(
+    method: StravaSimplifyMethod, tolerance: float, original_points: int, simplified_points: int
+) -> StravaRouteSimplification:
+    return StravaRouteSimplification(
+        method=method,
+        tolerance=tolerance,
+        original_points=original_points,
+        simplified_points=simplified_points,
+        reduction=round(1 - simplified_points / original_points, 4) if original_points else 0.0,
+    )
@@ -0,0 +1,54 @@
+from cachetools import LRUCache
+import numpy as np
+
+from app.modules.strava.strava_types import StravaRouteSimplification, StravaSimplifyMethod
+
+# (cells, activity types, activity count, simplification of the routes if any)
+CachedRoutemap = tuple[np.ndarray, list[str], int, StravaRouteSimplification | None]
+# The simplification method and tolerance of the routes, None for the routemap of the routes as synced
+RoutemapVariant = tuple[StravaSimplifyMethod, float] | None
+
+
+class StravaRoutemapCache:
+    """
+    In-memory cache of the unfiltered routemap of each user, the union of the cells of all their activities,
+    once for the routes as synced and once for each simplification tolerance asked for.
+    The cells are cached rather than the points, at 8 bytes per point, and the entries of a user are
+    invalidated by the sync as soon as a new activity of the user is stored.
+    Invalidating also bumps the user's generation: a routemap built from activities read before a sync
+    is stored with the generation read before the query, and dropped if it changed meanwhile.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self._memory: LRUCache[tuple[str, RoutemapVariant], CachedRoutemap] = LRUCache(maxsize=maxsize)
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, variant: RoutemapVariant = None) -> CachedRoutemap | None:
+        cached = self._memory.get((user_id, variant))
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, 0)
+
+    def set(
+        self,
+        user_id: str,
+        routemap: CachedRoutemap,
+        variant: RoutemapVariant = None,
+        generation: int | None = None,
+    ) -> None:
+        """Cache the routemap, unless the user's routemaps were invalidated since `generation` was read."""
+        if generation is not None and generation != self.generation(user_id):
+            return
+        self._memory[(user_id, variant)] = routemap
+
+    def invalidate(self, user_id: str) -> None:
+        self._generations[user_id] = self.generation(user_id) + 1
+        for key in [key for key in self._memory if key[0] == user_id]:
+            self._memory.pop(key, None)
@@ -1,26 +1,50 @@
 from datetime import datetime
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi import APIRouter, Depends, Path, Query, Request, Response, status
+from pydantic import AfterValidator
 
+from app.common.geo import parse_bbox
 from app.common.responses import ResponseDocs
 from app.modules.auth.auth_types import CurrentUser
 from app.modules.auth.auth_utils import auth_user, auth_user_or_api_key
-from app.modules.strava.create_routemap import create_routemap
+from app.modules.strava.create_routemap import create_routemap, create_routemap_binary
+from app.modules.strava.get_activity_route import get_activity_route
+from app.modules.strava.heatmap_tiles import MAX_TILE_ZOOM, get_heatmap_tile
+from app.modules.strava.route_simplify import MAX_SIMPLIFY_TOLERANCE_METERS
 from app.modules.strava.strava_types import (
+    ROUTEMAP_BINARY_MEDIA_TYPE,
+    StravaActivityRoute,
     StravaActivityType,
+    StravaRoutemapFormat,
     StravaRoutesResponse,
-    StravaSyncResponse,
+    StravaSimplifyMethod,
+    StravaStatus,
+    StravaSyncJob,
+    StravaTileFormat,
 )
-from app.modules.strava.sync_routes import sync_strava_routes
+from app.modules.strava.sync_jobs import get_sync_job, start_sync_job
 
 
 router = APIRouter(prefix="/strava", tags=["Strava"])
 
 
+@router.get(
+    path="/status",
+    summary="Get the health of the Strava database",
+    status_code=status.HTTP_200_OK,
+)
+async def get_strava_status(request: Request) -> StravaStatus:
+    """
+    Ping the Strava database, e.g. for health checks. Its unavailability doesn't stop the application,
+    only the Strava endpoints fail.
+    """
+    return StravaStatus(database=await request.app.state.strava_db_manager.ping())
+
+
 @router.post(
     path="/routes/sync",
-    status_code=status.HTTP_200_OK,
-    summary="Sync Strava activities with routes for the user",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Start syncing Strava activities with routes for the user",
     responses={**ResponseDocs.unauthorized_response},
 )
 async def post_sync_strava_routes(
@@ -30,20 +54,49 @@ async def post_sync_strava_routes(
     force: Annotated[
         bool | None, Query(description="Force sync all activities")
     ] = False,
-) -> StravaSyncResponse:
+) -> StravaSyncJob:
     """
-    Sync Strava activities with routes lat/lng data for the current user.
+    Start syncing Strava activities with routes lat/lng data for the current user in the background.
+    If a sync is already running for the user, its job is returned instead of starting a new one.
     If `force` is True, it will force a sync for all activities even if the last sync was recent.
+    Poll the progress of the sync with `GET /strava/routes/sync/{job_id}`.
     """
-    return await sync_strava_routes(
+    return await start_sync_job(
         request=request, user=user, strava_token=strava_token, force=force
     )
 
 
+@router.get(
+    path="/routes/sync/{job_id}",
+    summary="Get the progress of a Strava sync job",
+    responses={**ResponseDocs.unauthorized_response, **ResponseDocs.not_found_response},
+)
+async def get_strava_sync_job(
+    request: Request,
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+    job_id: str,
+) -> StravaSyncJob:
+    """
+    Get the status and progress of a Strava sync job of the current user.
+    """
+    return await get_sync_job(request=request, user=user, job_id=job_id)
+
+
 @router.get(
     path="/routes/routemap",
     summary="Get routemap coordinates for the user",
-    responses={**ResponseDocs.unauthorized_response},
+    response_model=StravaRoutesResponse,
+    responses={
+        **ResponseDocs.unauthorized_response,
+        200: {
+            "content": {
+                ROUTEMAP_BINARY_MEDIA_TYPE: {
+                    "schema": {"type": "string", "format": "binary"},
+                }
+            },
+            "description": "The routemap as JSON, or as packed int32 pairs if requested",
+        },
+    },
 )
 async def get_create_routemap(
     request: Request,
@@ -66,10 +119,164 @@ async def get_create_routemap(
             description="Filter activities by type ('Walk', 'Run', 'Ride'). If not provided, all types are included.",
         ),
     ] = None,
-) -> StravaRoutesResponse:
+    format: Annotated[
+        StravaRoutemapFormat | None,
+        Query(
+            description="Response format, 'json' by default. 'binary' is the same as `Accept: application/octet-stream`.",
+        ),
+    ] = None,
+    tolerance: Annotated[
+        float | None,
+        Query(
+            gt=0,
+            le=MAX_SIMPLIFY_TOLERANCE_METERS,
+            description="Simplify the routes to within this many metres before generating the routemap",
+        ),
+    ] = None,
+    simplify: Annotated[
+        StravaSimplifyMethod,
+        Query(description="Simplification method used with `tolerance`"),
+    ] = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+    # Parsed to a `BoundingBoxQuery`, a model can't be an optional query parameter
+    bbox: Annotated[
+        str | None,
+        Query(
+            description="Only the routes in this bounding box - 'west,south,east,north', e.g., '18.9,47.4,19.2,47.6'",
+        ),
+        AfterValidator(parse_bbox),
+    ] = None,
+) -> StravaRoutesResponse | Response:
     """
     This endpoint retrieves the routemap coordinates for the current user. You can filter the results by date range and activity type.
+    With `Accept: application/octet-stream` or `format=binary`, the points are returned as packed
+    little-endian int32 `(lat, lng)` pairs in units of `1 / X-Routemap-Scale` degrees,
+    and the rest of the response in the `X-Routemap-*` and `X-Activity-*` headers.
+    This is much smaller and faster to parse than the JSON for large routemaps.
+    With `tolerance`, the routes are simplified with the `simplify` method (Douglas-Peucker by default)
+    before generating the routemap, and the points dropped are reported in `simplification`,
+    or in the `X-Route-Points-*` headers for the binary format.
+    With `bbox`, only the activities crossing the bounding box are read, and the points of their routes
+    outside of it are dropped.
     """
+    accept = request.headers.get("accept", "")
+    if format == StravaRoutemapFormat.BINARY or (
+        format is None and ROUTEMAP_BINARY_MEDIA_TYPE in accept
+    ):
+        return await create_routemap_binary(
+            request=request,
+            user=user,
+            before=before,
+            after=after,
+            types=types,
+            tolerance=tolerance,
+            method=simplify,
+            bbox=bbox,
+        )
     return await create_routemap(
-        request=request, user=user, before=before, after=after, types=types
+        request=request,
+        user=user,
+        before=before,
+        after=after,
+        types=types,
+        tolerance=tolerance,
+        method=simplify,
+        bbox=bbox,
+    )
+
+
+@router.get(
+    path="/activities/{strava_id}/route",
+    summary="Get the route of a Strava activity of the user",
+    responses={**ResponseDocs.unauthorized_response, **ResponseDocs.not_found_response},
+)
+async def get_strava_activity_route(
+    request: Request,
+    user: Annotated[CurrentUser, Depends(auth_user)],
+    strava_id: int,
+    tolerance: Annotated[
+        float | None,
+        Query(
+            gt=0,
+            le=MAX_SIMPLIFY_TOLERANCE_METERS,
+            description="Simplify the route to within this many metres",
+        ),
+    ] = None,
+    simplify: Annotated[
+        StravaSimplifyMethod,
+        Query(description="Simplification method used with `tolerance`"),
+    ] = StravaSimplifyMethod.DOUGLAS_PEUCKER,
+) -> StravaActivityRoute:
+    """
+    Get the route of a synced activity of the current user by its Strava ID.
+    With `tolerance`, the route is simplified with the `simplify` method (Douglas-Peucker by default)
+    and the points dropped are reported in `simplification`.
+    """
+    return await get_activity_route(
+        request=request, user=user, strava_id=strava_id, tolerance=tolerance, method=simplify
+    )
+
+
+@router.get(
+    path="/routes/tiles/{z}/{x}/{y}",
+    summary="Get a heatmap tile of the routes of the user",
+    response_class=Response,
+    responses={
+        **ResponseDocs.unauthorized_response,
+        **ResponseDocs.not_found_response,
+        200: {
+            "content": {
+                "image/png": {"schema": {"type": "string", "format": "binary"}},
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+            },
+            "description": "The heatmap tile as PNG, or as the raw point counts if requested",
+        },
+        304: {"description": "The tile matching the `If-None-Match` ETag is unchanged"},
+    },
+)
+async def get_routes_heatmap_tile(
+    request: Request,
+    user: Annotated[CurrentUser, Depends(auth_user)],
+    z: Annotated[int, Path(ge=0, le=MAX_TILE_ZOOM, description="Zoom level")],
+    x: Annotated[int, Path(ge=0, description="Tile column")],
+    y: Annotated[int, Path(ge=0, description="Tile row")],
+    after: Annotated[
+        datetime | None,
+        Query(
+            description="Filter activities after this date, widened to the start of the day - ISO 8601 format",
+        ),
+    ] = None,
+    before: Annotated[
+        datetime | None,
+        Query(
+            description="Filter activities before this date, widened to the end of the day - ISO 8601 format",
+        ),
+    ] = None,
+    types: Annotated[
+        list[StravaActivityType] | None,
+        Query(
+            description="Filter activities by type ('Walk', 'Run', 'Ride'). If not provided, all types are included.",
+        ),
+    ] = None,
+    format: Annotated[
+        StravaTileFormat,
+        Query(description="'png' by default, or 'raw' for the point counts"),
+    ] = StravaTileFormat.PNG,
+) -> Response:
+    """
+    A 256x256 Web Mercator (XYZ) heatmap tile of the routes of the current user, rendered on the server,
+    to be used as a map tile layer instead of the routemap points for zoomed-out views.
+    The `raw` format is the number of route points in each pixel, as little-endian uint32 in rows from the top.
+    Tiles have an ETag that changes when the user's routes are synced, send it as `If-None-Match` to get a 304
+    while the tile is unchanged.
+    """
+    return await get_heatmap_tile(
+        request=request,
+        user=user,
+        z=z,
+        x=x,
+        y=y,
+        before=before,
+        after=after,
+        types=types,
+        tile_format=format,
     )
@@ -1,17 +1,36 @@
+import asyncio
 from logging import Logger
-from fastapi import HTTPException
+from typing import AsyncIterator
+from fastapi import HTTPException, status
 import httpx
 
+from app.modules.strava.strava_rate_limiter import StravaRateLimiter
+
+STRAVA_API_URL = "https://www.strava.com/api/v3"
+# Activity streams fetched at the same time during a sync
+STRAVA_STREAM_CONCURRENCY = 8
+
 
 class StravaApi:
     """
     A class to handle Strava API interactions.
+    With a rate limiter, every request waits for a token and reports the rate limit headers back,
+    and a request refused with 429 is retried once in the next rate limit window.
     """
 
-    def __init__(self, access_token: str, logger: Logger):
+    def __init__(
+        self,
+        access_token: str,
+        logger: Logger,
+        http_client: httpx.AsyncClient | None = None,
+        rate_limiter: StravaRateLimiter | None = None,
+        base_url: str = STRAVA_API_URL,
+    ):
         self.access_token = access_token
-        self.base_url = "https://www.strava.com/api/v3"
+        self.base_url = base_url
         self.logger = logger
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter
 
     async def get_athlete(self):
         """
@@ -69,6 +88,33 @@ class StravaApi:
             f"/activities/{activity_id}/streams", params=params
         )
 
+    async def iter_latlng_streams(
+        self, activity_ids: list[int], concurrency: int = STRAVA_STREAM_CONCURRENCY
+    ) -> AsyncIterator[tuple[int, dict]]:
+        """
+        Fetch the latlng streams of the activities with up to `concurrency` requests in flight,
+        yielding `(activity_id, stream)` in the order of `activity_ids`.
+        If a fetch fails, the ones in flight are cancelled and the error is raised.
+        """
+        pending: dict[int, asyncio.Task] = {}
+        try:
+            for index, activity_id in enumerate(activity_ids):
+                pending[index] = asyncio.create_task(
+                    self.get_activity_latlng_stream(activity_id=activity_id)
+                )
+                # Once `concurrency` fetches are in flight, the oldest is yielded before the next one starts
+                if len(pending) >= concurrency:
+                    oldest = min(pending)
+                    yield activity_ids[oldest], await pending.pop(oldest)
+            for index in sorted(pending):
+                yield activity_ids[index], await pending.pop(index)
+        finally:
+            for task in pending.values():
+                if task.done() and not task.cancelled():
+                    # Retrieve the exceptions of the fetches that failed meanwhile
+                    task.exception()
+                task.cancel()
+
     async def _get_request(self, endpoint: str, params: dict | None = None):
         """
         Generic GET request to the Strava API.
@@ -78,8 +124,16 @@ class StravaApi:
         self.logger.info(
             f"Making GET request to Strava API: {endpoint} with params: {params}"
         )
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params)
+        for attempt in range(2):
+            if self.rate_limiter is not None:
+                window = await self.rate_limiter.acquire()
+            response = await self._send(url, headers, params)
+            if self.rate_limiter is not None:
+                self.rate_limiter.update(response.headers, window)
+                if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS and attempt == 0:
+                    self.logger.warning(f"Strava API rate limited {url}, retrying in the next window")
+                    self.rate_limiter.mark_exhausted()
+                    continue
             try:
                 response.raise_for_status()
                 return response.json()
@@ -91,3 +145,9 @@ class StravaApi:
                     status_code=exc.response.status_code,
                     detail=f"Strava API error: {exc.response.text}",
                 )
+
+    async def _send(self, url: str, headers: dict, params: dict | None) -> httpx.Response:
+        if self.http_client is not None:
+            return await self.http_client.get(url, headers=headers, params=params)
+        async with httpx.AsyncClient() as client:
+            return await client.get(url, headers=headers, params=params)
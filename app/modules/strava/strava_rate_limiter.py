@@ -0,0 +1,144 @@
+import asyncio
+import time
+from logging import Logger
+from typing import Awaitable, Callable, Mapping
+
+# Strava's default application limits, updated from the response headers
+STRAVA_SHORT_TERM_LIMIT = 100
+STRAVA_DAILY_LIMIT = 1000
+# Strava resets the short term usage at natural 15 minute boundaries and the daily usage at midnight UTC
+STRAVA_SHORT_TERM_WINDOW_SECONDS = 15 * 60
+STRAVA_DAILY_WINDOW_SECONDS = 24 * 60 * 60
+# Requests left unused in each window, for other Strava calls made outside of the limiter's view
+STRAVA_SHORT_TERM_RESERVE = 5
+STRAVA_DAILY_RESERVE = 20
+
+
+class StravaRateLimitExceeded(Exception):
+    """
+    Raised when a Strava request can't be made without waiting longer than allowed.
+    `resets_at` is the epoch timestamp when requests can be made again.
+    """
+
+    def __init__(self, message: str, resets_at: float):
+        super().__init__(message)
+        self.resets_at = resets_at
+
+
+def _parse_pair(value: str | None) -> tuple[int, int] | None:
+    try:
+        short_term, daily = (int(part) for part in (value or "").split(","))
+        return short_term, daily
+    except ValueError:
+        return None
+
+
+class StravaRateLimiter:
+    """
+    Token bucket in front of the Strava API, shared by all users as the limits are per application.
+    Every request takes a token from both the 15 minute and the daily bucket, and the buckets are
+    corrected from Strava's `X-RateLimit-Limit` and `X-RateLimit-Usage` response headers.
+    When the short term bucket is (nearly) empty, requests pause until the next 15 minute window,
+    when the daily one is, or the pause would be longer than `max_wait_seconds`,
+    `StravaRateLimitExceeded` is raised so the caller can stop cleanly.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        short_term_limit: int = STRAVA_SHORT_TERM_LIMIT,
+        daily_limit: int = STRAVA_DAILY_LIMIT,
+        short_term_reserve: int = STRAVA_SHORT_TERM_RESERVE,
+        daily_reserve: int = STRAVA_DAILY_RESERVE,
+        max_wait_seconds: float = STRAVA_SHORT_TERM_WINDOW_SECONDS,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.logger = logger
+        self.short_term_limit = short_term_limit
+        self.daily_limit = daily_limit
+        self.short_term_reserve = short_term_reserve
+        self.daily_reserve = daily_reserve
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = asyncio.Lock()
+        self._short_term_window = self._window(STRAVA_SHORT_TERM_WINDOW_SECONDS)
+        self._daily_window = self._window(STRAVA_DAILY_WINDOW_SECONDS)
+        self.short_term_usage = 0
+        self.daily_usage = 0
+        self.requests = 0
+        self.pauses = 0
+
+    def _window(self, length: int) -> int:
+        return int(self._clock() // length)
+
+    def _roll_windows(self) -> None:
+        short_term_window = self._window(STRAVA_SHORT_TERM_WINDOW_SECONDS)
+        if short_term_window != self._short_term_window:
+            self._short_term_window = short_term_window
+            self.short_term_usage = 0
+        daily_window = self._window(STRAVA_DAILY_WINDOW_SECONDS)
+        if daily_window != self._daily_window:
+            self._daily_window = daily_window
+            self.daily_usage = 0
+
+    async def acquire(self) -> int:
+        """
+        Take a token for one request, pausing until the next 15 minute window if needed.
+        Returns the window the token belongs to, to be passed to `update` with the response headers.
+        """
+        # Waiters queue up behind a pause, so they all resume in the new window
+        async with self._lock:
+            while True:
+                self._roll_windows()
+                if self.daily_usage >= self.daily_limit - self.daily_reserve:
+                    raise StravaRateLimitExceeded(
+                        f"Strava daily rate limit reached ({self.daily_usage}/{self.daily_limit})",
+                        resets_at=(self._daily_window + 1) * STRAVA_DAILY_WINDOW_SECONDS,
+                    )
+                if self.short_term_usage < self.short_term_limit - self.short_term_reserve:
+                    break
+
+                resets_at = (self._short_term_window + 1) * STRAVA_SHORT_TERM_WINDOW_SECONDS
+                wait = resets_at - self._clock()
+                if wait > self.max_wait_seconds:
+                    raise StravaRateLimitExceeded(
+                        f"Strava rate limit reached ({self.short_term_usage}/{self.short_term_limit}), "
+                        f"it resets in {wait:.0f} seconds",
+                        resets_at=resets_at,
+                    )
+                self.pauses += 1
+                self.logger.info(
+                    f"Strava rate limit nearly reached ({self.short_term_usage}/{self.short_term_limit}), "
+                    f"pausing for {wait:.0f} seconds"
+                )
+                await self._sleep(max(wait, 0))
+
+            self.short_term_usage += 1
+            self.daily_usage += 1
+            self.requests += 1
+            return self._short_term_window
+
+    def update(self, headers: Mapping[str, str], window: int | None = None) -> None:
+        """
+        Correct the buckets from the rate limit headers of a Strava response.
+        Usage only grows within a window, as responses of concurrent requests arrive in any order,
+        and the 15 minute usage of a response to a request from a previous `window` is ignored.
+        """
+        self._roll_windows()
+        limits = _parse_pair(headers.get("X-RateLimit-Limit"))
+        if limits:
+            self.short_term_limit, self.daily_limit = limits
+        usage = _parse_pair(headers.get("X-RateLimit-Usage"))
+        if usage:
+            if window in (None, self._short_term_window):
+                self.short_term_usage = max(self.short_term_usage, usage[0])
+            self.daily_usage = max(self.daily_usage, usage[1])
+
+    def mark_exhausted(self) -> None:
+        """
+        Empty the short term bucket after Strava refused a request with 429 Too Many Requests.
+        """
+        self._roll_windows()
+        self.short_term_usage = max(self.short_term_usage, self.short_term_limit)
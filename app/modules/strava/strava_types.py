@@ -1,31 +1,76 @@
+from datetime import datetime
 from enum import Enum
 
 from app.common.responses import OkResponse
 from app.common.types import PkBaseModel
 
 
-class StravaDbCollection(str, Enum):
-    """
-    Enum for Strava database collections.
-    """
-
-    ACTIVITIES = "activities"
-    SYNC_META = "sync_metadata"
-
-
 class StravaActivityType(str, Enum):
     WALK = "Walk"
     RUN = "Run"
     RIDE = "Ride"
 
 
-class StravaSyncResponse(OkResponse):
+class StravaSyncJobStatus(str, Enum):
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class StravaSyncJob(OkResponse):
+    id: str
+    status: StravaSyncJobStatus
+    force: bool
     routes_synced: int
-    total_routes: int
+    activities_to_sync: int | None = None
+    activities_remaining: int | None = None
+    total_routes: int | None = None
+    resume_after: datetime | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class StravaStatus(OkResponse):
+    database: bool  # whether the Strava database answered the ping
 
 
 Coords = tuple[float, float]  # (latitude, longitude)
 
+ROUTEMAP_BINARY_MEDIA_TYPE = "application/octet-stream"
+ROUTEMAP_COUNT_HEADER = "X-Routemap-Count"
+ROUTEMAP_SCALE_HEADER = "X-Routemap-Scale"
+ROUTEMAP_AFTER_HEADER = "X-Routemap-After"
+ROUTEMAP_BEFORE_HEADER = "X-Routemap-Before"
+ACTIVITY_COUNT_HEADER = "X-Activity-Count"
+ACTIVITY_TYPES_HEADER = "X-Activity-Types"
+ROUTE_POINTS_HEADER = "X-Route-Points"
+SIMPLIFIED_POINTS_HEADER = "X-Route-Points-Simplified"
+
+
+class StravaRoutemapFormat(str, Enum):
+    JSON = "json"
+    BINARY = "binary"
+
+
+class StravaTileFormat(str, Enum):
+    PNG = "png"
+    RAW = "raw"
+
+
+class StravaSimplifyMethod(str, Enum):
+    DOUGLAS_PEUCKER = "douglas-peucker"
+    VISVALINGAM_WHYATT = "visvalingam-whyatt"
+
+
+class StravaRouteSimplification(PkBaseModel):
+    method: StravaSimplifyMethod
+    tolerance: float
+    original_points: int
+    simplified_points: int
+    reduction: float  # share of the points dropped
+
 
 class StravaRoutemap(PkBaseModel):
     count: int = 0
@@ -38,3 +83,14 @@ class StravaRoutesResponse(OkResponse):
     before: str | None = None
     types: list[StravaActivityType]
     activity_count: int
+    simplification: StravaRouteSimplification | None = None
+
+
+class StravaActivityRoute(OkResponse):
+    strava_id: int
+    name: str
+    type: StravaActivityType
+    start_date: datetime
+    distance: float
+    route: list[Coords]
+    simplification: StravaRouteSimplification | None = None
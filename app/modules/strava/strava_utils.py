@@ -1,7 +1,113 @@
 from logging import Logger
+import numpy as np
 
+from app.common.geo import BoundingBoxQuery, to_geo_point
+from app.modules.strava.route_codec import decode_cells, decode_route
 from app.modules.strava.strava_types import Coords, StravaRoutemap
 
+# Coordinates are rounded to 4 decimal places for better clustering (approx. 11m precision)
+ROUTEMAP_DECIMALS = 4
+ROUTEMAP_SCALE = 10**ROUTEMAP_DECIMALS
+# Offsets making the grid coordinates non-negative, and the bit width of the longitude in the packed keys
+_LAT_OFFSET = 90 * ROUTEMAP_SCALE
+_LNG_OFFSET = 180 * ROUTEMAP_SCALE
+_LNG_BITS = 22
+# Scaled values this close to a .5 tie are rounded by Python, so the result matches `round()` exactly
+_TIE_TOLERANCE = 1e-6
+_NO_CELLS = np.empty(0, dtype=np.int64)
+# Routes along a meridian or a parallel have a flat box, which is not a valid GeoJSON polygon
+_MIN_BBOX_SIZE_DEG = 1e-6
+
+
+def _to_grid(values: np.ndarray) -> np.ndarray:
+    """
+    The values on the routemap grid as integers, rounded half to even like `round(value, 4)`.
+    Near ties the binary representation decides the direction, those few values are rounded by Python.
+    """
+    scaled = values * ROUTEMAP_SCALE
+    grid = np.rint(scaled)
+    near_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < _TIE_TOLERANCE
+    if near_tie.any():
+        grid[near_tie] = [
+            round(round(value, ROUTEMAP_DECIMALS) * ROUTEMAP_SCALE) for value in values[near_tie].tolist()
+        ]
+    return grid.astype(np.int64)
+
+
+def unique_cells(cells: np.ndarray) -> np.ndarray:
+    """
+    The sorted distinct cells, same as `np.unique`,
+    which hashes instead of sorting since NumPy 2.3 and is much slower on int64 keys.
+    """
+    cells = np.sort(cells)
+    return cells[np.concatenate(([True], cells[1:] != cells[:-1]))] if len(cells) else cells
+
+
+def route_cells(route: bytes | list[list[float]] | np.ndarray | None, sampling_rate: int = 1) -> np.ndarray:
+    """
+    The routemap cells of the route as sorted distinct packed `(lat, lng)` int64 keys.
+    Like the routemap, the first point is skipped and every `sampling_rate`-th point after it is used.
+    """
+    coords = decode_route(route)[1::sampling_rate]
+    keys = ((_to_grid(coords[:, 0]) + _LAT_OFFSET) << _LNG_BITS) | (_to_grid(coords[:, 1]) + _LNG_OFFSET)
+    return unique_cells(keys)
+
+
+def activity_cells(activity: dict, sampling_rate: int = 1) -> np.ndarray:
+    """The cells precomputed at sync time (with a sampling rate of 1), or computed from the route."""
+    if sampling_rate == 1 and activity.get("cells") is not None:
+        return decode_cells(activity["cells"])
+    return route_cells(activity.get("route"), sampling_rate)
+
+
+def cells_to_grid(cells: np.ndarray) -> np.ndarray:
+    """The cells as an `(n, 2)` int32 array of `(lat, lng)` in units of `1 / ROUTEMAP_SCALE` degrees."""
+    grid = np.empty((len(cells), 2), dtype=np.int32)
+    grid[:, 0] = (cells >> _LNG_BITS) - _LAT_OFFSET
+    grid[:, 1] = (cells & ((1 << _LNG_BITS) - 1)) - _LNG_OFFSET
+    return grid
+
+
+def route_bbox(route: bytes | list[list[float]] | np.ndarray) -> dict:
+    """The bounding box of the route as a GeoJSON polygon, to be stored in a `2dsphere` indexed field."""
+    coords = decode_route(route)
+    south, west = coords.min(axis=0).tolist()
+    north, east = coords.max(axis=0).tolist()
+    north, east = max(north, south + _MIN_BBOX_SIZE_DEG), max(east, west + _MIN_BBOX_SIZE_DEG)
+    ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def route_start_point(route: bytes | list[list[float]] | np.ndarray) -> dict:
+    """The first point of the route as a GeoJSON point."""
+    lat, lng = decode_route(route)[0].tolist()
+    return to_geo_point(lat, lng)
+
+
+def clip_cells(cells: np.ndarray, bbox: BoundingBoxQuery) -> np.ndarray:
+    """The cells in the bounding box, the parts of the routes crossing its edges outside are dropped."""
+    grid = cells_to_grid(cells)
+    lats, lngs = grid[:, 0] / ROUTEMAP_SCALE, grid[:, 1] / ROUTEMAP_SCALE
+    in_lngs = (
+        (lngs >= bbox.west) & (lngs <= bbox.east)
+        if bbox.west <= bbox.east
+        else (lngs >= bbox.west) | (lngs <= bbox.east)
+    )
+    return cells[in_lngs & (lats >= bbox.south) & (lats <= bbox.north)]
+
+
+def routemap_from_cells(cells: np.ndarray, logger: Logger) -> StravaRoutemap:
+    """The routemap of the sorted distinct cells."""
+    grid = cells_to_grid(cells)
+    lats = grid[:, 0] / ROUTEMAP_SCALE
+    lngs = grid[:, 1] / ROUTEMAP_SCALE
+    points: set[Coords] = set(zip(lats.tolist(), lngs.tolist()))
+
+    logger.info(f"Generated routemap with {len(points)} unique points.")
+
+    # The points are already float pairs, validating them would take longer than building them
+    return StravaRoutemap.model_construct(points=points, count=len(points))
+
 
 def generate_routemap(
     activities: list[dict], logger: Logger, sampling_rate: int = 5
@@ -9,38 +115,39 @@ def generate_routemap(
     """
     Generate a route map based on activity data.
     This function takes a list of activities, extracts route coordinates,
-    and clusters them.
+    and clusters them on a grid of 4 decimal places.
+    Each activity is a set of grid cells as sorted packed `(lat, lng)` int64 keys, precomputed at sync time
+    or quantized from its route, and the routemap is the union of these sets.
 
     ### Adjust this parameters to control clustering sensitivity and performance.
     - `sampling_rate`: How often to sample points from the route (e.g., every 5th point). Default is 5.
     """
 
-    points: set[Coords] = set()
-    activity_count = len(activities)
+    cells = [activity_cells(activity, sampling_rate) for activity in activities]
+    logger.info(
+        f"Processing {len(activities)} activities with {sum(map(len, cells))} distinct cells."
+    )
+    return routemap_from_cells(unique_cells(np.concatenate([_NO_CELLS, *cells])), logger)
 
-    for index, activity in enumerate(activities):
-        route = activity["route"]
-        if not route:
-            continue
 
-        logger.info(
-            f"Processing activity {index+1}/{activity_count} {activity['strava_id']} with {len(route)} coordinates."
-        )
+def generate_routemap_per_point(
+    activities: list[dict], logger: Logger, sampling_rate: int = 5
+) -> StravaRoutemap:
+    """
+    Point by point equivalent of `generate_routemap`, the reference for its tests and benchmark.
+    """
+
+    points: set[Coords] = set()
 
-        points_before = len(points)
-        for entry in route[1::sampling_rate]:
-            # Round coordinates to 4 decimal places for better clustering (approx. 11m precision)
+    for activity in activities:
+        route = decode_route(activity["route"])
+        for entry in route[1::sampling_rate].tolist():
             coords: Coords = (
-                round(entry[0], 4),
-                round(entry[1], 4),
+                round(entry[0], ROUTEMAP_DECIMALS),
+                round(entry[1], ROUTEMAP_DECIMALS),
             )
             points.add(coords)
 
-        points_after = len(points)
-        logger.info(
-            f"Added {points_after - points_before} unique points from activity."
-        )
-
     logger.info(f"Generated routemap with {len(points)} unique points.")
 
     return StravaRoutemap(points=points, count=len(points))
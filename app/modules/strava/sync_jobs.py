@@ -0,0 +1,301 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from logging import Logger
+import httpx
+from fastapi import Request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.common.db import StravaDbCollection
+from app.common.responses import InternalServerErrorException, NotFoundException
+from app.common.types import AsyncDatabase
+from app.modules.auth.auth_types import CurrentUser
+from app.modules.strava.heatmap_tiles import StravaHeatmapTiles
+from app.modules.strava.routemap_cache import StravaRoutemapCache
+from app.modules.strava.strava_api import StravaApi
+from app.modules.strava.strava_rate_limiter import StravaRateLimiter, StravaRateLimitExceeded
+from app.modules.strava.strava_types import StravaSyncJob, StravaSyncJobStatus
+from app.modules.strava.sync_routes import plan_sync, sync_activities
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class StravaSyncJobs:
+    """
+    Runs Strava route syncs as background jobs, persisted in the `sync_jobs` collection of the Strava DB.
+    A job first plans the activities to sync, then stores their routes in order, checkpointing the activities
+    still to sync after each stored batch, so an interrupted job continues where it stopped:
+    - jobs active at shutdown are resumed at startup, see `resume_interrupted`,
+    - jobs stopped by the Strava rate limits pause until the limit resets, then continue,
+    - a failed job with activities left is resumed by the next sync of the user.
+    There is at most one active job per user (a partial unique index), a sync started while one is active
+    attaches to it and refreshes its Strava token. The token is stored with the job while it is active,
+    so it can be resumed, and removed when the job finishes.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        logger: Logger,
+        http_client: httpx.AsyncClient,
+        rate_limiter: StravaRateLimiter,
+        routemap_cache: StravaRoutemapCache | None = None,
+        heatmap_tiles: StravaHeatmapTiles | None = None,
+    ):
+        self.db = db
+        self.logger = logger
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter
+        self.routemap_cache = routemap_cache
+        self.heatmap_tiles = heatmap_tiles
+        self._jobs = db.get_collection(StravaDbCollection.SYNC_JOBS)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self, user_id: str, strava_token: str, force: bool = False) -> StravaSyncJob:
+        """
+        Start a sync job for the user, or attach to the active one.
+        """
+        async with self._lock:
+            job = await self._jobs.find_one_and_update(
+                {"user_id": user_id, "active": True},
+                {"$set": {"strava_token": strava_token, "updated_at": _now()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is not None:
+                self.logger.info(f"Attaching to active Strava sync job {job['id']} of user {user_id}")
+            elif not force and (job := await self._reactivate_failed(user_id, strava_token)):
+                self.logger.info(f"Resuming failed Strava sync job {job['id']} of user {user_id}")
+            else:
+                job = await self._create(user_id, strava_token, force)
+
+            self._schedule(job["id"])
+            return self._to_job(job)
+
+    async def get(self, user_id: str, job_id: str) -> StravaSyncJob | None:
+        job = await self._jobs.find_one({"id": job_id, "user_id": user_id})
+        return self._to_job(job) if job else None
+
+    async def resume_interrupted(self) -> None:
+        """
+        Resume the jobs that were active when the application stopped, failures are logged.
+        """
+        try:
+            jobs = await self._jobs.find({"active": True}, projection={"id": 1}).to_list(length=None)
+        except Exception as e:
+            self.logger.error(f"Failed to resume Strava sync jobs: {e}")
+            return
+        for job in jobs:
+            self._schedule(job["id"])
+        if jobs:
+            self.logger.info(f"Resumed {len(jobs)} Strava sync jobs")
+
+    async def close(self) -> None:
+        """
+        Stop the running jobs, they stay active and are resumed at the next startup.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _create(self, user_id: str, strava_token: str, force: bool) -> dict:
+        now = _now()
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "status": StravaSyncJobStatus.RUNNING.value,
+            "active": True,
+            "force": bool(force),
+            "strava_token": strava_token,
+            "pending": None,
+            "activities_to_sync": None,
+            "routes_synced": 0,
+            "total_routes": None,
+            "resume_after": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            await self._jobs.insert_one(job)
+        except DuplicateKeyError:
+            # Started by another instance meanwhile
+            existing = await self._jobs.find_one({"user_id": user_id, "active": True})
+            if existing is None:
+                raise
+            return existing
+        self.logger.info(f"Started Strava sync job {job['id']} for user {user_id}")
+        return job
+
+    async def _reactivate_failed(self, user_id: str, strava_token: str) -> dict | None:
+        latest = await self._jobs.find_one({"user_id": user_id}, sort=[("created_at", -1)])
+        if (
+            latest is None
+            or latest["status"] != StravaSyncJobStatus.FAILED.value
+            or not latest.get("pending")
+        ):
+            return None
+        return await self._jobs.find_one_and_update(
+            {"id": latest["id"], "active": False},
+            {
+                "$set": {
+                    "status": StravaSyncJobStatus.RUNNING.value,
+                    "active": True,
+                    "strava_token": strava_token,
+                    "error": None,
+                    "updated_at": _now(),
+                }
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _schedule(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str) -> None:
+        while True:
+            job = await self._jobs.find_one({"id": job_id})
+            if job is None or not job["active"]:
+                return
+
+            if job.get("resume_after") is not None:
+                # MongoDB returns naive UTC datetimes
+                resume_after = job["resume_after"].replace(tzinfo=timezone.utc)
+                await asyncio.sleep(max(0.0, (resume_after - _now()).total_seconds()))
+
+            try:
+                await self._sync(job)
+                return
+            except StravaRateLimitExceeded as e:
+                resume_after = datetime.fromtimestamp(e.resets_at, timezone.utc)
+                self.logger.warning(f"Strava sync job {job_id} paused until {resume_after}: {e}")
+                await self._set(
+                    job_id,
+                    status=StravaSyncJobStatus.PAUSED.value,
+                    resume_after=resume_after,
+                    error=str(e),
+                )
+            except Exception as e:
+                self.logger.error(f"Strava sync job {job_id} failed: {e}")
+                await self._finish(job_id, StravaSyncJobStatus.FAILED, error=str(e))
+                return
+
+    async def _sync(self, job: dict) -> None:
+        job_id, user_id = job["id"], job["user_id"]
+        strava = StravaApi(
+            access_token=job["strava_token"],
+            logger=self.logger,
+            http_client=self.http_client,
+            rate_limiter=self.rate_limiter,
+        )
+        await self._set(job_id, status=StravaSyncJobStatus.RUNNING.value, resume_after=None, error=None)
+
+        pending = job["pending"]
+        if pending is None:
+            pending = await plan_sync(self.db, strava, user_id, self.logger, force=job["force"])
+            await self._set(job_id, pending=pending, activities_to_sync=len(pending))
+
+        async def checkpoint(checkpoints: list[tuple[int, bool]]) -> None:
+            routes_synced = sum(synced for _, synced in checkpoints)
+            if routes_synced:
+                self._invalidate_routes(user_id)
+            await self._jobs.update_one(
+                {"id": job_id},
+                {
+                    "$pull": {"pending": {"id": {"$in": [strava_id for strava_id, _ in checkpoints]}}},
+                    "$inc": {"routes_synced": routes_synced},
+                    "$set": {"updated_at": _now()},
+                },
+            )
+
+        await sync_activities(self.db, strava, user_id, pending, self.logger, on_progress=checkpoint)
+
+        total_routes = await self.db.get_collection(StravaDbCollection.ACTIVITIES).count_documents(
+            {"user_id": user_id}
+        )
+        await self._finish(job_id, StravaSyncJobStatus.COMPLETED, total_routes=total_routes)
+
+    def _invalidate_routes(self, user_id: str) -> None:
+        """Drop the cached routemap and heatmap tiles of the user, which don't have the new activities."""
+        if self.routemap_cache is not None:
+            self.routemap_cache.invalidate(user_id)
+        if self.heatmap_tiles is not None:
+            self.heatmap_tiles.invalidate(user_id)
+
+    async def _set(self, job_id: str, **fields) -> None:
+        await self._jobs.update_one({"id": job_id}, {"$set": {**fields, "updated_at": _now()}})
+
+    async def _finish(self, job_id: str, status: StravaSyncJobStatus, **fields) -> None:
+        try:
+            await self._jobs.update_one(
+                {"id": job_id},
+                {
+                    "$set": {**fields, "status": status.value, "active": False, "updated_at": _now()},
+                    "$unset": {"strava_token": ""},
+                },
+            )
+        except Exception as e:
+            # The job stays active and is resumed at the next startup
+            self.logger.error(f"Failed to finish Strava sync job {job_id}: {e}")
+
+    @staticmethod
+    def _to_job(job: dict) -> StravaSyncJob:
+        pending = job.get("pending")
+        return StravaSyncJob(
+            id=job["id"],
+            status=job["status"],
+            force=job["force"],
+            routes_synced=job["routes_synced"],
+            activities_to_sync=job.get("activities_to_sync"),
+            activities_remaining=len(pending) if pending is not None else None,
+            total_routes=job.get("total_routes"),
+            resume_after=job.get("resume_after"),
+            error=job.get("error"),
+            created_at=job["created_at"],
+            updated_at=job["updated_at"],
+        )
+
+
+async def start_sync_job(
+    request: Request, user: CurrentUser, strava_token: str, force: bool | None = False
+) -> StravaSyncJob:
+    """
+    Start syncing Strava routes for the current user in the background, or attach to the running sync.
+    """
+    sync_jobs: StravaSyncJobs = request.app.state.strava_sync_jobs
+    logger = request.app.state.logger
+
+    try:
+        return await sync_jobs.start(user.id, strava_token, force=bool(force))
+    except Exception as e:
+        logger.error(f"Error starting Strava sync for user {user.id}: {str(e)}")
+        raise InternalServerErrorException(
+            detail=f"Could not start syncing routes from Strava. - {str(e)}",
+        )
+
+
+async def get_sync_job(request: Request, user: CurrentUser, job_id: str) -> StravaSyncJob:
+    """
+    Get the progress of a Strava sync job of the current user.
+    """
+    sync_jobs: StravaSyncJobs = request.app.state.strava_sync_jobs
+    logger = request.app.state.logger
+
+    try:
+        job = await sync_jobs.get(user.id, job_id)
+    except Exception as e:
+        logger.error(f"Error fetching Strava sync job {job_id}: {str(e)}")
+        raise InternalServerErrorException(detail=f"Could not fetch sync job: {str(e)}")
+
+    if job is None:
+        raise NotFoundException("Sync job")
+    return job
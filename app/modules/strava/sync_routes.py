@@ -1,162 +1,196 @@
 import uuid
+from contextlib import aclosing
 from datetime import datetime, timezone
-from fastapi import Request
-from pymongo import AsyncMongoClient
-from pymongo.server_api import ServerApi
+from logging import Logger
+from typing import Awaitable, Callable
 
-from app.common.environment import PkCentralEnv
-from app.common.responses import InternalServerErrorException
-from app.modules.auth.auth_types import CurrentUser
+from pymongo.errors import BulkWriteError
+
+from app.common.db import StravaDbCollection
+from app.common.types import AsyncCollection, AsyncDatabase
+from app.modules.strava.route_codec import encode_cells, encode_route
 from app.modules.strava.strava_api import StravaApi
-from app.modules.strava.strava_types import StravaDbCollection, StravaSyncResponse
+from app.modules.strava.strava_utils import route_bbox, route_cells, route_start_point
+
+SYNCED_ACTIVITY_TYPES = ["Walk", "Run", "Ride"]
+# Activities stored with one `insert_many`, a route is typically a few hundred kB at most
+SYNC_BATCH_SIZE = 50
+DUPLICATE_KEY_ERROR_CODE = 11000
 
 
-async def sync_strava_routes(
-    request: Request, user: CurrentUser, strava_token: str, force: bool | None = False
-):
+async def plan_sync(
+    db: AsyncDatabase, strava: StravaApi, user_id: str, logger: Logger, force: bool = False
+) -> list[dict]:
     """
-    Endpoint to sync Strava data for the current user.
-    If `force` is True, it will force a sync even if the last sync was recent.
+    List the Strava activities of the user that need to be synced, oldest data first as returned by Strava.
+    If `force` is True, all activities are listed even if the last sync was recent.
+    Only the summary fields needed to store an activity are kept, so the list can be checkpointed.
     """
-    env: PkCentralEnv = request.app.state.env
-    logger = request.app.state.logger
-    db_client = AsyncMongoClient(
-        host=env.STRAVA_DB_URI, connectTimeoutMS=5000, server_api=ServerApi("1")
-    )
-    try:
-        await db_client.admin.command("ping")
-    except Exception as e:
-        logger.error(f"Error connecting to Strava database: {e}")
-        raise InternalServerErrorException(
-            detail="Failed to connect to Strava database. " + str(e)
-        )
+    sync_meta_collection = db.get_collection(StravaDbCollection.SYNC_META)
 
-    just_synced_count = 0
-    try:
-        db = db_client.get_database("strava")
-        strava = StravaApi(access_token=strava_token, logger=logger)
-        activities_collection = db.get_collection(StravaDbCollection.ACTIVITIES)
-        sync_meta_collection = db.get_collection(StravaDbCollection.SYNC_META)
-
-        user_sync_data = await sync_meta_collection.find_one({"user_id": user.id})
-        if not user_sync_data:
-            logger.info(
-                f"No sync metadata found for user {user.id}, creating new entry."
-            )
-            user_sync_data = {"user_id": user.id, "synced_ids": [], "last_synced": None}
-            await sync_meta_collection.insert_one(user_sync_data)
+    user_sync_data = await sync_meta_collection.find_one({"user_id": user_id})
+    if not user_sync_data:
+        logger.info(f"No sync metadata found for user {user_id}, creating new entry.")
+        user_sync_data = {"user_id": user_id, "synced_ids": [], "last_synced": None}
+        await sync_meta_collection.insert_one(user_sync_data)
 
-        logger.info(f"Syncing routes for user {user.id}")
+    logger.info(f"Syncing routes for user {user_id}")
 
-        athlete = await strava.get_athlete()
+    athlete = await strava.get_athlete()
+    logger.info(f"Authenticated as athlete: {athlete['username']} ({athlete['id']})")
+
+    if force is True:
+        logger.info("Force is True, fetching all activities.")
+        activities = await strava.get_all_activities()
+    elif user_sync_data["last_synced"] is not None:
         logger.info(
-            f"Authenticated as athlete: {athlete['username']} ({athlete['id']})"
+            f"Last synced time found: {user_sync_data['last_synced']}, fetching activities since then."
         )
-
-        if force is True:
-            logger.info("Force is True, fetching all activities.")
-            activities = await strava.get_all_activities()
-        elif user_sync_data["last_synced"] is not None:
-            logger.info(
-                f"Last synced time found: {user_sync_data['last_synced']}, fetching activities since then."
-            )
-            dt = datetime.fromisoformat(
-                user_sync_data["last_synced"].replace("Z", "+00:00")
-            )
-            epoch_ts = int(dt.timestamp())
-            activities = await strava.get_all_activities(after=epoch_ts)
-        else:
-            logger.info("No last synced time found, fetching all activities.")
-            activities = await strava.get_all_activities()
-
-        logger.info(f"Fetched {len(activities)} activities for athlete {athlete['id']}")
-
-        if not activities:
-            logger.info("No activities found to sync.")
-            saved_count = await activities_collection.count_documents(
-                {"user_id": user.id}
-            )
-            return StravaSyncResponse(
-                routes_synced=0,
-                total_routes=saved_count,
+        dt = datetime.fromisoformat(user_sync_data["last_synced"].replace("Z", "+00:00"))
+        epoch_ts = int(dt.timestamp())
+        activities = await strava.get_all_activities(after=epoch_ts)
+    else:
+        logger.info("No last synced time found, fetching all activities.")
+        activities = await strava.get_all_activities()
+
+    logger.info(f"Fetched {len(activities)} activities for athlete {athlete['id']}")
+
+    already_synced = set(user_sync_data["synced_ids"])
+    activities_to_sync: dict[int, dict] = {}
+
+    for activity in activities:
+        strava_id = activity["id"]
+
+        if strava_id in already_synced:
+            logger.info(f"Activity {strava_id} already synced, skipping.")
+            continue
+
+        if activity["type"] not in SYNCED_ACTIVITY_TYPES:
+            logger.info(f"Activity {strava_id} is of type {activity['type']}, skipping.")
+            continue
+
+        activities_to_sync[strava_id] = {
+            "id": strava_id,
+            "name": activity.get("name", "Unnamed Activity"),
+            "start_date": activity["start_date"],
+            "distance": activity["distance"],
+            "type": activity["type"],
+        }
+
+    return list(activities_to_sync.values())
+
+
+async def sync_activities(
+    db: AsyncDatabase,
+    strava: StravaApi,
+    user_id: str,
+    activities: list[dict],
+    logger: Logger,
+    on_progress: Callable[[list[tuple[int, bool]]], Awaitable[None]],
+    batch_size: int = SYNC_BATCH_SIZE,
+) -> int:
+    """
+    Fetch the routes of the planned activities and store them, returns the number of routes synced.
+    Activities are written in batches of `batch_size` with one `insert_many` and one sync metadata update,
+    so `synced_ids` and `last_synced` are not rewritten for every activity.
+    `on_progress(checkpoints)` is awaited with the `(strava_id, synced)` of the batch's activities, in order,
+    once the batch is stored, so the caller can checkpoint the remaining activities with a single write.
+    """
+    activities_collection = db.get_collection(StravaDbCollection.ACTIVITIES)
+    sync_meta_collection = db.get_collection(StravaDbCollection.SYNC_META)
+    activities_by_id = {activity["id"]: activity for activity in activities}
+    just_synced_count = 0
+    batch: list[dict] = []
+    progress: list[tuple[int, bool]] = []
+
+    async def flush() -> None:
+        nonlocal just_synced_count
+        docs, batch[:] = batch[:], []
+        checkpoints, progress[:] = progress[:], []
+        if docs:
+            just_synced_count += await _store_batch(activities_collection, user_id, docs, logger)
+            await sync_meta_collection.update_one(
+                {"user_id": user_id},
+                {
+                    "$addToSet": {"synced_ids": {"$each": [doc["strava_id"] for doc in docs]}},
+                    "$set": {"last_synced": datetime.now(timezone.utc).isoformat()},
+                },
             )
+            logger.info(f"Synced {len(docs)} activities for user {user_id}")
+        if checkpoints:
+            await on_progress(checkpoints)
 
-        already_synced = set(user_sync_data["synced_ids"])
-
-        for activity in activities:
-            strava_id = activity["id"]
-
-            if strava_id in already_synced:
-                logger.info(f"Activity {strava_id} already synced, skipping.")
-                continue
-
-            if activity["type"] not in ["Walk", "Run", "Ride"]:
+    # Streams are fetched concurrently within the Strava rate limits, and handled in activity order
+    streams = strava.iter_latlng_streams(list(activities_by_id))
+    try:
+        async with aclosing(streams):
+            async for strava_id, stream_response in streams:
+                activity = activities_by_id[strava_id]
+
+                if (
+                    not stream_response
+                    or "latlng" not in stream_response
+                    or not stream_response["latlng"]["data"]
+                ):
+                    logger.info(f"No lat/lng stream found for activity {strava_id}, skipping.")
+                    progress.append((strava_id, False))
+                    continue
+
+                latlng_data = stream_response["latlng"]["data"]
                 logger.info(
-                    f"Activity {strava_id} is of type {activity['type']}, skipping."
+                    f"Activity {strava_id} has lat/lng data with length: {len(latlng_data)}, syncing..."
                 )
-                continue
-
-            stream_response = await strava.get_activity_latlng_stream(
-                activity_id=strava_id
-            )
 
-            if (
-                not stream_response
-                or "latlng" not in stream_response
-                or not stream_response["latlng"]["data"]
-            ):
-                logger.info(
-                    f"No lat/lng stream found for activity {strava_id}, skipping."
+                batch.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "strava_id": strava_id,
+                        "user_id": user_id,
+                        "name": activity["name"],
+                        "start_date": datetime.fromisoformat(
+                            activity["start_date"].replace("Z", "+00:00")
+                        ),
+                        "distance": activity["distance"],
+                        "type": activity["type"],
+                        "route": encode_route(latlng_data),
+                        # Precomputed for the routemap, which then doesn't need to read the route
+                        "cells": encode_cells(route_cells(latlng_data)),
+                        # Indexed, so the activities outside of a bounding box are skipped
+                        "bbox": route_bbox(latlng_data),
+                        "start_point": route_start_point(latlng_data),
+                    }
                 )
-                continue
-
-            latlng_data = stream_response["latlng"]["data"]
-            logger.info(
-                f"Activity {strava_id} has lat/lng data with length: {len(latlng_data)}, syncing..."
-            )
-
-            activity_with_route = {
-                "id": str(uuid.uuid4()),
-                "strava_id": strava_id,
-                "user_id": user.id,
-                "name": activity.get("name", "Unnamed Activity"),
-                "start_date": datetime.fromisoformat(
-                    activity["start_date"].replace("Z", "+00:00")
-                ),
-                "distance": activity["distance"],
-                "type": activity["type"],
-                "route": latlng_data,
-            }
-            await activities_collection.insert_one(activity_with_route)
-
-            user_sync_data["synced_ids"].append(strava_id)
-            user_sync_data["last_synced"] = datetime.now(timezone.utc).isoformat()
-            await sync_meta_collection.update_one(
-                {"user_id": user.id},
-                {"$set": user_sync_data},
-            )
-            just_synced_count += 1
-            logger.info(f"Synced activity {strava_id} for user {user.id}")
-
-        logger.info(
-            f"Successfully synced {just_synced_count} activities for user {user.id}"
-            if just_synced_count > 0
-            else "No new activities were synced."
-        )
-        return StravaSyncResponse(
-            routes_synced=just_synced_count,
-            total_routes=len(user_sync_data["synced_ids"]),
-        )
+                progress.append((strava_id, True))
+                if len(batch) >= batch_size:
+                    await flush()
+    except Exception:
+        # Keep the routes fetched before the error, e.g. when the rate limits are reached
+        await flush()
+        raise
+    await flush()
+
+    logger.info(
+        f"Successfully synced {just_synced_count} activities for user {user_id}"
+        if just_synced_count > 0
+        else "No new activities were synced."
+    )
+    return just_synced_count
 
-    except Exception as e:
-        logger.info(
-            f"Synced {just_synced_count} activities for {user.id} before the error."
-        )
-        logger.error(f"Error syncing routes for user {user.id}: {str(e)}")
-        raise InternalServerErrorException(
-            detail=f"Could not finish syncing routes from Strava. (Synced {just_synced_count} before the error.) - {str(e)}",
-        )
 
-    finally:
-        await db_client.close()
-        logger.info("Strava sync completed, MongoDB connection closed.")
+async def _store_batch(
+    activities_collection: AsyncCollection, user_id: str, batch: list[dict], logger: Logger
+) -> int:
+    """
+    Insert the activities, returns the number inserted.
+    Activities already stored (by the unique `(user_id, strava_id)` index) are skipped,
+    e.g. when a sync is resumed after storing a batch but before checkpointing it.
+    """
+    try:
+        result = await activities_collection.insert_many(batch, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR_CODE for error in errors):
+            raise
+        logger.info(f"Skipped {len(errors)} activities already synced for user {user_id}")
+        return e.details.get("nInserted", 0)
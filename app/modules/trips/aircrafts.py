@@ -1,34 +1,20 @@
 from fastapi import Request
 
-from app.common.db import DbCollection
-from app.common.responses import InternalServerErrorException, ListResponse
+from app.common.responses import ListResponse
 from app.modules.flights.flights_types import Aircraft
+from app.modules.trips.static_search import StaticDataSearch
 
 
-async def search_aircrafts(request: Request, query: str) -> ListResponse[Aircraft]:
+def search_aircrafts(request: Request, query: str) -> ListResponse[Aircraft]:
     """
-    Search for aircrafts based on the provided query.
+    Search for aircrafts by name or ICAO code in the in-memory static data index.
     """
-    db = request.app.state.db
+    static_search: StaticDataSearch = request.app.state.static_search
     logger = request.app.state.logger
 
-    try:
-        collection = db.get_collection(DbCollection.AIRCRAFTS)
-        results = await collection.find(
-            {
-                "$or": [
-                    {"name": {"$regex": query, "$options": "i"}},
-                    {"icao": {"$regex": query, "$options": "i"}},
-                ]
-            }
-        ).to_list(length=100)
+    results = static_search.aircrafts.search(query)
 
-        if not results:
-            logger.info(f"No aircrafts found for query: {query}")
-            return ListResponse[Aircraft](entities=[])
+    if not results:
+        logger.info(f"No aircrafts found for query: {query}")
 
-        return ListResponse[Aircraft](entities=results)
-
-    except Exception as e:
-        logger.error(f"Error searching aircrafts for query '{query}': {e}")
-        raise InternalServerErrorException("Failed to search aircrafts: " + str(e))
+    return ListResponse[Aircraft](entities=results)
@@ -0,0 +1,87 @@
+from logging import Logger
+import httpx
+from cachetools import TTLCache
+from pydantic import ValidationError
+
+from app.common.country_data import get_country_data
+from app.modules.flights.flights_types import Airline, Airport
+
+# AirLabs answers, including "not found", are cached for this long
+AIRLABS_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+class AirLabsApi:
+    """
+    AirLabs client for structured airport and airline data by IATA code, on the shared HTTP client.
+    Lookups return None if AirLabs doesn't know the code or its data is incomplete, and raise on
+    HTTP or API errors. Answers are cached by code, errors are not.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        airports_url: str,
+        airlines_url: str,
+        api_key: str,
+        logger: Logger,
+        cache_ttl_seconds: int = AIRLABS_CACHE_TTL_SECONDS,
+    ):
+        self.http_client = http_client
+        self.airports_url = airports_url
+        self.airlines_url = airlines_url
+        self.api_key = api_key
+        self.logger = logger
+        self._airports: TTLCache[str, Airport | None] = TTLCache(maxsize=2048, ttl=cache_ttl_seconds)
+        self._airlines: TTLCache[str, Airline | None] = TTLCache(maxsize=2048, ttl=cache_ttl_seconds)
+
+    async def get_airport(self, iata_code: str) -> Airport | None:
+        iata_code = iata_code.upper()
+        if iata_code in self._airports:
+            return self._airports[iata_code]
+
+        item = await self._get_first(self.airports_url, iata_code)
+        airport = self._to_airport(iata_code, item) if item else None
+        self._airports[iata_code] = airport
+        return airport
+
+    async def get_airline(self, iata_code: str) -> Airline | None:
+        iata_code = iata_code.upper()
+        if iata_code in self._airlines:
+            return self._airlines[iata_code]
+
+        item = await self._get_first(self.airlines_url, iata_code)
+        airline = None
+        if item:
+            try:
+                airline = Airline(iata=item["iata_code"], icao=item["icao_code"], name=item["name"])
+            except (KeyError, ValidationError) as e:
+                self.logger.error(f"Incomplete AirLabs airline data for {iata_code}: {item} ({e})")
+        self._airlines[iata_code] = airline
+        return airline
+
+    async def _get_first(self, url: str, iata_code: str) -> dict | None:
+        response = await self.http_client.get(
+            url, params={"api_key": self.api_key, "iata_code": iata_code}
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise ValueError(f"AirLabs error: {data['error']}")
+        matches = [item for item in data.get("response") or [] if item.get("iata_code") == iata_code]
+        return matches[0] if matches else None
+
+    def _to_airport(self, iata_code: str, item: dict) -> Airport | None:
+        try:
+            return Airport(
+                iata=item["iata_code"],
+                icao=item["icao_code"],
+                name=item["name"],
+                city=item["city"],
+                country=get_country_data().get_name(item["country_code"]),
+                lat=item["lat"],
+                lng=item["lng"],
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            # e.g. the city is missing on some plans, the caller falls back to Gemini
+            self.logger.error(f"Incomplete AirLabs airport data for {iata_code}: {item} ({e})")
+            return None
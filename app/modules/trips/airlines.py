@@ -1,42 +1,48 @@
 from fastapi import Request
 
-from app.common.db import DbCollection
-from app.common.responses import InternalServerErrorException, ListResponse
-from app.common.types import AsyncDatabase
+from app.common.responses import ListResponse
 from app.modules.flights.flights_types import Airline
+from app.modules.trips.airlabs_api import AirLabsApi
+from app.modules.trips.static_search import StaticDataSearch
+
+IATA_CODE_LENGTH = 2
 
 
 async def search_airlines(
     request: Request, iata: str | None, name: str | None
 ) -> ListResponse[Airline]:
     """
-    Search for airlines based on the provided query.
+    Search for airlines in the in-memory static data index.
     If both `iata` and `name` are set, IATA code will be prioritized.
+    IATA codes match like a case-insensitive substring, the exact code first.
+    Full IATA codes missing from the static data are looked up on AirLabs, partial codes are not,
+    so typing a code doesn't call AirLabs on every keystroke.
     """
     if not iata and not name:
         return ListResponse[Airline](entities=[])
 
-    db: AsyncDatabase = request.app.state.db
+    static_search: StaticDataSearch = request.app.state.static_search
     logger = request.app.state.logger
 
-    try:
-        query = {}
-        if iata:
-            query["iata"] = {"$regex": iata, "$options": "i"}
-        if name and not iata:
-            query["name"] = {"$regex": name, "$options": "i"}
+    if iata:
+        results = static_search.airlines_iata.search(iata)
+        if not results and len(iata.strip()) == IATA_CODE_LENGTH:
+            results = await _find_airline_on_airlabs(request, iata.strip())
+    else:
+        results = static_search.airlines.search(name)
 
-        collection = db.get_collection(DbCollection.AIRLINES)
-        results = await collection.find(query).to_list(length=100)
+    if not results:
+        logger.info(f"No airlines found for iata '{iata}' and name '{name}'")
 
-        if not results:
-            logger.info(f"No airlines found for query: {query}")
-            return ListResponse[Airline](entities=[])
+    return ListResponse[Airline](entities=results)
 
-        return ListResponse[Airline](entities=results)
 
+async def _find_airline_on_airlabs(request: Request, iata: str) -> list[Airline]:
+    airlabs: AirLabsApi = request.app.state.airlabs_api
+    try:
+        airline = await airlabs.get_airline(iata)
+        return [airline] if airline else []
     except Exception as e:
-        logger.error(
-            f"Error searching airlines for iata '{iata}' and name '{name}': {e}"
-        )
-        raise InternalServerErrorException("Failed to search airlines: " + str(e))
+        # The search still answers from the static data
+        request.app.state.logger.error(f"AirLabs airline lookup failed for {iata}: {e}")
+        return []
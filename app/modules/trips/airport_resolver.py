@@ -0,0 +1,292 @@
+import asyncio
+from logging import Logger
+from typing import Any, Coroutine
+from cachetools import LRUCache, TTLCache
+from pydantic import ValidationError
+from pymongo import UpdateOne
+
+from app.common.db import DbCollection
+from app.common.responses import NotFoundException
+from app.common.types import AsyncDatabase
+from app.modules.ai.gemini_api import GeminiApi
+from app.modules.ai.prompts import airport_data_prompt, airports_data_prompt
+from app.modules.flights.flights_types import Airport
+from app.modules.flights.flights_utils import to_airport_doc
+from app.modules.trips.airlabs_api import AirLabsApi
+from app.modules.trips.airports_index import AirportsIndex
+from app.modules.trips.trips_types import AirportResolverMetrics
+
+# Codes Gemini couldn't resolve to a valid airport are not retried for this long
+AIRPORT_NEGATIVE_TTL_SECONDS = 6 * 60 * 60
+
+
+class AirportResolver:
+    """
+    Resolves IATA codes to airports through four tiers:
+    an in-process LRU, the `airports` collection, AirLabs, then Gemini.
+    Concurrent lookups of the same code share a single DB and Gemini round trip,
+    batch lookups resolve all their misses with one `$in` query and one Gemini prompt.
+    Airports resolved by AirLabs or Gemini are validated and persisted to the `airports` collection
+    (and the nearest-airport index), codes failing Gemini validation are cached as not found
+    for `AIRPORT_NEGATIVE_TTL_SECONDS`. Gemini errors are not cached, so they are retried.
+    AirLabs errors are logged and the lookup falls back to Gemini.
+    Gemini answers are cached by the shared `GeminiApi`, answers failing validation are evicted from there.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        logger: Logger,
+        gemini_api: GeminiApi,
+        airports_index: AirportsIndex | None = None,
+        airlabs: AirLabsApi | None = None,
+        maxsize: int = 2048,
+        negative_ttl_seconds: int = AIRPORT_NEGATIVE_TTL_SECONDS,
+    ):
+        self.db = db
+        self.logger = logger
+        self.gemini_api = gemini_api
+        self.airports_index = airports_index
+        self.airlabs = airlabs
+        self._memory: LRUCache[str, Airport] = LRUCache(maxsize=maxsize)
+        self._not_found: TTLCache[str, bool] = TTLCache(maxsize=maxsize, ttl=negative_ttl_seconds)
+        self._in_flight: dict[str, asyncio.Task[Airport]] = {}
+        self.memory_hits = 0
+        self.negative_hits = 0
+        self.shared_lookups = 0
+        self.db_hits = 0
+        self.airlabs_lookups = 0
+        self.airlabs_resolved = 0
+        self.airlabs_errors = 0
+        self.gemini_calls = 0
+        self.gemini_resolved = 0
+        self.gemini_invalid = 0
+        self.gemini_errors = 0
+
+    async def resolve(self, iata_code: str) -> Airport:
+        """
+        The airport of the IATA code, raises `NotFoundException` if it can't be resolved.
+        """
+        iata_code = iata_code.upper()
+
+        airport = self._memory.get(iata_code)
+        if airport is not None:
+            self.memory_hits += 1
+            return airport
+
+        if iata_code in self._not_found:
+            self.negative_hits += 1
+            raise NotFoundException("Airport data")
+
+        task = self._in_flight.get(iata_code)
+        if task is None:
+            task = self._start(iata_code, self._load(iata_code))
+        else:
+            self.shared_lookups += 1
+
+        # A cancelled request must not cancel the lookup shared with the others
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, iata_codes: list[str]) -> dict[str, Airport]:
+        """
+        The airports of the IATA codes by code, codes that can't be resolved are left out.
+        """
+        found: dict[str, Airport] = {}
+        pending: dict[str, asyncio.Task[Airport]] = {}
+        to_load: list[str] = []
+
+        for iata_code in dict.fromkeys(code.upper() for code in iata_codes):
+            airport = self._memory.get(iata_code)
+            if airport is not None:
+                self.memory_hits += 1
+                found[iata_code] = airport
+            elif iata_code in self._not_found:
+                self.negative_hits += 1
+            elif iata_code in self._in_flight:
+                self.shared_lookups += 1
+                pending[iata_code] = self._in_flight[iata_code]
+            else:
+                to_load.append(iata_code)
+
+        if to_load:
+            batch = asyncio.create_task(self._load_many(to_load))
+            for iata_code in to_load:
+                pending[iata_code] = self._start(iata_code, self._pick(batch, iata_code))
+
+        results = await asyncio.gather(
+            *(asyncio.shield(task) for task in pending.values()), return_exceptions=True
+        )
+        for iata_code, result in zip(pending, results):
+            if isinstance(result, Airport):
+                found[iata_code] = result
+            elif not isinstance(result, NotFoundException):
+                raise result
+        return found
+
+    def _start(self, iata_code: str, lookup: Coroutine[Any, Any, Airport]) -> asyncio.Task[Airport]:
+        task = asyncio.create_task(lookup)
+        self._in_flight[iata_code] = task
+        task.add_done_callback(lambda t: self._finish(iata_code, t))
+        return task
+
+    def _finish(self, iata_code: str, task: asyncio.Task[Airport]) -> None:
+        self._in_flight.pop(iata_code, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled
+            task.exception()
+
+    async def _load(self, iata_code: str) -> Airport:
+        item = await self.db.get_collection(DbCollection.AIRPORTS).find_one(
+            {"iata": iata_code}, projection={"_id": 0, "location": 0}
+        )
+        if item:
+            self.db_hits += 1
+            airport = Airport(**item)
+        else:
+            airport = await self._resolve_with_airlabs(iata_code)
+            if airport is None:
+                airport = await self._resolve_with_gemini(iata_code)
+            await self._persist([airport])
+
+        self._memory[iata_code] = airport
+        return airport
+
+    async def _load_many(self, iata_codes: list[str]) -> dict[str, Airport]:
+        items = await self.db.get_collection(DbCollection.AIRPORTS).find(
+            {"iata": {"$in": iata_codes}}, projection={"_id": 0, "location": 0}
+        ).to_list(length=None)
+        airports = {item["iata"]: Airport(**item) for item in items}
+        self.db_hits += len(airports)
+
+        misses = [code for code in iata_codes if code not in airports]
+        if misses:
+            from_airlabs = await asyncio.gather(*(self._resolve_with_airlabs(code) for code in misses))
+            resolved = {airport.iata: airport for airport in from_airlabs if airport is not None}
+            misses = [code for code in misses if code not in resolved]
+            if misses:
+                resolved.update(await self._resolve_many_with_gemini(misses))
+            await self._persist(list(resolved.values()))
+            airports.update(resolved)
+
+        for iata_code, airport in airports.items():
+            self._memory[iata_code] = airport
+        return airports
+
+    @staticmethod
+    async def _pick(batch: asyncio.Task[dict[str, Airport]], iata_code: str) -> Airport:
+        airports = await batch
+        if iata_code not in airports:
+            raise NotFoundException("Airport data")
+        return airports[iata_code]
+
+    async def _resolve_with_airlabs(self, iata_code: str) -> Airport | None:
+        if self.airlabs is None:
+            return None
+        self.airlabs_lookups += 1
+        try:
+            airport = await self.airlabs.get_airport(iata_code)
+        except Exception as e:
+            self.airlabs_errors += 1
+            self.logger.error(f"AirLabs lookup failed for {iata_code}, falling back to Gemini: {e}")
+            return None
+        if airport is not None:
+            self.airlabs_resolved += 1
+        return airport
+
+    async def _resolve_with_gemini(self, iata_code: str) -> Airport:
+        self.gemini_calls += 1
+        prompt = airport_data_prompt(iata_code)
+        try:
+            response = await self.gemini_api.generate_json(prompt=prompt)
+        except Exception:
+            self.gemini_errors += 1
+            raise
+
+        airport = self._validate(iata_code, response)
+        if airport is None:
+            self._mark_not_found(iata_code)
+            # Asked again once the negative cache expires, not answered from the response cache
+            await self.gemini_api.invalidate(prompt)
+            raise NotFoundException("Airport data")
+
+        self.gemini_resolved += 1
+        return airport
+
+    async def _resolve_many_with_gemini(self, iata_codes: list[str]) -> dict[str, Airport]:
+        """Resolve all the codes with a single prompt, every element of the answer is validated."""
+        self.gemini_calls += 1
+        prompt = airports_data_prompt(iata_codes)
+        try:
+            response = await self.gemini_api.generate_json_list(prompt=prompt)
+        except Exception:
+            self.gemini_errors += 1
+            raise
+
+        resolved: dict[str, Airport] = {}
+        for item in response:
+            iata_code = item.get("iata") if isinstance(item, dict) else None
+            if iata_code in iata_codes and iata_code not in resolved:
+                airport = self._validate(iata_code, item)
+                if airport is not None:
+                    resolved[iata_code] = airport
+
+        for iata_code in iata_codes:
+            if iata_code not in resolved:
+                self._mark_not_found(iata_code)
+        if len(resolved) < len(iata_codes):
+            await self.gemini_api.invalidate(prompt)
+        self.gemini_resolved += len(resolved)
+        return resolved
+
+    def _validate(self, iata_code: str, response: Any) -> Airport | None:
+        try:
+            if response.get("iata") != iata_code:
+                raise ValueError("IATA code mismatch")
+            return Airport(**response)
+        except (ValidationError, ValueError, TypeError, AttributeError) as e:
+            self.logger.error(f"Incomplete airport data received for {iata_code}: {response} ({e})")
+            return None
+
+    def _mark_not_found(self, iata_code: str) -> None:
+        self.gemini_invalid += 1
+        self._not_found[iata_code] = True
+
+    async def _persist(self, airports: list[Airport]) -> None:
+        if not airports:
+            return
+        try:
+            result = await self.db.get_collection(DbCollection.AIRPORTS).bulk_write(
+                [
+                    UpdateOne(
+                        {"iata": airport.iata}, {"$setOnInsert": to_airport_doc(airport)}, upsert=True
+                    )
+                    for airport in airports
+                ],
+                ordered=False,
+            )
+            for i in result.upserted_ids:
+                self.logger.info(f"New airport added: {airports[i].iata} ({airports[i].name})")
+                if self.airports_index is not None:
+                    self.airports_index.add(airports[i])
+        except Exception as e:
+            # The resolved airports are still returned, they will be resolved again after a restart
+            self.logger.error(f"Failed to persist airports {[a.iata for a in airports]}: {e}")
+
+    def metrics(self) -> AirportResolverMetrics:
+        return AirportResolverMetrics(
+            memory_hits=self.memory_hits,
+            negative_hits=self.negative_hits,
+            shared_lookups=self.shared_lookups,
+            db_hits=self.db_hits,
+            airlabs_lookups=self.airlabs_lookups,
+            airlabs_resolved=self.airlabs_resolved,
+            airlabs_errors=self.airlabs_errors,
+            gemini_calls=self.gemini_calls,
+            gemini_resolved=self.gemini_resolved,
+            gemini_invalid=self.gemini_invalid,
+            gemini_errors=self.gemini_errors,
+            gemini=self.gemini_api.metrics(),
+            memory_size=len(self._memory),
+            negative_size=len(self._not_found),
+            in_flight=len(self._in_flight),
+        )
@@ -1,51 +1,43 @@
 from fastapi import Request
 
-from app.common.db import DbCollection
-from app.common.environment import PkCentralEnv
 from app.common.responses import InternalServerErrorException, NotFoundException
-from app.modules.ai.gemini_api import GeminiApi
-from app.modules.ai.prompts import airport_data_prompt
-from app.modules.trips.trips_types import AirportResponse
+from app.modules.trips.airport_resolver import AirportResolver
+from app.modules.trips.trips_types import AirportResponse, AirportsBatchRequest, AirportsBatchResponse
 
 
 async def get_airport_data(request: Request, iata_code: str) -> AirportResponse:
     """
     Fetch airport data based on the provided IATA code.
     """
-    db = request.app.state.db
-    env: PkCentralEnv = request.app.state.env
+    resolver: AirportResolver = request.app.state.airport_resolver
     logger = request.app.state.logger
 
     try:
-        collection = db.get_collection(DbCollection.AIRPORTS)
-        airport_data = await collection.find_one({"iata": iata_code.upper()})
+        airport = await resolver.resolve(iata_code)
+        return AirportResponse(**airport.model_dump())
 
-        if airport_data:
-            return AirportResponse(**airport_data)
+    except NotFoundException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching airport data for {iata_code}: {e}")
+        raise InternalServerErrorException("Failed to retrieve airport data: " + str(e))
 
-        gemini_api = GeminiApi(api_key=env.GEMINI_API_KEY, logger=logger)
 
-        response = await gemini_api.generate_json(
-            prompt=airport_data_prompt(iata_code.upper())
+async def get_airports_batch(request: Request, body: AirportsBatchRequest) -> AirportsBatchResponse:
+    """
+    Fetch airport data for multiple IATA codes, with a single Gemini call for all unknown airports.
+    """
+    resolver: AirportResolver = request.app.state.airport_resolver
+    logger = request.app.state.logger
+
+    try:
+        iata_codes = list(dict.fromkeys(code.upper() for code in body.iata))
+        airports = await resolver.resolve_many(iata_codes)
+        return AirportsBatchResponse(
+            airports=[airports[code] for code in iata_codes if code in airports],
+            not_found=[code for code in iata_codes if code not in airports],
         )
-        if (
-            not response.get("iata") == iata_code.upper()
-            or not response.get("icao")
-            or not response.get("name")
-            or not response.get("city")
-            or not response.get("country")
-            or not response.get("lat")
-            or not response.get("lng")
-        ):
-            logger.error(
-                f"Incomplete airport data received for {iata_code}: {response}"
-            )
-            raise NotFoundException("Airport data")
-
-        return AirportResponse(**response)
 
-    except NotFoundException as e:
-        raise e
     except Exception as e:
-        logger.error(f"Error fetching airport data for {iata_code}: {e}")
+        logger.error(f"Error fetching airport data for {body.iata}: {e}")
         raise InternalServerErrorException("Failed to retrieve airport data: " + str(e))
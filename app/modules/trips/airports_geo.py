@@ -0,0 +1,38 @@
+from fastapi import Request
+
+from app.common.db import DbCollection
+from app.common.responses import InternalServerErrorException, ListResponse
+from app.modules.flights.flights_types import Airport
+from app.modules.trips.airports_index import AirportsIndex
+from app.modules.trips.trips_types import NearestAirport
+
+
+async def find_airports_by_location(request: Request, location_filter: dict) -> ListResponse[Airport]:
+    """
+    Find airports matching a filter on the GeoJSON `location` field.
+    """
+    db = request.app.state.db
+    logger = request.app.state.logger
+
+    try:
+        collection = db.get_collection(DbCollection.AIRPORTS)
+
+        data = await collection.find(location_filter, projection={"_id": 0}).to_list(length=None)
+        return ListResponse(entities=[Airport(**item) for item in data])
+
+    except Exception as e:
+        logger.error(f"Error querying airports by location: {e}")
+        raise InternalServerErrorException("Failed to query airports by location: " + str(e))
+
+
+def find_nearest_airports(request: Request, lat: float, lng: float, k: int) -> ListResponse[NearestAirport]:
+    """
+    Find the `k` known airports nearest to the position from the in-memory airports index, nearest first.
+    """
+    airports_index: AirportsIndex = request.app.state.airports_index
+    return ListResponse(
+        entities=[
+            NearestAirport(**airport.model_dump(), distance_km=round(distance_km, 3))
+            for airport, distance_km in airports_index.nearest(lat, lng, k)
+        ]
+    )
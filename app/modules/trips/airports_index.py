@@ -0,0 +1,145 @@
+import heapq
+import math
+from logging import Logger
+
+from app.common.db import DbCollection
+from app.common.types import AsyncDatabase
+from app.modules.flights.flights_types import Airport
+
+EARTH_RADIUS_KM = 6371.0
+
+# The tree is rebuilt once an incremental insert lands deeper than this factor times the balanced depth
+_REBALANCE_DEPTH_FACTOR = 3
+
+
+def _to_unit_vector(lat: float, lng: float) -> tuple[float, float, float]:
+    lat_rad = math.radians(lat)
+    lng_rad = math.radians(lng)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lng_rad), cos_lat * math.sin(lng_rad), math.sin(lat_rad))
+
+
+def _chord_to_km(chord: float) -> float:
+    """Great-circle distance of two points on the unit sphere from their straight-line distance."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class _Node:
+    __slots__ = ("point", "airport", "axis", "left", "right")
+
+    def __init__(self, point: tuple[float, float, float], airport: Airport, axis: int):
+        self.point = point
+        self.airport = airport
+        self.axis = axis
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+
+
+class AirportsIndex:
+    """
+    In-memory nearest-airport index over the `airports` collection.
+    Airports are stored as 3D unit vectors in a KD-tree, so the Euclidean nearest neighbours are
+    the great-circle nearest ones, without special cases for the antimeridian or the poles.
+    Built once at startup with `load`, then kept up to date with `add` when new airports are upserted.
+    """
+
+    def __init__(self):
+        self._root: _Node | None = None
+        self._iatas: set[str] = set()
+        self._airports: list[Airport] = []
+
+    def __len__(self) -> int:
+        return len(self._airports)
+
+    async def load(self, db: AsyncDatabase, logger: Logger) -> None:
+        try:
+            data = await db.get_collection(DbCollection.AIRPORTS).find(
+                {}, projection={"_id": 0, "location": 0}
+            ).to_list(length=None)
+            self.build([Airport(**item) for item in data])
+            logger.info(f"Airports index built with {len(self)} airports")
+        except Exception as e:
+            # Nearest-airport lookups return no results until airports are added, the app still starts
+            logger.error(f"Failed to build airports index: {e}")
+
+    def build(self, airports: list[Airport]) -> None:
+        unique = {airport.iata: airport for airport in airports}
+        self._airports = list(unique.values())
+        self._iatas = set(unique)
+        nodes = [(_to_unit_vector(a.lat, a.lng), a) for a in self._airports]
+        self._root = self._build(nodes, 0)
+
+    def _build(self, nodes: list[tuple[tuple[float, float, float], Airport]], depth: int) -> _Node | None:
+        if not nodes:
+            return None
+        axis = depth % 3
+        nodes.sort(key=lambda node: node[0][axis])
+        median = len(nodes) // 2
+        node = _Node(nodes[median][0], nodes[median][1], axis)
+        node.left = self._build(nodes[:median], depth + 1)
+        node.right = self._build(nodes[median + 1 :], depth + 1)
+        return node
+
+    def add(self, airport: Airport) -> None:
+        """Insert a new airport, airports already in the index (by IATA code) are ignored."""
+        if airport.iata in self._iatas:
+            return
+        self._iatas.add(airport.iata)
+        self._airports.append(airport)
+
+        point = _to_unit_vector(airport.lat, airport.lng)
+        if self._root is None:
+            self._root = _Node(point, airport, 0)
+            return
+
+        node, depth = self._root, 1
+        while True:
+            side = "left" if point[node.axis] < node.point[node.axis] else "right"
+            child = getattr(node, side)
+            if child is None:
+                setattr(node, side, _Node(point, airport, depth % 3))
+                break
+            node, depth = child, depth + 1
+
+        if depth > _REBALANCE_DEPTH_FACTOR * max(1, math.ceil(math.log2(len(self._airports)))):
+            self.build(self._airports)
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> list[tuple[Airport, float]]:
+        """The `k` nearest airports to the position with their distances in km, nearest first."""
+        if self._root is None or k < 1:
+            return []
+
+        target = _to_unit_vector(lat, lng)
+        # Max-heap of the best candidates as (-squared distance, tie breaker, airport)
+        best: list[tuple[float, int, Airport]] = []
+        # Nodes to visit with a lower bound of the squared distance of their subtree
+        stack: list[tuple[_Node, float]] = [(self._root, 0.0)]
+        order = 0
+
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+
+            dx = node.point[0] - target[0]
+            dy = node.point[1] - target[1]
+            dz = node.point[2] - target[2]
+            dist_sq = dx * dx + dy * dy + dz * dz
+            order += 1
+            if len(best) < k:
+                heapq.heappush(best, (-dist_sq, order, node.airport))
+            elif dist_sq < -best[0][0]:
+                heapq.heapreplace(best, (-dist_sq, order, node.airport))
+
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            # The near side is visited first, the far side is skipped if it can't hold a closer airport
+            if far is not None:
+                stack.append((far, max(bound, diff * diff)))
+            if near is not None:
+                stack.append((near, bound))
+
+        return [
+            (airport, _chord_to_km(math.sqrt(-neg_dist_sq)))
+            for neg_dist_sq, _, airport in sorted(best, key=lambda item: (-item[0], item[1]))
+        ]
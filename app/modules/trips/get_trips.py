@@ -1,8 +1,14 @@
+import asyncio
 from fastapi import Request
 
-from app.common.db import DbCollection
 from app.common.responses import InternalServerErrorException
 from app.modules.flights.flights_utils import to_flight
+from app.modules.trips.trips_data import (
+    VISIT_PROJECTION,
+    build_flights_query,
+    build_visits_query,
+    get_trips_data_loader,
+)
 from app.modules.trips.trips_types import Trips
 from app.modules.visits.visits_utils import to_visit
 
@@ -11,23 +17,15 @@ async def get_trips(request: Request, user_id: str, year: list[str] | None = Non
     """
     Endpoint to get trips data.
     """
-    db = request.app.state.db
     logger = request.app.state.logger
 
     try:
-        flights_collection = db.get_collection(DbCollection.FLIGHTS)
-        visits_collection = db.get_collection(DbCollection.VISITS)
+        loader = get_trips_data_loader(request)
 
-        flights_query: dict = {"user_id": user_id}
-        visits_query: dict = {"user_id": user_id}
-
-        if year:
-            year_pattern = "|".join(year)
-            flights_query["date"] = {"$regex": f"^({year_pattern})"}
-            visits_query["year"] = {"$in": year}
-
-        flights = await flights_collection.find(flights_query).to_list(length=None)
-        visits = await visits_collection.find(visits_query).to_list(length=None)
+        flights, visits = await asyncio.gather(
+            loader.find_flights(build_flights_query(user_id, year=year, completed_only=False)),
+            loader.find_visits(build_visits_query(user_id, year=year), VISIT_PROJECTION),
+        )
 
         return Trips(
             flights=[to_flight(flight) for flight in flights],
@@ -1,43 +1,77 @@
+import asyncio
 from fastapi import Request
 
-from app.common.db import DbCollection
 from app.common.responses import InternalServerErrorException
-from app.modules.flights.flights_utils import to_flight
-from app.modules.trips.trips_utils import compute_flights_map, compute_visits_map
+from app.modules.trips.map_clustering import clip_markers, cluster_markers
+from app.modules.trips.trips_cache import cached_trips_result, normalize_trips_filter
+from app.modules.trips.trips_data import (
+    FLIGHT_MAP_PROJECTION,
+    VISIT_PROJECTION,
+    build_flights_query,
+    build_visits_query,
+    get_trips_data_loader,
+)
+from app.modules.trips.trips_utils import (
+    compute_flights_map,
+    compute_visits_map,
+    to_flight_map_entry,
+)
 from app.modules.trips.trips_types import TripsMaps, TripsMapsRequest
 from app.modules.visits.visits_utils import to_visit
 
 
 async def get_trips_maps(request: Request, user_id: str, body: TripsMapsRequest) -> TripsMaps:
-    db = request.app.state.db
     logger = request.app.state.logger
 
     try:
-        flights_collection = db.get_collection(DbCollection.FLIGHTS)
-        visits_collection = db.get_collection(DbCollection.VISITS)
-
-        flights_query: dict = {"user_id": user_id, "is_planned": False}
-        if body.year:
-            flights_query["date"] = {"$regex": f"^({'|'.join(body.year)})"}
-        elif body.flight_ids is not None:
-            flights_query["id"] = {"$in": body.flight_ids}
-        raw_flights = await flights_collection.find(flights_query).to_list(length=None)
-
-        visits_query: dict = {"user_id": user_id}
-        if body.year:
-            visits_query["year"] = {"$in": body.year}
-        elif body.visit_ids is not None:
-            visits_query["id"] = {"$in": body.visit_ids}
-        raw_visits = await visits_collection.find(visits_query).to_list(length=None)
-
-        flights = [to_flight(f) for f in raw_flights]
-        visits = [to_visit(v) for v in raw_visits]
+        loader = get_trips_data_loader(request)
 
-        return TripsMaps(
-            flights=compute_flights_map(flights),
-            visits=compute_visits_map(visits),
+        raw_flights, raw_visits = await asyncio.gather(
+            loader.find_flights(
+                build_flights_query(user_id, body.year, body.flight_ids), FLIGHT_MAP_PROJECTION
+            ),
+            loader.find_visits(
+                build_visits_query(user_id, body.year, body.visit_ids), VISIT_PROJECTION
+            ),
         )
 
+        flights = [to_flight_map_entry(f) for f in raw_flights]
+        visits = [to_visit(v) for v in raw_visits]
+
+        flights_map = compute_flights_map(flights)
+        visits_map = compute_visits_map(visits)
+        if body.zoom is not None:
+            flights_map.markers = cluster_markers(flights_map.markers, body.zoom)
+            visits_map.markers = cluster_markers(visits_map.markers, body.zoom)
+
+        return TripsMaps(flights=flights_map, visits=visits_map)
+
     except Exception as e:
         logger.error(f"Error computing trips maps for user {user_id}: {e}")
         raise InternalServerErrorException("Failed to compute trips maps: " + str(e))
+
+
+async def get_cached_trips_maps(request: Request, user_id: str, body: TripsMapsRequest) -> TripsMaps:
+    """
+    Map data from the results cache, clustered per zoom level.
+    The viewport is applied on the cached clusters, so panning the map doesn't recompute them.
+    """
+    maps = await cached_trips_result(
+        request,
+        user_id,
+        "maps",
+        {**normalize_trips_filter(body.year, body.flight_ids, body.visit_ids), "zoom": body.zoom},
+        TripsMaps,
+        lambda: get_trips_maps(request, user_id=user_id, body=body),
+    )
+    if body.viewport is None:
+        return maps
+
+    return TripsMaps(
+        flights=maps.flights.model_copy(
+            update={"markers": clip_markers(maps.flights.markers, body.viewport)}
+        ),
+        visits=maps.visits.model_copy(
+            update={"markers": clip_markers(maps.visits.markers, body.viewport)}
+        ),
+    )
@@ -0,0 +1,61 @@
+import asyncio
+from fastapi import Request
+
+from app.common.responses import InternalServerErrorException
+from app.modules.trips.get_trips_stats import load_flights_stats
+from app.modules.trips.stats_engine import FLIGHT_STATS_PROJECTION
+from app.modules.trips.trips_data import (
+    FLIGHT_MAP_PROJECTION,
+    VISIT_PROJECTION,
+    build_flights_query,
+    build_visits_query,
+    get_trips_data_loader,
+)
+from app.modules.trips.trips_utils import (
+    compute_flights_map,
+    compute_visits_map,
+    compute_visits_stats,
+    to_flight_map_entry,
+)
+from app.modules.trips.trips_types import TripsOverview, TripsOverviewRequest
+from app.modules.visits.visits_utils import to_visit
+
+# Covers both the stats and the map, so a list of flight IDs is fetched only once
+FLIGHT_OVERVIEW_PROJECTION: dict[str, int] = {**FLIGHT_STATS_PROJECTION, **FLIGHT_MAP_PROJECTION}
+
+
+async def get_trips_overview(
+    request: Request, user_id: str, body: TripsOverviewRequest
+) -> TripsOverview:
+    db = request.app.state.db
+    logger = request.app.state.logger
+
+    try:
+        loader = get_trips_data_loader(request)
+
+        flight_stats, raw_flights, raw_visits = await asyncio.gather(
+            load_flights_stats(
+                db, loader, user_id, body.year, body.flight_ids, FLIGHT_OVERVIEW_PROJECTION
+            ),
+            loader.find_flights(
+                build_flights_query(user_id, body.year, body.flight_ids),
+                FLIGHT_OVERVIEW_PROJECTION,
+            ),
+            loader.find_visits(
+                build_visits_query(user_id, body.year, body.visit_ids), VISIT_PROJECTION
+            ),
+        )
+
+        flights = [to_flight_map_entry(f) for f in raw_flights]
+        visits = [to_visit(v) for v in raw_visits]
+
+        return TripsOverview(
+            flights_stats=flight_stats,
+            visits_stats=compute_visits_stats(visits),
+            flights_map=compute_flights_map(flights),
+            visits_map=compute_visits_map(visits),
+        )
+
+    except Exception as e:
+        logger.error(f"Error computing trips overview for user {user_id}: {e}")
+        raise InternalServerErrorException("Failed to compute trips overview: " + str(e))
@@ -1,40 +1,63 @@
+import asyncio
 from fastapi import Request
 
-from app.common.db import DbCollection
 from app.common.responses import InternalServerErrorException
-from app.modules.flights.flights_utils import to_flight
-from app.modules.trips.trips_utils import compute_flights_stats, compute_visits_stats
-from app.modules.trips.trips_types import TripsStats, TripsStatsRequest
+from app.common.types import AsyncDatabase
+from app.modules.trips.stats_engine import (
+    FLIGHT_STATS_PROJECTION,
+    compute_flights_stats_columnar,
+)
+from app.modules.trips.stats_rollups import get_flights_stats_from_rollups
+from app.modules.trips.trips_data import (
+    VISIT_PROJECTION,
+    TripsDataLoader,
+    build_flights_query,
+    build_visits_query,
+    get_trips_data_loader,
+)
+from app.modules.trips.trips_utils import compute_visits_stats
+from app.modules.trips.trips_types import FlightStats, TripsStats, TripsStatsRequest
 from app.modules.visits.visits_utils import to_visit
 
 
+async def load_flights_stats(
+    db: AsyncDatabase,
+    loader: TripsDataLoader,
+    user_id: str,
+    year: list[str] | None,
+    flight_ids: list[str] | None,
+    projection: dict = FLIGHT_STATS_PROJECTION,
+) -> FlightStats:
+    """
+    Only an explicit list of flights needs a full computation, otherwise the per-year rollups are merged.
+    `projection` must contain at least the fields of `FLIGHT_STATS_PROJECTION`.
+    """
+    if not year and flight_ids is not None:
+        raw_flights = await loader.find_flights(
+            build_flights_query(user_id, flight_ids=flight_ids), projection
+        )
+        return compute_flights_stats_columnar(raw_flights)
+    return await get_flights_stats_from_rollups(db, user_id, years_filter=year)
+
+
 async def get_trips_stats(request: Request, user_id: str, body: TripsStatsRequest) -> TripsStats:
     db = request.app.state.db
     logger = request.app.state.logger
 
     try:
-        flights_collection = db.get_collection(DbCollection.FLIGHTS)
-        visits_collection = db.get_collection(DbCollection.VISITS)
-
-        flights_query: dict = {"user_id": user_id, "is_planned": False}
-        if body.year:
-            flights_query["date"] = {"$regex": f"^({'|'.join(body.year)})"}
-        elif body.flight_ids is not None:
-            flights_query["id"] = {"$in": body.flight_ids}
-        raw_flights = await flights_collection.find(flights_query).to_list(length=None)
-
-        visits_query: dict = {"user_id": user_id}
-        if body.year:
-            visits_query["year"] = {"$in": body.year}
-        elif body.visit_ids is not None:
-            visits_query["id"] = {"$in": body.visit_ids}
-        raw_visits = await visits_collection.find(visits_query).to_list(length=None)
-
-        flights = [to_flight(f) for f in raw_flights]
+        loader = get_trips_data_loader(request)
+
+        flight_stats, raw_visits = await asyncio.gather(
+            load_flights_stats(db, loader, user_id, body.year, body.flight_ids),
+            loader.find_visits(
+                build_visits_query(user_id, body.year, body.visit_ids), VISIT_PROJECTION
+            ),
+        )
+
         visits = [to_visit(v) for v in raw_visits]
 
         return TripsStats(
-            flights=compute_flights_stats(flights, years_filter=body.year),
+            flights=flight_stats,
             visits=compute_visits_stats(visits),
         )
 
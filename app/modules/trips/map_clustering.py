@@ -0,0 +1,79 @@
+from collections import Counter
+
+import numpy as np
+
+from app.modules.trips.trips_types import MapMarker, MapViewport
+
+# Size of a grid cell on screen, markers closer than this at the given zoom are merged
+CLUSTER_CELL_SIZE_PX = 60
+TILE_SIZE_PX = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def _to_world_pixels(lat: np.ndarray, lng: np.ndarray, zoom: int) -> tuple[np.ndarray, np.ndarray]:
+    """Web Mercator pixel coordinates of the positions at the given zoom level."""
+    world_size = TILE_SIZE_PX * 2**zoom
+    lat_rad = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (lng + 180.0) / 360.0 * world_size
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * world_size
+    return x, y
+
+
+def cluster_markers(
+    markers: list[MapMarker], zoom: int, cell_size_px: int = CLUSTER_CELL_SIZE_PX
+) -> list[MapMarker]:
+    """
+    Merge markers falling into the same screen grid cell at the given zoom level.
+    A cluster is placed at the count-weighted mean position of its markers, its popup is the most
+    common popup of the cluster. Single markers are returned unchanged. Clusters keep the order
+    of their first marker.
+    """
+    if len(markers) < 2:
+        return markers
+
+    lat = np.array([m.pos[0] for m in markers], dtype=np.float64)
+    lng = np.array([m.pos[1] for m in markers], dtype=np.float64)
+    counts = np.array([m.count for m in markers], dtype=np.int64)
+
+    x, y = _to_world_pixels(lat, lng, zoom)
+    cells = np.column_stack(
+        (np.floor(x / cell_size_px).astype(np.int64), np.floor(y / cell_size_px).astype(np.int64))
+    )
+    _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    cluster_count = np.bincount(inverse, weights=counts)
+    cluster_lat = np.bincount(inverse, weights=lat * counts) / cluster_count
+    cluster_lng = np.bincount(inverse, weights=lng * counts) / cluster_count
+
+    popups: list[Counter[str]] = [Counter() for _ in range(len(first))]
+    for marker, cluster in zip(markers, inverse.tolist()):
+        popups[cluster][marker.popup] += marker.count
+
+    clusters: list[MapMarker] = []
+    for cluster in np.argsort(first, kind="stable").tolist():
+        if cluster_count[cluster] == markers[first[cluster]].count:
+            clusters.append(markers[first[cluster]])
+            continue
+        clusters.append(
+            MapMarker(
+                pos=(float(cluster_lat[cluster]), float(cluster_lng[cluster])),
+                popup=popups[cluster].most_common(1)[0][0],
+                count=int(cluster_count[cluster]),
+            )
+        )
+    return clusters
+
+
+def in_viewport(pos: tuple[float, float], viewport: MapViewport) -> bool:
+    """Whether the position is inside the viewport, which may cross the antimeridian."""
+    lat, lng = pos
+    if not viewport.south <= lat <= viewport.north:
+        return False
+    if viewport.west <= viewport.east:
+        return viewport.west <= lng <= viewport.east
+    return lng >= viewport.west or lng <= viewport.east
+
+
+def clip_markers(markers: list[MapMarker], viewport: MapViewport) -> list[MapMarker]:
+    return [m for m in markers if in_viewport(m.pos, viewport)]
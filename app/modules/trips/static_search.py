@@ -0,0 +1,170 @@
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import chain, islice, takewhile
+from logging import Logger
+from pathlib import Path
+from typing import Iterable
+from pydantic import BaseModel, ValidationError
+
+from app.common.db import DbCollection
+from app.common.types import AsyncDatabase
+from app.modules.flights.flights_types import Aircraft, Airline
+
+SEARCH_RESULTS_LIMIT = 100
+# Queries up to this length are answered from a single posting list, longer ones by intersecting them
+_MAX_GRAM_LENGTH = 3
+
+_static_data_path = Path(__file__).resolve().parents[3] / "app" / "static_data"
+
+
+def normalize_search_text(text: str) -> str:
+    """Normalized form of indexed values and queries, matching like a case-insensitive substring."""
+    return text.lower()
+
+
+class SearchIndex[T: BaseModel]:
+    """
+    In-memory case-insensitive substring search over entities by their name and code fields.
+    Entities are kept in name order, so every lookup below yields them already ranked within a tier:
+    - exact code matches from a dict,
+    - name and code prefix matches from bisecting the sorted names and codes (a flattened prefix trie),
+    - substring matches from an inverted index of every 1 to 3 character substring: short queries
+      are a single posting list, longer ones intersect the postings of their trigrams and are verified.
+    """
+
+    def __init__(self, entities: list[T], code_fields: tuple[str, ...], name_field: str = "name"):
+        names = [normalize_search_text(getattr(e, name_field)) for e in entities]
+        order = sorted(range(len(entities)), key=names.__getitem__)
+        self.entities = [entities[i] for i in order]
+        self._names = [names[i] for i in order]
+        self._codes = [
+            tuple(normalize_search_text(getattr(e, f)) for f in code_fields) for e in self.entities
+        ]
+
+        self._exact_codes: dict[str, list[int]] = defaultdict(list)
+        sorted_codes: list[tuple[str, int]] = []
+        # Entity indexes in ascending, so name order per n-gram
+        self._postings: dict[str, list[int]] = defaultdict(list)
+
+        for i, (name, codes) in enumerate(zip(self._names, self._codes)):
+            for code in set(codes):
+                self._exact_codes[code].append(i)
+                sorted_codes.append((code, i))
+            grams = {
+                value[start : start + n]
+                for value in (name, *codes)
+                for n in range(1, _MAX_GRAM_LENGTH + 1)
+                for start in range(len(value) - n + 1)
+            }
+            for gram in grams:
+                self._postings[gram].append(i)
+
+        sorted_codes.sort()
+        self._sorted_code_keys = [code for code, _ in sorted_codes]
+        self._sorted_code_ids = [i for _, i in sorted_codes]
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def _prefix_matches(self, query: str, limit: int) -> list[int]:
+        start = bisect_left(self._names, query)
+        by_name = list(
+            islice(
+                takewhile(lambda i: self._names[i].startswith(query), range(start, len(self._names))),
+                limit,
+            )
+        )
+
+        start = bisect_left(self._sorted_code_keys, query)
+        by_code = [
+            self._sorted_code_ids[j]
+            for j in takewhile(
+                lambda j: self._sorted_code_keys[j].startswith(query),
+                range(start, len(self._sorted_code_keys)),
+            )
+        ]
+        return sorted(set(by_name).union(by_code))[:limit]
+
+    def _substring_matches(self, query: str) -> Iterable[int]:
+        if len(query) <= _MAX_GRAM_LENGTH:
+            return self._postings.get(query, [])
+        grams = {query[i : i + _MAX_GRAM_LENGTH] for i in range(len(query) - _MAX_GRAM_LENGTH + 1)}
+        postings = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        # Having all the trigrams doesn't mean they are adjacent, so candidates are verified
+        return sorted(
+            i
+            for i in candidates
+            if query in self._names[i] or any(query in code for code in self._codes[i])
+        )
+
+    def search(self, query: str, limit: int = SEARCH_RESULTS_LIMIT) -> list[T]:
+        """
+        Entities with the query in their name or codes, ranked: exact code match,
+        then name or code prefix, then substring anywhere, in name order within each.
+        """
+        if not query.strip() or limit < 1:
+            return []
+        query = normalize_search_text(query)
+
+        results = list(self._exact_codes.get(query, []))[:limit]
+        seen = set(results)
+        tiers = (self._prefix_matches(query, limit), self._substring_matches(query))
+        for i in chain.from_iterable(tiers):
+            if len(results) == limit:
+                break
+            if i not in seen:
+                seen.add(i)
+                results.append(i)
+        return [self.entities[i] for i in results]
+
+
+class StaticDataSearch:
+    """
+    Search indexes of the aircrafts and airlines static data, loaded once at startup.
+    Aircrafts are searched by name and ICAO code, airlines by name or by IATA code.
+    The data is read from the `aircrafts` and `airlines` collections, which are seeded from `app/static_data`,
+    and the JSON files are used directly if the collections can't be read.
+    """
+
+    def __init__(self):
+        self.build([], [])
+
+    def build(self, aircrafts: list[Aircraft], airlines: list[Airline]) -> None:
+        self.aircrafts = SearchIndex(aircrafts, code_fields=("icao",))
+        self.airlines = SearchIndex(airlines, code_fields=())
+        # Only the IATA code is searched, it is also the name so the results are in code order
+        self.airlines_iata = SearchIndex(airlines, code_fields=("iata",), name_field="iata")
+
+    async def load(self, db: AsyncDatabase, logger: Logger) -> None:
+        self.build(
+            await self._load_entities(db, DbCollection.AIRCRAFTS, Aircraft, logger),
+            await self._load_entities(db, DbCollection.AIRLINES, Airline, logger),
+        )
+        logger.info(
+            f"Static data search indexes built with {len(self.aircrafts)} aircrafts "
+            f"and {len(self.airlines)} airlines"
+        )
+
+    @staticmethod
+    async def _load_entities[T: BaseModel](
+        db: AsyncDatabase, collection_name: DbCollection, model: type[T], logger: Logger
+    ) -> list[T]:
+        try:
+            data = await db.get_collection(collection_name).find(
+                {}, projection={"_id": 0}
+            ).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Failed to load {collection_name} for search, using static data: {e}")
+            with open(_static_data_path / f"{collection_name.value}.json", "r") as f:
+                data = json.load(f)
+
+        entities: list[T] = []
+        for item in data:
+            try:
+                entities.append(model(**item))
+            except ValidationError:
+                # e.g. airlines with multiple or marked codes, these could never be returned in a response
+                logger.warning(f"Skipping invalid {collection_name} entry for search: {item}")
+        return entities
@@ -0,0 +1,167 @@
+import numpy as np
+
+from app.common.country_data import get_country_data
+from app.modules.trips.trips_types import FlightStats, FlightStatsRollup
+from app.modules.trips.trips_utils import finalize_flights_stats
+
+# Only the fields needed for the stats, to be used as a MongoDB projection
+FLIGHT_STATS_PROJECTION: dict[str, int] = {
+    "_id": 0,
+    "date": 1,
+    "duration": 1,
+    "distance": 1,
+    "is_planned": 1,
+    "flight_class": 1,
+    "flight_reason": 1,
+    "seat_type": 1,
+    "departure_airport.iata": 1,
+    "departure_airport.name": 1,
+    "departure_airport.city": 1,
+    "departure_airport.country": 1,
+    "arrival_airport.iata": 1,
+    "arrival_airport.name": 1,
+    "arrival_airport.city": 1,
+    "arrival_airport.country": 1,
+    "airline.iata": 1,
+    "airline.name": 1,
+    "aircraft.icao": 1,
+    "aircraft.name": 1,
+}
+
+
+def _encode(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dictionary-encode the values.
+    Categories are ordered by their first appearance, the same order the row-wise path inserts them,
+    so ties are sorted identically. Returns the codes, the categories and their first indexes.
+    """
+    uniques, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse], uniques[order], first[order]
+
+
+def _counter(
+    codes: np.ndarray, categories: np.ndarray, weights: np.ndarray | None = None
+) -> dict:
+    totals = np.bincount(codes, weights=weights, minlength=len(categories))
+    return {str(category): total.item() for category, total in zip(categories, totals)}
+
+
+def _count_values(values: np.ndarray, weights: np.ndarray | None = None) -> dict:
+    codes, categories, _ = _encode(values)
+    return _counter(codes, categories, weights)
+
+
+def _interleave(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """[a0, b0, a1, b1, ...] to keep the departure-then-arrival order of the row-wise path."""
+    return np.column_stack((a, b)).ravel()
+
+
+def _column(docs: list[dict], field: str, sub_field: str | None = None) -> np.ndarray:
+    if sub_field:
+        return np.array([d[field][sub_field] for d in docs], dtype=str)
+    return np.array([d.get(field) or "Unknown" for d in docs], dtype=str)
+
+
+def accumulate_flights_stats_columnar(raw_flights: list[dict]) -> FlightStatsRollup:
+    """
+    Columnar equivalent of `accumulate_flights_stats`, working directly on MongoDB flight documents.
+    Fields are loaded into NumPy arrays, categorical values are dictionary-encoded and
+    all counters and distance sums are computed with `bincount`.
+    """
+    docs = [d for d in raw_flights if not d.get("is_planned", False)]
+    if not docs:
+        return FlightStatsRollup()
+
+    distance = np.array([d["distance"] for d in docs], dtype=np.float64)
+
+    # "HH:MM" strings as code points -> minutes without parsing each string in Python
+    duration_digits = (
+        np.array([d["duration"] for d in docs], dtype="U5").view(np.uint32).reshape(-1, 5)
+        - ord("0")
+    ).astype(np.int64)
+    duration_minutes = (duration_digits[:, 0] * 10 + duration_digits[:, 1]) * 60 + (
+        duration_digits[:, 3] * 10 + duration_digits[:, 4]
+    )
+
+    dates = np.array([d["date"] for d in docs], dtype="datetime64[D]")
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12
+    weekdays = (dates.astype(np.int64) + 4) % 7  # 1970-01-01 was a Thursday, JS: 0=Sun..6=Sat
+
+    countries = _interleave(
+        _column(docs, "departure_airport", "country"),
+        _column(docs, "arrival_airport", "country"),
+    )
+    country_codes, country_categories, _ = _encode(countries)
+    country_data = get_country_data()
+    continent_of_country = np.array(
+        [country_data.get_continent_by_name(str(c)) for c in country_categories],
+        dtype=str,
+    )
+    domestic_count = int(np.count_nonzero(country_codes[0::2] == country_codes[1::2]))
+
+    dep_iata = _column(docs, "departure_airport", "iata")
+    arr_iata = _column(docs, "arrival_airport", "iata")
+    airport_codes, airport_categories, airport_first = _encode(_interleave(dep_iata, arr_iata))
+    airport_labels = _interleave(
+        np.char.add(
+            np.char.add(_column(docs, "departure_airport", "city"), ", "),
+            _column(docs, "departure_airport", "name"),
+        ),
+        np.char.add(
+            np.char.add(_column(docs, "arrival_airport", "city"), ", "),
+            _column(docs, "arrival_airport", "name"),
+        ),
+    )
+
+    airline_codes, airline_categories, airline_first = _encode(_column(docs, "airline", "iata"))
+    airline_names = _column(docs, "airline", "name")
+
+    aircraft_codes, aircraft_categories, aircraft_first = _encode(_column(docs, "aircraft", "icao"))
+    aircraft_names = _column(docs, "aircraft", "name")
+
+    route_codes, route_categories, _ = _encode(np.char.add(np.char.add(dep_iata, "-"), arr_iata))
+
+    year_codes, year_categories, _ = _encode(years.astype(str))
+
+    return FlightStatsRollup(
+        total_count=len(docs),
+        domestic_count=domestic_count,
+        intl_count=len(docs) - domestic_count,
+        # cumulative sums add sequentially, like the row-wise path, so totals match exactly
+        total_distance=float(np.cumsum(distance)[-1]),
+        total_duration_minutes=int(duration_minutes.sum()),
+        flight_classes=_count_values(_column(docs, "flight_class")),
+        reasons=_count_values(_column(docs, "flight_reason")),
+        seat_types=_count_values(_column(docs, "seat_type")),
+        continents=_count_values(continent_of_country[country_codes]),
+        countries=_counter(country_codes, country_categories),
+        airports=_counter(airport_codes, airport_categories),
+        airlines=_counter(airline_codes, airline_categories),
+        airlines_distance=_counter(airline_codes, airline_categories, distance),
+        aircraft=_counter(aircraft_codes, aircraft_categories),
+        aircraft_distance=_counter(aircraft_codes, aircraft_categories, distance),
+        routes=_counter(route_codes, route_categories),
+        routes_distance=_counter(route_codes, route_categories, distance),
+        years=_counter(year_codes, year_categories),
+        years_distance=_counter(year_codes, year_categories, distance),
+        months={str(m): int(c) for m, c in enumerate(np.bincount(months, minlength=12)) if c},
+        weekdays={str(d): int(c) for d, c in enumerate(np.bincount(weekdays, minlength=7)) if c},
+        airports_map=dict(zip(airport_categories.tolist(), airport_labels[airport_first].tolist())),
+        airlines_map=dict(zip(airline_categories.tolist(), airline_names[airline_first].tolist())),
+        aircraft_map=dict(zip(aircraft_categories.tolist(), aircraft_names[aircraft_first].tolist())),
+    )
+
+
+def compute_flights_stats_columnar(
+    raw_flights: list[dict], years_filter: list[str] | None = None
+) -> FlightStats:
+    """
+    Columnar equivalent of `compute_flights_stats`, see `accumulate_flights_stats_columnar`.
+    """
+    return finalize_flights_stats(
+        accumulate_flights_stats_columnar(raw_flights), years_filter=years_filter
+    )
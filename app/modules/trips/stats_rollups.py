@@ -0,0 +1,233 @@
+from logging import Logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.common.db import DbCollection
+from app.common.types import AsyncCollection, AsyncDatabase
+from app.modules.flights.flights_types import Flight
+from app.modules.trips.stats_engine import (
+    FLIGHT_STATS_PROJECTION,
+    accumulate_flights_stats_columnar,
+)
+from app.modules.trips.trips_types import FlightStats, FlightStatsRollup
+from app.modules.trips.trips_utils import (
+    ROLLUP_COUNTER_FIELDS,
+    ROLLUP_MAP_FIELDS,
+    add_flight_to_rollup,
+    finalize_flights_stats,
+    merge_flights_stats_rollups,
+)
+
+# The marker of the user's rollups is stored with the years, so it is covered by the same unique index.
+# `ready` is set by a complete rebuild, `writes` is bumped by every flight change,
+# `pending` counts the flight changes being applied.
+ROLLUPS_MARKER_YEAR = 0
+
+
+def _escape_key(key: str) -> str:
+    """Make a counter key safe to be used as a MongoDB field name."""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _unescape_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def to_rollup_doc(user_id: str, year: int, rollup: FlightStatsRollup) -> dict:
+    doc: dict = {"user_id": user_id, "year": year}
+    for field, value in rollup.model_dump().items():
+        if isinstance(value, dict):
+            doc[field] = {_escape_key(k): v for k, v in value.items()}
+        else:
+            doc[field] = value
+    return doc
+
+
+def to_rollup(doc: dict) -> FlightStatsRollup:
+    data: dict = {}
+    for field in FlightStatsRollup.model_fields:
+        if field not in doc:
+            continue
+        value = doc[field]
+        data[field] = (
+            {_unescape_key(k): v for k, v in value.items()}
+            if isinstance(value, dict)
+            else value
+        )
+    return FlightStatsRollup(**data)
+
+
+def rollups_by_year(raw_flights: list[dict]) -> dict[int, FlightStatsRollup]:
+    """
+    Group completed flight documents by year and build the partial aggregates for each year.
+    """
+    flights_by_year: dict[int, list[dict]] = {}
+    for f in raw_flights:
+        if f.get("is_planned", False):
+            continue
+        flights_by_year.setdefault(int(f["date"][:4]), []).append(f)
+
+    return {
+        year: accumulate_flights_stats_columnar(year_flights)
+        for year, year_flights in flights_by_year.items()
+    }
+
+
+def _rollup_update(flight: Flight, sign: int) -> list[dict]:
+    """
+    Build the update pipeline adding (or for sign -1 subtracting) a single flight.
+    Display names of additions are only set if missing, so the first seen name is kept,
+    the same rule as the rebuild and `merge_flights_stats_rollups`.
+    """
+    partial = FlightStatsRollup()
+    add_flight_to_rollup(partial, flight)
+
+    increments: dict[str, int | float] = {
+        "total_count": sign * partial.total_count,
+        "domestic_count": sign * partial.domestic_count,
+        "intl_count": sign * partial.intl_count,
+        "total_distance": sign * partial.total_distance,
+        "total_duration_minutes": sign * partial.total_duration_minutes,
+    }
+    for field in ROLLUP_COUNTER_FIELDS:
+        for key, value in getattr(partial, field).items():
+            increments[f"{field}.{_escape_key(key)}"] = sign * value
+
+    fields: dict = {
+        path: {"$add": [{"$ifNull": [f"${path}", 0]}, value]}
+        for path, value in increments.items()
+    }
+    if sign > 0:
+        for field in ROLLUP_MAP_FIELDS:
+            for key, value in getattr(partial, field).items():
+                path = f"{field}.{_escape_key(key)}"
+                fields[path] = {"$ifNull": [f"${path}", {"$literal": value}]}
+    return [{"$set": fields}]
+
+
+async def _upsert_rollup_doc(collection: AsyncCollection, doc: dict) -> None:
+    """
+    Replace the year's rollup with the doc, concurrent upserts of a new year can hit the unique index,
+    then the doc is there and replacing it again is enough.
+    """
+    query = {"user_id": doc["user_id"], "year": doc["year"]}
+    try:
+        await collection.replace_one(query, doc, upsert=True)
+    except DuplicateKeyError:
+        await collection.replace_one(query, doc)
+
+
+async def rebuild_flight_stats_rollups(db: AsyncDatabase, user_id: str) -> None:
+    """
+    Recompute all rollups of the user from the flights collection.
+    The marker is only set ready if no flight change was being applied when the rebuild started
+    and no flight of the user changed during the rebuild, otherwise the rollups may have missed the change
+    or counted it twice, and the next stats request rebuilds them again.
+    """
+    flights_collection = db.get_collection(DbCollection.FLIGHTS)
+    rollups_collection = db.get_collection(DbCollection.FLIGHT_STATS_ROLLUPS)
+    marker_query = {"user_id": user_id, "year": ROLLUPS_MARKER_YEAR}
+
+    # Flight changes bump `writes` after the flight is written, read before the flights
+    try:
+        marker = await rollups_collection.find_one_and_update(
+            marker_query,
+            {"$set": {"ready": False}, "$setOnInsert": {"writes": 0, "pending": 0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        marker = await rollups_collection.find_one_and_update(
+            marker_query, {"$set": {"ready": False}}, return_document=ReturnDocument.AFTER
+        )
+    writes, pending = marker["writes"], marker.get("pending", 0)
+
+    raw_flights = await flights_collection.find(
+        {"user_id": user_id, "is_planned": False}, projection=FLIGHT_STATS_PROJECTION
+    ).to_list(length=None)
+    rollups = rollups_by_year(raw_flights)
+
+    for year, rollup in rollups.items():
+        await _upsert_rollup_doc(rollups_collection, to_rollup_doc(user_id, year, rollup))
+    await rollups_collection.delete_many(
+        {"user_id": user_id, "year": {"$nin": [ROLLUPS_MARKER_YEAR, *rollups]}}
+    )
+    if pending == 0:
+        await rollups_collection.update_one(
+            {**marker_query, "writes": writes, "pending": 0}, {"$set": {"ready": True}}
+        )
+
+
+async def update_flight_stats_rollups(
+    db: AsyncDatabase,
+    user_id: str,
+    logger: Logger,
+    removed: Flight | None = None,
+    added: Flight | None = None,
+) -> None:
+    """
+    Incrementally apply a flight change to the user's rollups, to be called after the flight is written.
+    Users without rollups are skipped, their rollups are built on the next stats request.
+    Every change bumps the `writes` of the marker, before and after updating the rollups, and is counted
+    in `pending` meanwhile, so a rebuild running at the same time doesn't set its rollups ready,
+    they may have missed the change or counted it twice.
+    On failure the rollups of the user are set not ready, so they get rebuilt the same way.
+    """
+    collection = db.get_collection(DbCollection.FLIGHT_STATS_ROLLUPS)
+    marker_query = {"user_id": user_id, "year": ROLLUPS_MARKER_YEAR}
+    try:
+        marker = await collection.find_one_and_update(
+            marker_query, {"$inc": {"writes": 1, "pending": 1}}
+        )
+        if not marker:
+            return
+
+        try:
+            if marker.get("ready"):
+                for flight, sign in ((removed, -1), (added, 1)):
+                    if flight is None or flight.is_planned:
+                        continue
+                    await collection.update_one(
+                        {"user_id": user_id, "year": int(flight.date[:4])},
+                        _rollup_update(flight, sign),
+                        upsert=True,
+                    )
+        finally:
+            await collection.update_one(marker_query, {"$inc": {"pending": -1, "writes": 1}})
+    except Exception as e:
+        logger.error(f"Failed to update flight stats rollups for user {user_id}: {e}")
+        try:
+            await collection.update_one(marker_query, {"$set": {"ready": False}})
+        except Exception as reset_error:
+            logger.error(
+                f"Failed to reset flight stats rollups for user {user_id}: {reset_error}"
+            )
+
+
+async def get_flights_stats_from_rollups(
+    db: AsyncDatabase, user_id: str, years_filter: list[str] | None = None
+) -> FlightStats:
+    """
+    Compute the flight stats by merging the per-year rollups of the user.
+    Rollups are rebuilt from the flights collection if the user has none yet or they are not ready,
+    then read again, so concurrent rebuilds return the same stored rollups.
+    """
+    collection = db.get_collection(DbCollection.FLIGHT_STATS_ROLLUPS)
+    docs = await collection.find({"user_id": user_id}).to_list(length=None)
+
+    marker = next((doc for doc in docs if doc["year"] == ROLLUPS_MARKER_YEAR), None)
+    if not marker or not marker.get("ready"):
+        await rebuild_flight_stats_rollups(db, user_id)
+        docs = await collection.find({"user_id": user_id}).to_list(length=None)
+
+    rollups = {doc["year"]: to_rollup(doc) for doc in docs if doc["year"] != ROLLUPS_MARKER_YEAR}
+
+    if years_filter:
+        years = {int(y) for y in years_filter}
+        selected = [rollup for year, rollup in sorted(rollups.items()) if year in years]
+    else:
+        selected = [rollup for _, rollup in sorted(rollups.items())]
+
+    return finalize_flights_stats(
+        merge_flights_stats_rollups(selected), years_filter=years_filter
+    )
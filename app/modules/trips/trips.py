@@ -3,17 +3,35 @@ from fastapi import APIRouter, Depends, Query, status, Request
 from pydantic import Field
 
 from app.common.constants import YEAR_REGEX
+from app.common.geo import BoundingBoxQuery, RadiusQuery
 from app.common.responses import ListResponse, ResponseDocs
 from app.modules.auth.auth_types import CurrentUser
 from app.modules.auth.auth_utils import auth_user_or_api_key
-from app.modules.flights.flights_types import Aircraft, Airline
+from app.modules.flights.flights_types import Aircraft, Airline, Airport
 from app.modules.trips.get_trips import get_trips
 from app.modules.trips.get_trips_stats import get_trips_stats
-from app.modules.trips.get_trips_maps import get_trips_maps
+from app.modules.trips.get_trips_maps import get_cached_trips_maps
+from app.modules.trips.get_trips_overview import get_trips_overview
 from app.modules.trips.aircrafts import search_aircrafts
 from app.modules.trips.airlines import search_airlines
-from app.modules.trips.airports import get_airport_data
-from app.modules.trips.trips_types import AirportResponse, Trips, TripsStats, TripsStatsRequest, TripsMaps, TripsMapsRequest
+from app.modules.trips.airports import get_airport_data, get_airports_batch
+from app.modules.trips.airports_geo import find_airports_by_location, find_nearest_airports
+from app.modules.trips.trips_cache import cached_trips_result, normalize_trips_filter
+from app.modules.trips.trips_types import (
+    AirportResolverMetrics,
+    AirportResponse,
+    AirportsBatchRequest,
+    AirportsBatchResponse,
+    NearestAirport,
+    Trips,
+    TripsMaps,
+    TripsMapsRequest,
+    TripsOverview,
+    TripsCacheMetrics,
+    TripsOverviewRequest,
+    TripsStats,
+    TripsStatsRequest,
+)
 
 
 router = APIRouter(prefix="/trips", tags=["Trips"])
@@ -41,6 +59,96 @@ async def get_get_airport_data(
     return await get_airport_data(request, iata_code=iata)
 
 
+@router.post(
+    path="/airports/batch",
+    summary="Get airport data by multiple IATA codes",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def post_airports_batch(
+    request: Request,
+    body: AirportsBatchRequest,
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> AirportsBatchResponse:
+    """
+    Get airport data for up to 50 IATA codes.
+    Known airports are read with one query, all unknown ones are looked up with a single Gemini call.
+    Codes that couldn't be resolved are listed in `notFound`.
+    """
+    return await get_airports_batch(request, body)
+
+
+@router.get(
+    path="/airports/metrics",
+    summary="Get airport resolution metrics",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_airport_resolver_metrics(
+    request: Request,
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> AirportResolverMetrics:
+    """
+    Get the hit counts of each airport resolution tier: in-memory cache, negative cache, database, AirLabs and Gemini,
+    with the response cache hit ratio and token usage of the Gemini API.
+    """
+    return request.app.state.airport_resolver.metrics()
+
+
+@router.get(
+    path="/airports/within",
+    summary="Get airports in a bounding box",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_airports_within(
+    request: Request,
+    bbox: Annotated[BoundingBoxQuery, Query()],
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> ListResponse[Airport]:
+    """
+    Get the known airports inside the bounding box, e.g. the visible area of a map.
+    """
+    return await find_airports_by_location(request, bbox.to_filter())
+
+
+@router.get(
+    path="/airports/near",
+    summary="Get airports within a radius",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_airports_near(
+    request: Request,
+    radius: Annotated[RadiusQuery, Query()],
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> ListResponse[Airport]:
+    """
+    Get the known airports within `radiusKm` kilometers of the position, nearest first.
+    """
+    return await find_airports_by_location(request, radius.to_filter())
+
+
+@router.get(
+    path="/airports/nearest",
+    summary="Get the nearest airports to a position",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_nearest_airports(
+    request: Request,
+    lat: Annotated[float, Query(description="Latitude", ge=-90, le=90)],
+    lng: Annotated[float, Query(description="Longitude", ge=-180, le=180)],
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+    k: Annotated[int, Query(description="Number of airports to return", ge=1, le=50)] = 1,
+) -> ListResponse[NearestAirport]:
+    """
+    Get the `k` known airports nearest to the position with their distances in km, nearest first.
+    Served from an in-memory index of the airports collection, without external calls.
+    """
+    return find_nearest_airports(request, lat=lat, lng=lng, k=k)
+
+
 @router.get(
     path="/aircrafts",
     summary="Search for aircrafts by name or ICAO code",
@@ -57,7 +165,7 @@ async def get_search_aircrafts(
     """
     Search for aircrafts based on the provided query.
     """
-    return await search_aircrafts(request, query=search)
+    return search_aircrafts(request, query=search)
 
 
 @router.get(
@@ -74,7 +182,7 @@ async def get_search_airlines(
     iata: (
         Annotated[
             str | None,
-            Query(description="Search by IATA code", pattern=r"^[a-zA-Z0-9]{2}$"),
+            Query(description="Search by IATA code, or its start", pattern=r"^[a-zA-Z0-9]{1,2}$"),
         ]
         | None
     ) = None,
@@ -93,6 +201,22 @@ async def get_search_airlines(
     return await search_airlines(request, iata=iata, name=name)
 
 
+@router.get(
+    path="/cache/metrics",
+    summary="Get trips results cache metrics",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_trips_cache_metrics(
+    request: Request,
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> TripsCacheMetrics:
+    """
+    Get hit and miss counts and hit ratios of the trips stats, maps and overview results cache.
+    """
+    return request.app.state.trips_cache.metrics()
+
+
 @router.post(
     path="/stats",
     summary="Get trips stats for the authenticated user",
@@ -108,7 +232,14 @@ async def post_trips_stats(
     Compute stats for the authenticated user's flights and visits.
     Optionally filter by years or by providing lists of flight or visit IDs.
     """
-    return await get_trips_stats(request, user_id=user.id, body=body)
+    return await cached_trips_result(
+        request,
+        user.id,
+        "stats",
+        normalize_trips_filter(body.year, body.flight_ids, body.visit_ids),
+        TripsStats,
+        lambda: get_trips_stats(request, user_id=user.id, body=body),
+    )
 
 
 @router.post(
@@ -125,8 +256,34 @@ async def post_trips_maps(
     """
     Compute map data for the authenticated user's flights and visits.
     Optionally filter by years or by providing lists of flight or visit IDs.
+    If `zoom` is set, markers are clustered for that zoom level, `viewport` limits the markers to an area.
     """
-    return await get_trips_maps(request, user_id=user.id, body=body)
+    return await get_cached_trips_maps(request, user_id=user.id, body=body)
+
+
+@router.post(
+    path="/overview",
+    summary="Get trips stats and map data for the authenticated user",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def post_trips_overview(
+    request: Request,
+    body: TripsOverviewRequest,
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> TripsOverview:
+    """
+    Compute both stats and map data for the authenticated user's flights and visits from a single fetch.
+    Optionally filter by years or by providing lists of flight or visit IDs.
+    """
+    return await cached_trips_result(
+        request,
+        user.id,
+        "overview",
+        normalize_trips_filter(body.year, body.flight_ids, body.visit_ids),
+        TripsOverview,
+        lambda: get_trips_overview(request, user_id=user.id, body=body),
+    )
 
 
 @router.post(
@@ -143,7 +300,14 @@ async def post_user_trips_stats(
     Compute stats for a specific user's flights and visits. No authentication required.
     Optionally filter by years or by providing lists of flight or visit IDs.
     """
-    return await get_trips_stats(request, user_id=user_id, body=body)
+    return await cached_trips_result(
+        request,
+        user_id,
+        "stats",
+        normalize_trips_filter(body.year, body.flight_ids, body.visit_ids),
+        TripsStats,
+        lambda: get_trips_stats(request, user_id=user_id, body=body),
+    )
 
 
 @router.post(
@@ -159,8 +323,33 @@ async def post_user_trips_maps(
     """
     Compute map data for a specific user's flights and visits. No authentication required.
     Optionally filter by years or by providing lists of flight or visit IDs.
+    If `zoom` is set, markers are clustered for that zoom level, `viewport` limits the markers to an area.
+    """
+    return await get_cached_trips_maps(request, user_id=user_id, body=body)
+
+
+@router.post(
+    path="/{user_id}/overview",
+    summary="Get trips stats and map data for a user (public)",
+    status_code=status.HTTP_200_OK,
+)
+async def post_user_trips_overview(
+    request: Request,
+    user_id: str,
+    body: TripsOverviewRequest,
+) -> TripsOverview:
+    """
+    Compute both stats and map data for a specific user's flights and visits. No authentication required.
+    Optionally filter by years or by providing lists of flight or visit IDs.
     """
-    return await get_trips_maps(request, user_id=user_id, body=body)
+    return await cached_trips_result(
+        request,
+        user_id,
+        "overview",
+        normalize_trips_filter(body.year, body.flight_ids, body.visit_ids),
+        TripsOverview,
+        lambda: get_trips_overview(request, user_id=user_id, body=body),
+    )
 
 
 @router.get(
@@ -0,0 +1,168 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Awaitable, Callable, Literal
+from cachetools import LRUCache
+from fastapi import Request
+from pydantic import BaseModel
+
+from app.common.db import DbCollection
+from app.common.types import AsyncDatabase
+from app.modules.trips.trips_types import TripsCacheMetrics
+
+TripsDataKind = Literal["flights", "visits"]
+
+
+async def bump_trips_data_version(
+    db: AsyncDatabase, user_id: str, kind: TripsDataKind, logger: Logger
+) -> None:
+    """
+    Increment the flights or visits data version of the user,
+    so every cached trips result computed from the previous data is ignored.
+    """
+    try:
+        await db.get_collection(DbCollection.TRIPS_DATA_VERSIONS).update_one(
+            {"user_id": user_id}, {"$inc": {kind: 1}}, upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to bump {kind} data version for user {user_id}: {e}")
+
+
+async def get_trips_data_version(db: AsyncDatabase, user_id: str) -> tuple[int, int]:
+    """The (flights, visits) data version of the user."""
+    doc = await db.get_collection(DbCollection.TRIPS_DATA_VERSIONS).find_one(
+        {"user_id": user_id}, projection={"_id": 0, "flights": 1, "visits": 1}
+    )
+    if not doc:
+        return 0, 0
+    return doc.get("flights", 0), doc.get("visits", 0)
+
+
+def normalize_trips_filter(
+    year: list[str] | None, flight_ids: list[str] | None, visit_ids: list[str] | None
+) -> dict:
+    """
+    Canonical form of a trips filter: years take priority over IDs, order and duplicates don't matter.
+    """
+    if year:
+        return {"year": sorted(set(year))}
+    return {
+        "flight_ids": sorted(set(flight_ids)) if flight_ids is not None else None,
+        "visit_ids": sorted(set(visit_ids)) if visit_ids is not None else None,
+    }
+
+
+def trips_filter_hash(kind: str, normalized_filter: dict) -> str:
+    payload = json.dumps({"kind": kind, "filter": normalized_filter}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TripsResultsCache:
+    """
+    Two-tier cache for computed trips results (stats, maps, overview).
+    Entries are keyed by the user, the filter hash and the user's flights and visits data versions,
+    so a write to flights or visits makes the previous entries unreachable without explicit deletes.
+    The in-memory LRU is always used, the MongoDB tier only if `persistent` is set, to survive restarts.
+    Persisted entries expire through a TTL index, see `TRIPS_RESULTS_CACHE_TTL_SECONDS`.
+    """
+
+    def __init__(self, logger: Logger, maxsize: int = 512, persistent: bool = False):
+        self.logger = logger
+        self.persistent = persistent
+        self._memory: LRUCache[str, BaseModel] = LRUCache(maxsize=maxsize)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get_or_compute[M: BaseModel](
+        self,
+        db: AsyncDatabase,
+        user_id: str,
+        kind: str,
+        normalized_filter: dict,
+        model: type[M],
+        compute_fn: Callable[[], Awaitable[M]],
+    ) -> M:
+        try:
+            flights_version, visits_version = await get_trips_data_version(db, user_id)
+        except Exception as e:
+            self.logger.error(f"Failed to get trips data version for user {user_id}: {e}")
+            self.misses += 1
+            return await compute_fn()
+
+        key = (
+            f"{user_id}:{trips_filter_hash(kind, normalized_filter)}"
+            f":{flights_version}:{visits_version}"
+        )
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            self.memory_hits += 1
+            return cached  # type: ignore[return-value]
+
+        if self.persistent:
+            persisted = await self._load(db, key, model)
+            if persisted is not None:
+                self.db_hits += 1
+                self._memory[key] = persisted
+                return persisted
+
+        self.misses += 1
+        result = await compute_fn()
+        self._memory[key] = result
+        if self.persistent:
+            await self._store(db, key, user_id, result)
+        return result
+
+    def metrics(self) -> TripsCacheMetrics:
+        requests = self.memory_hits + self.db_hits + self.misses
+        return TripsCacheMetrics(
+            requests=requests,
+            memory_hits=self.memory_hits,
+            db_hits=self.db_hits,
+            misses=self.misses,
+            hit_ratio=(self.memory_hits + self.db_hits) / requests if requests else 0.0,
+            memory_hit_ratio=self.memory_hits / requests if requests else 0.0,
+            memory_size=len(self._memory),
+            persistent=self.persistent,
+        )
+
+    async def _load[M: BaseModel](self, db: AsyncDatabase, key: str, model: type[M]) -> M | None:
+        try:
+            doc = await db.get_collection(DbCollection.TRIPS_RESULTS_CACHE).find_one({"_id": key})
+            return model.model_validate(doc["result"]) if doc else None
+        except Exception as e:
+            self.logger.error(f"Failed to load cached trips result {key}: {e}")
+            return None
+
+    async def _store(self, db: AsyncDatabase, key: str, user_id: str, result: BaseModel) -> None:
+        try:
+            await db.get_collection(DbCollection.TRIPS_RESULTS_CACHE).replace_one(
+                {"_id": key},
+                {
+                    "user_id": user_id,
+                    "result": result.model_dump(mode="json"),
+                    "created_at": datetime.now(timezone.utc),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to persist trips result {key}: {e}")
+
+
+async def cached_trips_result[M: BaseModel](
+    request: Request,
+    user_id: str,
+    kind: str,
+    normalized_filter: dict,
+    model: type[M],
+    compute_fn: Callable[[], Awaitable[M]],
+) -> M:
+    """
+    Serve a trips result from the application's results cache, computing it on a miss.
+    """
+    cache: TripsResultsCache = request.app.state.trips_cache
+    return await cache.get_or_compute(
+        request.app.state.db, user_id, kind, normalized_filter, model, compute_fn
+    )
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from fastapi import Request
+
+from app.common.db import DbCollection
+from app.common.types import AsyncDatabase
+from app.modules.flights.flights_utils import flight_years_query
+
+# Only the fields needed for the flight map. Dotted paths, so it can be merged with `FLIGHT_STATS_PROJECTION`.
+FLIGHT_MAP_PROJECTION: dict[str, int] = {
+    "_id": 0,
+    "is_planned": 1,
+    **{
+        f"{airport}.{field}": 1
+        for airport in ("departure_airport", "arrival_airport")
+        for field in ("iata", "icao", "name", "city", "country", "lat", "lng")
+    },
+}
+
+VISIT_PROJECTION: dict[str, int] = {"_id": 0, "user_id": 0}
+
+
+def build_flights_query(
+    user_id: str,
+    year: list[str] | None = None,
+    flight_ids: list[str] | None = None,
+    completed_only: bool = True,
+) -> dict:
+    """
+    Query for the flights of the user. Years take priority over the list of flight IDs.
+    """
+    query: dict = {"user_id": user_id}
+    if completed_only:
+        query["is_planned"] = False
+    if year:
+        query["year"] = flight_years_query(year)
+    elif flight_ids is not None:
+        query["id"] = {"$in": flight_ids}
+    return query
+
+
+def build_visits_query(
+    user_id: str, year: list[str] | None = None, visit_ids: list[str] | None = None
+) -> dict:
+    """
+    Query for the visits of the user. Years take priority over the list of visit IDs.
+    """
+    query: dict = {"user_id": user_id}
+    if year:
+        query["year"] = {"$in": year}
+    elif visit_ids is not None:
+        query["id"] = {"$in": visit_ids}
+    return query
+
+
+class TripsDataLoader:
+    """
+    Fetches flights and visits for a single request.
+    Identical queries (same filter and projection) are only sent to the database once,
+    concurrent callers await the same pending fetch.
+    """
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+        self._fetches: dict[str, asyncio.Task[list[dict]]] = {}
+
+    async def find_flights(self, query: dict, projection: dict | None = None) -> list[dict]:
+        return await self._find(DbCollection.FLIGHTS, query, projection)
+
+    async def find_visits(self, query: dict, projection: dict | None = None) -> list[dict]:
+        return await self._find(DbCollection.VISITS, query, projection)
+
+    async def _find(
+        self, collection_name: DbCollection, query: dict, projection: dict | None
+    ) -> list[dict]:
+        key = json.dumps([collection_name.value, query, projection], sort_keys=True)
+        if key not in self._fetches:
+            cursor = self.db.get_collection(collection_name).find(query, projection=projection)
+            self._fetches[key] = asyncio.create_task(cursor.to_list(length=None))
+        return await self._fetches[key]
+
+
+def get_trips_data_loader(request: Request) -> TripsDataLoader:
+    """
+    The data loader of the current request, created on first use.
+    """
+    loader = getattr(request.state, "trips_data_loader", None)
+    if loader is None:
+        loader = TripsDataLoader(request.app.state.db)
+        request.state.trips_data_loader = loader
+    return loader
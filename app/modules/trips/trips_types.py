@@ -3,6 +3,7 @@ from pydantic import Field
 from app.common.constants import YEAR_REGEX
 from app.common.responses import OkResponse
 from app.common.types import PkBaseModel
+from app.modules.ai.ai_types import GeminiApiMetrics
 from app.modules.flights.flights_types import Airport, Flight
 from app.modules.visits.visits_types import Visit
 
@@ -16,18 +17,53 @@ class AirportResponse(OkResponse, Airport):
     pass
 
 
+class NearestAirport(Airport):
+    distance_km: float
+
+
+class AirportsBatchResponse(OkResponse):
+    airports: list[Airport]
+    not_found: list[str]
+
+
 # ── Request bodies ────────────────────────────────────────────────────────────
 
+AIRPORTS_BATCH_MAX_SIZE = 50
+
+
+class AirportsBatchRequest(PkBaseModel):
+    iata: list[Annotated[str, Field(pattern=r"^[a-zA-Z]{3}$")]] = Field(
+        ..., min_length=1, max_length=AIRPORTS_BATCH_MAX_SIZE
+    )
+
+
 class TripsStatsRequest(PkBaseModel):
     year: list[Annotated[str, Field(pattern=YEAR_REGEX)]] | None = None
     flight_ids: list[str] | None = None
     visit_ids: list[str] | None = None
 
 
+class MapViewport(PkBaseModel):
+    """Visible map area, `west` > `east` if it crosses the antimeridian."""
+
+    south: float = Field(..., ge=-90, le=90)
+    west: float = Field(..., ge=-180, le=180)
+    north: float = Field(..., ge=-90, le=90)
+    east: float = Field(..., ge=-180, le=180)
+
+
 class TripsMapsRequest(PkBaseModel):
     year: list[Annotated[str, Field(pattern=YEAR_REGEX)]] | None = None
     flight_ids: list[str] | None = None
     visit_ids: list[str] | None = None
+    zoom: int | None = Field(None, ge=0, le=22)  # cluster markers for this zoom level
+    viewport: MapViewport | None = None  # only return markers in this area
+
+
+class TripsOverviewRequest(PkBaseModel):
+    year: list[Annotated[str, Field(pattern=YEAR_REGEX)]] | None = None
+    flight_ids: list[str] | None = None
+    visit_ids: list[str] | None = None
 
 
 # ── Stats response shapes ─────────────────────────────────────────────────────
@@ -66,6 +102,38 @@ class FlightStats(PkBaseModel):
     years: list[str]
 
 
+class FlightStatsRollup(PkBaseModel):
+    """
+    Mergeable partial aggregates of completed flights, stored per user and year.
+    Distinct sets (countries, airports, routes...) are the keys of the counters with a positive count.
+    """
+
+    total_count: int = 0
+    domestic_count: int = 0
+    intl_count: int = 0
+    total_distance: float = 0
+    total_duration_minutes: int = 0
+    flight_classes: dict[str, int] = {}
+    reasons: dict[str, int] = {}
+    seat_types: dict[str, int] = {}
+    continents: dict[str, int] = {}
+    countries: dict[str, int] = {}
+    airports: dict[str, int] = {}
+    airlines: dict[str, int] = {}
+    airlines_distance: dict[str, float] = {}
+    aircraft: dict[str, int] = {}
+    aircraft_distance: dict[str, float] = {}
+    routes: dict[str, int] = {}
+    routes_distance: dict[str, float] = {}
+    years: dict[str, int] = {}
+    years_distance: dict[str, float] = {}
+    months: dict[str, int] = {}
+    weekdays: dict[str, int] = {}
+    airports_map: dict[str, str] = {}
+    airlines_map: dict[str, str] = {}
+    aircraft_map: dict[str, str] = {}
+
+
 class VisitStats(PkBaseModel):
     cities_count: int
     countries_count: int
@@ -78,9 +146,18 @@ class TripsStats(OkResponse):
 
 # ── Map response shapes ───────────────────────────────────────────────────────
 
+class FlightMapEntry(PkBaseModel):
+    """The parts of a flight needed for the map."""
+
+    departure_airport: Airport
+    arrival_airport: Airport
+    is_planned: bool = False
+
+
 class MapMarker(PkBaseModel):
     pos: tuple[float, float]
     popup: str
+    count: int = 1  # number of markers merged into this one when clustered
 
 
 class FlightMapRoute(PkBaseModel):
@@ -102,3 +179,43 @@ class VisitMapData(PkBaseModel):
 class TripsMaps(OkResponse):
     flights: FlightMapData
     visits: VisitMapData
+
+
+# ── Overview response shape ───────────────────────────────────────────────────
+
+class TripsOverview(OkResponse):
+    flights_stats: FlightStats
+    visits_stats: VisitStats
+    flights_map: FlightMapData
+    visits_map: VisitMapData
+
+
+# ── Cache metrics ─────────────────────────────────────────────────────────────
+
+class TripsCacheMetrics(OkResponse):
+    requests: int
+    memory_hits: int
+    db_hits: int
+    misses: int
+    hit_ratio: float
+    memory_hit_ratio: float
+    memory_size: int
+    persistent: bool
+
+
+class AirportResolverMetrics(OkResponse):
+    memory_hits: int
+    negative_hits: int
+    shared_lookups: int
+    db_hits: int
+    airlabs_lookups: int
+    airlabs_resolved: int
+    airlabs_errors: int
+    gemini_calls: int
+    gemini_resolved: int
+    gemini_invalid: int
+    gemini_errors: int
+    gemini: GeminiApiMetrics
+    memory_size: int
+    negative_size: int
+    in_flight: int
@@ -1,15 +1,19 @@
-import json
-from datetime import datetime
-from pathlib import Path
+from datetime import date, datetime
 
+from app.common.country_data import get_country_data
 from app.modules.flights.flights_types import Flight
-from app.modules.trips.trips_types import FlightMapData, FlightMapRoute, FlightStats, MapMarker, VisitMapData, VisitStats
+from app.modules.trips.trips_types import (
+    FlightMapData,
+    FlightMapEntry,
+    FlightMapRoute,
+    FlightStats,
+    FlightStatsRollup,
+    MapMarker,
+    VisitMapData,
+    VisitStats,
+)
 from app.modules.visits.visits_types import Visit
 
-_continents_path = Path(__file__).resolve().parents[3] / "app" / "static_data" / "continents.json"
-with open(_continents_path, "r") as _f:
-    CONTINENTS_FOR_COUNTRIES: dict[str, str] = json.load(_f)
-
 MONTH_NAMES: dict[int, str] = {
     0: "January",
     1: "February",
@@ -25,6 +29,29 @@ MONTH_NAMES: dict[int, str] = {
     11: "December",
 }
 
+# Counter fields of FlightStatsRollup that are summed when merging partial aggregates
+ROLLUP_COUNTER_FIELDS: tuple[str, ...] = (
+    "flight_classes",
+    "reasons",
+    "seat_types",
+    "continents",
+    "countries",
+    "airports",
+    "airlines",
+    "airlines_distance",
+    "aircraft",
+    "aircraft_distance",
+    "routes",
+    "routes_distance",
+    "years",
+    "years_distance",
+    "months",
+    "weekdays",
+)
+
+# Name lookup fields of FlightStatsRollup where the first seen value is kept
+ROLLUP_MAP_FIELDS: tuple[str, ...] = ("airports_map", "airlines_map", "aircraft_map")
+
 DAY_NAMES: dict[int, str] = {
     0: "Sunday",
     1: "Monday",
@@ -36,147 +63,168 @@ DAY_NAMES: dict[int, str] = {
 }
 
 
-def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | None = None) -> FlightStats:
-    flights = [f for f in all_flights if not f.is_planned]
+def add_flight_to_rollup(rollup: FlightStatsRollup, f: Flight, sign: int = 1) -> None:
+    """
+    Add a single flight to the partial aggregates in place.
+    Use `sign=-1` to remove a previously added flight from the counters.
+    """
+    def inc(counter: dict, key: str, value: int | float = 1) -> None:
+        counter[key] = counter.get(key, 0) + sign * value
 
-    if not flights:
-        empty_weekdays = [(DAY_NAMES[i], 0) for i in range(7)]
-        # shift Sunday to end so Monday is first
-        empty_weekdays.append(empty_weekdays.pop(0))
-        return FlightStats(
-            total_count=0,
-            domestic_count=0,
-            intl_count=0,
-            total_distance=0,
-            total_duration_minutes=0,
-            flight_classes_by_count=[],
-            reasons_by_count=[],
-            seat_type_by_count=[],
-            continents_by_count=[],
-            total_countries=0,
-            countries_by_count=[],
-            total_airports=0,
-            airports_by_count=[],
-            total_airlines=0,
-            airlines_by_count=[],
-            airlines_by_distance=[],
-            total_aircrafts=0,
-            aircraft_by_count=[],
-            aircraft_by_distance=[],
-            total_routes=0,
-            routes_by_count=[],
-            routes_by_distance=[],
-            flights_per_year=[],
-            distance_per_year=[],
-            flights_per_month=[(MONTH_NAMES[i], 0) for i in range(12)],
-            flights_per_weekday=empty_weekdays,
-            airports_map={},
-            airlines_map={},
-            aircraft_map={},
-            years=[],
-        )
+    if f.arrival_airport.country == f.departure_airport.country:
+        rollup.domestic_count += sign
+    else:
+        rollup.intl_count += sign
+
+    rollup.total_count += sign
+    rollup.total_distance += sign * f.distance
+    hrs, mins = f.duration.split(":")
+    rollup.total_duration_minutes += sign * (int(hrs) * 60 + int(mins))
+
+    inc(rollup.flight_classes, f.flight_class.value if f.flight_class else "Unknown")
+    inc(rollup.reasons, f.flight_reason.value if f.flight_reason else "Unknown")
+    inc(rollup.seat_types, f.seat_type.value if f.seat_type else "Unknown")
+
+    country_data = get_country_data()
+    inc(rollup.continents, country_data.get_continent_by_name(f.departure_airport.country))
+    inc(rollup.continents, country_data.get_continent_by_name(f.arrival_airport.country))
+
+    inc(rollup.countries, f.departure_airport.country)
+    inc(rollup.countries, f.arrival_airport.country)
+
+    from_iata = f.departure_airport.iata
+    to_iata = f.arrival_airport.iata
+    if from_iata not in rollup.airports_map:
+        rollup.airports_map[from_iata] = f"{f.departure_airport.city}, {f.departure_airport.name}"
+    if to_iata not in rollup.airports_map:
+        rollup.airports_map[to_iata] = f"{f.arrival_airport.city}, {f.arrival_airport.name}"
+    inc(rollup.airports, from_iata)
+    inc(rollup.airports, to_iata)
+
+    airline_iata = f.airline.iata
+    if airline_iata not in rollup.airlines_map:
+        rollup.airlines_map[airline_iata] = f.airline.name
+    inc(rollup.airlines, airline_iata)
+    inc(rollup.airlines_distance, airline_iata, f.distance)
+
+    aircraft_icao = f.aircraft.icao
+    if aircraft_icao not in rollup.aircraft_map:
+        rollup.aircraft_map[aircraft_icao] = f.aircraft.name
+    inc(rollup.aircraft, aircraft_icao)
+    inc(rollup.aircraft_distance, aircraft_icao, f.distance)
+
+    route = f"{f.departure_airport.iata}-{f.arrival_airport.iata}"
+    inc(rollup.routes, route)
+    inc(rollup.routes_distance, route, f.distance)
+
+    flight_date = date.fromisoformat(f.date)
+    year = str(flight_date.year)
+    inc(rollup.years, year)
+    inc(rollup.years_distance, year, f.distance)
+
+    inc(rollup.months, str(flight_date.month - 1))  # 0-indexed to match JS Date.getMonth()
+    inc(rollup.weekdays, str(flight_date.isoweekday() % 7))  # JS: 0=Sun,1=Mon..6=Sat; isoweekday: 1=Mon..7=Sun
+
+
+def accumulate_flights_stats(flights: list[Flight]) -> FlightStatsRollup:
+    """
+    Build the mergeable partial aggregates for the given flights, skipping planned ones.
+    """
+    rollup = FlightStatsRollup()
+    for f in flights:
+        if not f.is_planned:
+            add_flight_to_rollup(rollup, f)
+    return rollup
+
+
+def merge_flights_stats_rollups(rollups: list[FlightStatsRollup]) -> FlightStatsRollup:
+    """
+    Merge several partial aggregates (e.g. one per year) into a single one.
+    """
+    merged = FlightStatsRollup()
+    for rollup in rollups:
+        merged.total_count += rollup.total_count
+        merged.domestic_count += rollup.domestic_count
+        merged.intl_count += rollup.intl_count
+        merged.total_distance += rollup.total_distance
+        merged.total_duration_minutes += rollup.total_duration_minutes
+        for field in ROLLUP_COUNTER_FIELDS:
+            target = getattr(merged, field)
+            for key, value in getattr(rollup, field).items():
+                target[key] = target.get(key, 0) + value
+        for field in ROLLUP_MAP_FIELDS:
+            target = getattr(merged, field)
+            for key, value in getattr(rollup, field).items():
+                target.setdefault(key, value)
+    return merged
+
+
+def _empty_flights_stats() -> FlightStats:
+    empty_weekdays = [(DAY_NAMES[i], 0) for i in range(7)]
+    # shift Sunday to end so Monday is first
+    empty_weekdays.append(empty_weekdays.pop(0))
+    return FlightStats(
+        total_count=0,
+        domestic_count=0,
+        intl_count=0,
+        total_distance=0,
+        total_duration_minutes=0,
+        flight_classes_by_count=[],
+        reasons_by_count=[],
+        seat_type_by_count=[],
+        continents_by_count=[],
+        total_countries=0,
+        countries_by_count=[],
+        total_airports=0,
+        airports_by_count=[],
+        total_airlines=0,
+        airlines_by_count=[],
+        airlines_by_distance=[],
+        total_aircrafts=0,
+        aircraft_by_count=[],
+        aircraft_by_distance=[],
+        total_routes=0,
+        routes_by_count=[],
+        routes_by_distance=[],
+        flights_per_year=[],
+        distance_per_year=[],
+        flights_per_month=[(MONTH_NAMES[i], 0) for i in range(12)],
+        flights_per_weekday=empty_weekdays,
+        airports_map={},
+        airlines_map={},
+        aircraft_map={},
+        years=[],
+    )
 
-    domestic_count = 0
-    intl_count = 0
-    total_distance: float = 0
-    total_duration_minutes = 0
-    flight_classes_count: dict[str, int] = {}
-    reasons_count: dict[str, int] = {}
-    seat_type_count: dict[str, int] = {}
-    continents_count: dict[str, int] = {}
-    countries_set: set[str] = set()
-    countries_count: dict[str, int] = {}
-    airports_map: dict[str, str] = {}
-    airports_count: dict[str, int] = {}
-    airlines_map: dict[str, str] = {}
-    airlines_count: dict[str, int] = {}
-    airlines_distance: dict[str, float] = {}
-    aircraft_map: dict[str, str] = {}
-    aircraft_count: dict[str, int] = {}
-    aircraft_distance: dict[str, float] = {}
-    routes_set: set[str] = set()
-    routes_count: dict[str, int] = {}
-    routes_distance: dict[str, float] = {}
-    flights_per_year_obj: dict[int, int] = {}
-    distance_per_year_obj: dict[int, float] = {}
-    flights_per_month_obj: dict[int, int] = {}
-    flights_per_weekday_obj: dict[int, int] = {}
 
-    for f in flights:
-        if f.arrival_airport.country == f.departure_airport.country:
-            domestic_count += 1
-        else:
-            intl_count += 1
-
-        total_distance += f.distance
-        hrs, mins = f.duration.split(":")
-        total_duration_minutes += int(hrs) * 60 + int(mins)
-
-        fc = f.flight_class.value if f.flight_class else "Unknown"
-        flight_classes_count[fc] = flight_classes_count.get(fc, 0) + 1
-
-        reason = f.flight_reason.value if f.flight_reason else "Unknown"
-        reasons_count[reason] = reasons_count.get(reason, 0) + 1
-
-        seat = f.seat_type.value if f.seat_type else "Unknown"
-        seat_type_count[seat] = seat_type_count.get(seat, 0) + 1
-
-        from_continent = CONTINENTS_FOR_COUNTRIES.get(f.departure_airport.country, "Unknown")
-        to_continent = CONTINENTS_FOR_COUNTRIES.get(f.arrival_airport.country, "Unknown")
-        continents_count[from_continent] = continents_count.get(from_continent, 0) + 1
-        continents_count[to_continent] = continents_count.get(to_continent, 0) + 1
-
-        from_country = f.departure_airport.country
-        to_country = f.arrival_airport.country
-        countries_set.add(from_country)
-        countries_set.add(to_country)
-        countries_count[from_country] = countries_count.get(from_country, 0) + 1
-        countries_count[to_country] = countries_count.get(to_country, 0) + 1
-
-        from_iata = f.departure_airport.iata
-        to_iata = f.arrival_airport.iata
-        if from_iata not in airports_map:
-            airports_map[from_iata] = f"{f.departure_airport.city}, {f.departure_airport.name}"
-        if to_iata not in airports_map:
-            airports_map[to_iata] = f"{f.arrival_airport.city}, {f.arrival_airport.name}"
-        airports_count[from_iata] = airports_count.get(from_iata, 0) + 1
-        airports_count[to_iata] = airports_count.get(to_iata, 0) + 1
-
-        airline_iata = f.airline.iata
-        if airline_iata not in airlines_map:
-            airlines_map[airline_iata] = f.airline.name
-        airlines_count[airline_iata] = airlines_count.get(airline_iata, 0) + 1
-        airlines_distance[airline_iata] = airlines_distance.get(airline_iata, 0) + f.distance
-
-        aircraft_icao = f.aircraft.icao
-        if aircraft_icao not in aircraft_map:
-            aircraft_map[aircraft_icao] = f.aircraft.name
-        aircraft_count[aircraft_icao] = aircraft_count.get(aircraft_icao, 0) + 1
-        aircraft_distance[aircraft_icao] = aircraft_distance.get(aircraft_icao, 0) + f.distance
-
-        route = f"{f.departure_airport.iata}-{f.arrival_airport.iata}"
-        routes_set.add(route)
-        routes_count[route] = routes_count.get(route, 0) + 1
-        routes_distance[route] = routes_distance.get(route, 0) + f.distance
-
-        date = datetime.strptime(f.date, "%Y-%m-%d")
-        year = date.year
-        flights_per_year_obj[year] = flights_per_year_obj.get(year, 0) + 1
-        distance_per_year_obj[year] = distance_per_year_obj.get(year, 0) + f.distance
-
-        month = date.month - 1  # 0-indexed to match JS Date.getMonth()
-        flights_per_month_obj[month] = flights_per_month_obj.get(month, 0) + 1
-
-        weekday = date.isoweekday() % 7  # JS: 0=Sun,1=Mon..6=Sat; isoweekday: 1=Mon..7=Sun
-        flights_per_weekday_obj[weekday] = flights_per_weekday_obj.get(weekday, 0) + 1
+def finalize_flights_stats(rollup: FlightStatsRollup, years_filter: list[str] | None = None) -> FlightStats:
+    """
+    Turn partial aggregates into the sorted, gap-filled stats response.
+    Keys whose count dropped to zero (e.g. after deleting flights) are ignored.
+    """
+    if rollup.total_count <= 0:
+        return _empty_flights_stats()
+
+    def counted(counter: dict[str, int]) -> dict[str, int]:
+        return {k: v for k, v in counter.items() if v > 0}
 
     def by_value(pair: tuple[str, int | float]) -> int | float:
         return -pair[1]
 
-    flight_classes_by_count = sorted(flight_classes_count.items(), key=by_value)
-    reasons_by_count = sorted(reasons_count.items(), key=by_value)
-    seat_type_by_count = sorted(seat_type_count.items(), key=by_value)
-    continents_by_count = sorted(continents_count.items(), key=by_value)
+    airports_count = counted(rollup.airports)
+    airlines_count = counted(rollup.airlines)
+    aircraft_count = counted(rollup.aircraft)
+    routes_count = counted(rollup.routes)
+    countries_count = counted(rollup.countries)
+
+    airlines_distance = {k: v for k, v in rollup.airlines_distance.items() if k in airlines_count}
+    aircraft_distance = {k: v for k, v in rollup.aircraft_distance.items() if k in aircraft_count}
+    routes_distance = {k: v for k, v in rollup.routes_distance.items() if k in routes_count}
+
+    flight_classes_by_count = sorted(counted(rollup.flight_classes).items(), key=by_value)
+    reasons_by_count = sorted(counted(rollup.reasons).items(), key=by_value)
+    seat_type_by_count = sorted(counted(rollup.seat_types).items(), key=by_value)
+    continents_by_count = sorted(counted(rollup.continents).items(), key=by_value)
     countries_by_count = sorted(countries_count.items(), key=by_value)
     airports_by_count = sorted(airports_count.items(), key=by_value)
     airlines_by_count = sorted(airlines_count.items(), key=by_value)
@@ -186,6 +234,11 @@ def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | N
     routes_by_count = sorted(routes_count.items(), key=by_value)
     routes_by_distance = sorted(routes_distance.items(), key=by_value)
 
+    flights_per_year_obj: dict[int, int] = {int(y): v for y, v in counted(rollup.years).items()}
+    distance_per_year_obj: dict[int, float] = {
+        int(y): v for y, v in rollup.years_distance.items() if int(y) in flights_per_year_obj
+    }
+
     # Build per-year series: use only the filtered years if provided, otherwise fill min→current
     if years_filter:
         for y_str in years_filter:
@@ -205,27 +258,33 @@ def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | N
     years = [str(y) for y, _ in flights_per_year]
 
     # Fill all 12 months
+    flights_per_month_obj: dict[int, int] = {int(m): v for m, v in rollup.months.items()}
     for m in range(12):
         flights_per_month_obj.setdefault(m, 0)
     flights_per_month = [(MONTH_NAMES[m], v) for m, v in sorted(flights_per_month_obj.items())]
 
     # Fill all 7 weekdays and shift Sunday to end (Monday first)
+    flights_per_weekday_obj: dict[int, int] = {int(d): v for d, v in rollup.weekdays.items()}
     for d in range(7):
         flights_per_weekday_obj.setdefault(d, 0)
     flights_per_weekday_list = [(DAY_NAMES[d], v) for d, v in sorted(flights_per_weekday_obj.items())]
     flights_per_weekday_list.append(flights_per_weekday_list.pop(0))  # move Sunday to end
 
+    airports_map = {k: v for k, v in rollup.airports_map.items() if k in airports_count}
+    airlines_map = {k: v for k, v in rollup.airlines_map.items() if k in airlines_count}
+    aircraft_map = {k: v for k, v in rollup.aircraft_map.items() if k in aircraft_count}
+
     return FlightStats(
-        total_count=len(flights),
-        domestic_count=domestic_count,
-        intl_count=intl_count,
-        total_distance=total_distance,
-        total_duration_minutes=total_duration_minutes,
+        total_count=rollup.total_count,
+        domestic_count=rollup.domestic_count,
+        intl_count=rollup.intl_count,
+        total_distance=rollup.total_distance,
+        total_duration_minutes=rollup.total_duration_minutes,
         flight_classes_by_count=flight_classes_by_count,
         reasons_by_count=reasons_by_count,
         seat_type_by_count=seat_type_by_count,
         continents_by_count=continents_by_count,
-        total_countries=len(countries_set),
+        total_countries=len(countries_count),
         countries_by_count=countries_by_count,
         total_airports=len(airports_map),
         airports_by_count=airports_by_count,
@@ -235,7 +294,7 @@ def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | N
         total_aircrafts=len(aircraft_map),
         aircraft_by_count=aircraft_by_count,
         aircraft_by_distance=aircraft_by_distance,
-        total_routes=len(routes_set),
+        total_routes=len(routes_count),
         routes_by_count=routes_by_count,
         routes_by_distance=routes_by_distance,
         flights_per_year=flights_per_year,
@@ -249,6 +308,10 @@ def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | N
     )
 
 
+def compute_flights_stats(all_flights: list[Flight], years_filter: list[str] | None = None) -> FlightStats:
+    return finalize_flights_stats(accumulate_flights_stats(all_flights), years_filter=years_filter)
+
+
 def compute_visits_stats(visits: list[Visit]) -> VisitStats:
     if not visits:
         return VisitStats(cities_count=0, countries_count=0)
@@ -262,7 +325,15 @@ def compute_visits_stats(visits: list[Visit]) -> VisitStats:
     return VisitStats(cities_count=len(cities), countries_count=len(countries))
 
 
-def compute_flights_map(all_flights: list[Flight]) -> FlightMapData:
+def to_flight_map_entry(item: dict) -> FlightMapEntry:
+    return FlightMapEntry(
+        departure_airport=item["departure_airport"],
+        arrival_airport=item["arrival_airport"],
+        is_planned=item.get("is_planned", False),
+    )
+
+
+def compute_flights_map(all_flights: list[Flight] | list[FlightMapEntry]) -> FlightMapData:
     flights = [f for f in all_flights if not f.is_planned]
 
     if not flights:
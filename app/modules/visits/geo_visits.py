@@ -0,0 +1,36 @@
+from fastapi import Request
+
+from app.common.db import DbCollection
+from app.common.responses import InternalServerErrorException, ListResponse
+from app.common.types import AsyncDatabase
+from app.modules.auth.auth_types import CurrentUser
+from app.modules.visits.visits_types import Visit
+from app.modules.visits.visits_utils import to_visit
+
+
+async def find_visits_by_location(
+    request: Request,
+    user: CurrentUser,
+    location_filter: dict,
+) -> ListResponse[Visit]:
+    """
+    Find the visits of the user matching a filter on the GeoJSON `location` field.
+    """
+    db: AsyncDatabase = request.app.state.db
+    logger = request.app.state.logger
+
+    try:
+        collection = db.get_collection(DbCollection.VISITS)
+
+        data = await collection.find({"user_id": user.id, **location_filter}).to_list(length=None)
+        if not data:
+            return ListResponse(entities=[])
+
+        entities = [to_visit(item) for item in data]
+        return ListResponse(entities=entities)
+
+    except Exception as e:
+        logger.error(f"Error querying Visits by location for user {user.id}: {e}")
+        raise InternalServerErrorException(
+            "An error occurred while querying Visits by location: " + str(e)
+        )
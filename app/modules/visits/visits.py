@@ -1,14 +1,17 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, Depends, Query, Request, status
 
 from app.common.crud_handler import CrudHandler
 from app.common.db import DbCollection
+from app.common.geo import BoundingBoxQuery, RadiusQuery, to_geo_point
 from app.common.responses import IdResponse, ListResponse, ResponseDocs
 from app.modules.auth.auth_types import CurrentUser
 from app.modules.auth.auth_utils import auth_user_or_api_key
 from app.modules.visits.visits_types import Visit, VisitQuery, VisitRequest
 from app.modules.visits.visits_utils import to_visit
+from app.modules.visits.geo_visits import find_visits_by_location
 from app.modules.visits.query_visits import query_visits
+from app.modules.trips.trips_cache import bump_trips_data_version
 
 
 router = APIRouter(tags=["Visits"], prefix="/visits")
@@ -52,6 +55,40 @@ async def post_query_visits(
     return await query_visits(request, user, body)
 
 
+@router.get(
+    path="/within",
+    summary="Get Visits in a bounding box",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_visits_within(
+    request: Request,
+    bbox: Annotated[BoundingBoxQuery, Query()],
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> ListResponse[Visit]:
+    """
+    Get the visits of the user inside the bounding box, e.g. the visible area of a map.
+    """
+    return await find_visits_by_location(request, user, bbox.to_filter())
+
+
+@router.get(
+    path="/near",
+    summary="Get Visits within a radius",
+    status_code=status.HTTP_200_OK,
+    responses={**ResponseDocs.unauthorized_response},
+)
+async def get_visits_near(
+    request: Request,
+    radius: Annotated[RadiusQuery, Query()],
+    user: Annotated[CurrentUser, Depends(auth_user_or_api_key)],
+) -> ListResponse[Visit]:
+    """
+    Get the visits of the user within `radiusKm` kilometers of the position, nearest first.
+    """
+    return await find_visits_by_location(request, user, radius.to_filter())
+
+
 @router.post(
     path="/",
     summary="Create Visit",
@@ -66,12 +103,20 @@ async def post_create_visit(
     """
     Create a new visit for the user.
     """
-    return await CrudHandler[Visit](
+    result = await CrudHandler[Visit](
         request=request,
         user=user,
         collection_name=DbCollection.VISITS,
         entity_name="Visit",
-    ).create(body, mapper_fn=to_visit)
+    ).create(
+        body,
+        mapper_fn=to_visit,
+        extra_fields={"location": to_geo_point(body.lat, body.lng)},
+    )
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "visits", request.app.state.logger
+    )
+    return result
 
 
 @router.put(
@@ -89,12 +134,21 @@ async def put_update_visit(
     """
     Update an existing visit for the user.
     """
-    return await CrudHandler[Visit](
+    result = await CrudHandler[Visit](
         request=request,
         user=user,
         collection_name=DbCollection.VISITS,
         entity_name="Visit",
-    ).update(id, body, mapper_fn=to_visit)
+    ).update(
+        id,
+        body,
+        mapper_fn=to_visit,
+        extra_fields={"location": to_geo_point(body.lat, body.lng)},
+    )
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "visits", request.app.state.logger
+    )
+    return result
 
 
 @router.delete(
@@ -111,9 +165,13 @@ async def delete_delete_visit(
     """
     Delete a visit for the user.
     """
-    return await CrudHandler[Visit](
+    result = await CrudHandler[Visit](
         request=request,
         user=user,
         collection_name=DbCollection.VISITS,
         entity_name="Visit",
     ).delete(id)
+    await bump_trips_data_version(
+        request.app.state.db, user.id, "visits", request.app.state.logger
+    )
+    return result
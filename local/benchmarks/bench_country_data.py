@@ -0,0 +1,47 @@
+"""
+Per-call cost of country lookups: parsing `countries.json` on every call, like `CountryData` used to,
+compared with the preloaded registry.
+Run with `make bench FILE=country_data`.
+"""
+
+import json
+import time
+from pathlib import Path
+
+from app.common.country_data import get_country_data
+
+REPEAT = 2_000
+COUNTRIES_PATH = Path(__file__).resolve().parents[2] / "app" / "static_data" / "countries.json"
+CODES = ["DE", "US", "HU", "JP", "BR", "AU", "ZA", "IN"]
+
+
+def get_name_from_file(country_code: str) -> str:
+    with open(COUNTRIES_PATH, "r") as f:
+        return json.load(f)[country_code.upper()]["name"]
+
+
+def per_call_us(fn) -> float:
+    start = time.perf_counter()
+    for i in range(REPEAT):
+        fn(CODES[i % len(CODES)])
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def main():
+    start = time.perf_counter()
+    country_data = get_country_data()
+    print(f"registry loaded in {(time.perf_counter() - start) * 1e3:.2f}ms")
+
+    print(f"{'lookup':>32} {'per call (us)':>14}")
+    print(f"{'get_name, json.load per call':>32} {per_call_us(get_name_from_file):>14.2f}")
+    print(f"{'get_name':>32} {per_call_us(country_data.get_name):>14.2f}")
+    print(f"{'get_continent':>32} {per_call_us(country_data.get_continent):>14.2f}")
+    names = [country_data.get_name(code) for code in CODES]
+    print(
+        f"{'get_continent_by_name':>32} "
+        f"{per_call_us(lambda code: country_data.get_continent_by_name(names[CODES.index(code)])):>14.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
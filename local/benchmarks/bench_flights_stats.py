@@ -0,0 +1,93 @@
+"""
+Compare the row-wise and the columnar flight stats computation on synthetic flights.
+Run with `make bench FILE=flights_stats`.
+"""
+
+import random
+import time
+
+from app.modules.flights.flights_utils import to_flight
+from app.modules.trips.stats_engine import compute_flights_stats_columnar
+from app.modules.trips.trips_utils import compute_flights_stats
+
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 3
+
+AIRPORTS = [
+    ("FRA", "Frankfurt", "Germany"),
+    ("MUC", "Munich", "Germany"),
+    ("JFK", "New York", "USA"),
+    ("LAX", "Los Angeles", "USA"),
+    ("BUD", "Budapest", "Hungary"),
+    ("LHR", "London", "UK"),
+    ("NRT", "Tokyo", "Japan"),
+    ("SYD", "Sydney", "Australia"),
+    ("GRU", "Sao Paulo", "Brazil"),
+    ("CPT", "Cape Town", "South Africa"),
+]
+AIRLINES = [
+    {"iata": "LH", "icao": "DLH", "name": "Lufthansa"},
+    {"iata": "W6", "icao": "WZZ", "name": "Wizz Air"},
+    {"iata": "BA", "icao": "BAW", "name": "British Airways"},
+    {"iata": "NH", "icao": "ANA", "name": "All Nippon Airways"},
+]
+AIRCRAFT = [
+    {"icao": "A320", "name": "Airbus A320"},
+    {"icao": "A388", "name": "Airbus A380"},
+    {"icao": "B738", "name": "Boeing 737-800"},
+    {"icao": "B77W", "name": "Boeing 777-300ER"},
+]
+
+
+def make_flights(count: int) -> list[dict]:
+    rng = random.Random(count)
+
+    def airport(a: tuple[str, str, str]) -> dict:
+        return {
+            "iata": a[0], "icao": a[0] + "X", "name": f"{a[1]} Airport",
+            "city": a[1], "country": a[2], "lat": 0.0, "lng": 0.0,
+        }
+
+    flights = []
+    for i in range(count):
+        dep, arr = rng.sample(AIRPORTS, 2)
+        flights.append({
+            "id": str(i),
+            "flight_number": "XX1",
+            "date": f"{rng.randint(2000, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "departure_airport": airport(dep),
+            "arrival_airport": airport(arr),
+            "departure_time": "10:00",
+            "arrival_time": "12:00",
+            "duration": f"{rng.randint(0, 15):02d}:{rng.randint(0, 59):02d}",
+            "distance": round(rng.uniform(100, 15000), 1),
+            "airline": rng.choice(AIRLINES),
+            "aircraft": rng.choice(AIRCRAFT),
+            "seat_type": rng.choice(["Aisle", "Window", "Middle"]),
+            "flight_class": rng.choice(["Economy", "Business"]),
+            "flight_reason": rng.choice(["Leisure", "Business"]),
+            "is_planned": False,
+        })
+    return flights
+
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'flights':>10} {'row-wise (s)':>14} {'columnar (s)':>14} {'speedup':>9}")
+    for size in SIZES:
+        flights = make_flights(size)
+        row_wise = best_of(lambda: compute_flights_stats([to_flight(f) for f in flights]))
+        columnar = best_of(lambda: compute_flights_stats_columnar(flights))
+        print(f"{size:>10} {row_wise:>14.4f} {columnar:>14.4f} {row_wise / columnar:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
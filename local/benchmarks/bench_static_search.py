@@ -0,0 +1,64 @@
+"""
+Compare a linear case-insensitive regex scan, like the previous `$regex` queries,
+with the in-memory static data search index on the aircrafts and airlines static data.
+Run with `make bench FILE=static_search`.
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+
+from app.modules.flights.flights_types import Aircraft, Airline
+from app.modules.trips.static_search import SEARCH_RESULTS_LIMIT, SearchIndex
+
+REPEAT = 200
+STATIC_DATA = Path(__file__).resolve().parents[2] / "app" / "static_data"
+
+AIRCRAFT_QUERIES = ["a", "b7", "a320", "boeing", "boeing 737-8", "cessna 172", "(1)", "zzzz"]
+AIRLINE_QUERIES = ["ai", "wizz", "lufthansa", "air fra", "zzzz"]
+
+
+def load[T](file: str, model: type[T]) -> list[T]:
+    entities = []
+    for item in json.loads((STATIC_DATA / file).read_text()):
+        try:
+            entities.append(model(**item))
+        except ValueError:
+            continue
+    return entities
+
+
+def regex_scan(entities: list, fields: tuple[str, ...], query: str) -> list:
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    return [e for e in entities if any(pattern.search(getattr(e, f)) for f in fields)][
+        :SEARCH_RESULTS_LIMIT
+    ]
+
+
+def per_call_us(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def run(label: str, entities: list, fields: tuple[str, ...], queries: list[str]) -> None:
+    start = time.perf_counter()
+    index = SearchIndex(entities, code_fields=fields[1:])
+    print(f"\n{label}: {len(entities)} entities, index built in {time.perf_counter() - start:.3f}s")
+    print(f"{'query':>14} {'results':>8} {'scan (us)':>11} {'index (us)':>11} {'speedup':>9}")
+    for query in queries:
+        scan = per_call_us(lambda: regex_scan(entities, fields, query))
+        indexed = per_call_us(lambda: index.search(query))
+        results = len(index.search(query))
+        print(f"{query:>14} {results:>8} {scan:>11.1f} {indexed:>11.1f} {scan / indexed:>8.1f}x")
+
+
+def main():
+    run("aircrafts", load("aircrafts.json", Aircraft), ("name", "icao"), AIRCRAFT_QUERIES)
+    run("airlines", load("airlines.json", Airline), ("name",), AIRLINE_QUERIES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the point by point and the vectorized routemap generation on synthetic routes.
+Run with `make bench FILE=strava_routemap`.
+"""
+
+import logging
+import math
+import random
+import time
+
+from app.modules.strava.route_codec import encode_route
+from app.modules.strava.strava_utils import generate_routemap, generate_routemap_per_point
+
+SIZES = [(100, 2_000), (500, 2_000), (1_000, 5_000)]  # (activities, points per activity)
+REPEAT = 3
+
+logger = logging.getLogger("bench")
+logger.disabled = True
+
+
+def make_activities(activity_count: int, points: int) -> list[dict]:
+    """GPS tracks sampled every second at ride speed around a few home areas, stored encoded."""
+    rng = random.Random(activity_count)
+    homes = [(rng.uniform(47.3, 47.7), rng.uniform(18.8, 19.3)) for _ in range(5)]
+    activities = []
+    for i in range(activity_count):
+        lat, lng = rng.choice(homes)
+        heading = rng.uniform(0, 2 * math.pi)
+        route = []
+        for _ in range(points):
+            heading += rng.gauss(0, 0.1)
+            lat += math.cos(heading) * 0.00008
+            lng += math.sin(heading) * 0.00012
+            route.append([round(lat, 6), round(lng, 6)])
+        activities.append({"strava_id": i, "route": bytes(encode_route(route))})
+    return activities
+
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'activities':>10} {'points':>8} {'per point (s)':>14} {'vectorized (s)':>15} {'speedup':>9}")
+    for activity_count, points in SIZES:
+        activities = make_activities(activity_count, points)
+        per_point = best_of(lambda: generate_routemap_per_point(activities, logger, sampling_rate=1))
+        vectorized = best_of(lambda: generate_routemap(activities, logger, sampling_rate=1))
+        print(
+            f"{activity_count:>10} {points:>8} {per_point:>14.3f} {vectorized:>15.3f} "
+            f"{per_point / vectorized:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
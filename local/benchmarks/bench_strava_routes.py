@@ -0,0 +1,72 @@
+"""
+Compare the stored size and the routemap latency of Strava routes as BSON arrays and encoded as binary.
+Run with `make bench FILE=strava_routes`.
+"""
+
+import logging
+import math
+import random
+import time
+
+import bson
+
+from app.modules.strava.route_codec import encode_route
+from app.modules.strava.strava_utils import generate_routemap
+
+SIZES = [(100, 2_000), (500, 5_000)]  # (activities, points per activity)
+REPEAT = 3
+
+logger = logging.getLogger("bench")
+logger.disabled = True
+
+
+def make_route(rng: random.Random, points: int) -> list[list[float]]:
+    """A GPS track sampled every second at ride speed, with 6 decimals like the Strava streams."""
+    lat, lng = rng.uniform(47.3, 47.7), rng.uniform(18.8, 19.3)
+    heading = rng.uniform(0, 2 * math.pi)
+    route = []
+    for _ in range(points):
+        heading += rng.gauss(0, 0.1)
+        lat += math.cos(heading) * 0.00008
+        lng += math.sin(heading) * 0.00012
+        route.append([round(lat, 6), round(lng, 6)])
+    return route
+
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(
+        f"{'activities':>10} {'points':>8} {'array (MB)':>11} {'binary (MB)':>12} "
+        f"{'array (s)':>10} {'binary (s)':>11}"
+    )
+    for activity_count, points in SIZES:
+        rng = random.Random(activity_count)
+        routes = [make_route(rng, points) for _ in range(activity_count)]
+        as_arrays = [bson.encode({"strava_id": i, "route": r}) for i, r in enumerate(routes)]
+        as_binary = [bson.encode({"strava_id": i, "route": encode_route(r)}) for i, r in enumerate(routes)]
+
+        # The routemap latency includes decoding the documents, as when they are read from the DB
+        array_time = best_of(
+            lambda: generate_routemap([bson.decode(d) for d in as_arrays], logger, sampling_rate=1)
+        )
+        binary_time = best_of(
+            lambda: generate_routemap([bson.decode(d) for d in as_binary], logger, sampling_rate=1)
+        )
+        array_size = sum(map(len, as_arrays)) / 1e6
+        binary_size = sum(map(len, as_binary)) / 1e6
+        print(
+            f"{activity_count:>10} {points:>8} {array_size:>11.1f} {binary_size:>12.1f} "
+            f"{array_time:>10.3f} {binary_time:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
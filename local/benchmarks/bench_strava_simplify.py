@@ -0,0 +1,54 @@
+"""
+Point reduction and time of the route simplification methods at a few tolerances on synthetic routes.
+Run with `make bench FILE=strava_simplify`.
+"""
+
+import math
+import random
+import time
+
+import numpy as np
+
+from app.modules.strava.route_simplify import simplify_route
+from app.modules.strava.strava_types import StravaSimplifyMethod
+
+ACTIVITIES = 50
+POINTS = 5_000
+TOLERANCES = [1.0, 5.0, 20.0]
+
+
+def make_routes() -> list[np.ndarray]:
+    """GPS tracks sampled every second at running speed, with a few metres of GPS noise."""
+    rng = random.Random(ACTIVITIES)
+    routes = []
+    for _ in range(ACTIVITIES):
+        lat, lng = rng.uniform(47.3, 47.7), rng.uniform(18.8, 19.3)
+        heading = rng.uniform(0, 2 * math.pi)
+        route = []
+        for _ in range(POINTS):
+            heading += rng.gauss(0, 0.05)
+            lat += math.cos(heading) * 0.00003
+            lng += math.sin(heading) * 0.000045
+            route.append([lat + rng.gauss(0, 0.00001), lng + rng.gauss(0, 0.000015)])
+        routes.append(np.array(route))
+    return routes
+
+
+def main():
+    routes = make_routes()
+    original = sum(len(route) for route in routes)
+    print(f"{ACTIVITIES} activities, {original} points")
+    print(f"{'method':>20} {'tolerance (m)':>14} {'points':>8} {'reduction':>10} {'ms / route':>11}")
+    for method in StravaSimplifyMethod:
+        for tolerance in TOLERANCES:
+            start = time.perf_counter()
+            simplified = sum(len(simplify_route(route, tolerance, method)) for route in routes)
+            elapsed = (time.perf_counter() - start) / len(routes)
+            print(
+                f"{method.value:>20} {tolerance:>14.1f} {simplified:>8} "
+                f"{1 - simplified / original:>10.1%} {elapsed * 1000:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
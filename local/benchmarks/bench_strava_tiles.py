@@ -0,0 +1,76 @@
+"""
+Time rendering heatmap tiles from the points of a loaded view, against sending the whole routemap.
+Run with `make bench FILE=strava_tiles`.
+"""
+
+import math
+import random
+import time
+
+import numpy as np
+
+from app.modules.strava.heatmap_tiles import (
+    MAX_TILE_ZOOM,
+    bin_tile,
+    encode_png,
+    heat_to_rgba,
+    to_world_pixels,
+)
+from app.modules.strava.strava_utils import cells_to_grid, route_cells, unique_cells
+
+SIZES = [(100, 2_000), (1_000, 2_000)]  # (activities, points per activity)
+ZOOMS = [8, 11, 14]
+REPEAT = 5
+
+
+def make_cells(activity_count: int, points: int) -> np.ndarray:
+    """The cells of GPS tracks sampled every second at ride speed around a few home areas."""
+    rng = random.Random(activity_count)
+    homes = [(rng.uniform(47.3, 47.7), rng.uniform(18.8, 19.3)) for _ in range(5)]
+    cells = []
+    for _ in range(activity_count):
+        lat, lng = rng.choice(homes)
+        heading = rng.uniform(0, 2 * math.pi)
+        route = []
+        for _ in range(points):
+            heading += rng.gauss(0, 0.1)
+            lat += math.cos(heading) * 0.00008
+            lng += math.sin(heading) * 0.00012
+            route.append([lat, lng])
+        cells.append(route_cells(route))
+    return np.concatenate(cells)
+
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'activities':>10} {'zoom':>5} {'tile (ms)':>10} {'png bytes':>10} {'routemap (ms)':>14} {"routemap bytes":>15}")
+    for activity_count, points in SIZES:
+        cells = make_cells(activity_count, points)
+        xs, ys = to_world_pixels(cells)
+        order = np.argsort(ys, kind="stable")
+        xs, ys = xs[order], ys[order]
+        # The binary routemap of the same activities, the alternative for drawing them
+        routemap = best_of(lambda: cells_to_grid(unique_cells(cells)).astype("<i4").tobytes())
+        routemap_bytes = len(unique_cells(cells)) * 8
+        for z in ZOOMS:
+            # The tile with the most points, around the first home area
+            x = int(np.median(xs)) >> (MAX_TILE_ZOOM + 8 - z)
+            y = int(np.median(ys)) >> (MAX_TILE_ZOOM + 8 - z)
+            png = encode_png(heat_to_rgba(bin_tile(xs, ys, z, x, y), z, y))
+            tile = best_of(lambda: encode_png(heat_to_rgba(bin_tile(xs, ys, z, x, y), z, y)))
+            print(
+                f"{activity_count:>10} {z:>5} {tile * 1000:>10.2f} {len(png):>10} "
+                f"{routemap * 1000:>14.2f} {routemap_bytes:>15}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from pymongo import UpdateOne
+
+from local.seeder import Seeder
+from app.common.db import StravaDbCollection
+from app.modules.strava.strava_utils import route_bbox, route_start_point
+
+BATCH_SIZE = 200
+
+
+def add_strava_route_bboxes():
+    """
+    Add the `bbox` and `start_point` of stored Strava activities synced before they were stored,
+    without them the activities are not found by the bounding box filter of the routemap.
+    Safe to run multiple times, only activities without a `bbox` are updated.
+    """
+    seeder = Seeder()
+    db = seeder.get_strava_db()
+    collection = db.get_collection(StravaDbCollection.ACTIVITIES)
+
+    cursor = collection.find({"bbox": {"$exists": False}}, projection={"_id": 1, "route": 1})
+    updated = 0
+    batch: list[UpdateOne] = []
+    for doc in cursor:
+        if not doc.get("route"):
+            continue
+        batch.append(
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"bbox": route_bbox(doc["route"]), "start_point": route_start_point(doc["route"])}},
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    print(f"Added the bounding box of {updated} activities.")
+
+    seeder.close_db()
+
+
+if __name__ == "__main__":
+    add_strava_route_bboxes()
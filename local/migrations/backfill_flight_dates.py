@@ -0,0 +1,38 @@
+from pymongo import UpdateOne
+
+from local.seeder import Seeder
+from app.modules.flights.flights_utils import flight_date_fields
+
+BATCH_SIZE = 1000
+
+
+def backfill_flight_dates():
+    """
+    Set the derived `year` and `date_ts` fields on flights that don't have them yet.
+    Safe to run multiple times, only flights missing one of the fields are updated.
+    """
+    seeder = Seeder()
+    db = seeder.get_db()
+
+    flights_collection = db.get_collection("flights")
+    cursor = flights_collection.find(
+        {"$or": [{"year": {"$exists": False}}, {"date_ts": {"$exists": False}}]},
+        projection={"_id": 1, "date": 1},
+    )
+
+    updated = 0
+    batch: list[UpdateOne] = []
+    for flight in cursor:
+        batch.append(UpdateOne({"_id": flight["_id"]}, {"$set": flight_date_fields(flight["date"])}))
+        if len(batch) >= BATCH_SIZE:
+            updated += flights_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += flights_collection.bulk_write(batch, ordered=False).modified_count
+
+    print(f"Backfilled date fields on {updated} flights.")
+    seeder.close_db()
+
+
+if __name__ == "__main__":
+    backfill_flight_dates()
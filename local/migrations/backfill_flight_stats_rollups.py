@@ -0,0 +1,37 @@
+from local.seeder import Seeder
+from app.modules.trips.stats_engine import FLIGHT_STATS_PROJECTION
+from app.modules.trips.stats_rollups import ROLLUPS_MARKER_YEAR, rollups_by_year, to_rollup_doc
+
+
+def backfill_flight_stats_rollups():
+    """
+    Rebuild the per-user, per-year flight stats rollups from the flights collection.
+    Safe to run multiple times, existing rollups of every user are replaced.
+    """
+    seeder = Seeder()
+    db = seeder.get_db()
+
+    flights_collection = db.get_collection("flights")
+    rollups_collection = db.get_collection("flight_stats_rollups")
+
+    user_ids = flights_collection.distinct("user_id")
+    print(f"Rebuilding flight stats rollups for {len(user_ids)} users.")
+
+    for user_id in user_ids:
+        raw_flights = flights_collection.find(
+            {"user_id": user_id, "is_planned": False}, projection=FLIGHT_STATS_PROJECTION
+        ).to_list()
+        rollups = rollups_by_year(raw_flights)
+
+        rollups_collection.delete_many({"user_id": user_id})
+        rollups_collection.insert_many(
+            [to_rollup_doc(user_id, year, rollup) for year, rollup in rollups.items()]
+            + [{"user_id": user_id, "year": ROLLUPS_MARKER_YEAR, "ready": True, "writes": 0, "pending": 0}]
+        )
+        print(f"User {user_id}: {len(rollups)} yearly rollups written.")
+
+    seeder.close_db()
+
+
+if __name__ == "__main__":
+    backfill_flight_stats_rollups()
@@ -0,0 +1,46 @@
+from pymongo import UpdateOne
+
+from local.seeder import Seeder
+from app.common.geo import to_geo_point
+
+BATCH_SIZE = 1000
+
+
+def backfill_collection(db, collection_name: str) -> int:
+    collection = db.get_collection(collection_name)
+    cursor = collection.find(
+        {"location": {"$exists": False}, "lat": {"$ne": None}, "lng": {"$ne": None}},
+        projection={"_id": 1, "lat": 1, "lng": 1},
+    )
+
+    updated = 0
+    batch: list[UpdateOne] = []
+    for doc in cursor:
+        batch.append(
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"location": to_geo_point(doc["lat"], doc["lng"])}})
+        )
+        if len(batch) >= BATCH_SIZE:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def backfill_geo_locations():
+    """
+    Set the GeoJSON `location` field on visits and airports that don't have it yet.
+    Safe to run multiple times, only documents missing the field are updated.
+    """
+    seeder = Seeder()
+    db = seeder.get_db()
+
+    for collection_name in ("visits", "airports"):
+        updated = backfill_collection(db, collection_name)
+        print(f"Backfilled location on {updated} {collection_name}.")
+
+    seeder.close_db()
+
+
+if __name__ == "__main__":
+    backfill_geo_locations()
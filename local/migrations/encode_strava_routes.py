@@ -0,0 +1,41 @@
+from pymongo import UpdateOne
+
+from local.seeder import Seeder
+from app.common.db import StravaDbCollection
+from app.modules.strava.route_codec import encode_route
+
+BATCH_SIZE = 200
+
+
+def encode_strava_routes():
+    """
+    Re-encode the `route` of stored Strava activities from `[lat, lng]` arrays to the compact binary form.
+    Safe to run multiple times, only routes still stored as arrays are updated.
+    """
+    seeder = Seeder()
+    db = seeder.get_strava_db()
+    collection = db.get_collection(StravaDbCollection.ACTIVITIES)
+
+    stats = db.command("collStats", StravaDbCollection.ACTIVITIES.value)
+    print(f"Activities size before: {stats['size'] / 1e6:.1f} MB")
+
+    cursor = collection.find({"route": {"$type": "array"}}, projection={"_id": 1, "route": 1})
+    updated = 0
+    batch: list[UpdateOne] = []
+    for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"route": encode_route(doc["route"])}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    print(f"Encoded the route of {updated} activities.")
+
+    stats = db.command("collStats", StravaDbCollection.ACTIVITIES.value)
+    print(f"Activities size after: {stats['size'] / 1e6:.1f} MB")
+
+    seeder.close_db()
+
+
+if __name__ == "__main__":
+    encode_strava_routes()
@@ -3,6 +3,8 @@ import dotenv
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 
+from app.common.db import STRAVA_DB_NAME
+
 
 class Seeder:
     def __init__(self):
@@ -40,6 +42,22 @@ class Seeder:
         except Exception as e:
             raise ConnectionError(f"Failed to connect to MongoDB: {e}")
 
+    def get_strava_db(self):
+        db_url = os.getenv("STRAVA_DB_URI")
+        if not db_url:
+            raise ValueError("STRAVA_DB_URI environment variable is not set.")
+        try:
+            self.client = MongoClient(
+                host=db_url, connectTimeoutMS=5000, server_api=ServerApi("1")
+            )
+            db = self.client.get_database(STRAVA_DB_NAME)
+            self.client.admin.command("ping")
+            print(f"Connected to Strava MongoDB database: {STRAVA_DB_NAME}")
+            return db
+
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to Strava MongoDB: {e}")
+
     def close_db(self):
         if self.client:
             self.client.close()
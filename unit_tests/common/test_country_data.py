@@ -1,5 +1,5 @@
 import pytest
-from app.common.country_data import CountryData
+from app.common.country_data import CountryData, get_country_data
 
 
 class TestCountryData:
@@ -27,23 +27,27 @@ class TestCountryData:
             self.country_data.get_continent("ZZ")
         assert "Country ZZ not found." in str(excinfo.value)
 
-    def test_get_continent_unknown(self, monkeypatch):
-        # Patch countries.json to return a country with an unknown continent code
-        import json
-
-        orig_path = self.country_data.countries_path
-        with open(orig_path, "r") as f:
-            countries = json.load(f)
-        countries["XY"] = {"code3": "XYZ", "name": "Testland", "continent": "XX"}
-        # Write to a temp file
-        import tempfile
-        import os
-
-        with tempfile.NamedTemporaryFile("w", delete=False) as tmp:
-            json.dump(countries, tmp)
-            tmp_path = tmp.name
-        monkeypatch.setattr(self.country_data, "countries_path", tmp_path)
-        try:
-            assert self.country_data.get_continent("XY") == "Unknown"
-        finally:
-            os.remove(tmp_path)
+    def test_get_continent_unknown(self):
+        country_data = CountryData(
+            countries={"XY": {"code3": "XYZ", "name": "Testland", "continent": "XX"}},
+            continents_by_country_name={},
+        )
+        assert country_data.get_continent("XY") == "Unknown"
+
+    def test_get_code(self):
+        assert self.country_data.get_code("Germany") == "DE"
+        assert self.country_data.get_code("united states") == "US"
+        assert self.country_data.get_code("Atlantis") is None
+
+    def test_get_continent_by_name(self):
+        assert self.country_data.get_continent_by_name("Hungary") == "Europe"
+        assert self.country_data.get_continent_by_name("USA") == "North America"
+        assert self.country_data.get_continent_by_name("Atlantis") == "Unknown"
+
+    def test_is_read_only(self):
+        with pytest.raises(TypeError):
+            self.country_data.continents["XX"] = "Atlantis"  # type: ignore[index]
+
+
+def test_get_country_data_is_shared():
+    assert get_country_data() is get_country_data()
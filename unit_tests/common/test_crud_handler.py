@@ -3,6 +3,7 @@ import pytest
 from datetime import datetime, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 from pydantic import Field
+from pymongo import ReturnDocument
 from app.common.crud_handler import CrudHandler
 from app.common.responses import (
     NotFoundException,
@@ -229,6 +230,19 @@ class TestCreate:
         assert "created_at" not in inserted
         assert result == {"mapped": {"a": 8, "b": "qux"}}
 
+    @pytest.mark.asyncio
+    async def test_extra_fields(self, handler, mapper_fn):
+        collection = handler.collection
+        body = DummyModel(a=9, b="quux")
+        collection.insert_one = AsyncMock(
+            return_value=MagicMock(acknowledged=True, inserted_id="mongoid")
+        )
+        collection.find_one = AsyncMock(return_value={"a": 9, "b": "quux"})
+        await handler.create(body, mapper_fn, extra_fields={"year": 2024})
+        inserted = collection.insert_one.call_args.args[0]
+        assert inserted["year"] == 2024
+        assert inserted["a"] == 9
+
 
 class TestUpdate:
     @pytest.mark.asyncio
@@ -248,6 +262,16 @@ class TestUpdate:
         with pytest.raises(NotFoundException):
             await handler.update("id1", DummyModel(a=1, b="bar"), mapper_fn)
 
+    @pytest.mark.asyncio
+    async def test_extra_fields(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_update = AsyncMock(return_value={"a": 1, "b": "bar"})
+        await handler.update(
+            "id1", DummyModel(a=1, b="bar"), mapper_fn, extra_fields={"year": 2024}
+        )
+        update = collection.find_one_and_update.call_args.args[1]
+        assert update == {"$set": {"a": 1, "b": "bar", "year": 2024}}
+
     @pytest.mark.asyncio
     async def test_db_error(self, handler, mapper_fn):
         collection = handler.collection
@@ -257,6 +281,37 @@ class TestUpdate:
         handler.logger.error.assert_called()
 
 
+class TestUpdateWithPrevious:
+    @pytest.mark.asyncio
+    async def test_success(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_update = AsyncMock(
+            return_value={"a": 1, "b": "foo", "year": 2023}
+        )
+        previous, result = await handler.update_with_previous(
+            "id1", DummyModel(a=2, b="bar"), mapper_fn, extra_fields={"year": 2024}
+        )
+        assert collection.find_one_and_update.call_args.kwargs["return_document"] == ReturnDocument.BEFORE
+        assert previous == {"mapped": {"a": 1, "b": "foo", "year": 2023}}
+        assert result == {"mapped": {"a": 2, "b": "bar", "year": 2024}}
+        handler.logger.info.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_not_found(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_update = AsyncMock(return_value=None)
+        with pytest.raises(NotFoundException):
+            await handler.update_with_previous("id1", DummyModel(a=1, b="bar"), mapper_fn)
+
+    @pytest.mark.asyncio
+    async def test_db_error(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_update = AsyncMock(side_effect=Exception("db fail"))
+        with pytest.raises(InternalServerErrorException):
+            await handler.update_with_previous("id1", DummyModel(a=1, b="bar"), mapper_fn)
+        handler.logger.error.assert_called()
+
+
 class TestDelete:
     @pytest.mark.asyncio
     async def test_success(self, handler):
@@ -283,3 +338,31 @@ class TestDelete:
         with pytest.raises(InternalServerErrorException):
             await handler.delete("id1")
         handler.logger.error.assert_called()
+
+
+class TestDeleteWithPrevious:
+    @pytest.mark.asyncio
+    async def test_success(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_delete = AsyncMock(return_value={"a": 1, "b": "foo"})
+        previous, result = await handler.delete_with_previous("id1", mapper_fn)
+        collection.find_one_and_delete.assert_called_once_with(
+            {"user_id": handler.user.id, "id": "id1"}
+        )
+        assert previous == {"mapped": {"a": 1, "b": "foo"}}
+        assert result == IdResponse(id="id1")
+
+    @pytest.mark.asyncio
+    async def test_not_found(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_delete = AsyncMock(return_value=None)
+        with pytest.raises(NotFoundException):
+            await handler.delete_with_previous("id1", mapper_fn)
+
+    @pytest.mark.asyncio
+    async def test_db_error(self, handler, mapper_fn):
+        collection = handler.collection
+        collection.find_one_and_delete = AsyncMock(side_effect=Exception("db fail"))
+        with pytest.raises(InternalServerErrorException):
+            await handler.delete_with_previous("id1", mapper_fn)
+        handler.logger.error.assert_called()
@@ -1,6 +1,6 @@
 import pytest
-from unittest.mock import AsyncMock, MagicMock
-from app.common.db import MongoDbManager
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.common.db import STRAVA_DB_NAME, MongoDbManager, StravaDbManager
 
 
 @pytest.fixture
@@ -51,3 +51,119 @@ async def test_close_does_nothing_if_no_client(env, logger):
     manager.mongo_client = None
     await manager.close()
     logger.info.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_configured_indexes(env, logger):
+    from app.common.db import DB_INDEXES
+
+    manager = MongoDbManager(env, logger)
+    collection = MagicMock()
+    collection.create_indexes = AsyncMock()
+    manager.db = MagicMock()
+    manager.db.get_collection.return_value = collection
+    await manager.ensure_indexes()
+    assert collection.create_indexes.await_count == len(DB_INDEXES)
+    logger.error.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_logs_failures(env, logger):
+    manager = MongoDbManager(env, logger)
+    collection = MagicMock()
+    collection.create_indexes = AsyncMock(side_effect=Exception("index error"))
+    manager.db = MagicMock()
+    manager.db.get_collection.return_value = collection
+    await manager.ensure_indexes()
+    logger.error.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("app.common.db.AsyncMongoClient")
+async def test_strava_connect_uses_one_pooled_client(mock_mongo, env, logger):
+    env.STRAVA_DB_URI = "mongodb://strava-db-uri"
+    mock_client = MagicMock()
+    mock_client.admin.command = AsyncMock()
+    mock_mongo.return_value = mock_client
+    manager = StravaDbManager(env, logger, max_pool_size=5)
+
+    db = await manager.connect()
+
+    assert db == mock_client.get_database.return_value
+    mock_client.get_database.assert_called_once_with(STRAVA_DB_NAME)
+    assert mock_mongo.call_args.kwargs["host"] == "mongodb://strava-db-uri"
+    assert mock_mongo.call_args.kwargs["maxPoolSize"] == 5
+    mock_client.admin.command.assert_awaited_once_with("ping")
+    assert manager.reachable is True
+    logger.error.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.common.db.AsyncMongoClient")
+async def test_strava_connect_failure_does_not_raise(mock_mongo, env, logger):
+    env.STRAVA_DB_URI = "mongodb://strava-db-uri"
+    mock_client = MagicMock()
+    mock_client.admin.command = AsyncMock(side_effect=Exception("db down"))
+    mock_mongo.return_value = mock_client
+    manager = StravaDbManager(env, logger)
+
+    db = await manager.connect()
+
+    assert db is not None
+    assert manager.reachable is False
+    assert await manager.ping() is False
+    logger.error.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("app.common.db.AsyncMongoClient")
+async def test_strava_ping_updates_reachable(mock_mongo, env, logger):
+    env.STRAVA_DB_URI = "mongodb://strava-db-uri"
+    mock_client = MagicMock()
+    mock_client.admin.command = AsyncMock(side_effect=[Exception("db down"), None])
+    mock_mongo.return_value = mock_client
+    manager = StravaDbManager(env, logger)
+
+    await manager.connect()
+    assert manager.reachable is False
+
+    assert await manager.ping() is True
+    assert manager.reachable is True
+
+
+@pytest.mark.asyncio
+async def test_strava_close_calls_client_close(env, logger):
+    manager = StravaDbManager(env, logger)
+    mock_client = AsyncMock()
+    manager.mongo_client = mock_client
+    await manager.close()
+    mock_client.close.assert_awaited_once()
+    logger.info.assert_called_with("Strava MongoDB connection closed.")
+
+
+@pytest.mark.asyncio
+async def test_strava_ensure_indexes_creates_configured_indexes(env, logger):
+    from app.common.db import STRAVA_DB_INDEXES
+
+    manager = StravaDbManager(env, logger)
+    collection = MagicMock()
+    collection.create_indexes = AsyncMock(side_effect=[Exception("boom")] + [None] * 10)
+    manager.db = MagicMock()
+    manager.db.get_collection.return_value = collection
+    manager.reachable = True
+
+    await manager.ensure_indexes()
+
+    assert collection.create_indexes.await_count == len(STRAVA_DB_INDEXES)
+    logger.error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_strava_ensure_indexes_skipped_when_unreachable(env, logger):
+    manager = StravaDbManager(env, logger)
+    manager.db = MagicMock()
+
+    await manager.ensure_indexes()
+
+    manager.db.get_collection.assert_not_called()
+    logger.warning.assert_called_once()
@@ -0,0 +1,100 @@
+import pytest
+from pydantic import ValidationError
+
+from app.common.geo import (
+    BoundingBoxQuery,
+    RadiusQuery,
+    bbox_geo_filter,
+    parse_bbox,
+    radius_geo_filter,
+    to_geo_point,
+)
+
+
+def polygon_lngs(clause: dict) -> tuple[float, float]:
+    ring = clause["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+    lngs = [point[0] for point in ring]
+    return min(lngs), max(lngs)
+
+
+class TestGeoPoint:
+    def test_coordinates_are_lng_lat(self):
+        assert to_geo_point(47.5, 19.0) == {"type": "Point", "coordinates": [19.0, 47.5]}
+
+
+class TestBboxGeoFilter:
+    def test_small_box_is_a_single_closed_polygon(self):
+        result = bbox_geo_filter(40, 10, 50, 20)
+
+        ring = result["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+        assert ring[0] == ring[-1] == [10, 40]
+        assert {point[1] for point in ring} == {40, 50}
+        assert polygon_lngs(result) == (10, 20)
+
+    def test_edges_along_parallels_are_densified(self):
+        result = bbox_geo_filter(40, 0, 50, 30)
+        ring = result["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+        assert len(ring) == 2 * 31 + 1
+
+    def test_wide_box_is_split_into_chunks(self):
+        result = bbox_geo_filter(-60, -180, 60, 180)
+
+        assert [polygon_lngs(c) for c in result["$or"]] == [
+            (-180, -90), (-90, 0), (0, 90), (90, 180)
+        ]
+
+    def test_box_crossing_antimeridian(self):
+        result = bbox_geo_filter(-10, 170, 10, -170)
+
+        assert [polygon_lngs(c) for c in result["$or"]] == [(170, 180), (-180, -170)]
+
+    def test_custom_field(self):
+        assert "start_point" in bbox_geo_filter(0, 0, 1, 1, field="start_point")
+
+    def test_intersects(self):
+        result = bbox_geo_filter(-10, 170, 10, -170, field="bbox", intersects=True)
+
+        assert all(list(c["bbox"]) == ["$geoIntersects"] for c in result["$or"])
+
+
+class TestRadiusGeoFilter:
+    def test_near_sphere_in_meters(self):
+        assert radius_geo_filter(47.5, 19.0, 12.5) == {
+            "location": {
+                "$nearSphere": {
+                    "$geometry": {"type": "Point", "coordinates": [19.0, 47.5]},
+                    "$maxDistance": 12500,
+                }
+            }
+        }
+
+
+class TestQueryModels:
+    def test_bbox_requires_south_below_north(self):
+        with pytest.raises(ValidationError):
+            BoundingBoxQuery(south=50, west=10, north=40, east=20)
+
+    def test_bbox_out_of_range(self):
+        with pytest.raises(ValidationError):
+            BoundingBoxQuery(south=-95, west=10, north=40, east=20)
+
+    def test_bbox_to_filter(self):
+        assert BoundingBoxQuery(south=40, west=10, north=50, east=20).to_filter() == bbox_geo_filter(
+            40, 10, 50, 20
+        )
+
+    def test_parse_bbox_is_west_south_east_north(self):
+        assert parse_bbox("10,40,20,50") == BoundingBoxQuery(south=40, west=10, north=50, east=20)
+        assert parse_bbox(None) is None
+
+    @pytest.mark.parametrize("value", ["10,40,20", "10,40,20,50,60", "a,40,20,50", "10,50,20,40"])
+    def test_parse_bbox_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+    def test_radius_must_be_positive(self):
+        with pytest.raises(ValidationError):
+            RadiusQuery(lat=0, lng=0, radius_km=0)
+
+    def test_radius_accepts_camel_case(self):
+        assert RadiusQuery(**{"lat": 1, "lng": 2, "radiusKm": 3}).radius_km == 3
@@ -1,7 +1,8 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from logging import Logger
-from app.modules.ai.gemini_api import GeminiApi
+from app.modules.ai.gemini_api import GEMINI_MODEL, GeminiApi, prompt_hash
 
 
 @pytest.fixture
@@ -65,7 +66,7 @@ def test_extract_json_no_json(mock_client_class, mock_logger):
     text = "no json here"
     with pytest.raises(ValueError, match="No valid JSON found in the response."):
         api.extract_json(text)
-    mock_logger.error.assert_called()
+    mock_logger.error.assert_called_once_with("No valid JSON found in the response: no json here")
 
 
 @patch("app.modules.ai.gemini_api.genai.Client")
@@ -75,3 +76,152 @@ def test_extract_json_invalid_json(mock_client_class, mock_logger):
     with pytest.raises(ValueError, match="Invalid JSON format"):
         api.extract_json(text)
     mock_logger.error.assert_called()
+
+
+@patch("app.modules.ai.gemini_api.genai.Client")
+def test_extract_json_list_success(mock_client_class, mock_logger):
+    api = GeminiApi(api_key="test-key", logger=mock_logger)
+    text = '```json\n[{"iata": "BUD"}, {"iata": "CPH"}]\n```'
+    assert api.extract_json_list(text) == [{"iata": "BUD"}, {"iata": "CPH"}]
+    mock_logger.error.assert_not_called()
+
+
+@patch("app.modules.ai.gemini_api.genai.Client")
+def test_extract_json_list_no_array(mock_client_class, mock_logger):
+    api = GeminiApi(api_key="test-key", logger=mock_logger)
+    with pytest.raises(ValueError, match="No valid JSON array found in the response."):
+        api.extract_json_list('{"iata": "BUD"}')
+    mock_logger.error.assert_called_once_with(
+        'No valid JSON array found in the response: {"iata": "BUD"}'
+    )
+
+
+@patch("app.modules.ai.gemini_api.genai.Client")
+def test_extract_json_list_invalid_json(mock_client_class, mock_logger):
+    api = GeminiApi(api_key="test-key", logger=mock_logger)
+    with pytest.raises(ValueError, match="Invalid JSON format"):
+        api.extract_json_list("[invalid json]")
+    (message,) = mock_logger.error.call_args.args
+    assert message.startswith("Invalid JSON format: ")
+
+
+def _usage(prompt_tokens: int, response_tokens: int):
+    return MagicMock(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=response_tokens,
+        total_token_count=prompt_tokens + response_tokens,
+    )
+
+
+@pytest.fixture
+def cache_collection():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=None)
+    collection.replace_one = AsyncMock()
+    collection.delete_one = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def cached_api(mock_logger, cache_collection):
+    db = MagicMock()
+    db.get_collection.return_value = cache_collection
+    with patch("app.modules.ai.gemini_api.genai.Client"):
+        api = GeminiApi(api_key="test-key", logger=mock_logger, db=db, timeout_seconds=0.5)
+        api.client.aio.models.generate_content = AsyncMock(
+            return_value=MagicMock(text='{"iata": "BUD"}', usage_metadata=_usage(100, 20))
+        )
+        yield api
+
+
+@pytest.mark.asyncio
+async def test_answer_is_cached_by_prompt_hash(cached_api, cache_collection):
+    result = await cached_api.generate_json(prompt="prompt")
+
+    assert result == {"iata": "BUD"}
+    key = prompt_hash("prompt", GEMINI_MODEL)
+    cache_collection.find_one.assert_awaited_once_with({"_id": key})
+    (filter, doc), _ = cache_collection.replace_one.call_args
+    assert filter == {"_id": key}
+    assert (doc["text"], doc["total_tokens"]) == ('{"iata": "BUD"}', 120)
+    metrics = cached_api.metrics()
+    assert (metrics.cache_misses, metrics.api_calls, metrics.prompt_tokens, metrics.response_tokens) == (
+        1,
+        1,
+        100,
+        20,
+    )
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_the_api(cached_api, cache_collection):
+    cache_collection.find_one.return_value = {"text": '[{"iata": "CPH"}]', "total_tokens": 300}
+
+    result = await cached_api.generate_json_list(prompt="prompt")
+
+    assert result == [{"iata": "CPH"}]
+    cached_api.client.aio.models.generate_content.assert_not_awaited()
+    metrics = cached_api.metrics()
+    assert (metrics.cache_hits, metrics.hit_ratio, metrics.saved_tokens) == (1, 1.0, 300)
+
+
+@pytest.mark.asyncio
+async def test_unparsable_answer_is_not_cached(cached_api, cache_collection):
+    cached_api.client.aio.models.generate_content.return_value = MagicMock(text="no json here")
+
+    with pytest.raises(ValueError):
+        await cached_api.generate_json(prompt="prompt")
+
+    cache_collection.replace_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_cache_errors_fall_back_to_the_api(cached_api, cache_collection, mock_logger):
+    cache_collection.find_one.side_effect = Exception("DB down")
+    cache_collection.replace_one.side_effect = Exception("DB down")
+
+    assert await cached_api.generate_json(prompt="prompt") == {"iata": "BUD"}
+    assert mock_logger.error.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_deletes_the_cached_answer(cached_api, cache_collection):
+    await cached_api.invalidate("prompt")
+
+    cache_collection.delete_one.assert_awaited_once_with({"_id": prompt_hash("prompt", GEMINI_MODEL)})
+
+
+@pytest.mark.asyncio
+async def test_calls_time_out(cached_api):
+    async def slow_generate(**kwargs):
+        await asyncio.sleep(10)
+
+    cached_api.client.aio.models.generate_content.side_effect = slow_generate
+
+    with pytest.raises(TimeoutError):
+        await cached_api.generate_json(prompt="prompt")
+    metrics = cached_api.metrics()
+    assert (metrics.timeouts, metrics.in_flight) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_limited(mock_logger):
+    with patch("app.modules.ai.gemini_api.genai.Client"):
+        api = GeminiApi(api_key="test-key", logger=mock_logger, max_concurrency=2)
+    running = 0
+    max_running = 0
+
+    async def generate(**kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return MagicMock(text='{"iata": "BUD"}', usage_metadata=None)
+
+    api.client.aio.models.generate_content = AsyncMock(side_effect=generate)
+
+    await asyncio.gather(*(api.generate_json(prompt=f"prompt {i}") for i in range(5)))
+
+    assert max_running == 2
+    assert api.metrics().api_calls == 5
@@ -1,9 +1,11 @@
 import pytest
+from datetime import datetime, timezone
 
-from app.modules.flights.flights_utils import to_flight
-from app.modules.flights.flights_types import Flight
-
-
+from app.modules.flights.flights_utils import (
+    flight_date_fields,
+    flight_years_query,
+    to_flight,
+)
 from app.modules.flights.flights_types import (
     Airport,
     Aircraft,
@@ -210,9 +212,43 @@ def make_flight_request(dep: Airport = AIRPORT_FRA, arr: Airport = AIRPORT_JFK)
     )
 
 
+class TestFlightDateFields:
+    def test_derives_year_and_utc_timestamp(self):
+        assert flight_date_fields("2024-02-29") == {
+            "year": 2024,
+            "date_ts": datetime(2024, 2, 29, tzinfo=timezone.utc),
+        }
+
+    def test_invalid_date_raises(self):
+        with pytest.raises(ValueError):
+            flight_date_fields("2024-13-01")
+
+    def test_years_query_uses_int_years(self):
+        assert flight_years_query(["2023", "2024"]) == {"$in": [2023, 2024]}
+
+
 # ── _upsert_airports ──────────────────────────────────────────────────────────
 
 class TestUpsertAirports:
+    @pytest.mark.asyncio
+    async def test_inserts_geojson_location(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from app.modules.flights.flights_utils import _upsert_airports
+
+        collection = MagicMock()
+        collection.update_one = AsyncMock(return_value=MagicMock(upserted_id="new-id"))
+        db = MagicMock()
+        db.get_collection.return_value = collection
+        body = make_flight_request()
+
+        await _upsert_airports(db, body, MagicMock())
+
+        inserted = collection.update_one.call_args_list[0].args[1]["$setOnInsert"]
+        assert inserted["location"] == {
+            "type": "Point",
+            "coordinates": [body.departure_airport.lng, body.departure_airport.lat],
+        }
+
     @pytest.mark.asyncio
     async def test_upserts_both_airports(self, monkeypatch):
         from unittest.mock import AsyncMock, MagicMock
@@ -230,6 +266,24 @@ class TestUpsertAirports:
 
         assert collection.update_one.call_count == 2
 
+    @pytest.mark.asyncio
+    async def test_adds_only_new_airports_to_index(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from app.modules.flights.flights_utils import _upsert_airports
+
+        collection = MagicMock()
+        collection.update_one = AsyncMock(
+            side_effect=[MagicMock(upserted_id="new-id"), MagicMock(upserted_id=None)]
+        )
+        db = MagicMock()
+        db.get_collection.return_value = collection
+        airports_index = MagicMock()
+        body = make_flight_request()
+
+        await _upsert_airports(db, body, MagicMock(), airports_index)
+
+        airports_index.add.assert_called_once_with(body.departure_airport)
+
     @pytest.mark.asyncio
     async def test_uses_setOnInsert_operator(self, monkeypatch):
         from unittest.mock import AsyncMock, MagicMock, call
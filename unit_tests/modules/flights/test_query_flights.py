@@ -81,7 +81,7 @@ async def test_query_flights_by_year_single(monkeypatch, user, req, db, collecti
 
     collection.find.assert_called_once_with({
         "user_id": "user123",
-        "date": {"$regex": "^(2024)"},
+        "year": {"$in": [2024]},
     })
 
 
@@ -95,7 +95,7 @@ async def test_query_flights_by_year_multiple(monkeypatch, user, req, db, collec
 
     collection.find.assert_called_once_with({
         "user_id": "user123",
-        "date": {"$regex": "^(2023|2024)"},
+        "year": {"$in": [2023, 2024]},
     })
 
 
@@ -8,7 +8,7 @@ from app.common.responses import NotFoundException, InternalServerErrorException
 
 @pytest.mark.asyncio
 @patch("app.modules.proxy.location.get_city.LocationIqApi")
-@patch("app.modules.proxy.location.get_city.CountryData")
+@patch("app.modules.proxy.location.get_city.get_country_data")
 async def test_get_city_success(mock_country_data, mock_location_api):
     env = MagicMock()
     env.PROXY_LOCATION_REVERSE_URL = "dummy_url"
@@ -55,7 +55,7 @@ async def test_get_city_address_not_found(mock_location_api):
 
 @pytest.mark.asyncio
 @patch("app.modules.proxy.location.get_city.LocationIqApi")
-@patch("app.modules.proxy.location.get_city.CountryData")
+@patch("app.modules.proxy.location.get_city.get_country_data")
 async def test_get_city_countrydata_raises(mock_country_data, mock_location_api):
     env = MagicMock()
     env.PROXY_LOCATION_REVERSE_URL = "dummy_url"
@@ -79,7 +79,7 @@ async def test_get_city_countrydata_raises(mock_country_data, mock_location_api)
 # Additional test: LocationIqApi raises an error
 @pytest.mark.asyncio
 @patch("app.modules.proxy.location.get_city.LocationIqApi")
-@patch("app.modules.proxy.location.get_city.CountryData")
+@patch("app.modules.proxy.location.get_city.get_country_data")
 async def test_get_city_locationiqapi_raises(mock_country_data, mock_location_api):
     env = MagicMock()
     env.PROXY_LOCATION_REVERSE_URL = "dummy_url"
@@ -0,0 +1,89 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+WINDOW_SECONDS = 15 * 60
+
+
+class FakeClock:
+    """Clock for the rate limiter and the Strava stand-in, `sleep` moves it forward instantly."""
+
+    def __init__(self, now: float = 1_700_000_200.0):
+        self.now = now
+        self.slept: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class StravaStandIn:
+    """
+    Local stand-in for the Strava API, served in-process over ASGI.
+    It counts requests in 15 minute windows like Strava, answers with the `X-RateLimit-*` headers,
+    and refuses requests over the limit with 429. Streams are served from `streams` by activity id.
+    """
+
+    def __init__(self, clock: FakeClock, short_term_limit: int = 100, daily_limit: int = 1000):
+        self.clock = clock
+        self.short_term_limit = short_term_limit
+        self.daily_limit = daily_limit
+        self.streams: dict[int, list[list[float]]] = {}
+        self.short_term_usage = 0
+        self.daily_usage = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._window = int(clock() // WINDOW_SECONDS)
+        self.app = FastAPI()
+        self.app.add_api_route("/api/v3/activities/{activity_id}/streams", self._get_streams)
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": f"{self.short_term_limit},{self.daily_limit}",
+            "X-RateLimit-Usage": f"{self.short_term_usage},{self.daily_usage}",
+        }
+
+    async def _get_streams(self, activity_id: int):
+        window = int(self.clock() // WINDOW_SECONDS)
+        if window != self._window:
+            self._window = window
+            self.short_term_usage = 0
+
+        self.short_term_usage += 1
+        self.daily_usage += 1
+        if self.short_term_usage > self.short_term_limit:
+            self.rejected += 1
+            return JSONResponse(
+                {"message": "Rate Limit Exceeded"}, status_code=429, headers=self._headers()
+            )
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Let the other requests in flight overlap with this one
+            await asyncio.sleep(0.001)
+        finally:
+            self.in_flight -= 1
+        return JSONResponse(
+            {"latlng": {"data": self.streams.get(activity_id, [])}}, headers=self._headers()
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app))
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def strava_stand_in(fake_clock):
+    return StravaStandIn(fake_clock)
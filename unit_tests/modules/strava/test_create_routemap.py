@@ -1,18 +1,80 @@
+import numpy as np
 import pytest
 from datetime import datetime
-from pymongo.server_api import ServerApi
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from app.modules.strava.create_routemap import create_routemap
-from app.modules.strava.strava_types import StravaActivityType, StravaRoutemap
+from app.common.config import expose_headers
+from app.common.geo import BoundingBoxQuery
+from app.modules.strava.create_routemap import (
+    ROUTEMAP_PROJECTION,
+    SIMPLIFIED_ROUTEMAP_PROJECTION,
+    create_routemap,
+    create_routemap_binary,
+)
+from app.modules.strava.route_codec import encode_cells, encode_route
+from app.modules.strava.routemap_cache import StravaRoutemapCache
+from app.modules.strava.strava import get_create_routemap
+from app.modules.strava.strava_types import (
+    StravaActivityType,
+    StravaRoutemapFormat,
+    StravaSimplifyMethod,
+)
+from app.modules.strava.strava_utils import route_cells
+
+
+RUN_ROUTE = [[51.1, -0.1], [51.2346, -0.2346], [51.3457, -0.3457]]
+WALK_ROUTE = [[51.9, -0.9], [51.2346, -0.2346], [52.0, -1.0]]
+EXPECTED_POINTS = {(51.2346, -0.2346), (51.3457, -0.3457), (52.0, -1.0)}
+
+
+def with_routes(activities):
+    routes = {"a1": RUN_ROUTE, "a2": WALK_ROUTE}
+    for activity in activities:
+        del activity["cells"]
+        activity["route"] = bytes(encode_route(routes[activity["id"]]))
+    return activities
+
+
+def make_activities():
+    return [
+        {
+            "id": "a1",
+            "user_id": "user123",
+            "type": "Run",
+            "start_date": datetime(2024, 1, 1),
+            "cells": encode_cells(route_cells(RUN_ROUTE)),
+        },
+        {
+            "id": "a2",
+            "user_id": "user123",
+            "type": "Walk",
+            "start_date": datetime(2024, 1, 1),
+            "cells": encode_cells(route_cells(WALK_ROUTE)),
+        },
+    ]
 
 
 @pytest.fixture
-def mock_request():
+def mock_collection():
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(side_effect=lambda: make_activities())
+    collection.bulk_write = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def mock_db(mock_collection):
+    db = MagicMock()
+    db.get_collection.return_value = mock_collection
+    return db
+
+
+@pytest.fixture
+def mock_request(mock_db):
     req = MagicMock()
     req.app.state.logger = MagicMock()
-    req.app.state.env = MagicMock()
-    req.app.state.env.STRAVA_DB_URI = "mongodb://strava-db-uri"
+    req.app.state.strava_db = mock_db
+    req.app.state.strava_routemap_cache = StravaRoutemapCache()
     return req
 
 
@@ -23,158 +85,76 @@ def mock_user():
     return user
 
 
-dummy_map = StravaRoutemap(count=0, points=set())
-mock_activities = [
-    {"user_id": "user123", "type": "Run", "start_date": datetime(2024, 1, 1)},
-    {"user_id": "user123", "type": "Walk", "start_date": datetime(2024, 1, 1)},
-]
-
-
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_success(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
+async def test_create_routemap_success(mock_request, mock_user, mock_db, mock_collection):
     before = datetime(2024, 1, 1)
     after = datetime(2023, 1, 1)
     types = None
 
-    # Mock MongoDB client and collection
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.return_value.to_list = AsyncMock(return_value=mock_activities)
-    mock_mongo.return_value = mock_client
-
     result = await create_routemap(mock_request, mock_user, before, after, types)
-    mock_client.admin.command.assert_called_once_with("ping")
     mock_db.get_collection.assert_called_once_with("activities")
     mock_collection.find.assert_called_once_with(
         {
             "user_id": mock_user.id,
             "type": {"$in": ["Walk", "Run", "Ride"]},
             "start_date": {"$gte": after, "$lte": before},
-        }
-    )
-    mock_generate_routemap.assert_called_once_with(
-        activities=mock_activities,
-        logger=mock_request.app.state.logger,
-        sampling_rate=1,
+        },
+        projection=ROUTEMAP_PROJECTION,
     )
-    assert result.routemap == dummy_map
+    assert result.routemap.points == EXPECTED_POINTS
+    assert result.routemap.count == 3
     assert result.activity_count == 2
     assert set(result.types) == {"Run", "Walk"}
     assert result.after == after.isoformat()
     assert result.before == before.isoformat()
+    mock_collection.bulk_write.assert_not_called()
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_no_before_no_after(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
-    before = None
-    after = None
-    types = None
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.return_value.to_list = AsyncMock(return_value=mock_activities)
-    mock_mongo.return_value = mock_client
-
-    result = await create_routemap(mock_request, mock_user, before, after, types)
+async def test_create_routemap_no_before_no_after(mock_request, mock_user, mock_collection):
+    result = await create_routemap(mock_request, mock_user, None, None, None)
     filter_query = {
         "user_id": mock_user.id,
         "type": {"$in": ["Walk", "Run", "Ride"]},
     }
-    mock_collection.find.assert_called_once_with(filter_query)
-    assert result.routemap == dummy_map
+    mock_collection.find.assert_called_once_with(filter_query, projection=ROUTEMAP_PROJECTION)
+    assert result.routemap.points == EXPECTED_POINTS
     assert result.activity_count == 2
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_only_before(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
+async def test_create_routemap_only_before(mock_request, mock_user, mock_collection):
     before = datetime(2024, 1, 1)
-    after = None
-    types = None
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.return_value.to_list = AsyncMock(return_value=mock_activities)
-    mock_mongo.return_value = mock_client
 
-    result = await create_routemap(mock_request, mock_user, before, after, types)
+    result = await create_routemap(mock_request, mock_user, before, None, None)
     filter_query = {
         "user_id": mock_user.id,
         "type": {"$in": ["Walk", "Run", "Ride"]},
         "start_date": {"$lte": before},
     }
-    mock_collection.find.assert_called_once_with(filter_query)
-    assert result.routemap == dummy_map
+    mock_collection.find.assert_called_once_with(filter_query, projection=ROUTEMAP_PROJECTION)
     assert result.activity_count == 2
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_only_after(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
-    before = None
+async def test_create_routemap_only_after(mock_request, mock_user, mock_collection):
     after = datetime(2023, 1, 1)
-    types = None
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.return_value.to_list = AsyncMock(return_value=mock_activities)
-    mock_mongo.return_value = mock_client
 
-    result = await create_routemap(mock_request, mock_user, before, after, types)
+    result = await create_routemap(mock_request, mock_user, None, after, None)
     filter_query = {
         "user_id": mock_user.id,
         "type": {"$in": ["Walk", "Run", "Ride"]},
         "start_date": {"$gte": after},
     }
-    mock_collection.find.assert_called_once_with(filter_query)
-    assert result.routemap == dummy_map
+    mock_collection.find.assert_called_once_with(filter_query, projection=ROUTEMAP_PROJECTION)
     assert result.activity_count == 2
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_with_types(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
+async def test_create_routemap_with_types(mock_request, mock_user, mock_collection):
     before = datetime(2024, 1, 1)
     after = datetime(2023, 1, 1)
     types = [StravaActivityType.RUN, StravaActivityType.WALK]
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.return_value.to_list = AsyncMock(return_value=mock_activities)
-    mock_mongo.return_value = mock_client
 
     result = await create_routemap(mock_request, mock_user, before, after, types)
     filter_query = {
@@ -182,74 +162,217 @@ async def test_create_routemap_with_types(
         "type": {"$in": [t.value for t in types]},
         "start_date": {"$gte": after, "$lte": before},
     }
-    mock_collection.find.assert_called_once_with(filter_query)
-    assert result.routemap == dummy_map
+    mock_collection.find.assert_called_once_with(filter_query, projection=ROUTEMAP_PROJECTION)
     assert result.activity_count == 2
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-async def test_create_routemap_db_connection_error(mock_mongo, mock_request, mock_user):
-    before = datetime(2024, 1, 1)
-    after = datetime(2023, 1, 1)
-    types = None
-    mock_client = AsyncMock()
-    mock_client.admin.command = AsyncMock(side_effect=Exception("db down"))
-    mock_mongo.return_value = mock_client
+async def test_create_routemap_unfiltered_is_cached(mock_request, mock_user, mock_collection):
+    first = await create_routemap(mock_request, mock_user, None, None, None)
+    second = await create_routemap(mock_request, mock_user, None, None, None)
 
-    from app.common.responses import InternalServerErrorException
+    mock_collection.find.assert_called_once()
+    assert second.routemap.points == first.routemap.points == EXPECTED_POINTS
+    assert second.activity_count == 2
+    assert set(second.types) == {"Run", "Walk"}
 
-    with pytest.raises(InternalServerErrorException) as exc:
-        await create_routemap(mock_request, mock_user, before, after, types)
-    assert "Failed to connect to Strava database" in str(exc.value.detail)
+    # Filtered routemaps are not cached
+    await create_routemap(mock_request, mock_user, None, None, [StravaActivityType.RUN])
+    await create_routemap(mock_request, mock_user, None, datetime(2023, 1, 1), None)
+    assert mock_collection.find.call_count == 3
+
+    mock_request.app.state.strava_routemap_cache.invalidate(mock_user.id)
+    await create_routemap(mock_request, mock_user, None, None, None)
+    assert mock_collection.find.call_count == 4
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_db_query_error(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
+async def test_create_routemap_synced_during_the_query_is_not_cached(mock_request, mock_user, mock_collection):
+    routemap_cache = mock_request.app.state.strava_routemap_cache
+
+    async def read_then_sync():
+        # A sync stores a batch of the user while the activities are read
+        routemap_cache.invalidate(mock_user.id)
+        return make_activities()
+
+    mock_collection.find.return_value.to_list = AsyncMock(side_effect=read_then_sync)
+    result = await create_routemap(mock_request, mock_user, None, None, None)
+
+    assert result.routemap.points == EXPECTED_POINTS
+    assert routemap_cache.get(mock_user.id) is None
+
+    mock_collection.find.return_value.to_list = AsyncMock(side_effect=lambda: make_activities())
+    await create_routemap(mock_request, mock_user, None, None, None)
+    assert routemap_cache.get(mock_user.id) is not None
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_computes_missing_cells(mock_request, mock_user, mock_collection):
+    activities = make_activities()
+    del activities[1]["cells"]
+    mock_collection.find.return_value.to_list = AsyncMock(
+        side_effect=[activities, [{"id": "a2", "route": bytes(encode_route(WALK_ROUTE))}]]
+    )
+
+    result = await create_routemap(mock_request, mock_user, None, None, None)
+
+    assert mock_collection.find.call_args_list[1].args[0] == {"id": {"$in": ["a2"]}}
+    assert result.routemap.points == EXPECTED_POINTS
+    updates = mock_collection.bulk_write.call_args.args[0]
+    assert len(updates) == 1
+    assert updates[0]._filter == {"id": "a2"}
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_simplified(mock_request, mock_user, mock_collection):
+    mock_collection.find.return_value.to_list = AsyncMock(
+        side_effect=lambda: with_routes(make_activities())
+    )
+
+    result = await create_routemap(
+        mock_request, mock_user, None, None, None, tolerance=1000, method=StravaSimplifyMethod.DOUGLAS_PEUCKER
+    )
+
+    assert mock_collection.find.call_args.kwargs == {"projection": SIMPLIFIED_ROUTEMAP_PROJECTION}
+    # The middle of the straight run is dropped, the detour of the walk is kept
+    assert result.routemap.points == EXPECTED_POINTS
+    assert result.simplification.original_points == 6
+    assert result.simplification.simplified_points == 5
+    assert result.simplification.reduction == pytest.approx(1 / 6, abs=1e-4)
+    mock_collection.bulk_write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_simplified_is_cached_per_tolerance(mock_request, mock_user, mock_collection):
+    mock_collection.find.return_value.to_list = AsyncMock(
+        side_effect=lambda: with_routes(make_activities())
+    )
+
+    await create_routemap(mock_request, mock_user, None, None, None, tolerance=1000)
+    cached = await create_routemap(mock_request, mock_user, None, None, None, tolerance=1000)
+    assert mock_collection.find.call_count == 1
+    assert cached.simplification.simplified_points == 5
+
+    await create_routemap(mock_request, mock_user, None, None, None, tolerance=1)
+    await create_routemap(
+        mock_request, mock_user, None, None, None, tolerance=1000, method=StravaSimplifyMethod.VISVALINGAM_WHYATT
+    )
+    assert mock_collection.find.call_count == 3
+
+    mock_request.app.state.strava_routemap_cache.invalidate(mock_user.id)
+    await create_routemap(mock_request, mock_user, None, None, None, tolerance=1000)
+    assert mock_collection.find.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_binary_simplified(mock_request, mock_user, mock_collection):
+    mock_collection.find.return_value.to_list = AsyncMock(
+        side_effect=lambda: with_routes(make_activities())
+    )
+
+    response = await create_routemap_binary(mock_request, mock_user, None, None, None, tolerance=1000)
+
+    assert response.headers["X-Routemap-Count"] == "3"
+    assert response.headers["X-Route-Points"] == "6"
+    assert response.headers["X-Route-Points-Simplified"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_bbox(mock_request, mock_user, mock_collection):
+    bbox = BoundingBoxQuery(south=51.2, west=-0.3, north=51.4, east=-0.2)
+
+    result = await create_routemap(mock_request, mock_user, None, None, None, bbox=bbox)
+
+    filter_query = mock_collection.find.call_args.args[0]
+    assert filter_query["bbox"] == bbox.to_filter("bbox", intersects=True)["bbox"]
+    # The walk crosses the box, its points outside of it are dropped
+    assert result.routemap.points == {(51.2346, -0.2346)}
+    assert result.activity_count == 2
+
+    # Routemaps of a bounding box are not cached
+    await create_routemap(mock_request, mock_user, None, None, None, bbox=bbox)
+    assert mock_collection.find.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_db_query_error(mock_request, mock_user, mock_collection):
     before = datetime(2024, 1, 1)
     after = datetime(2023, 1, 1)
-    types = None
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
     mock_collection.find.return_value.to_list = AsyncMock(
         side_effect=Exception("query error")
     )
-    mock_mongo.return_value = mock_client
 
     from app.common.responses import InternalServerErrorException
 
     with pytest.raises(InternalServerErrorException) as exc:
-        await create_routemap(mock_request, mock_user, before, after, types)
+        await create_routemap(mock_request, mock_user, before, after, None)
     assert "Could not create routemap" in str(exc.value.detail)
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.create_routemap.AsyncMongoClient")
-@patch("app.modules.strava.create_routemap.generate_routemap", return_value=dummy_map)
-async def test_create_routemap_empty_response(
-    mock_generate_routemap, mock_mongo, mock_request, mock_user
-):
+async def test_create_routemap_empty_response(mock_request, mock_user, mock_collection):
     before = datetime(2024, 1, 1)
     after = datetime(2023, 1, 1)
-    types = None
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_collection = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-    mock_db.get_collection.return_value = mock_collection
     mock_collection.find.return_value.to_list = AsyncMock(return_value=[])
-    mock_mongo.return_value = mock_client
 
-    result = await create_routemap(mock_request, mock_user, before, after, types)
+    result = await create_routemap(mock_request, mock_user, before, after, None)
     assert result.routemap is None
     assert result.activity_count == 0
     assert result.types == []
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_binary(mock_request, mock_user):
+    after = datetime(2023, 1, 1)
+
+    response = await create_routemap_binary(mock_request, mock_user, None, after, None)
+
+    assert response.media_type == "application/octet-stream"
+    pairs = np.frombuffer(response.body, dtype="<i4").reshape(-1, 2)
+    scale = int(response.headers["X-Routemap-Scale"])
+    assert {(lat / scale, lng / scale) for lat, lng in pairs.tolist()} == EXPECTED_POINTS
+    assert response.headers["X-Routemap-Count"] == "3"
+    assert response.headers["X-Activity-Count"] == "2"
+    assert set(response.headers["X-Activity-Types"].split(",")) == {"Run", "Walk"}
+    assert response.headers["X-Routemap-After"] == after.isoformat()
+    assert "X-Routemap-Before" not in response.headers
+    # The metadata headers are readable by the browser apps
+    assert {h.lower() for h in response.headers if h.lower().startswith("x-")} <= {
+        h.lower() for h in expose_headers
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_routemap_binary_empty(mock_request, mock_user, mock_collection):
+    mock_collection.find.return_value.to_list = AsyncMock(return_value=[])
+
+    response = await create_routemap_binary(mock_request, mock_user, None, None, None)
+
+    assert response.body == b""
+    assert response.headers["X-Routemap-Count"] == "0"
+    assert response.headers["X-Activity-Count"] == "0"
+    assert "X-Route-Points" not in response.headers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "accept, format, binary",
+    [
+        ("application/json", None, False),
+        ("*/*", None, False),
+        ("application/octet-stream", None, True),
+        ("application/json", StravaRoutemapFormat.BINARY, True),
+        ("application/octet-stream", StravaRoutemapFormat.JSON, False),
+    ],
+)
+@patch("app.modules.strava.strava.create_routemap_binary", new_callable=AsyncMock)
+@patch("app.modules.strava.strava.create_routemap", new_callable=AsyncMock)
+async def test_routemap_format_negotiation(
+    mock_create_routemap, mock_create_routemap_binary, mock_request, mock_user, accept, format, binary
+):
+    mock_request.headers = {"accept": accept}
+
+    await get_create_routemap(mock_request, mock_user, format=format)
+
+    assert mock_create_routemap_binary.called is binary
+    assert mock_create_routemap.called is not binary
@@ -0,0 +1,99 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from app.common.responses import InternalServerErrorException, NotFoundException
+from app.modules.strava.get_activity_route import get_activity_route
+from app.modules.strava.route_codec import encode_route
+from app.modules.strava.strava_types import StravaSimplifyMethod
+
+ROUTE = [[47.5, 19.05], [47.5001, 19.05], [47.5002, 19.05], [47.5003, 19.0501], [47.5004, 19.05]]
+
+
+def make_activity():
+    return {
+        "id": "a1",
+        "strava_id": 123,
+        "user_id": "user123",
+        "name": "Morning Run",
+        "type": "Run",
+        "start_date": datetime(2024, 5, 1, 8),
+        "distance": 44.5,
+        "route": bytes(encode_route(ROUTE)),
+    }
+
+
+@pytest.fixture
+def mock_collection():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(side_effect=lambda *args, **kwargs: make_activity())
+    return collection
+
+
+@pytest.fixture
+def mock_request(mock_collection):
+    req = MagicMock()
+    req.app.state.logger = MagicMock()
+    req.app.state.strava_db.get_collection.return_value = mock_collection
+    return req
+
+
+@pytest.fixture
+def mock_user():
+    user = MagicMock()
+    user.id = "user123"
+    return user
+
+
+@pytest.mark.asyncio
+async def test_get_activity_route(mock_request, mock_user, mock_collection):
+    result = await get_activity_route(mock_request, mock_user, 123)
+
+    mock_collection.find_one.assert_called_once_with(
+        {"user_id": "user123", "strava_id": 123}, projection={"_id": 0, "cells": 0}
+    )
+    assert result.strava_id == 123
+    assert result.name == "Morning Run"
+    assert result.route == [tuple(point) for point in ROUTE]
+    assert result.simplification is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "method, tolerance, kept",
+    [
+        # The fourth point is 7.5 m off the line of the others
+        (StravaSimplifyMethod.DOUGLAS_PEUCKER, 5, [0, 3, 4]),
+        (StravaSimplifyMethod.DOUGLAS_PEUCKER, 10, [0, 4]),
+        # Its triangles with the points around it are about 40 and 80 m², then 170 m² once they are dropped
+        (StravaSimplifyMethod.VISVALINGAM_WHYATT, 5, [0, 2, 3, 4]),
+        (StravaSimplifyMethod.VISVALINGAM_WHYATT, 10, [0, 3, 4]),
+        (StravaSimplifyMethod.VISVALINGAM_WHYATT, 15, [0, 4]),
+    ],
+)
+async def test_get_activity_route_simplified(mock_request, mock_user, method, tolerance, kept):
+    result = await get_activity_route(mock_request, mock_user, 123, tolerance=tolerance, method=method)
+
+    assert result.route == [tuple(ROUTE[i]) for i in kept]
+    assert result.simplification.method == method
+    assert result.simplification.tolerance == tolerance
+    assert result.simplification.original_points == 5
+    assert result.simplification.simplified_points == len(kept)
+    assert result.simplification.reduction == pytest.approx(1 - len(kept) / 5)
+
+
+@pytest.mark.asyncio
+async def test_get_activity_route_not_found(mock_request, mock_user, mock_collection):
+    mock_collection.find_one = AsyncMock(return_value=None)
+
+    with pytest.raises(NotFoundException):
+        await get_activity_route(mock_request, mock_user, 456)
+
+
+@pytest.mark.asyncio
+async def test_get_activity_route_db_error(mock_request, mock_user, mock_collection):
+    mock_collection.find_one = AsyncMock(side_effect=Exception("DB error"))
+
+    with pytest.raises(InternalServerErrorException) as exc:
+        await get_activity_route(mock_request, mock_user, 123)
+    assert "Could not fetch activity route" in str(exc.value.detail)
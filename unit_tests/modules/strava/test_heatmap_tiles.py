@@ -0,0 +1,279 @@
+import asyncio
+import struct
+import zlib
+import numpy as np
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from app.common.responses import NotFoundException
+from app.modules.strava.heatmap_tiles import (
+    MAX_TILE_ZOOM,
+    TILE_CACHE_CONTROL,
+    TILE_SIZE,
+    StravaHeatmapTiles,
+    bin_tile,
+    date_buckets,
+    encode_png,
+    etag_matches,
+    get_heatmap_tile,
+    heat_to_rgba,
+    to_world_pixels,
+)
+from app.modules.strava.route_codec import encode_cells
+from app.modules.strava.strava_types import StravaTileFormat
+from app.modules.strava.strava_utils import route_cells
+
+RUN_ROUTE = [[47.49, 19.04], [47.495, 19.045], [47.5, 19.05], [47.505, 19.055]]
+RIDE_ROUTE = [[47.0, 19.0], [47.5, 19.05], [47.505, 19.055]]
+# Budapest at zoom 10
+TILE = (10, 566, 358)
+
+
+def make_activities():
+    return [
+        {"id": "a1", "user_id": "user123", "type": "Run", "cells": encode_cells(route_cells(RUN_ROUTE))},
+        {"id": "a2", "user_id": "user123", "type": "Ride", "cells": encode_cells(route_cells(RIDE_ROUTE))},
+    ]
+
+
+def sorted_pixels(route):
+    xs, ys = to_world_pixels(route_cells(route))
+    order = np.argsort(ys, kind="stable")
+    return xs[order], ys[order]
+
+
+@pytest.fixture
+def mock_collection():
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(side_effect=lambda: make_activities())
+    collection.bulk_write = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def mock_db(mock_collection):
+    db = MagicMock()
+    db.get_collection.return_value = mock_collection
+    return db
+
+
+@pytest.fixture
+def heatmap_tiles():
+    return StravaHeatmapTiles(MagicMock())
+
+
+@pytest.fixture
+def mock_request(mock_db, heatmap_tiles):
+    req = MagicMock()
+    req.headers = {}
+    req.app.state.logger = MagicMock()
+    req.app.state.strava_db = mock_db
+    req.app.state.strava_heatmap_tiles = heatmap_tiles
+    return req
+
+
+@pytest.fixture
+def mock_user():
+    user = MagicMock()
+    user.id = "user123"
+    return user
+
+
+def test_to_world_pixels():
+    cells = route_cells([[0.0, 0.0], [0.0, 0.0], [0.0, -180.0], [85.1, 179.9999]])
+    xs, ys = to_world_pixels(cells)
+    world = 1 << (MAX_TILE_ZOOM + 8)
+    # Sorted cells: (0, -180), (0, 0), (85.1, 179.9999) clipped to the top of the map
+    assert xs.tolist()[:2] == [0, world // 2]
+    assert world - 32 < xs[2] < world
+    assert ys.tolist() == [world // 2, world // 2, 0]
+    assert xs.dtype == np.uint32
+
+
+def test_bin_tile_counts_points_of_the_tile():
+    xs, ys = sorted_pixels(RUN_ROUTE)
+    counts = bin_tile(xs, ys, *TILE)
+    assert counts.shape == (TILE_SIZE, TILE_SIZE)
+    assert counts.dtype == np.uint32
+    assert counts.sum() == len(RUN_ROUTE) - 1
+    # The whole world at zoom 0 has every point, a neighbouring tile has none
+    assert bin_tile(xs, ys, 0, 0, 0).sum() == len(RUN_ROUTE) - 1
+    z, x, y = TILE
+    assert bin_tile(xs, ys, z, x + 1, y).sum() == 0
+    assert bin_tile(xs, ys, z, x, y + 1).sum() == 0
+
+
+def test_bin_tile_max_zoom_is_one_point_per_pixel():
+    xs, ys = sorted_pixels([[0.0, 0.0], [47.5, 19.05]])
+    x, y = int(xs[0]) // TILE_SIZE, int(ys[0]) // TILE_SIZE
+    counts = bin_tile(xs, ys, MAX_TILE_ZOOM, x, y)
+    assert counts[int(ys[0]) % TILE_SIZE, int(xs[0]) % TILE_SIZE] == 1
+    assert counts.sum() == 1
+
+
+def test_heat_to_rgba_is_transparent_without_points():
+    counts = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint32)
+    counts[0, 0] = 1
+    counts[1, 1] = 1000
+    rgba = heat_to_rgba(counts, *TILE[::2])
+    assert rgba.shape == (TILE_SIZE, TILE_SIZE, 4)
+    assert rgba[2, 2, 3] == 0
+    assert 0 < rgba[0, 0, 3] < rgba[1, 1, 3] == 255
+
+
+def test_encode_png():
+    rgba = np.arange(4 * 3 * 4, dtype=np.uint8).reshape(3, 4, 4)
+    png = encode_png(rgba)
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    assert struct.unpack(">II", png[16:24]) == (4, 3)
+    idat_length = struct.unpack(">I", png[33:37])[0]
+    assert png[37:41] == b"IDAT"
+    rows = np.frombuffer(zlib.decompress(png[41 : 41 + idat_length]), dtype=np.uint8).reshape(3, 17)
+    assert (rows[:, 0] == 0).all()
+    assert (rows[:, 1:].reshape(3, 4, 4) == rgba).all()
+    assert png.endswith(b"IEND\xaeB`\x82")
+
+
+def test_date_buckets():
+    after, before = date_buckets(datetime(2024, 1, 1, 10, 30), datetime(2024, 2, 1, 8))
+    assert after == datetime(2024, 1, 1)
+    assert before == datetime(2024, 2, 1, 23, 59, 59, 999999)
+    assert date_buckets(None, None) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_get_tile_caches_tiles_and_views(heatmap_tiles, mock_db, mock_collection):
+    z, x, y = TILE
+    raw = await heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x, y, StravaTileFormat.RAW)
+    again = await heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x, y, StravaTileFormat.RAW)
+    await heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x + 1, y, StravaTileFormat.RAW)
+
+    assert again is raw
+    assert len(raw) == TILE_SIZE * TILE_SIZE * 4
+    assert heatmap_tiles.tile_hits == 1
+    assert heatmap_tiles.tiles_rendered == 2
+    assert heatmap_tiles.views_loaded == 1
+    mock_collection.find.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_tile_concurrent_tiles_share_the_view(heatmap_tiles, mock_db, mock_collection):
+    z, x, y = TILE
+    await asyncio.gather(
+        *[
+            heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x + dx, y, StravaTileFormat.PNG)
+            for dx in range(4)
+        ]
+    )
+    assert heatmap_tiles.views_loaded == 1
+    assert heatmap_tiles.tiles_rendered == 4
+    mock_collection.find.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_tile_counts_overlapping_activities(heatmap_tiles, mock_db):
+    z, x, y = TILE
+    raw = await heatmap_tiles.get_tile(
+        mock_db, "user123", ["Run", "Ride"], None, None, z, x, y, StravaTileFormat.RAW
+    )
+    counts = np.frombuffer(raw, dtype="<u4")
+    # The cells shared by both activities are counted twice
+    assert counts.sum() == len(route_cells(RUN_ROUTE)) + len(route_cells(RIDE_ROUTE))
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reloads_the_view(heatmap_tiles, mock_db, mock_collection):
+    z, x, y = TILE
+    await heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x, y, StravaTileFormat.PNG)
+    heatmap_tiles.invalidate("user123")
+    await heatmap_tiles.get_tile(mock_db, "user123", ["Run"], None, None, z, x, y, StravaTileFormat.PNG)
+
+    assert heatmap_tiles.tile_hits == 0
+    assert heatmap_tiles.views_loaded == 2
+    assert mock_collection.find.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_png(mock_request, mock_user, mock_collection):
+    response = await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+
+    assert response.media_type == "image/png"
+    assert response.body.startswith(b"\x89PNG")
+    assert response.headers["Cache-Control"] == TILE_CACHE_CONTROL == "private, no-cache"
+    assert response.headers["ETag"].startswith('"')
+    filter_query = mock_collection.find.call_args[0][0]
+    assert set(filter_query["type"]["$in"]) == {"Walk", "Run", "Ride"}
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_raw(mock_request, mock_user):
+    response = await get_heatmap_tile(
+        mock_request, mock_user, *TILE, before=None, after=None, tile_format=StravaTileFormat.RAW
+    )
+
+    assert response.media_type == "application/octet-stream"
+    assert response.headers["X-Tile-Size"] == str(TILE_SIZE)
+    assert len(response.body) == TILE_SIZE * TILE_SIZE * 4
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_not_modified(mock_request, mock_user, mock_collection, heatmap_tiles):
+    response = await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+    etag = response.headers["ETag"]
+
+    mock_request.headers = {"if-none-match": f"W/{etag}"}
+    not_modified = await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert not_modified.headers["ETag"] == etag
+    assert heatmap_tiles.tile_hits == 0
+    mock_collection.find.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_etag_changes_after_sync(mock_request, mock_user, heatmap_tiles):
+    response = await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+    etag = response.headers["ETag"]
+    heatmap_tiles.invalidate("user123")
+
+    mock_request.headers = {"if-none-match": etag}
+    response = await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.body.startswith(b"\x89PNG")
+
+
+def test_tile_etag_depends_on_the_tile_and_the_process(heatmap_tiles):
+    z, x, y = TILE
+    etag = heatmap_tiles.tile_etag("user123", ["Run"], None, None, z, x, y, StravaTileFormat.PNG)
+
+    assert heatmap_tiles.tile_etag("user123", ["Run"], None, None, z, x, y, StravaTileFormat.PNG) == etag
+    assert heatmap_tiles.tile_etag("user123", ["Run"], None, None, z, x, y, StravaTileFormat.RAW) != etag
+    assert heatmap_tiles.tile_etag("other", ["Run"], None, None, z, x, y, StravaTileFormat.PNG) != etag
+    restarted = StravaHeatmapTiles(MagicMock())
+    assert restarted.tile_etag("user123", ["Run"], None, None, z, x, y, StravaTileFormat.PNG) != etag
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"x"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_out_of_range(mock_request, mock_user):
+    with pytest.raises(NotFoundException):
+        await get_heatmap_tile(mock_request, mock_user, 2, 4, 0, before=None, after=None)
+
+
+@pytest.mark.asyncio
+async def test_get_heatmap_tile_db_error(mock_request, mock_user, mock_collection):
+    mock_collection.find.return_value.to_list = AsyncMock(side_effect=Exception("DB error"))
+    with pytest.raises(Exception) as exc:
+        await get_heatmap_tile(mock_request, mock_user, *TILE, before=None, after=None)
+    assert "Could not create heatmap tile" in str(exc.value.detail)
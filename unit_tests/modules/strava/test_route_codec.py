@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from bson import BSON, Binary
+
+from app.modules.strava.route_codec import decode_cells, decode_route, encode_cells, encode_route
+
+ROUTE = [
+    [47.497912, 19.040235],
+    [47.497999, 19.040111],
+    [47.498101, 19.039987],
+    [47.498250, 19.039800],
+]
+
+
+def test_round_trip_is_lossless_at_strava_precision():
+    encoded = encode_route(ROUTE)
+
+    assert isinstance(encoded, Binary)
+    assert decode_route(bytes(encoded)).tolist() == ROUTE
+
+
+def test_small_deltas_use_two_bytes_per_coordinate():
+    encoded = encode_route(ROUTE)
+
+    assert encoded[1] == 2
+    assert len(encoded) == 2 + 8 + 3 * 4
+
+
+def test_large_deltas_use_four_bytes_per_coordinate():
+    route = [[47.497912, 19.040235], [-33.868820, 151.209296], [47.497912, 19.040235]]
+    encoded = encode_route(route)
+
+    assert encoded[1] == 4
+    assert decode_route(bytes(encoded)).tolist() == route
+
+
+def test_single_point_and_empty_routes():
+    assert decode_route(bytes(encode_route([[1.5, -2.5]]))).tolist() == [[1.5, -2.5]]
+    assert decode_route([]).shape == (0, 2)
+    assert decode_route(None).shape == (0, 2)
+
+
+def test_decodes_routes_stored_as_arrays():
+    assert decode_route(ROUTE).tolist() == ROUTE
+
+
+def test_round_trip_through_bson():
+    doc = BSON.encode({"route": encode_route(ROUTE)})
+
+    assert np.array_equal(decode_route(BSON(doc).decode()["route"]), np.array(ROUTE))
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError, match="Unknown route format"):
+        decode_route(b"\x07\x02" + bytes(8))
+
+
+def test_cells_round_trip():
+    cells = np.array([3, 1 << 40, (1 << 62) + 5], dtype=np.int64)
+    encoded = encode_cells(cells)
+
+    assert len(encoded) == 3 * 8
+    assert decode_cells(bytes(encoded)).tolist() == cells.tolist()
+    assert decode_cells(b"").tolist() == []
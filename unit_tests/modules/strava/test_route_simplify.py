@@ -0,0 +1,100 @@
+import math
+import numpy as np
+import pytest
+
+from app.modules.strava.route_simplify import (
+    douglas_peucker,
+    simplification_stats,
+    simplify_route,
+    to_local_meters,
+    visvalingam_whyatt,
+)
+from app.modules.strava.strava_types import StravaSimplifyMethod
+
+# One metre in degrees of latitude
+METRE = 1 / 111_195
+
+
+def zigzag(points: int, offset_m: float) -> np.ndarray:
+    """A route north along a meridian every 10 m, every other point `offset_m` metres east."""
+    lat0, lng0 = 47.5, 19.05
+    lng_metre = METRE / math.cos(math.radians(lat0))
+    return np.array(
+        [[lat0 + i * 10 * METRE, lng0 + (i % 2) * offset_m * lng_metre] for i in range(points)]
+    )
+
+
+def test_to_local_meters():
+    xy = to_local_meters(np.array([[47.5, 19.05], [47.5 + 100 * METRE, 19.05]]))
+    assert xy[1, 1] - xy[0, 1] == pytest.approx(100, rel=1e-3)
+    assert xy[1, 0] - xy[0, 0] == pytest.approx(0)
+
+
+@pytest.mark.parametrize("simplify", [douglas_peucker, visvalingam_whyatt])
+def test_straight_line_keeps_the_ends(simplify):
+    route = zigzag(50, 0)
+    assert simplify(route, 1.0).tolist() == [0, 49]
+
+
+@pytest.mark.parametrize("simplify", [douglas_peucker, visvalingam_whyatt])
+def test_short_routes_are_kept(simplify):
+    assert simplify(np.empty((0, 2)), 5.0).tolist() == []
+    assert simplify(zigzag(2, 3), 5.0).tolist() == [0, 1]
+
+
+def test_douglas_peucker_keeps_points_beyond_the_tolerance():
+    route = zigzag(21, 5)
+    assert douglas_peucker(route, 10.0).tolist() == [0, 20]
+    assert douglas_peucker(route, 2.0).tolist() == list(range(21))
+
+
+def test_douglas_peucker_is_within_the_tolerance():
+    rng = np.random.default_rng(1)
+    route = np.cumsum(rng.normal(0, 5 * METRE, size=(500, 2)), axis=0) + (47.5, 19.05)
+    kept = douglas_peucker(route, 8.0)
+    xy = to_local_meters(route)
+    for first, last in zip(kept[:-1], kept[1:]):
+        segment = xy[last] - xy[first]
+        for point in xy[first + 1 : last]:
+            t = np.clip((point - xy[first]) @ segment / (segment @ segment), 0, 1)
+            assert np.hypot(*(point - xy[first] - t * segment)) <= 8.0
+
+
+def test_douglas_peucker_closed_loop():
+    # Starts and ends at the same point, the farthest point from the start is kept
+    route = np.array([[47.5, 19.05], [47.5 + 100 * METRE, 19.05], [47.5 + 50 * METRE, 19.05], [47.5, 19.05]])
+    assert douglas_peucker(route, 10.0).tolist() == [0, 1, 3]
+
+
+def test_visvalingam_whyatt_drops_the_smallest_areas():
+    # The 1 m bump makes a 10 m² triangle, the 20 m one a 200 m² triangle
+    route = zigzag(3, 1).tolist() + [[47.5 + 30 * METRE, 19.05 + 20 * METRE / math.cos(math.radians(47.5))]]
+    route.append([47.5 + 40 * METRE, 19.05])
+    route = np.array(route)
+    assert visvalingam_whyatt(route, 5.0).tolist() == [0, 2, 3, 4]
+    assert visvalingam_whyatt(route, 3.0).tolist() == [0, 1, 2, 3, 4]
+    assert visvalingam_whyatt(route, 15.0).tolist() == [0, 4]
+
+
+@pytest.mark.parametrize("method", list(StravaSimplifyMethod))
+def test_simplify_route_fewer_points_with_larger_tolerance(method):
+    rng = np.random.default_rng(2)
+    route = np.cumsum(rng.normal(0, 5 * METRE, size=(1000, 2)), axis=0) + (47.5, 19.05)
+    sizes = [len(simplify_route(route, tolerance, method)) for tolerance in (1, 5, 20, 100)]
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[0] < len(route)
+    simplified = simplify_route(route, 5, method)
+    assert (simplified[[0, -1]] == route[[0, -1]]).all()
+
+
+def test_simplification_stats():
+    stats = simplification_stats(StravaSimplifyMethod.VISVALINGAM_WHYATT, 5.0, 1000, 125)
+    assert stats.reduction == 0.875
+    assert stats.model_dump(by_alias=True) == {
+        "method": StravaSimplifyMethod.VISVALINGAM_WHYATT,
+        "tolerance": 5.0,
+        "originalPoints": 1000,
+        "simplifiedPoints": 125,
+        "reduction": 0.875,
+    }
+    assert simplification_stats(StravaSimplifyMethod.DOUGLAS_PEUCKER, 5.0, 0, 0).reduction == 0.0
@@ -1,6 +1,8 @@
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 from app.modules.strava.strava_api import StravaApi
+from app.modules.strava.strava_rate_limiter import StravaRateLimiter, StravaRateLimitExceeded
 
 
 @pytest.fixture
@@ -83,3 +85,57 @@ async def test__get_request_http_error(mock_async_client, strava_api, logger):
         with pytest.raises(Exception, match="error"):
             await strava_api._get_request("/athlete")
             logger.error.assert_called()
+
+
+class TestLatlngStreamsWithRateLimits:
+    @pytest_asyncio.fixture
+    async def api(self, logger, fake_clock, strava_stand_in):
+        rate_limiter = StravaRateLimiter(logger, clock=fake_clock, sleep=fake_clock.sleep)
+        async with strava_stand_in.client() as http_client:
+            yield StravaApi(
+                access_token="dummy_token",
+                logger=logger,
+                http_client=http_client,
+                rate_limiter=rate_limiter,
+                base_url="http://strava.test/api/v3",
+            )
+
+    @pytest.mark.asyncio
+    async def test_streams_are_fetched_concurrently_in_order_within_limits(
+        self, api, strava_stand_in, fake_clock
+    ):
+        strava_stand_in.short_term_limit = 20
+        strava_stand_in.streams = {i: [[float(i), float(i)]] for i in range(50)}
+
+        results = [item async for item in api.iter_latlng_streams(list(range(50)), concurrency=4)]
+
+        assert [activity_id for activity_id, _ in results] == list(range(50))
+        assert results[7][1] == {"latlng": {"data": [[7.0, 7.0]]}}
+        assert 1 < strava_stand_in.max_in_flight <= 4
+        assert strava_stand_in.rejected == 0
+        # 15 requests per window, keeping a reserve of 5 below Strava's limit of 20
+        assert api.rate_limiter.pauses == 3
+        assert len(fake_clock.slept) == 3
+
+    @pytest.mark.asyncio
+    async def test_refused_request_is_retried_in_the_next_window(self, api, strava_stand_in):
+        # Another client of the same application used up the window
+        strava_stand_in.short_term_usage = 100
+        strava_stand_in.streams = {1: [[1.0, 2.0]]}
+
+        result = await api.get_activity_latlng_stream(activity_id=1)
+
+        assert result == {"latlng": {"data": [[1.0, 2.0]]}}
+        assert strava_stand_in.rejected == 1
+        assert api.rate_limiter.pauses == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_cancels_the_others(self, api, strava_stand_in):
+        api.rate_limiter.max_wait_seconds = 0
+        strava_stand_in.short_term_limit = 10
+
+        with pytest.raises(StravaRateLimitExceeded):
+            async for _ in api.iter_latlng_streams(list(range(20)), concurrency=4):
+                pass
+
+        assert strava_stand_in.rejected == 0
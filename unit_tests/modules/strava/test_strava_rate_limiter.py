@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.modules.strava.strava_rate_limiter import StravaRateLimiter, StravaRateLimitExceeded
+
+
+@pytest.fixture
+def clock(fake_clock):
+    # 100 seconds into a 15 minute window
+    assert fake_clock.now % (15 * 60) == 100
+    return fake_clock
+
+
+def make_limiter(clock, **kwargs) -> StravaRateLimiter:
+    return StravaRateLimiter(MagicMock(), clock=clock, sleep=clock.sleep, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_pauses_until_the_next_window_near_the_limit(clock):
+    limiter = make_limiter(clock, short_term_limit=10, short_term_reserve=2)
+
+    for _ in range(8):
+        await limiter.acquire()
+    assert clock.slept == []
+
+    await limiter.acquire()
+
+    assert clock.slept == [800.0]
+    assert (limiter.short_term_usage, limiter.daily_usage, limiter.pauses) == (1, 9, 1)
+
+
+@pytest.mark.asyncio
+async def test_usage_and_limits_are_updated_from_headers(clock):
+    limiter = make_limiter(clock)
+    await limiter.acquire()
+
+    limiter.update({"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "50,700"})
+    # Responses of concurrent requests arrive out of order, usage never goes back
+    limiter.update({"X-RateLimit-Usage": "40,650"})
+    limiter.update({"X-RateLimit-Usage": "not,numbers"})
+
+    assert (limiter.short_term_limit, limiter.daily_limit) == (200, 2000)
+    assert (limiter.short_term_usage, limiter.daily_usage) == (50, 700)
+
+
+@pytest.mark.asyncio
+async def test_daily_limit_raises(clock):
+    limiter = make_limiter(clock, daily_reserve=20)
+    limiter.update({"X-RateLimit-Usage": "10,980"})
+
+    with pytest.raises(StravaRateLimitExceeded, match="daily"):
+        await limiter.acquire()
+    assert clock.slept == []
+
+
+@pytest.mark.asyncio
+async def test_wait_longer_than_allowed_raises(clock):
+    limiter = make_limiter(clock, max_wait_seconds=60)
+    limiter.mark_exhausted()
+
+    with pytest.raises(StravaRateLimitExceeded, match="resets in 800 seconds"):
+        await limiter.acquire()
+
+
+@pytest.mark.asyncio
+async def test_windows_reset_with_time(clock):
+    limiter = make_limiter(clock)
+    limiter.update({"X-RateLimit-Usage": "90,500"})
+
+    clock.now += 24 * 60 * 60
+    await limiter.acquire()
+
+    assert (limiter.short_term_usage, limiter.daily_usage) == (1, 1)
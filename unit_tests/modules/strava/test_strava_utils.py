@@ -1,6 +1,18 @@
+import random
 import pytest
 from unittest.mock import MagicMock
-from app.modules.strava.strava_utils import generate_routemap
+from app.modules.strava.route_codec import encode_cells, encode_route
+from app.common.geo import BoundingBoxQuery
+from app.modules.strava.strava_utils import (
+    activity_cells,
+    cells_to_grid,
+    clip_cells,
+    generate_routemap,
+    generate_routemap_per_point,
+    route_bbox,
+    route_cells,
+    route_start_point,
+)
 from app.modules.strava.strava_types import StravaRoutemap
 
 
@@ -106,3 +118,101 @@ class TestGenerateRoutemap:
         assert result.count == 0
         assert result.points == set()
         mock_logger.info.assert_any_call("Generated routemap with 0 unique points.")
+
+    def test_generate_routemap_encoded_routes(self, mock_logger, sample_activities):
+        # Routes stored in the binary form give the same routemap as the not yet migrated arrays
+        encoded = [
+            {**activity, "route": bytes(encode_route(activity["route"]))}
+            for activity in sample_activities
+        ]
+        result = generate_routemap(encoded, logger=mock_logger, sampling_rate=1)
+        expected = generate_routemap(sample_activities, logger=mock_logger, sampling_rate=1)
+        assert result.points == expected.points
+        assert result.count == 6
+
+    @pytest.mark.parametrize("sampling_rate", [1, 2, 5])
+    def test_generate_routemap_matches_per_point(self, mock_logger, sampling_rate):
+        rng = random.Random(sampling_rate)
+        activities = [
+            {
+                "strava_id": i,
+                "route": [
+                    [round(rng.uniform(-90, 90), 6), round(rng.uniform(-180, 180), 7)]
+                    for _ in range(rng.randint(0, 200))
+                ],
+            }
+            for i in range(50)
+        ]
+        # Values exactly between two grid points, rounded by their binary representation
+        activities.append(
+            {"strava_id": 50, "route": [[i / 1e4 + 0.00005, -(i / 1e4 + 0.00005)] for i in range(500)]}
+        )
+
+        result = generate_routemap(activities, logger=mock_logger, sampling_rate=sampling_rate)
+        expected = generate_routemap_per_point(
+            activities, logger=mock_logger, sampling_rate=sampling_rate
+        )
+        assert result.points == expected.points
+        assert result.count == expected.count
+
+    def test_generate_routemap_precomputed_cells(self, mock_logger, sample_activities):
+        # Only the precomputed cells are used with a sampling rate of 1, the routes otherwise
+        with_cells = [
+            {"strava_id": a["strava_id"], "route": None, "cells": encode_cells(route_cells(a["route"]))}
+            for a in sample_activities
+        ]
+        result = generate_routemap(with_cells, logger=mock_logger, sampling_rate=1)
+        expected = generate_routemap(sample_activities, logger=mock_logger, sampling_rate=1)
+        assert result.points == expected.points
+
+
+class TestRouteCells:
+    def test_route_cells_are_sorted_and_distinct(self):
+        route = [[0.0, 0.0], [51.23456, -0.23456], [51.2346, -0.2346], [10.0, 20.0]]
+        cells = route_cells(route)
+        assert len(cells) == 2
+        assert cells.tolist() == sorted(cells.tolist())
+
+    def test_route_cells_of_empty_routes(self):
+        assert route_cells(None).tolist() == []
+        assert route_cells([[1.0, 2.0]]).tolist() == []
+
+    def test_activity_cells_prefers_precomputed(self):
+        route = [[0.0, 0.0], [1.0, 2.0], [3.0, 4.0]]
+        activity = {"route": route, "cells": encode_cells(route_cells(route)[:1])}
+        assert len(activity_cells(activity)) == 1
+        assert len(activity_cells(activity, sampling_rate=2)) == 1
+        assert len(activity_cells({"route": route})) == 2
+
+
+class TestRouteGeometry:
+    def test_route_bbox_is_a_closed_lng_lat_polygon(self):
+        route = encode_route([[47.5, 19.05], [47.52, 19.01], [47.49, 19.08]])
+        assert route_bbox(route) == {
+            "type": "Polygon",
+            "coordinates": [[[19.01, 47.49], [19.08, 47.49], [19.08, 47.52], [19.01, 47.52], [19.01, 47.49]]],
+        }
+
+    def test_route_bbox_of_a_flat_route_has_an_area(self):
+        ring = route_bbox([[47.5, 19.05], [47.6, 19.05]])["coordinates"][0]
+        west, south = ring[0]
+        east, north = ring[2]
+        assert north > south and east > west
+
+    def test_route_start_point(self):
+        assert route_start_point([[47.5, 19.05], [47.6, 19.1]]) == {
+            "type": "Point",
+            "coordinates": [19.05, 47.5],
+        }
+
+    def test_clip_cells(self):
+        route = [[0.0, 0.0], [47.5, 19.05], [47.55, 19.1], [47.6, 19.15], [48.0, 19.1]]
+        bbox = BoundingBoxQuery(south=47.5, west=19.0, north=47.58, east=19.12)
+        clipped = cells_to_grid(clip_cells(route_cells(route), bbox)).tolist()
+        assert clipped == [[475000, 190500], [475500, 191000]]
+
+    def test_clip_cells_across_the_antimeridian(self):
+        route = [[0.0, 0.0], [10.0, 179.5], [10.0, -179.5], [10.0, 170.0]]
+        bbox = BoundingBoxQuery(south=0, west=175, north=20, east=-175)
+        clipped = cells_to_grid(clip_cells(route_cells(route), bbox))[:, 1].tolist()
+        assert sorted(clipped) == [-1795000, 1795000]
@@ -0,0 +1,405 @@
+import asyncio
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import DuplicateKeyError
+
+from app.common.db import StravaDbCollection
+from app.common.responses import InternalServerErrorException, NotFoundException
+from app.modules.strava.heatmap_tiles import StravaHeatmapTiles
+from app.modules.strava.routemap_cache import StravaRoutemapCache
+from app.modules.strava.strava_rate_limiter import StravaRateLimitExceeded
+from app.modules.strava.strava_types import StravaSyncJobStatus
+from app.modules.strava.sync_jobs import StravaSyncJobs, get_sync_job, start_sync_job
+
+USER_ID = "user123"
+
+
+class FakeJobsCollection:
+    """In-memory `sync_jobs` collection supporting the queries and updates used by the jobs."""
+
+    def __init__(self):
+        self.docs: list[dict] = []
+
+    def _match(self, doc: dict, query: dict) -> bool:
+        return all(doc.get(key) == value for key, value in query.items())
+
+    async def find_one(self, query, sort=None, projection=None):
+        docs = [doc for doc in self.docs if self._match(doc, query)]
+        if sort:
+            key, direction = sort[0]
+            docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return dict(docs[0]) if docs else None
+
+    def find(self, query, projection=None):
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(
+            return_value=[dict(doc) for doc in self.docs if self._match(doc, query)]
+        )
+        return cursor
+
+    async def insert_one(self, doc):
+        if doc.get("active") and any(
+            d["user_id"] == doc["user_id"] and d.get("active") for d in self.docs
+        ):
+            raise DuplicateKeyError("duplicate active job")
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self._apply(doc, update)
+                return
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self._apply(doc, update)
+                return dict(doc)
+        return None
+
+    @staticmethod
+    def _apply(doc: dict, update: dict) -> None:
+        doc.update(update.get("$set", {}))
+        for key in update.get("$unset", {}):
+            doc.pop(key, None)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        for key, match in update.get("$pull", {}).items():
+            (field, condition), = match.items()
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            doc[key] = [item for item in doc[key] if item[field] not in values]
+
+
+@pytest.fixture
+def jobs_collection():
+    return FakeJobsCollection()
+
+
+@pytest.fixture
+def activities_collection():
+    collection = MagicMock()
+    collection.count_documents = AsyncMock(return_value=7)
+    return collection
+
+
+@pytest.fixture
+def mock_db(jobs_collection, activities_collection):
+    db = MagicMock()
+    db.get_collection.side_effect = lambda name: (
+        jobs_collection if name == StravaDbCollection.SYNC_JOBS else activities_collection
+    )
+    return db
+
+
+@pytest.fixture
+def routemap_cache():
+    return StravaRoutemapCache()
+
+
+@pytest.fixture
+def heatmap_tiles():
+    return MagicMock(spec=StravaHeatmapTiles)
+
+
+@pytest.fixture
+def sync_jobs(mock_db, routemap_cache, heatmap_tiles):
+    return StravaSyncJobs(
+        mock_db,
+        MagicMock(),
+        MagicMock(),
+        MagicMock(),
+        routemap_cache=routemap_cache,
+        heatmap_tiles=heatmap_tiles,
+    )
+
+
+def planned(strava_id):
+    return {
+        "id": strava_id,
+        "name": "Run",
+        "start_date": "2024-05-01T08:00:00Z",
+        "distance": 1000,
+        "type": "Run",
+    }
+
+
+def fake_sync_activities(
+    fail_after: int | None = None, error: Exception | None = None, batch_size: int = 2, skipped=()
+):
+    """
+    Syncs the planned activities in batches like `sync_activities`, optionally raising after some of them.
+    Activities in `skipped` have no route.
+    """
+
+    async def sync(db, strava, user_id, activities, logger, on_progress):
+        checkpoints = []
+        for i, activity in enumerate(activities):
+            if fail_after is not None and i == fail_after:
+                if checkpoints:
+                    await on_progress(checkpoints)
+                raise error
+            checkpoints.append((activity["id"], activity["id"] not in skipped))
+            if len(checkpoints) == batch_size:
+                await on_progress(checkpoints)
+                checkpoints = []
+        if checkpoints:
+            await on_progress(checkpoints)
+        return len(activities)
+
+    return AsyncMock(side_effect=sync)
+
+
+async def wait_for(sync_jobs: StravaSyncJobs):
+    await asyncio.gather(*sync_jobs._tasks.values(), return_exceptions=True)
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.sync_activities", new_callable=fake_sync_activities)
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_start_runs_job_to_completion(
+    mock_plan_sync,
+    mock_sync_activities,
+    mock_strava_api,
+    sync_jobs,
+    jobs_collection,
+    routemap_cache,
+    heatmap_tiles,
+):
+    mock_plan_sync.return_value = [planned(1), planned(2)]
+    routemap_cache.set(USER_ID, (np.empty(0, dtype=np.int64), [], 0, None))
+
+    job = await sync_jobs.start(USER_ID, "token", force=True)
+    assert job.status == StravaSyncJobStatus.RUNNING
+    assert job.force is True
+    await wait_for(sync_jobs)
+
+    mock_strava_api.assert_called_once_with(
+        access_token="token",
+        logger=sync_jobs.logger,
+        http_client=sync_jobs.http_client,
+        rate_limiter=sync_jobs.rate_limiter,
+    )
+    assert mock_plan_sync.call_args.kwargs == {"force": True}
+    done = await sync_jobs.get(USER_ID, job.id)
+    assert done.status == StravaSyncJobStatus.COMPLETED
+    assert done.activities_to_sync == 2
+    assert done.activities_remaining == 0
+    assert done.routes_synced == 2
+    assert done.total_routes == 7
+    stored = jobs_collection.docs[0]
+    assert stored["active"] is False
+    assert "strava_token" not in stored
+    # The cached routemap and heatmap tiles of the user don't have the new activities
+    assert routemap_cache.get(USER_ID) is None
+    heatmap_tiles.invalidate.assert_called_with(USER_ID)
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_job_checkpoints_each_batch_with_one_update(
+    mock_plan_sync, mock_strava_api, sync_jobs, jobs_collection, heatmap_tiles
+):
+    mock_plan_sync.return_value = [planned(i) for i in range(1, 6)]
+    checkpoint_updates = []
+    update_one = jobs_collection.update_one
+
+    async def record_update(query, update):
+        if "$pull" in update:
+            checkpoint_updates.append(update)
+        await update_one(query, update)
+
+    jobs_collection.update_one = record_update
+    with patch(
+        "app.modules.strava.sync_jobs.sync_activities",
+        new=fake_sync_activities(batch_size=3, skipped={2, 4, 5}),
+    ):
+        job = await sync_jobs.start(USER_ID, "token")
+        await wait_for(sync_jobs)
+
+    assert [update["$pull"] for update in checkpoint_updates] == [
+        {"pending": {"id": {"$in": [1, 2, 3]}}},
+        {"pending": {"id": {"$in": [4, 5]}}},
+    ]
+    assert [update["$inc"] for update in checkpoint_updates] == [
+        {"routes_synced": 2},
+        {"routes_synced": 0},
+    ]
+    # Batches without new routes keep the cached routemap and heatmap tiles
+    heatmap_tiles.invalidate.assert_called_once_with(USER_ID)
+    done = await sync_jobs.get(USER_ID, job.id)
+    assert done.activities_remaining == 0
+    assert done.routes_synced == 2
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_start_attaches_to_active_job(mock_plan_sync, mock_strava_api, sync_jobs, jobs_collection):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_plan(*args, **kwargs):
+        started.set()
+        await release.wait()
+        return []
+
+    mock_plan_sync.side_effect = slow_plan
+
+    first, second = await asyncio.gather(
+        sync_jobs.start(USER_ID, "token-1"), sync_jobs.start(USER_ID, "token-2")
+    )
+    await started.wait()
+
+    assert first.id == second.id
+    assert len(jobs_collection.docs) == 1
+    assert jobs_collection.docs[0]["strava_token"] == "token-2"
+    release.set()
+    await wait_for(sync_jobs)
+    assert mock_plan_sync.await_count == 1
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_interrupted_job_resumes_from_checkpoint(
+    mock_plan_sync, mock_strava_api, mock_db, jobs_collection
+):
+    now = datetime.now(timezone.utc)
+    jobs_collection.docs.append(
+        {
+            "id": "job-1",
+            "user_id": USER_ID,
+            "status": "running",
+            "active": True,
+            "force": False,
+            "strava_token": "token",
+            "pending": [planned(3)],
+            "activities_to_sync": 3,
+            "routes_synced": 2,
+            "total_routes": None,
+            "resume_after": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    sync_jobs = StravaSyncJobs(mock_db, MagicMock(), MagicMock(), MagicMock())
+
+    with patch("app.modules.strava.sync_jobs.sync_activities", new_callable=fake_sync_activities) as sync:
+        await sync_jobs.resume_interrupted()
+        await wait_for(sync_jobs)
+
+    mock_plan_sync.assert_not_called()
+    assert sync.call_args.args[3] == [planned(3)]
+    job = await sync_jobs.get(USER_ID, "job-1")
+    assert job.status == StravaSyncJobStatus.COMPLETED
+    assert job.routes_synced == 3
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.asyncio.sleep", new_callable=AsyncMock)
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_rate_limited_job_pauses_then_continues(
+    mock_plan_sync, mock_strava_api, mock_sleep, sync_jobs, jobs_collection
+):
+    mock_plan_sync.return_value = [planned(1), planned(2), planned(3)]
+    resets_at = (datetime.now(timezone.utc) + timedelta(minutes=10)).timestamp()
+    paused = fake_sync_activities(
+        fail_after=1, error=StravaRateLimitExceeded("Strava short term rate limit reached", resets_at)
+    )
+    pauses = []
+
+    async def sync(*args, **kwargs):
+        if not pauses:
+            pauses.append(True)
+            return await paused(*args, **kwargs)
+        assert jobs_collection.docs[0]["status"] == "running"
+        return await fake_sync_activities()(*args, **kwargs)
+
+    with patch("app.modules.strava.sync_jobs.sync_activities", side_effect=sync) as mock_sync:
+        job = await sync_jobs.start(USER_ID, "token")
+        await wait_for(sync_jobs)
+
+    # Paused until the limit resets, then continued with the remaining activities
+    wait = mock_sleep.await_args.args[0]
+    assert 590 < wait <= 600
+    assert mock_sync.call_args.args[3] == [planned(2), planned(3)]
+    mock_plan_sync.assert_awaited_once()
+    done = await sync_jobs.get(USER_ID, job.id)
+    assert done.status == StravaSyncJobStatus.COMPLETED
+    assert done.routes_synced == 3
+    assert done.resume_after is None
+
+
+@pytest.mark.asyncio
+@patch("app.modules.strava.sync_jobs.StravaApi")
+@patch("app.modules.strava.sync_jobs.plan_sync", new_callable=AsyncMock)
+async def test_failed_job_is_resumed_by_next_start(
+    mock_plan_sync, mock_strava_api, sync_jobs, jobs_collection
+):
+    mock_plan_sync.return_value = [planned(1), planned(2)]
+
+    with patch(
+        "app.modules.strava.sync_jobs.sync_activities",
+        new=fake_sync_activities(fail_after=1, error=Exception("strava api error")),
+    ):
+        job = await sync_jobs.start(USER_ID, "token")
+        await wait_for(sync_jobs)
+
+    failed = await sync_jobs.get(USER_ID, job.id)
+    assert failed.status == StravaSyncJobStatus.FAILED
+    assert failed.error == "strava api error"
+    assert failed.activities_remaining == 1
+    assert jobs_collection.docs[0]["active"] is False
+    assert "strava_token" not in jobs_collection.docs[0]
+
+    with patch("app.modules.strava.sync_jobs.sync_activities", new=fake_sync_activities()):
+        resumed = await sync_jobs.start(USER_ID, "token")
+        await wait_for(sync_jobs)
+
+    assert resumed.id == job.id
+    done = await sync_jobs.get(USER_ID, job.id)
+    assert done.status == StravaSyncJobStatus.COMPLETED
+    assert done.routes_synced == 2
+    mock_plan_sync.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_sync_job_of_other_user_is_not_found(sync_jobs, jobs_collection):
+    now = datetime.now(timezone.utc)
+    jobs_collection.docs.append(
+        {
+            "id": "job-1",
+            "user_id": "other",
+            "status": "completed",
+            "force": False,
+            "routes_synced": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    request = MagicMock()
+    request.app.state.strava_sync_jobs = sync_jobs
+    user = MagicMock()
+    user.id = USER_ID
+
+    with pytest.raises(NotFoundException):
+        await get_sync_job(request, user, "job-1")
+
+
+@pytest.mark.asyncio
+async def test_start_sync_job_error():
+    request = MagicMock()
+    request.app.state.strava_sync_jobs.start = AsyncMock(side_effect=Exception("db down"))
+    user = MagicMock()
+    user.id = USER_ID
+
+    with pytest.raises(InternalServerErrorException) as exc:
+        await start_sync_job(request, user, "token")
+    assert "db down" in str(exc.value.detail)
+    request.app.state.logger.error.assert_called_once()
@@ -1,272 +1,288 @@
 import pytest
+from functools import partial
 from datetime import datetime, timezone
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import BulkWriteError
 
-from app.modules.strava.sync_routes import sync_strava_routes
-from app.modules.strava.strava_types import StravaSyncResponse, StravaDbCollection
+from app.modules.strava.route_codec import decode_cells, decode_route
+from app.modules.strava.strava_api import StravaApi
+from app.modules.strava.strava_rate_limiter import StravaRateLimitExceeded
+from app.modules.strava.strava_utils import route_cells
+from app.modules.strava.sync_routes import plan_sync, sync_activities
+from app.common.db import StravaDbCollection
 
 
 @pytest.fixture
-def mock_request():
-    req = MagicMock()
-    req.app.state.logger = MagicMock()
-    req.app.state.env = MagicMock()
-    req.app.state.env.STRAVA_DB_URI = "mongodb://strava-db-uri"
-    return req
+def mock_activities_col():
+    return MagicMock()
 
 
 @pytest.fixture
-def mock_user():
-    user = MagicMock()
-    user.id = "user123"
-    return user
+def mock_sync_meta_col():
+    return MagicMock()
 
 
 @pytest.fixture
-def mock_strava_token():
-    return "dummy-token"
-
-
-@pytest.mark.asyncio
-@patch("app.modules.strava.sync_routes.AsyncMongoClient")
-@patch("app.modules.strava.sync_routes.StravaApi")
-async def test_sync_strava_routes_success(
-    mock_strava_api, mock_mongo, mock_request, mock_user, mock_strava_token
-):
-    # Setup DB mocks
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_activities_col = MagicMock()
-    mock_sync_meta_col = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
-
+def mock_db(mock_activities_col, mock_sync_meta_col):
     def get_collection_side_effect(name):
-        if name == StravaDbCollection.ACTIVITIES or name == "activities":
+        if name == StravaDbCollection.ACTIVITIES:
             return mock_activities_col
-        if name == StravaDbCollection.SYNC_META or name == "sync_metadata":
+        if name == StravaDbCollection.SYNC_META:
             return mock_sync_meta_col
         raise KeyError(name)
 
-    mock_db.get_collection.side_effect = get_collection_side_effect
-    mock_mongo.return_value = mock_client
+    db = MagicMock()
+    db.get_collection.side_effect = get_collection_side_effect
+    return db
+
 
-    # Setup sync meta
-    user_sync_data = {"user_id": mock_user.id, "synced_ids": [], "last_synced": None}
+@pytest.fixture
+def mock_logger():
+    return MagicMock()
+
+
+@pytest.fixture
+def mock_strava():
+    strava = MagicMock()
+    strava.iter_latlng_streams = partial(StravaApi.iter_latlng_streams, strava)
+    strava.get_athlete = AsyncMock(return_value={"username": "athlete1", "id": 42})
+    return strava
+
+
+@pytest.fixture
+def on_progress():
+    return AsyncMock()
+
+
+USER_ID = "user123"
+
+
+def planned(strava_id, type="Run", name="Morning Run"):
+    return {
+        "id": strava_id,
+        "name": name,
+        "start_date": "2024-05-01T08:00:00Z",
+        "distance": 1000,
+        "type": type,
+    }
+
+
+@pytest.mark.asyncio
+async def test_plan_sync_lists_activities_to_sync(mock_db, mock_sync_meta_col, mock_strava, mock_logger):
+    user_sync_data = {"user_id": USER_ID, "synced_ids": [3], "last_synced": None}
     mock_sync_meta_col.find_one = AsyncMock(return_value=user_sync_data)
     mock_sync_meta_col.insert_one = AsyncMock()
-    mock_sync_meta_col.update_one = AsyncMock()
-    mock_activities_col.insert_one = AsyncMock()
-    mock_activities_col.count_documents = AsyncMock(return_value=2)
-
-    # Setup StravaApi mocks
-    mock_strava = MagicMock()
-    mock_strava.get_athlete = AsyncMock(return_value={"username": "athlete1", "id": 42})
     mock_strava.get_all_activities = AsyncMock(
         return_value=[
-            {
-                "id": 1,
-                "type": "Run",
-                "start_date": datetime.now(timezone.utc).isoformat(),
-                "distance": 1000,
-                "name": "Morning Run",
-            },
-            {
-                "id": 2,
-                "type": "Walk",
-                "start_date": datetime.now(timezone.utc).isoformat(),
-                "distance": 500,
-                "name": "Evening Walk",
-            },
+            {**planned(1), "max_speed": 3.2},
+            {"id": 2, "type": "Walk", "start_date": "2024-05-02T08:00:00Z", "distance": 500},
+            planned(3),
+            planned(4, type="Swim"),
         ]
     )
-    mock_strava.get_activity_latlng_stream = AsyncMock(
-        return_value={"latlng": {"data": [[1, 2], [3, 4]]}}
-    )
-    mock_strava_api.return_value = mock_strava
-
-    result = await sync_strava_routes(mock_request, mock_user, mock_strava_token)
-    mock_client.admin.command.assert_called_once_with("ping")
-    mock_client.get_database.assert_called_once_with("strava")
-    mock_db.get_collection.assert_any_call(StravaDbCollection.ACTIVITIES)
-    mock_db.get_collection.assert_any_call(StravaDbCollection.SYNC_META)
-    mock_sync_meta_col.find_one.assert_called_once_with({"user_id": mock_user.id})
+
+    result = await plan_sync(mock_db, mock_strava, USER_ID, mock_logger)
+
+    mock_sync_meta_col.find_one.assert_called_once_with({"user_id": USER_ID})
     mock_sync_meta_col.insert_one.assert_not_called()
-    mock_strava_api.assert_called_once_with(
-        access_token=mock_strava_token, logger=mock_request.app.state.logger
-    )
     mock_strava.get_athlete.assert_called_once_with()
-    mock_strava.get_all_activities.assert_called()
-    mock_strava.get_activity_latlng_stream.assert_any_call(activity_id=1)
-    mock_strava.get_activity_latlng_stream.assert_any_call(activity_id=2)
-    assert isinstance(result, StravaSyncResponse)
-    assert result.routes_synced == 2
-    assert result.total_routes == 2
-    assert mock_activities_col.insert_one.await_count == 2
-    assert mock_sync_meta_col.update_one.await_count == 2
+    mock_strava.get_all_activities.assert_called_once_with()
+    assert result == [
+        planned(1),
+        {
+            "id": 2,
+            "name": "Unnamed Activity",
+            "start_date": "2024-05-02T08:00:00Z",
+            "distance": 500,
+            "type": "Walk",
+        },
+    ]
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.sync_routes.AsyncMongoClient")
-@patch("app.modules.strava.sync_routes.StravaApi")
-async def test_sync_strava_routes_no_sync_meta(
-    mock_strava_api, mock_mongo, mock_request, mock_user, mock_strava_token
-):
-    # Setup DB mocks
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_activities_col = MagicMock()
-    mock_sync_meta_col = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
+async def test_plan_sync_creates_sync_meta(mock_db, mock_sync_meta_col, mock_strava, mock_logger):
+    mock_sync_meta_col.find_one = AsyncMock(return_value=None)
+    mock_sync_meta_col.insert_one = AsyncMock()
+    mock_strava.get_all_activities = AsyncMock(return_value=[planned(1)])
 
-    def get_collection_side_effect(name):
-        if name == StravaDbCollection.ACTIVITIES or name == "activities":
-            return mock_activities_col
-        if name == StravaDbCollection.SYNC_META or name == "sync_metadata":
-            return mock_sync_meta_col
-        raise KeyError(name)
+    result = await plan_sync(mock_db, mock_strava, USER_ID, mock_logger)
 
-    mock_db.get_collection.side_effect = get_collection_side_effect
-    mock_mongo.return_value = mock_client
+    mock_sync_meta_col.insert_one.assert_called_once_with(
+        {"user_id": USER_ID, "synced_ids": [], "last_synced": None}
+    )
+    assert result == [planned(1)]
 
-    # No sync meta found
-    mock_sync_meta_col.find_one = AsyncMock(return_value=None)
-    mock_sync_meta_col.insert_one = AsyncMock()
-    mock_sync_meta_col.update_one = AsyncMock()
-    mock_activities_col.insert_one = AsyncMock()
-    mock_activities_col.count_documents = AsyncMock(return_value=2)
 
-    # Setup StravaApi mocks
-    mock_strava = MagicMock()
-    mock_strava.get_athlete = AsyncMock(return_value={"username": "athlete1", "id": 42})
-    mock_strava.get_all_activities = AsyncMock(
-        return_value=[
-            {
-                "id": 1,
-                "type": "Run",
-                "start_date": datetime.now(timezone.utc).isoformat(),
-                "distance": 1000,
-                "name": "Morning Run",
-            },
-        ]
+@pytest.mark.asyncio
+async def test_plan_sync_fetches_activities_since_last_sync(
+    mock_db, mock_sync_meta_col, mock_strava, mock_logger
+):
+    last_synced = "2024-05-01T00:00:00+00:00"
+    mock_sync_meta_col.find_one = AsyncMock(
+        return_value={"user_id": USER_ID, "synced_ids": [], "last_synced": last_synced}
     )
-    mock_strava.get_activity_latlng_stream = AsyncMock(
-        return_value={"latlng": {"data": [[1, 2], [3, 4]]}}
+    mock_strava.get_all_activities = AsyncMock(return_value=[])
+
+    await plan_sync(mock_db, mock_strava, USER_ID, mock_logger)
+    mock_strava.get_all_activities.assert_called_once_with(
+        after=int(datetime.fromisoformat(last_synced).timestamp())
+    )
+
+    mock_strava.get_all_activities.reset_mock()
+    await plan_sync(mock_db, mock_strava, USER_ID, mock_logger, force=True)
+    mock_strava.get_all_activities.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_plan_sync_strava_api_error(mock_db, mock_sync_meta_col, mock_strava, mock_logger):
+    mock_sync_meta_col.find_one = AsyncMock(
+        return_value={"user_id": USER_ID, "synced_ids": [], "last_synced": None}
     )
-    mock_strava_api.return_value = mock_strava
+    mock_strava.get_athlete = AsyncMock(side_effect=Exception("strava api error"))
+
+    with pytest.raises(Exception, match="strava api error"):
+        await plan_sync(mock_db, mock_strava, USER_ID, mock_logger)
+
 
-    result = await sync_strava_routes(mock_request, mock_user, mock_strava_token)
-    mock_sync_meta_col.find_one.assert_called_once_with({"user_id": mock_user.id})
-    mock_sync_meta_col.insert_one.assert_called_once()
-    assert isinstance(result, StravaSyncResponse)
-    assert result.routes_synced == 1
-    assert result.total_routes == 1
+def inserted(result_count):
+    result = MagicMock()
+    result.inserted_ids = list(range(result_count))
+    return result
+
+
+@pytest.fixture
+def mock_insert_many(mock_activities_col):
+    mock_activities_col.insert_many = AsyncMock(side_effect=lambda docs, ordered: inserted(len(docs)))
+    return mock_activities_col.insert_many
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.sync_routes.AsyncMongoClient")
-@patch("app.modules.strava.sync_routes.StravaApi")
-async def test_sync_strava_routes_empty_activities(
-    mock_strava_api, mock_mongo, mock_request, mock_user, mock_strava_token
+async def test_sync_activities_stores_routes_in_order(
+    mock_db, mock_insert_many, mock_sync_meta_col, mock_strava, mock_logger, on_progress
 ):
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_activities_col = MagicMock()
-    mock_sync_meta_col = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
+    mock_sync_meta_col.update_one = AsyncMock()
+    mock_strava.get_activity_latlng_stream = AsyncMock(
+        side_effect=lambda activity_id: (
+            {"latlng": {"data": [[1, 2], [3, 4]]}} if activity_id != 2 else {}
+        )
+    )
 
-    def get_collection_side_effect(name):
-        if name == StravaDbCollection.ACTIVITIES or name == "activities":
-            return mock_activities_col
-        if name == StravaDbCollection.SYNC_META or name == "sync_metadata":
-            return mock_sync_meta_col
-        raise KeyError(name)
+    result = await sync_activities(
+        mock_db, mock_strava, USER_ID, [planned(1), planned(2), planned(3)], mock_logger, on_progress
+    )
 
-    mock_db.get_collection.side_effect = get_collection_side_effect
-    mock_mongo.return_value = mock_client
+    assert result == 2
+    mock_strava.get_activity_latlng_stream.assert_any_call(activity_id=1)
+    mock_strava.get_activity_latlng_stream.assert_any_call(activity_id=3)
+    mock_insert_many.assert_awaited_once()
+    stored = mock_insert_many.call_args.args[0]
+    assert mock_insert_many.call_args.kwargs == {"ordered": False}
+    assert [doc["strava_id"] for doc in stored] == [1, 3]
+    assert stored[0]["user_id"] == USER_ID
+    assert stored[0]["start_date"] == datetime(2024, 5, 1, 8, tzinfo=timezone.utc)
+    assert decode_route(stored[0]["route"]).tolist() == [[1, 2], [3, 4]]
+    assert decode_cells(stored[0]["cells"]).tolist() == route_cells([[1, 2], [3, 4]]).tolist()
+    assert stored[0]["bbox"]["coordinates"][0] == [[2, 1], [4, 1], [4, 3], [2, 3], [2, 1]]
+    assert stored[0]["start_point"] == {"type": "Point", "coordinates": [2, 1]}
+    mock_sync_meta_col.update_one.assert_awaited_once()
+    query, update = mock_sync_meta_col.update_one.call_args.args
+    assert query == {"user_id": USER_ID}
+    assert update["$addToSet"] == {"synced_ids": {"$each": [1, 3]}}
+    assert "last_synced" in update["$set"]
+    on_progress.assert_awaited_once_with([(1, True), (2, False), (3, True)])
 
-    user_sync_data = {"user_id": mock_user.id, "synced_ids": [], "last_synced": None}
-    mock_sync_meta_col.find_one = AsyncMock(return_value=user_sync_data)
-    mock_sync_meta_col.insert_one = AsyncMock()
-    mock_activities_col.count_documents = AsyncMock(return_value=0)
 
-    mock_strava = MagicMock()
-    mock_strava.get_athlete = AsyncMock(return_value={"username": "athlete1", "id": 42})
-    mock_strava.get_all_activities = AsyncMock(return_value=[])
-    mock_strava_api.return_value = mock_strava
-
-    result = await sync_strava_routes(mock_request, mock_user, mock_strava_token)
-    mock_client.admin.command.assert_called_once_with("ping")
-    mock_client.get_database.assert_called_once_with("strava")
-    mock_db.get_collection.assert_any_call(StravaDbCollection.ACTIVITIES)
-    mock_db.get_collection.assert_any_call(StravaDbCollection.SYNC_META)
-    mock_sync_meta_col.find_one.assert_called_once_with({"user_id": mock_user.id})
-    mock_strava_api.assert_called_once_with(
-        access_token=mock_strava_token, logger=mock_request.app.state.logger
+@pytest.mark.asyncio
+async def test_sync_activities_writes_in_batches(
+    mock_db, mock_insert_many, mock_sync_meta_col, mock_strava, mock_logger, on_progress
+):
+    mock_sync_meta_col.update_one = AsyncMock()
+    mock_strava.get_activity_latlng_stream = AsyncMock(return_value={"latlng": {"data": [[1, 2]]}})
+    checkpoints = []
+    on_progress.side_effect = lambda batch: checkpoints.append(
+        ([strava_id for strava_id, _ in batch], mock_insert_many.await_count)
     )
-    mock_strava.get_athlete.assert_called_once_with()
-    mock_strava.get_all_activities.assert_called_once_with()
-    mock_activities_col.count_documents.assert_called_once_with(
-        {"user_id": mock_user.id}
+
+    result = await sync_activities(
+        mock_db,
+        mock_strava,
+        USER_ID,
+        [planned(i) for i in range(5)],
+        mock_logger,
+        on_progress,
+        batch_size=2,
     )
-    assert isinstance(result, StravaSyncResponse)
-    assert result.routes_synced == 0
-    assert result.total_routes == 0
+
+    assert result == 5
+    assert [len(c.args[0]) for c in mock_insert_many.call_args_list] == [2, 2, 1]
+    assert mock_sync_meta_col.update_one.await_count == 3
+    # Each batch is checkpointed once, after it is stored
+    assert checkpoints == [([0, 1], 1), ([2, 3], 2), ([4], 3)]
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.sync_routes.AsyncMongoClient")
-async def test_sync_strava_routes_db_connection_error(
-    mock_mongo, mock_request, mock_user, mock_strava_token
+async def test_sync_activities_skips_already_stored(
+    mock_db, mock_activities_col, mock_sync_meta_col, mock_strava, mock_logger, on_progress
 ):
-    mock_client = AsyncMock()
-    mock_client.admin.command = AsyncMock(side_effect=Exception("db down"))
-    mock_mongo.return_value = mock_client
-    from app.common.responses import InternalServerErrorException
+    mock_sync_meta_col.update_one = AsyncMock()
+    mock_activities_col.insert_many = AsyncMock(
+        side_effect=BulkWriteError(
+            {"writeErrors": [{"code": 11000, "index": 0}], "nInserted": 1}
+        )
+    )
+    mock_strava.get_activity_latlng_stream = AsyncMock(return_value={"latlng": {"data": [[1, 2]]}})
 
-    with pytest.raises(InternalServerErrorException) as exc:
-        await sync_strava_routes(mock_request, mock_user, mock_strava_token)
-    assert "Failed to connect to Strava database" in str(exc.value.detail)
+    result = await sync_activities(
+        mock_db, mock_strava, USER_ID, [planned(1), planned(2)], mock_logger, on_progress
+    )
+
+    assert result == 1
+    mock_sync_meta_col.update_one.assert_awaited_once()
+    on_progress.assert_awaited_once_with([(1, True), (2, True)])
 
 
 @pytest.mark.asyncio
-@patch("app.modules.strava.sync_routes.AsyncMongoClient")
-@patch("app.modules.strava.sync_routes.StravaApi")
-async def test_sync_strava_routes_strava_api_error(
-    mock_strava_api, mock_mongo, mock_request, mock_user, mock_strava_token
+async def test_sync_activities_raises_other_write_errors(
+    mock_db, mock_activities_col, mock_sync_meta_col, mock_strava, mock_logger, on_progress
 ):
-    mock_client = AsyncMock()
-    mock_db = MagicMock()
-    mock_activities_col = MagicMock()
-    mock_sync_meta_col = MagicMock()
-    mock_client.admin.command = AsyncMock()
-    mock_client.get_database = MagicMock(return_value=mock_db)
+    mock_sync_meta_col.update_one = AsyncMock()
+    mock_activities_col.insert_many = AsyncMock(
+        side_effect=BulkWriteError({"writeErrors": [{"code": 2, "index": 0}], "nInserted": 0})
+    )
+    mock_strava.get_activity_latlng_stream = AsyncMock(return_value={"latlng": {"data": [[1, 2]]}})
 
-    def get_collection_side_effect(name):
-        if name == StravaDbCollection.ACTIVITIES or name == "activities":
-            return mock_activities_col
-        if name == StravaDbCollection.SYNC_META or name == "sync_metadata":
-            return mock_sync_meta_col
-        raise KeyError(name)
+    with pytest.raises(BulkWriteError):
+        await sync_activities(mock_db, mock_strava, USER_ID, [planned(1)], mock_logger, on_progress)
+    mock_sync_meta_col.update_one.assert_not_called()
+    on_progress.assert_not_called()
 
-    mock_db.get_collection.side_effect = get_collection_side_effect
-    mock_mongo.return_value = mock_client
 
-    user_sync_data = {"user_id": mock_user.id, "synced_ids": [], "last_synced": None}
-    mock_sync_meta_col.find_one = AsyncMock(return_value=user_sync_data)
-    mock_sync_meta_col.insert_one = AsyncMock()
-    mock_activities_col.count_documents = AsyncMock(return_value=0)
+@pytest.mark.asyncio
+async def test_sync_activities_empty(mock_db, mock_insert_many, mock_strava, mock_logger, on_progress):
+    result = await sync_activities(mock_db, mock_strava, USER_ID, [], mock_logger, on_progress)
+
+    assert result == 0
+    mock_insert_many.assert_not_called()
+    on_progress.assert_not_called()
 
-    # StravaApi raises error on get_athlete
-    mock_strava = MagicMock()
-    mock_strava.get_athlete = AsyncMock(side_effect=Exception("strava api error"))
-    mock_strava_api.return_value = mock_strava
 
-    from app.common.responses import InternalServerErrorException
+@pytest.mark.asyncio
+async def test_sync_activities_rate_limit_reached(
+    mock_db, mock_insert_many, mock_sync_meta_col, mock_strava, mock_logger, on_progress
+):
+    mock_sync_meta_col.update_one = AsyncMock()
+    mock_strava.get_activity_latlng_stream = AsyncMock(
+        side_effect=[
+            {"latlng": {"data": [[1, 2]]}},
+            StravaRateLimitExceeded("Strava daily rate limit reached (980/1000)", resets_at=1.0),
+            {"latlng": {"data": [[1, 2]]}},
+        ]
+    )
 
-    with pytest.raises(InternalServerErrorException) as exc:
-        await sync_strava_routes(mock_request, mock_user, mock_strava_token)
-    assert "Could not finish syncing routes from Strava" in str(exc.value.detail)
-    assert "strava api error" in str(exc.value.detail)
+    with pytest.raises(StravaRateLimitExceeded):
+        await sync_activities(
+            mock_db, mock_strava, USER_ID, [planned(i) for i in range(3)], mock_logger, on_progress
+        )
+    # The activities fetched before the limit are stored and checkpointed
+    assert [doc["strava_id"] for doc in mock_insert_many.call_args.args[0]] == [0]
+    on_progress.assert_awaited_once_with([(0, True)])
@@ -0,0 +1,46 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+
+class AirLabsStandIn:
+    """
+    Local stand-in for the AirLabs airports and airlines endpoints, served in-process over ASGI.
+    Tests add records to `airports` and `airlines`, and can inspect the received `requests`.
+    """
+
+    def __init__(self):
+        self.api_key = "test-airlabs-key"
+        self.airports: list[dict] = []
+        self.airlines: list[dict] = []
+        self.requests: list[httpx.URL] = []
+        self.status_code = 200
+        self.app = FastAPI()
+        self.app.add_api_route("/api/v9/airports", self._endpoint(lambda: self.airports))
+        self.app.add_api_route("/api/v9/airlines", self._endpoint(lambda: self.airlines))
+
+    def _endpoint(self, records):
+        async def endpoint(api_key: str = Query(...), iata_code: str | None = Query(None)):
+            if self.status_code != 200:
+                return JSONResponse({"error": {"message": "Server error"}}, status_code=self.status_code)
+            if api_key != self.api_key:
+                return {"error": {"message": "Unknown api_key", "code": "unknown_api_key"}}
+            return {"response": [r for r in records() if iata_code in (None, r.get("iata_code"))]}
+
+        return endpoint
+
+    def client(self) -> httpx.AsyncClient:
+        async def record(request: httpx.Request):
+            self.requests.append(request.url)
+
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app),
+            base_url="http://airlabs.test",
+            event_hooks={"request": [record]},
+        )
+
+
+@pytest.fixture
+def airlabs_stand_in():
+    return AirLabsStandIn()
@@ -0,0 +1,91 @@
+import httpx
+import pytest
+import pytest_asyncio
+from unittest.mock import MagicMock
+
+from app.modules.flights.flights_types import Airline, Airport
+from app.modules.trips.airlabs_api import AirLabsApi
+
+BUD = {
+    "name": "Budapest Liszt Ferenc International Airport",
+    "iata_code": "BUD",
+    "icao_code": "LHBP",
+    "lat": 47.43,
+    "lng": 19.26,
+    "country_code": "HU",
+    "city": "Budapest",
+}
+WIZZ = {"name": "Wizz Air", "iata_code": "W6", "icao_code": "WZZ"}
+
+
+@pytest_asyncio.fixture
+async def api(airlabs_stand_in):
+    async with airlabs_stand_in.client() as http_client:
+        yield AirLabsApi(
+            http_client,
+            airports_url="http://airlabs.test/api/v9/airports",
+            airlines_url="http://airlabs.test/api/v9/airlines",
+            api_key=airlabs_stand_in.api_key,
+            logger=MagicMock(),
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_airport(api, airlabs_stand_in):
+    airlabs_stand_in.airports.append(BUD)
+
+    airport = await api.get_airport("bud")
+
+    assert airport == Airport(
+        iata="BUD",
+        icao="LHBP",
+        name="Budapest Liszt Ferenc International Airport",
+        city="Budapest",
+        country="Hungary",
+        lat=47.43,
+        lng=19.26,
+    )
+    assert airlabs_stand_in.requests[0].params["iata_code"] == "BUD"
+
+
+@pytest.mark.asyncio
+async def test_answers_are_cached_including_not_found(api, airlabs_stand_in):
+    airlabs_stand_in.airports.append(BUD)
+
+    await api.get_airport("BUD")
+    await api.get_airport("BUD")
+    assert await api.get_airport("XXX") is None
+    assert await api.get_airport("XXX") is None
+
+    assert len(airlabs_stand_in.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_incomplete_airport_is_none(api, airlabs_stand_in):
+    airlabs_stand_in.airports.append({k: v for k, v in BUD.items() if k != "city"})
+
+    assert await api.get_airport("BUD") is None
+    api.logger.error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_airline(api, airlabs_stand_in):
+    airlabs_stand_in.airlines.append(WIZZ)
+
+    assert await api.get_airline("w6") == Airline(iata="W6", icao="WZZ", name="Wizz Air")
+
+
+@pytest.mark.asyncio
+async def test_api_errors_raise_and_are_not_cached(api, airlabs_stand_in):
+    api.api_key = "wrong-key"
+    with pytest.raises(ValueError, match="AirLabs error"):
+        await api.get_airport("BUD")
+
+    api.api_key = airlabs_stand_in.api_key
+    airlabs_stand_in.status_code = 500
+    with pytest.raises(httpx.HTTPStatusError):
+        await api.get_airport("BUD")
+
+    airlabs_stand_in.status_code = 200
+    airlabs_stand_in.airports.append(BUD)
+    assert (await api.get_airport("BUD")).iata == "BUD"
@@ -2,18 +2,9 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock
 from fastapi import Request
 from app.modules.trips.airlines import search_airlines
+from app.modules.trips.static_search import StaticDataSearch
 from app.modules.flights.flights_types import Airline
-from app.common.responses import InternalServerErrorException, ListResponse
-
-
-@pytest.fixture
-def mock_db():
-    return MagicMock()
-
-
-@pytest.fixture
-def mock_collection():
-    return MagicMock()
+from app.common.responses import ListResponse
 
 
 @pytest.fixture
@@ -22,114 +13,107 @@ def mock_logger():
 
 
 @pytest.fixture
-def mock_app(mock_db, mock_logger):
-    app = MagicMock()
-    app.state.db = mock_db
-    app.state.logger = mock_logger
-    return app
+def static_search():
+    static_search = StaticDataSearch()
+    static_search.build(
+        aircrafts=[],
+        airlines=[
+            Airline(iata="LH", icao="DLH", name="Lufthansa"),
+            Airline(iata="BA", icao="BAW", name="British Airways"),
+        ],
+    )
+    return static_search
 
 
 @pytest.fixture
-def req(mock_app):
+def req(mock_logger, static_search):
     r = MagicMock(Request)
-    r.app = mock_app
+    r.app = MagicMock()
+    r.app.state.logger = mock_logger
+    r.app.state.static_search = static_search
+    r.app.state.airlabs_api = MagicMock()
+    r.app.state.airlabs_api.get_airline = AsyncMock(return_value=None)
     return r
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_iata_success(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_find_result = MagicMock()
-    mock_find_result.to_list = AsyncMock(
-        return_value=[{"iata": "LH", "icao": "DLH", "name": "Lufthansa"}]
-    )
-    mock_collection.find.return_value = mock_find_result
-    result = await search_airlines(req, iata="LH", name=None)
+async def test_search_airlines_iata_success(req, mock_logger):
+    result = await search_airlines(req, iata="lh", name=None)
     assert isinstance(result, ListResponse)
     assert len(result.entities) == 1
     assert result.entities[0].iata == "LH"
-    mock_db.get_collection.assert_called_once()
-    mock_collection.find.assert_called_once_with(
-        {"iata": {"$regex": "LH", "$options": "i"}}
-    )
     mock_logger.info.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_name_success(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_find_result = MagicMock()
-    mock_find_result.to_list = AsyncMock(
-        return_value=[{"iata": "BA", "icao": "BAW", "name": "British Airways"}]
-    )
-    mock_collection.find.return_value = mock_find_result
-    result = await search_airlines(req, iata=None, name="British")
-    assert isinstance(result, ListResponse)
+async def test_search_airlines_name_success(req, mock_logger):
+    result = await search_airlines(req, iata=None, name="british")
     assert len(result.entities) == 1
     assert result.entities[0].name == "British Airways"
-    mock_db.get_collection.assert_called_once()
-    mock_collection.find.assert_called_once_with(
-        {"name": {"$regex": "British", "$options": "i"}}
-    )
     mock_logger.info.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_both_iata_and_name_prioritizes_iata(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_find_result = MagicMock()
-    mock_find_result.to_list = AsyncMock(
-        return_value=[{"iata": "LH", "icao": "DLH", "name": "Lufthansa"}]
-    )
-    mock_collection.find.return_value = mock_find_result
-    result = await search_airlines(req, iata="LH", name="Lufthansa")
-    assert isinstance(result, ListResponse)
+async def test_search_airlines_both_iata_and_name_prioritizes_iata(req):
+    result = await search_airlines(req, iata="LH", name="British")
     assert len(result.entities) == 1
     assert result.entities[0].iata == "LH"
-    mock_db.get_collection.assert_called_once()
-    mock_collection.find.assert_called_once_with(
-        {"iata": {"$regex": "LH", "$options": "i"}}
-    )
-    mock_logger.info.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_no_query_returns_empty(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
+async def test_search_airlines_no_query_returns_empty(req, mock_logger):
     result = await search_airlines(req, iata=None, name=None)
     assert isinstance(result, ListResponse)
     assert result.entities == []
-    mock_db.get_collection.assert_not_called()
     mock_logger.info.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_no_results(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_find_result = MagicMock()
-    mock_find_result.to_list = AsyncMock(return_value=[])
-    mock_collection.find.return_value = mock_find_result
+async def test_search_airlines_no_results(req, mock_logger):
     result = await search_airlines(req, iata="XX", name=None)
-    assert isinstance(result, ListResponse)
     assert result.entities == []
     mock_logger.info.assert_called_once()
 
 
 @pytest.mark.asyncio
-async def test_search_airlines_error(
-    mock_db, mock_collection, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find.side_effect = Exception("DB error")
-    with pytest.raises(InternalServerErrorException):
-        await search_airlines(req, iata="LH", name=None)
+async def test_search_airlines_iata_not_in_static_data_uses_airlabs(req, mock_logger):
+    req.app.state.airlabs_api.get_airline.return_value = Airline(iata="W6", icao="WZZ", name="Wizz Air")
+
+    result = await search_airlines(req, iata="w6", name=None)
+
+    assert result.entities == [Airline(iata="W6", icao="WZZ", name="Wizz Air")]
+    req.app.state.airlabs_api.get_airline.assert_awaited_once_with("w6")
+
+
+@pytest.mark.asyncio
+async def test_search_airlines_partial_iata_matches_substring(req, mock_logger):
+    result = await search_airlines(req, iata="a", name=None)
+    assert [a.iata for a in result.entities] == ["BA"]
+
+    result = await search_airlines(req, iata="L", name=None)
+    assert [a.iata for a in result.entities] == ["LH"]
+
+
+@pytest.mark.asyncio
+async def test_search_airlines_partial_iata_skips_airlabs(req, mock_logger):
+    result = await search_airlines(req, iata="6", name=None)
+
+    assert result.entities == []
+    req.app.state.airlabs_api.get_airline.assert_not_called()
+    mock_logger.info.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_search_airlines_iata_in_static_data_skips_airlabs(req):
+    await search_airlines(req, iata="LH", name=None)
+    req.app.state.airlabs_api.get_airline.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_search_airlines_airlabs_error_returns_empty(req, mock_logger):
+    req.app.state.airlabs_api.get_airline.side_effect = Exception("AirLabs down")
+
+    result = await search_airlines(req, iata="W6", name=None)
+
+    assert result.entities == []
     mock_logger.error.assert_called_once()
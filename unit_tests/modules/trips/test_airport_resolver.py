@@ -0,0 +1,304 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.common.responses import NotFoundException
+from app.modules.ai.ai_types import GeminiApiMetrics
+from app.modules.flights.flights_types import Airport
+from app.modules.trips.airport_resolver import AirportResolver
+
+BUD = {
+    "iata": "BUD",
+    "icao": "LHBP",
+    "name": "Liszt Ferenc International Airport",
+    "city": "Budapest",
+    "country": "Hungary",
+    "lat": 47.4369,
+    "lng": 19.2551,
+}
+
+
+@pytest.fixture
+def collection():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=None)
+    collection.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={0: "new-id"}))
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+    return collection
+
+
+@pytest.fixture
+def logger():
+    return MagicMock()
+
+
+@pytest.fixture
+def gemini_api():
+    gemini_api = MagicMock()
+    gemini_api.generate_json = AsyncMock(return_value=dict(BUD))
+    gemini_api.generate_json_list = AsyncMock(return_value=[])
+    gemini_api.invalidate = AsyncMock()
+    gemini_api.metrics.return_value = GeminiApiMetrics(
+        requests=0, cache_hits=0, cache_misses=0, hit_ratio=0.0, api_calls=0, errors=0, timeouts=0,
+        prompt_tokens=0, response_tokens=0, total_tokens=0, saved_tokens=0, in_flight=0,
+    )
+    return gemini_api
+
+
+@pytest.fixture
+def gemini(gemini_api):
+    return gemini_api.generate_json
+
+
+@pytest.fixture
+def gemini_list(gemini_api):
+    return gemini_api.generate_json_list
+
+
+@pytest.fixture
+def resolver(collection, logger, gemini_api):
+    db = MagicMock()
+    db.get_collection.return_value = collection
+    return AirportResolver(db, logger, gemini_api, MagicMock())
+
+
+@pytest.mark.asyncio
+async def test_db_hit_is_cached_in_memory(resolver, collection, gemini):
+    collection.find_one.return_value = dict(BUD)
+
+    first = await resolver.resolve("bud")
+    second = await resolver.resolve("BUD")
+
+    assert first == second == Airport(**BUD)
+    collection.find_one.assert_awaited_once_with({"iata": "BUD"}, projection={"_id": 0, "location": 0})
+    gemini.assert_not_awaited()
+    metrics = resolver.metrics()
+    assert (metrics.db_hits, metrics.memory_hits, metrics.gemini_calls) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_gemini_result_is_persisted_and_indexed(resolver, collection, gemini):
+    airport = await resolver.resolve("BUD")
+
+    assert airport == Airport(**BUD)
+    (operation,) = collection.bulk_write.call_args.args[0]
+    assert operation._filter == {"iata": "BUD"}
+    assert operation._doc["$setOnInsert"]["location"] == {
+        "type": "Point",
+        "coordinates": [BUD["lng"], BUD["lat"]],
+    }
+    resolver.airports_index.add.assert_called_once_with(airport)
+    assert resolver.metrics().gemini_resolved == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_gemini_call(resolver, collection, gemini):
+    release = asyncio.Event()
+
+    async def slow_gemini(**kwargs):
+        await release.wait()
+        return dict(BUD)
+
+    gemini.side_effect = slow_gemini
+
+    lookups = [asyncio.create_task(resolver.resolve("BUD")) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*lookups)
+
+    assert all(r == Airport(**BUD) for r in results)
+    gemini.assert_awaited_once()
+    collection.find_one.assert_awaited_once()
+    metrics = resolver.metrics()
+    assert (metrics.shared_lookups, metrics.in_flight) == (4, 0)
+
+
+@pytest.mark.asyncio
+async def test_invalid_gemini_result_is_negatively_cached(resolver, gemini_api, gemini, logger):
+    gemini.return_value = {"iata": "BUD", "name": "Somewhere"}
+
+    with pytest.raises(NotFoundException):
+        await resolver.resolve("BUD")
+    with pytest.raises(NotFoundException):
+        await resolver.resolve("BUD")
+
+    gemini.assert_awaited_once()
+    gemini_api.invalidate.assert_awaited_once_with(gemini.call_args.kwargs["prompt"])
+    logger.error.assert_called_once()
+    metrics = resolver.metrics()
+    assert (metrics.gemini_invalid, metrics.negative_hits, metrics.negative_size) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_mismatching_iata_code_is_invalid(resolver, gemini):
+    gemini.return_value = {**BUD, "iata": "BUX"}
+
+    with pytest.raises(NotFoundException):
+        await resolver.resolve("BUD")
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_expires(collection, logger, gemini_api, gemini):
+    db = MagicMock()
+    db.get_collection.return_value = collection
+    resolver = AirportResolver(db, logger, gemini_api, negative_ttl_seconds=0)
+    gemini.return_value = {"iata": "BUD"}
+
+    for _ in range(2):
+        with pytest.raises(NotFoundException):
+            await resolver.resolve("BUD")
+
+    assert gemini.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_gemini_errors_are_retried(resolver, gemini):
+    gemini.side_effect = [Exception("Gemini error"), dict(BUD)]
+
+    with pytest.raises(Exception):
+        await resolver.resolve("BUD")
+    assert await resolver.resolve("BUD") == Airport(**BUD)
+
+    metrics = resolver.metrics()
+    assert (metrics.gemini_errors, metrics.gemini_resolved, metrics.negative_size) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_persist_failure_still_returns_airport(resolver, collection, gemini, logger):
+    collection.bulk_write.side_effect = Exception("db down")
+
+    assert await resolver.resolve("BUD") == Airport(**BUD)
+    logger.error.assert_called_once()
+
+
+CPH = {
+    "iata": "CPH",
+    "icao": "EKCH",
+    "name": "Copenhagen Airport",
+    "city": "Copenhagen",
+    "country": "Denmark",
+    "lat": 55.6179,
+    "lng": 12.6560,
+}
+
+
+class TestResolveMany:
+    @pytest.mark.asyncio
+    async def test_db_hits_with_one_query_and_misses_with_one_prompt(
+        self, resolver, collection, gemini_list
+    ):
+        collection.find.return_value.to_list.return_value = [dict(BUD)]
+        gemini_list.return_value = [dict(CPH), {"iata": "XXX", "name": "Nowhere"}]
+
+        result = await resolver.resolve_many(["bud", "CPH", "XXX", "BUD"])
+
+        assert result == {"BUD": Airport(**BUD), "CPH": Airport(**CPH)}
+        collection.find.assert_called_once_with(
+            {"iata": {"$in": ["BUD", "CPH", "XXX"]}}, projection={"_id": 0, "location": 0}
+        )
+        gemini_list.assert_awaited_once()
+        assert "CPH, XXX" in gemini_list.call_args.kwargs["prompt"]
+        (operation,) = collection.bulk_write.call_args.args[0]
+        assert operation._filter == {"iata": "CPH"}
+        resolver.airports_index.add.assert_called_once_with(Airport(**CPH))
+        metrics = resolver.metrics()
+        assert (metrics.db_hits, metrics.gemini_resolved, metrics.gemini_invalid) == (1, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_cached_and_negative_codes_are_not_looked_up(self, resolver, collection, gemini_list):
+        gemini_list.return_value = [dict(CPH)]
+        await resolver.resolve_many(["CPH", "XXX"])
+
+        result = await resolver.resolve_many(["CPH", "XXX"])
+
+        assert result == {"CPH": Airport(**CPH)}
+        assert collection.find.call_count == 1
+        gemini_list.assert_awaited_once()
+        metrics = resolver.metrics()
+        assert (metrics.memory_hits, metrics.negative_hits) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_elements_are_validated_one_by_one(self, resolver, gemini_list):
+        gemini_list.return_value = ["BUD", {**BUD, "lat": "north"}, dict(CPH), {**CPH, "name": "Dup"}]
+
+        result = await resolver.resolve_many(["BUD", "CPH"])
+
+        assert result == {"CPH": Airport(**CPH)}
+
+    @pytest.mark.asyncio
+    async def test_single_lookup_joins_a_running_batch(self, resolver, gemini, gemini_list):
+        release = asyncio.Event()
+
+        async def slow_gemini(**kwargs):
+            await release.wait()
+            return [dict(BUD)]
+
+        gemini_list.side_effect = slow_gemini
+
+        batch = asyncio.create_task(resolver.resolve_many(["BUD"]))
+        await asyncio.sleep(0)
+        single = asyncio.create_task(resolver.resolve("BUD"))
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await batch == {"BUD": Airport(**BUD)}
+        assert await single == Airport(**BUD)
+        gemini.assert_not_awaited()
+        assert resolver.metrics().shared_lookups == 1
+
+    @pytest.mark.asyncio
+    async def test_gemini_error_is_raised(self, resolver, gemini_list):
+        gemini_list.side_effect = Exception("Gemini error")
+
+        with pytest.raises(Exception, match="Gemini error"):
+            await resolver.resolve_many(["BUD"])
+        assert resolver.metrics().negative_size == 0
+
+
+class TestAirLabs:
+    @pytest.fixture
+    def airlabs(self):
+        airlabs = MagicMock()
+        airlabs.get_airport = AsyncMock(return_value=None)
+        return airlabs
+
+    @pytest.fixture
+    def resolver(self, collection, logger, gemini_api, airlabs):
+        db = MagicMock()
+        db.get_collection.return_value = collection
+        return AirportResolver(db, logger, gemini_api, MagicMock(), airlabs=airlabs)
+
+    @pytest.mark.asyncio
+    async def test_airlabs_hit_skips_gemini(self, resolver, collection, airlabs, gemini):
+        airlabs.get_airport.return_value = Airport(**BUD)
+
+        airport = await resolver.resolve("BUD")
+
+        assert airport == Airport(**BUD)
+        gemini.assert_not_awaited()
+        collection.bulk_write.assert_awaited_once()
+        metrics = resolver.metrics()
+        assert (metrics.airlabs_lookups, metrics.airlabs_resolved, metrics.gemini_calls) == (1, 1, 0)
+
+    @pytest.mark.asyncio
+    async def test_airlabs_error_falls_back_to_gemini(self, resolver, airlabs, gemini, logger):
+        airlabs.get_airport.side_effect = Exception("AirLabs down")
+
+        airport = await resolver.resolve("BUD")
+
+        assert airport == Airport(**BUD)
+        gemini.assert_awaited_once()
+        logger.error.assert_called_once()
+        assert resolver.metrics().airlabs_errors == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_misses_go_to_airlabs_before_gemini(self, resolver, airlabs, gemini_list):
+        airlabs.get_airport.side_effect = lambda code: Airport(**BUD) if code == "BUD" else None
+        gemini_list.return_value = [dict(CPH)]
+
+        with patch("app.modules.trips.airport_resolver.airports_data_prompt") as prompt:
+            result = await resolver.resolve_many(["BUD", "CPH"])
+
+        assert result == {"BUD": Airport(**BUD), "CPH": Airport(**CPH)}
+        prompt.assert_called_once_with(["CPH"])
+        gemini_list.assert_awaited_once()
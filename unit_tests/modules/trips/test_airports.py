@@ -1,26 +1,18 @@
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 from fastapi import Request
-from app.modules.trips.airports import get_airport_data
-from app.modules.trips.trips_types import AirportResponse
+from app.modules.flights.flights_types import Airport
+from app.modules.trips.airports import get_airport_data, get_airports_batch
+from app.modules.trips.trips_types import AirportResponse, AirportsBatchRequest
 from app.common.responses import InternalServerErrorException, NotFoundException
 
 
 @pytest.fixture
-def mock_db():
-    return MagicMock()
-
-
-@pytest.fixture
-def mock_collection():
-    return AsyncMock()
-
-
-@pytest.fixture
-def mock_env():
-    env = MagicMock()
-    env.GEMINI_API_KEY = "test-key"
-    return env
+def mock_resolver():
+    resolver = MagicMock()
+    resolver.resolve = AsyncMock()
+    resolver.resolve_many = AsyncMock()
+    return resolver
 
 
 @pytest.fixture
@@ -29,126 +21,75 @@ def mock_logger():
 
 
 @pytest.fixture
-def mock_app(mock_db, mock_env, mock_logger):
-    app = MagicMock()
-    app.state.db = mock_db
-    app.state.env = mock_env
-    app.state.logger = mock_logger
-    return app
-
-
-@pytest.fixture
-def req(mock_app):
+def req(mock_resolver, mock_logger):
     r = MagicMock(Request)
-    r.app = mock_app
+    r.app = MagicMock()
+    r.app.state.airport_resolver = mock_resolver
+    r.app.state.logger = mock_logger
     return r
 
 
 @pytest.mark.asyncio
-@patch("app.modules.trips.airports.GeminiApi")
-async def test_get_airport_data_success_db(
-    mock_gemini_api, mock_db, mock_collection, mock_env, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find_one.return_value = {
-        "iata": "BUD",
-        "icao": "LHBP",
-        "name": "Liszt Ferenc International Airport",
-        "city": "Budapest",
-        "country": "Hungary",
-        "lat": 47.4369,
-        "lng": 19.2551,
-    }
-    mock_gemini_instance = mock_gemini_api.return_value
-    mock_gemini_instance.generate_json = AsyncMock()
-    result = await get_airport_data(req, "BUD")
-    assert isinstance(result, AirportResponse)
-    assert result.iata == "BUD"
-    mock_db.get_collection.assert_called_once_with(
-        mock_db.get_collection.call_args[0][0]
-    )
-    mock_collection.find_one.assert_awaited_once_with({"iata": "BUD"})
-    mock_gemini_instance.generate_json.assert_not_awaited()
-
-
-@pytest.mark.asyncio
-@patch("app.modules.trips.airports.GeminiApi")
-async def test_get_airport_data_success_gemini(
-    mock_gemini_api, mock_db, mock_collection, mock_env, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find_one.return_value = None
-    mock_gemini_instance = mock_gemini_api.return_value
-    mock_gemini_instance.generate_json = AsyncMock(
-        return_value={
-            "iata": "BUD",
-            "icao": "LHBP",
-            "name": "Liszt Ferenc International Airport",
-            "city": "Budapest",
-            "country": "Hungary",
-            "lat": 47.4369,
-            "lng": 19.2551,
-        }
+async def test_get_airport_data_success(mock_resolver, req):
+    mock_resolver.resolve.return_value = Airport(
+        iata="BUD",
+        icao="LHBP",
+        name="Liszt Ferenc International Airport",
+        city="Budapest",
+        country="Hungary",
+        lat=47.4369,
+        lng=19.2551,
     )
-    result = await get_airport_data(req, "BUD")
+    result = await get_airport_data(req, "bud")
     assert isinstance(result, AirportResponse)
     assert result.iata == "BUD"
-    mock_db.get_collection.assert_called_once_with(
-        mock_db.get_collection.call_args[0][0]
-    )
-    mock_collection.find_one.assert_awaited_once_with({"iata": "BUD"})
-    mock_gemini_instance.generate_json.assert_awaited_once()
+    mock_resolver.resolve.assert_awaited_once_with("bud")
 
 
 @pytest.mark.asyncio
-@patch("app.modules.trips.airports.GeminiApi")
-async def test_get_airport_data_incomplete_gemini(
-    mock_gemini_api, mock_db, mock_collection, mock_env, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find_one.return_value = None
-    mock_gemini_instance = mock_gemini_api.return_value
-    mock_gemini_instance.generate_json = AsyncMock(
-        return_value={
-            "iata": "BUD",
-            "icao": "LHBP",
-            "name": "Liszt Ferenc International Airport",
-            "city": "Budapest",
-            "country": "Hungary",
-        }
-    )
+async def test_get_airport_data_not_found(mock_resolver, req):
+    mock_resolver.resolve.side_effect = NotFoundException("Airport data")
     with pytest.raises(NotFoundException):
-        await get_airport_data(req, "BUD")
-    mock_logger.error.assert_called()
-    mock_gemini_instance.generate_json.assert_awaited_once()
+        await get_airport_data(req, "XXX")
 
 
 @pytest.mark.asyncio
-@patch("app.modules.trips.airports.GeminiApi")
-async def test_get_airport_data_db_internal_error(
-    mock_gemini_api, mock_db, mock_collection, mock_env, mock_logger, mock_app, req
-):
-    mock_gemini_instance = mock_gemini_api.return_value
-    mock_gemini_instance.generate_json = AsyncMock()
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find_one.side_effect = Exception("DB error")
+async def test_get_airport_data_internal_error(mock_resolver, mock_logger, req):
+    mock_resolver.resolve.side_effect = Exception("Gemini error")
     with pytest.raises(InternalServerErrorException):
         await get_airport_data(req, "BUD")
     mock_logger.error.assert_called()
-    mock_gemini_instance.generate_json.assert_not_awaited()
 
 
 @pytest.mark.asyncio
-@patch("app.modules.trips.airports.GeminiApi")
-async def test_get_airport_data_gemini_internal_error(
-    mock_gemini_api, mock_db, mock_collection, mock_env, mock_logger, mock_app, req
-):
-    mock_db.get_collection.return_value = mock_collection
-    mock_collection.find_one.return_value = None
-    mock_gemini_instance = mock_gemini_api.return_value
-    mock_gemini_instance.generate_json = AsyncMock()
-    mock_gemini_instance.generate_json.side_effect = Exception("Gemini error")
+async def test_get_airports_batch_keeps_request_order(mock_resolver, req):
+    bud = Airport(
+        iata="BUD", icao="LHBP", name="Liszt Ferenc", city="Budapest", country="Hungary", lat=47.4, lng=19.2
+    )
+    cph = Airport(
+        iata="CPH", icao="EKCH", name="Kastrup", city="Copenhagen", country="Denmark", lat=55.6, lng=12.6
+    )
+    mock_resolver.resolve_many.return_value = {"BUD": bud, "CPH": cph}
+
+    result = await get_airports_batch(req, AirportsBatchRequest(iata=["cph", "XXX", "bud", "CPH"]))
+
+    mock_resolver.resolve_many.assert_awaited_once_with(["CPH", "XXX", "BUD"])
+    assert result.airports == [cph, bud]
+    assert result.not_found == ["XXX"]
+
+
+@pytest.mark.asyncio
+async def test_get_airports_batch_internal_error(mock_resolver, mock_logger, req):
+    mock_resolver.resolve_many.side_effect = Exception("Gemini error")
     with pytest.raises(InternalServerErrorException):
-        await get_airport_data(req, "BUD")
+        await get_airports_batch(req, AirportsBatchRequest(iata=["BUD"]))
     mock_logger.error.assert_called()
-    mock_gemini_instance.generate_json.assert_awaited_once()
+
+
+def test_airports_batch_request_size_is_limited():
+    from pydantic import ValidationError
+
+    with pytest.raises(ValidationError):
+        AirportsBatchRequest(iata=["BUD"] * 51)
+    with pytest.raises(ValidationError):
+        AirportsBatchRequest(iata=[])
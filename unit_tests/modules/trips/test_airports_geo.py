@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.common.geo import bbox_geo_filter
+from app.common.responses import InternalServerErrorException
+from app.modules.trips.airports_geo import find_airports_by_location
+
+BUD = {
+    "iata": "BUD",
+    "icao": "LHBP",
+    "name": "Budapest Ferenc Liszt International Airport",
+    "city": "Budapest",
+    "country": "Hungary",
+    "lat": 47.4369,
+    "lng": 19.2556,
+    "location": {"type": "Point", "coordinates": [19.2556, 47.4369]},
+}
+
+
+@pytest.fixture
+def collection():
+    return MagicMock()
+
+
+@pytest.fixture
+def request_mock(collection):
+    req = MagicMock()
+    req.app.state.db.get_collection.return_value = collection
+    return req
+
+
+@pytest.mark.asyncio
+async def test_returns_airports_matching_the_filter(request_mock, collection):
+    collection.find.return_value.to_list = AsyncMock(return_value=[BUD])
+    location_filter = bbox_geo_filter(40, 10, 50, 20)
+
+    result = await find_airports_by_location(request_mock, location_filter)
+
+    collection.find.assert_called_once_with(location_filter, projection={"_id": 0})
+    assert [a.iata for a in result.entities] == ["BUD"]
+
+
+@pytest.mark.asyncio
+async def test_db_error(request_mock, collection):
+    collection.find.side_effect = Exception("db fail")
+
+    with pytest.raises(InternalServerErrorException):
+        await find_airports_by_location(request_mock, {})
+
+
+def test_find_nearest_airports_from_index(request_mock):
+    from app.modules.trips.airports_index import AirportsIndex
+    from app.modules.trips.airports_geo import find_nearest_airports
+    from app.modules.flights.flights_types import Airport
+
+    index = AirportsIndex()
+    index.build([Airport(**{k: v for k, v in BUD.items() if k != "location"})])
+    request_mock.app.state.airports_index = index
+
+    result = find_nearest_airports(request_mock, lat=47.4979, lng=19.0402, k=3)
+
+    assert [a.iata for a in result.entities] == ["BUD"]
+    assert 15 < result.entities[0].distance_km < 20
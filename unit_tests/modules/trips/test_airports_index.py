@@ -0,0 +1,122 @@
+import math
+import random
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.modules.flights.flights_types import Airport
+from app.modules.trips.airports_index import AirportsIndex
+
+
+def make_airport(iata: str, lat: float, lng: float) -> Airport:
+    return Airport(
+        iata=iata, icao=f"X{iata}", name=f"{iata} Airport", city=iata, country="Test", lat=lat, lng=lng
+    )
+
+
+BUD = make_airport("BUD", 47.4369, 19.2556)
+VIE = make_airport("VIE", 48.1103, 16.5697)
+NRT = make_airport("NRT", 35.7720, 140.3929)
+SUV = make_airport("SUV", -18.0433, 178.5592)
+TVU = make_airport("TVU", -16.6906, -179.8770)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    h = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def random_airports(count: int, seed: int = 7) -> list[Airport]:
+    rng = random.Random(seed)
+    return [
+        make_airport(
+            f"{chr(65 + i // 676 % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}",
+            rng.uniform(-90, 90),
+            rng.uniform(-180, 180),
+        )
+        for i in range(count)
+    ]
+
+
+class TestAirportsIndex:
+    def test_nearest_with_distance(self):
+        index = AirportsIndex()
+        index.build([VIE, NRT, BUD])
+
+        (nearest, distance_km), second = index.nearest(47.4979, 19.0402, k=2)
+
+        assert nearest == BUD
+        assert distance_km == pytest.approx(haversine_km(47.4979, 19.0402, BUD.lat, BUD.lng))
+        assert second[0] == VIE
+
+    def test_across_the_antimeridian(self):
+        index = AirportsIndex()
+        index.build([BUD, SUV, TVU])
+
+        result = index.nearest(-16.7, 179.9, k=2)
+
+        assert [airport.iata for airport, _ in result] == ["TVU", "SUV"]
+
+    def test_k_larger_than_index(self):
+        index = AirportsIndex()
+        index.build([BUD, VIE])
+        assert len(index.nearest(0, 0, k=10)) == 2
+
+    def test_empty_index(self):
+        assert AirportsIndex().nearest(47.5, 19.0) == []
+
+    def test_matches_brute_force(self):
+        airports = random_airports(1500)
+        index = AirportsIndex()
+        index.build(airports[:500])
+        for airport in airports[500:]:
+            index.add(airport)
+
+        rng = random.Random(1)
+        for _ in range(50):
+            lat, lng = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            expected = sorted(airports, key=lambda a: haversine_km(lat, lng, a.lat, a.lng))[:5]
+            assert [a for a, _ in index.nearest(lat, lng, k=5)] == expected
+
+    def test_add_is_immediately_visible_and_ignores_duplicates(self):
+        index = AirportsIndex()
+        index.build([NRT])
+
+        index.add(BUD)
+        index.add(make_airport("BUD", 0, 0))
+
+        assert len(index) == 2
+        assert index.nearest(47.5, 19.0)[0][0] == BUD
+
+
+class TestLoad:
+    @pytest.mark.asyncio
+    async def test_builds_from_airports_collection(self):
+        collection = MagicMock()
+        collection.find.return_value.to_list = AsyncMock(
+            return_value=[BUD.model_dump(), VIE.model_dump()]
+        )
+        db = MagicMock()
+        db.get_collection.return_value = collection
+        index = AirportsIndex()
+
+        await index.load(db, MagicMock())
+
+        assert len(index) == 2
+        assert collection.find.call_args.kwargs["projection"] == {"_id": 0, "location": 0}
+
+    @pytest.mark.asyncio
+    async def test_db_error_leaves_index_empty(self):
+        db = MagicMock()
+        db.get_collection.side_effect = Exception("db down")
+        logger = MagicMock()
+        index = AirportsIndex()
+
+        await index.load(db, logger)
+
+        assert len(index) == 0
+        logger.error.assert_called_once()
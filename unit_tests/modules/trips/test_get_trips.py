@@ -1,9 +1,11 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from fastapi import Request
+from starlette.datastructures import State
 
 from app.common.responses import InternalServerErrorException
 from app.modules.trips.get_trips import get_trips
+from app.modules.trips.trips_data import VISIT_PROJECTION
 
 
 # ── Shared fixtures ───────────────────────────────────────────────────────────
@@ -31,6 +33,7 @@ def visits_collection():
 @pytest.fixture
 def req(db, logger):
     req = MagicMock(spec=Request)
+    req.state = State()
     req.app.state.db = db
     req.app.state.logger = logger
     return req
@@ -57,11 +60,11 @@ class TestGetTrips:
 
         await get_trips(req, "user1")
 
-        flights_collection.find.assert_called_once_with({"user_id": "user1"})
-        visits_collection.find.assert_called_once_with({"user_id": "user1"})
+        flights_collection.find.assert_called_once_with({"user_id": "user1"}, projection=None)
+        visits_collection.find.assert_called_once_with({"user_id": "user1"}, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
-    async def test_year_filter_applies_date_regex_to_flights(
+    async def test_year_filter_applies_year_in_to_flights(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
@@ -73,7 +76,7 @@ class TestGetTrips:
         await get_trips(req, "user1", year=["2024"])
 
         flights_collection.find.assert_called_once_with(
-            {"user_id": "user1", "date": {"$regex": "^(2024)"}}
+            {"user_id": "user1", "year": {"$in": [2024]}}, projection=None
         )
 
     @pytest.mark.asyncio
@@ -89,11 +92,11 @@ class TestGetTrips:
         await get_trips(req, "user1", year=["2024"])
 
         visits_collection.find.assert_called_once_with(
-            {"user_id": "user1", "year": {"$in": ["2024"]}}
+            {"user_id": "user1", "year": {"$in": ["2024"]}}, projection=VISIT_PROJECTION
         )
 
     @pytest.mark.asyncio
-    async def test_multi_year_filter_builds_combined_regex(
+    async def test_multi_year_filter_builds_combined_in(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
@@ -105,10 +108,10 @@ class TestGetTrips:
         await get_trips(req, "user1", year=["2024", "2023"])
 
         flights_collection.find.assert_called_once_with(
-            {"user_id": "user1", "date": {"$regex": "^(2024|2023)"}}
+            {"user_id": "user1", "year": {"$in": [2024, 2023]}}, projection=None
         )
         visits_collection.find.assert_called_once_with(
-            {"user_id": "user1", "year": {"$in": ["2024", "2023"]}}
+            {"user_id": "user1", "year": {"$in": ["2024", "2023"]}}, projection=VISIT_PROJECTION
         )
 
     @pytest.mark.asyncio
@@ -123,8 +126,8 @@ class TestGetTrips:
 
         await get_trips(req, "user1", year=None)
 
-        flights_collection.find.assert_called_once_with({"user_id": "user1"})
-        visits_collection.find.assert_called_once_with({"user_id": "user1"})
+        flights_collection.find.assert_called_once_with({"user_id": "user1"}, projection=None)
+        visits_collection.find.assert_called_once_with({"user_id": "user1"}, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
     async def test_returns_converted_flights_and_visits(
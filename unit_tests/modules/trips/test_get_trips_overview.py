@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import Request
+from starlette.datastructures import State
+
+from app.common.responses import InternalServerErrorException
+from app.modules.trips.get_trips_overview import (
+    FLIGHT_OVERVIEW_PROJECTION,
+    get_trips_overview,
+)
+from app.modules.trips.trips_data import VISIT_PROJECTION
+from app.modules.trips.trips_types import TripsOverviewRequest
+
+
+@pytest.fixture
+def logger():
+    return MagicMock()
+
+
+@pytest.fixture
+def db():
+    return MagicMock()
+
+
+@pytest.fixture
+def flights_collection():
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+    return collection
+
+
+@pytest.fixture
+def visits_collection():
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+    return collection
+
+
+@pytest.fixture
+def req(db, logger, flights_collection, visits_collection):
+    req = MagicMock(spec=Request)
+    req.state = State()
+    req.app.state.db = db
+    req.app.state.logger = logger
+    db.get_collection.side_effect = lambda name: (
+        flights_collection if name == "flights" else visits_collection
+    )
+    return req
+
+
+@pytest.fixture
+def rollups(monkeypatch):
+    rollups = AsyncMock(return_value=MagicMock())
+    monkeypatch.setattr("app.modules.trips.get_trips_stats.get_flights_stats_from_rollups", rollups)
+    monkeypatch.setattr("app.modules.trips.get_trips_overview.TripsOverview", MagicMock())
+    return rollups
+
+
+class TestGetTripsOverview:
+    @pytest.mark.asyncio
+    async def test_year_filter_merges_rollups_and_fetches_map_data_once(
+        self, rollups, req, db, flights_collection, visits_collection
+    ):
+        await get_trips_overview(req, "user1", TripsOverviewRequest(year=["2024"]))
+
+        rollups.assert_awaited_once_with(db, "user1", years_filter=["2024"])
+        flights_collection.find.assert_called_once_with(
+            {"user_id": "user1", "is_planned": False, "year": {"$in": [2024]}},
+            projection=FLIGHT_OVERVIEW_PROJECTION,
+        )
+        visits_collection.find.assert_called_once_with(
+            {"user_id": "user1", "year": {"$in": ["2024"]}}, projection=VISIT_PROJECTION
+        )
+
+    @pytest.mark.asyncio
+    async def test_flight_ids_are_fetched_once_for_stats_and_map(
+        self, rollups, req, flights_collection
+    ):
+        await get_trips_overview(req, "user1", TripsOverviewRequest(flight_ids=["f1", "f2"]))
+
+        rollups.assert_not_awaited()
+        flights_collection.find.assert_called_once_with(
+            {"user_id": "user1", "is_planned": False, "id": {"$in": ["f1", "f2"]}},
+            projection=FLIGHT_OVERVIEW_PROJECTION,
+        )
+
+    @pytest.mark.asyncio
+    async def test_db_error_raises_internal_server_error(self, req, db, logger):
+        db.get_collection.side_effect = Exception("db boom")
+
+        with pytest.raises(InternalServerErrorException):
+            await get_trips_overview(req, "user1", TripsOverviewRequest())
+        logger.error.assert_called_once()
@@ -1,10 +1,13 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from fastapi import Request
+from starlette.datastructures import State
 
 from app.common.responses import InternalServerErrorException
 from app.modules.trips.get_trips_maps import get_trips_maps
 from app.modules.trips.get_trips_stats import get_trips_stats
+from app.modules.trips.stats_engine import FLIGHT_STATS_PROJECTION
+from app.modules.trips.trips_data import FLIGHT_MAP_PROJECTION, VISIT_PROJECTION
 from app.modules.trips.trips_types import TripsMapsRequest, TripsStatsRequest
 
 
@@ -33,6 +36,7 @@ def visits_collection():
 @pytest.fixture
 def req(db, logger):
     req = MagicMock(spec=Request)
+    req.state = State()
     req.app.state.db = db
     req.app.state.logger = logger
     return req
@@ -46,16 +50,15 @@ def setup_collections(db, flights_collection, visits_collection):
 
 def _patch_stats(monkeypatch, flights_collection, visits_collection):
     """Patch all compute functions and response model for stats handler tests."""
-    monkeypatch.setattr("app.modules.trips.get_trips_stats.to_flight", lambda x: x)
     monkeypatch.setattr("app.modules.trips.get_trips_stats.to_visit", lambda x: x)
-    monkeypatch.setattr("app.modules.trips.get_trips_stats.compute_flights_stats", lambda f, years_filter=None: MagicMock())
+    monkeypatch.setattr("app.modules.trips.get_trips_stats.compute_flights_stats_columnar", lambda f, years_filter=None: MagicMock())
     monkeypatch.setattr("app.modules.trips.get_trips_stats.compute_visits_stats", lambda v: MagicMock())
     monkeypatch.setattr("app.modules.trips.get_trips_stats.TripsStats", MagicMock(return_value=MagicMock()))
 
 
 def _patch_maps(monkeypatch, flights_collection, visits_collection):
     """Patch all compute functions and response model for maps handler tests."""
-    monkeypatch.setattr("app.modules.trips.get_trips_maps.to_flight", lambda x: x)
+    monkeypatch.setattr("app.modules.trips.get_trips_maps.to_flight_map_entry", lambda x: x)
     monkeypatch.setattr("app.modules.trips.get_trips_maps.to_visit", lambda x: x)
     monkeypatch.setattr("app.modules.trips.get_trips_maps.compute_flights_map", lambda f: MagicMock())
     monkeypatch.setattr("app.modules.trips.get_trips_maps.compute_visits_map", lambda v: MagicMock())
@@ -66,120 +69,90 @@ def _patch_maps(monkeypatch, flights_collection, visits_collection):
 
 class TestGetTripsStats:
     @pytest.mark.asyncio
-    async def test_no_filters_fetches_all_completed_flights_and_all_visits(
+    async def test_no_filters_merges_rollups_and_fetches_all_visits(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
         visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        rollups = AsyncMock(return_value=MagicMock())
+        monkeypatch.setattr("app.modules.trips.get_trips_stats.get_flights_stats_from_rollups", rollups)
         _patch_stats(monkeypatch, flights_collection, visits_collection)
 
         await get_trips_stats(req, "user1", TripsStatsRequest())
 
-        flights_collection.find.assert_called_once_with({"user_id": "user1", "is_planned": False})
-        visits_collection.find.assert_called_once_with({"user_id": "user1"})
+        rollups.assert_awaited_once_with(db, "user1", years_filter=None)
+        flights_collection.find.assert_not_called()
+        visits_collection.find.assert_called_once_with({"user_id": "user1"}, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
-    async def test_year_filter_uses_regex_for_flights_and_in_for_visits(
+    async def test_year_filter_uses_rollups_for_flights_and_in_for_visits(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
-        visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
-        _patch_stats(monkeypatch, flights_collection, visits_collection)
-
-        await get_trips_stats(req, "user1", TripsStatsRequest(year=["2024"]))
-
-        flights_collection.find.assert_called_once_with({
-            "user_id": "user1", "is_planned": False, "date": {"$regex": "^(2024)"}
-        })
-        visits_collection.find.assert_called_once_with({
-            "user_id": "user1", "year": {"$in": ["2024"]}
-        })
-
-    @pytest.mark.asyncio
-    async def test_year_filter_with_multiple_years(
-        self, monkeypatch, req, db, flights_collection, visits_collection
-    ):
-        setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
         visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        rollups = AsyncMock(return_value=MagicMock())
+        monkeypatch.setattr("app.modules.trips.get_trips_stats.get_flights_stats_from_rollups", rollups)
         _patch_stats(monkeypatch, flights_collection, visits_collection)
 
         await get_trips_stats(req, "user1", TripsStatsRequest(year=["2022", "2023"]))
 
-        flights_collection.find.assert_called_once_with({
-            "user_id": "user1", "is_planned": False, "date": {"$regex": "^(2022|2023)"}
-        })
+        rollups.assert_awaited_once_with(db, "user1", years_filter=["2022", "2023"])
+        flights_collection.find.assert_not_called()
         visits_collection.find.assert_called_once_with({
             "user_id": "user1", "year": {"$in": ["2022", "2023"]}
-        })
+        }, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
-    async def test_flight_ids_filter_applied_when_no_year(
+    async def test_flight_ids_filter_falls_back_to_full_computation(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
         flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
         visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        rollups = AsyncMock(return_value=MagicMock())
+        monkeypatch.setattr("app.modules.trips.get_trips_stats.get_flights_stats_from_rollups", rollups)
         _patch_stats(monkeypatch, flights_collection, visits_collection)
 
         await get_trips_stats(req, "user1", TripsStatsRequest(flight_ids=["f1", "f2"]))
 
-        flights_collection.find.assert_called_once_with({
-            "user_id": "user1", "is_planned": False, "id": {"$in": ["f1", "f2"]}
-        })
+        flights_collection.find.assert_called_once_with(
+            {"user_id": "user1", "is_planned": False, "id": {"$in": ["f1", "f2"]}},
+            projection=FLIGHT_STATS_PROJECTION,
+        )
+        rollups.assert_not_awaited()
 
     @pytest.mark.asyncio
     async def test_visit_ids_filter_applied_when_no_year(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
         visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        monkeypatch.setattr(
+            "app.modules.trips.get_trips_stats.get_flights_stats_from_rollups",
+            AsyncMock(return_value=MagicMock()),
+        )
         _patch_stats(monkeypatch, flights_collection, visits_collection)
 
         await get_trips_stats(req, "user1", TripsStatsRequest(visit_ids=["v1"]))
 
         visits_collection.find.assert_called_once_with({
             "user_id": "user1", "id": {"$in": ["v1"]}
-        })
+        }, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
     async def test_year_takes_priority_over_flight_ids(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
         visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        rollups = AsyncMock(return_value=MagicMock())
+        monkeypatch.setattr("app.modules.trips.get_trips_stats.get_flights_stats_from_rollups", rollups)
         _patch_stats(monkeypatch, flights_collection, visits_collection)
 
         await get_trips_stats(req, "user1", TripsStatsRequest(year=["2024"], flight_ids=["f1"]))
 
-        call_args = flights_collection.find.call_args[0][0]
-        assert "id" not in call_args
-        assert "date" in call_args
-
-    @pytest.mark.asyncio
-    async def test_year_passes_filter_to_compute_flights_stats(
-        self, monkeypatch, req, db, flights_collection, visits_collection
-    ):
-        setup_collections(db, flights_collection, visits_collection)
-        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
-        visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
-        monkeypatch.setattr("app.modules.trips.get_trips_stats.to_flight", lambda x: x)
-        monkeypatch.setattr("app.modules.trips.get_trips_stats.to_visit", lambda x: x)
-        monkeypatch.setattr("app.modules.trips.get_trips_stats.compute_visits_stats", lambda v: MagicMock())
-        monkeypatch.setattr("app.modules.trips.get_trips_stats.TripsStats", MagicMock(return_value=MagicMock()))
-        captured = {}
-        def mock_compute(flights, years_filter=None):
-            captured["years_filter"] = years_filter
-            return MagicMock()
-        monkeypatch.setattr("app.modules.trips.get_trips_stats.compute_flights_stats", mock_compute)
-
-        await get_trips_stats(req, "user1", TripsStatsRequest(year=["2023"]))
-
-        assert captured["years_filter"] == ["2023"]
+        rollups.assert_awaited_once_with(db, "user1", years_filter=["2024"])
+        flights_collection.find.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_db_error_raises_internal_server_error(
@@ -206,11 +179,11 @@ class TestGetTripsMaps:
 
         await get_trips_maps(req, "user1", TripsMapsRequest())
 
-        flights_collection.find.assert_called_once_with({"user_id": "user1", "is_planned": False})
-        visits_collection.find.assert_called_once_with({"user_id": "user1"})
+        flights_collection.find.assert_called_once_with({"user_id": "user1", "is_planned": False}, projection=FLIGHT_MAP_PROJECTION)
+        visits_collection.find.assert_called_once_with({"user_id": "user1"}, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
-    async def test_year_filter_uses_regex_for_flights_and_in_for_visits(
+    async def test_year_filter_uses_in_for_flights_and_visits(
         self, monkeypatch, req, db, flights_collection, visits_collection
     ):
         setup_collections(db, flights_collection, visits_collection)
@@ -221,11 +194,11 @@ class TestGetTripsMaps:
         await get_trips_maps(req, "user1", TripsMapsRequest(year=["2024"]))
 
         flights_collection.find.assert_called_once_with({
-            "user_id": "user1", "is_planned": False, "date": {"$regex": "^(2024)"}
-        })
+            "user_id": "user1", "is_planned": False, "year": {"$in": [2024]}
+        }, projection=FLIGHT_MAP_PROJECTION)
         visits_collection.find.assert_called_once_with({
             "user_id": "user1", "year": {"$in": ["2024"]}
-        })
+        }, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
     async def test_flight_ids_filter_applied_when_no_year(
@@ -240,7 +213,7 @@ class TestGetTripsMaps:
 
         flights_collection.find.assert_called_once_with({
             "user_id": "user1", "is_planned": False, "id": {"$in": ["f1"]}
-        })
+        }, projection=FLIGHT_MAP_PROJECTION)
 
     @pytest.mark.asyncio
     async def test_visit_ids_filter_applied_when_no_year(
@@ -255,7 +228,7 @@ class TestGetTripsMaps:
 
         visits_collection.find.assert_called_once_with({
             "user_id": "user1", "id": {"$in": ["v1", "v2"]}
-        })
+        }, projection=VISIT_PROJECTION)
 
     @pytest.mark.asyncio
     async def test_year_takes_priority_over_flight_ids(
@@ -270,7 +243,23 @@ class TestGetTripsMaps:
 
         call_args = flights_collection.find.call_args[0][0]
         assert "id" not in call_args
-        assert "date" in call_args
+        assert "year" in call_args
+
+    @pytest.mark.asyncio
+    async def test_zoom_clusters_flight_and_visit_markers(
+        self, monkeypatch, req, db, flights_collection, visits_collection
+    ):
+        setup_collections(db, flights_collection, visits_collection)
+        flights_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        visits_collection.find.return_value.to_list = AsyncMock(return_value=[])
+        _patch_maps(monkeypatch, flights_collection, visits_collection)
+        cluster = MagicMock(return_value=[])
+        monkeypatch.setattr("app.modules.trips.get_trips_maps.cluster_markers", cluster)
+
+        await get_trips_maps(req, "user1", TripsMapsRequest(zoom=4))
+
+        assert cluster.call_count == 2
+        assert all(call.args[1] == 4 for call in cluster.call_args_list)
 
     @pytest.mark.asyncio
     async def test_db_error_raises_internal_server_error(
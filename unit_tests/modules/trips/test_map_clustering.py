@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.modules.trips.get_trips_maps import get_cached_trips_maps
+from app.modules.trips.map_clustering import clip_markers, cluster_markers, in_viewport
+from app.modules.trips.trips_types import (
+    FlightMapData,
+    MapMarker,
+    MapViewport,
+    TripsMaps,
+    TripsMapsRequest,
+    VisitMapData,
+)
+
+BUDAPEST = MapMarker(pos=(47.4979, 19.0402), popup="Budapest")
+BUDAPEST_AIRPORT = MapMarker(pos=(47.4369, 19.2556), popup="Budapest")
+VIENNA = MapMarker(pos=(48.2082, 16.3738), popup="Vienna")
+TOKYO = MapMarker(pos=(35.6762, 139.6503), popup="Tokyo")
+
+
+class TestClusterMarkers:
+    def test_nearby_markers_are_merged_at_low_zoom(self):
+        clusters = cluster_markers([BUDAPEST, VIENNA, BUDAPEST_AIRPORT, TOKYO], zoom=3)
+
+        assert len(clusters) == 2
+        europe, tokyo = clusters
+        assert europe.count == 3
+        assert europe.popup == "Budapest"  # most common popup
+        assert 47.4 < europe.pos[0] < 48.3
+        assert tokyo == TOKYO
+
+    def test_markers_are_kept_apart_at_high_zoom(self):
+        clusters = cluster_markers([BUDAPEST, VIENNA, BUDAPEST_AIRPORT, TOKYO], zoom=12)
+        assert clusters == [BUDAPEST, VIENNA, BUDAPEST_AIRPORT, TOKYO]
+
+    def test_position_is_count_weighted(self):
+        a = MapMarker(pos=(10.0, 10.0), popup="A", count=3)
+        b = MapMarker(pos=(10.1, 10.1), popup="B", count=1)
+
+        (cluster,) = cluster_markers([a, b], zoom=0)
+
+        assert cluster.count == 4
+        assert cluster.popup == "A"
+        assert cluster.pos == pytest.approx((10.025, 10.025))
+
+    def test_total_count_is_preserved(self):
+        markers = [MapMarker(pos=(i * 0.5, i * 0.7), popup=str(i)) for i in range(200)]
+        for zoom in (0, 4, 8):
+            assert sum(m.count for m in cluster_markers(markers, zoom)) == 200
+
+    def test_empty_and_single(self):
+        assert cluster_markers([], zoom=5) == []
+        assert cluster_markers([TOKYO], zoom=5) == [TOKYO]
+
+
+class TestViewport:
+    def test_in_viewport(self):
+        europe = MapViewport(south=40, west=10, north=50, east=20)
+        assert in_viewport(BUDAPEST.pos, europe)
+        assert not in_viewport(TOKYO.pos, europe)
+
+    def test_viewport_crossing_antimeridian(self):
+        pacific = MapViewport(south=-60, west=170, north=60, east=-170)
+        assert in_viewport((0.0, 175.0), pacific)
+        assert in_viewport((0.0, -175.0), pacific)
+        assert not in_viewport(TOKYO.pos, pacific)
+
+    def test_clip_markers(self):
+        asia = MapViewport(south=20, west=100, north=50, east=150)
+        assert clip_markers([BUDAPEST, TOKYO], asia) == [TOKYO]
+
+
+class TestGetCachedTripsMaps:
+    @pytest.mark.asyncio
+    async def test_zoom_is_part_of_the_cache_key_and_viewport_is_applied_after(self, monkeypatch):
+        maps = TripsMaps(
+            flights=FlightMapData(routes=[], markers=[BUDAPEST, TOKYO], center=(0.0, 0.0)),
+            visits=VisitMapData(markers=[VIENNA, TOKYO]),
+        )
+        cached = AsyncMock(return_value=maps)
+        monkeypatch.setattr("app.modules.trips.get_trips_maps.cached_trips_result", cached)
+        body = TripsMapsRequest(
+            year=["2024"], zoom=5, viewport=MapViewport(south=40, west=10, north=50, east=20)
+        )
+
+        result = await get_cached_trips_maps(MagicMock(), "user1", body)
+
+        normalized_filter = cached.call_args.args[3]
+        assert normalized_filter == {"year": ["2024"], "zoom": 5}
+        assert result.flights.markers == [BUDAPEST]
+        assert result.visits.markers == [VIENNA]
+        # the cached result is not modified
+        assert maps.flights.markers == [BUDAPEST, TOKYO]
@@ -0,0 +1,153 @@
+import json
+import re
+from pathlib import Path
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.modules.flights.flights_types import Aircraft, Airline
+from app.modules.trips.static_search import SEARCH_RESULTS_LIMIT, SearchIndex, StaticDataSearch
+
+STATIC_DATA = Path(__file__).resolve().parents[3] / "app" / "static_data"
+
+
+def load_static[T](file: str, model: type[T]) -> list[T]:
+    entities = []
+    for item in json.loads((STATIC_DATA / file).read_text()):
+        try:
+            entities.append(model(**item))
+        except ValueError:
+            continue
+    return entities
+
+
+AIRCRAFTS = load_static("aircrafts.json", Aircraft)
+AIRLINES = load_static("airlines.json", Airline)
+
+
+@pytest.fixture(scope="module")
+def aircrafts_index():
+    return SearchIndex(AIRCRAFTS, code_fields=("icao",))
+
+
+@pytest.fixture(scope="module")
+def airlines_index():
+    return SearchIndex(AIRLINES, code_fields=())
+
+
+@pytest.fixture(scope="module")
+def airlines_iata_index():
+    static_search = StaticDataSearch()
+    static_search.build([], AIRLINES)
+    return static_search.airlines_iata
+
+
+def regex_matches(entities: list, fields: tuple[str, ...], query: str) -> list:
+    """What the previous case-insensitive `$regex` queries matched, with the query taken literally."""
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    return [e for e in entities if any(pattern.search(getattr(e, f)) for f in fields)]
+
+
+class TestRegressionWithRegexSearch:
+    @pytest.mark.parametrize(
+        "query",
+        ["A320", "a32", "boeing", "Boeing 737-8", "737", "cessna 17", "B7", "(1)", "a-1 ", "x", "zzzz"],
+    )
+    def test_aircrafts_match_the_same_entities(self, aircrafts_index, query):
+        expected = regex_matches(AIRCRAFTS, ("name", "icao"), query)
+        result = aircrafts_index.search(query)
+
+        assert len(result) == min(len(expected), SEARCH_RESULTS_LIMIT)
+        if len(expected) <= SEARCH_RESULTS_LIMIT:
+            assert sorted(map(id, result)) == sorted(map(id, expected))
+        else:
+            assert {id(e) for e in result} <= {id(e) for e in expected}
+
+    @pytest.mark.parametrize("query", ["wizz", "Air Fr", "lufthansa", "airways", "ai", "zzzz"])
+    def test_airlines_match_the_same_entities(self, airlines_index, query):
+        expected = regex_matches(AIRLINES, ("name",), query)
+        result = airlines_index.search(query)
+
+        assert len(result) == min(len(expected), SEARCH_RESULTS_LIMIT)
+        assert {id(e) for e in result} <= {id(e) for e in expected}
+
+    @pytest.mark.parametrize("query", ["W6", "w", "6", "W", "LH", "l", "2", "zz"])
+    def test_airline_iata_codes_match_the_same_entities(self, airlines_iata_index, query):
+        expected = regex_matches(AIRLINES, ("iata",), query)
+        result = airlines_iata_index.search(query)
+
+        assert len(result) == min(len(expected), SEARCH_RESULTS_LIMIT)
+        assert {id(e) for e in result} <= {id(e) for e in expected}
+
+    def test_airline_iata_exact_code_ranks_first(self, airlines_iata_index):
+        assert airlines_iata_index.search("w6")[0].iata == "W6"
+        assert airlines_iata_index.search("w")[0].iata.lower().startswith("w")
+
+    def test_regex_characters_are_literal(self, aircrafts_index):
+        assert aircrafts_index.search(".*") == []
+        assert all("(" in a.name for a in aircrafts_index.search("(1"))
+
+
+class TestRanking:
+    def test_exact_code_then_prefix_then_substring(self):
+        index = SearchIndex(
+            [
+                Aircraft(icao="B38M", name="Boeing 737 MAX 8"),
+                Aircraft(icao="A320", name="Airbus A320"),
+                Aircraft(icao="A20N", name="Airbus A320neo"),
+                Aircraft(icao="A321", name="A321 by Airbus"),
+            ],
+            code_fields=("icao",),
+        )
+
+        assert [a.icao for a in index.search("a320")] == ["A320", "A20N"]
+        # within a tier by name
+        assert [a.icao for a in index.search("a32")] == ["A321", "A320", "A20N"]
+        assert [a.name for a in index.search("airbus")] == ["Airbus A320", "Airbus A320neo", "A321 by Airbus"]
+
+    def test_limit(self, aircrafts_index):
+        assert len(aircrafts_index.search("a", limit=5)) == 5
+
+    def test_blank_query(self, aircrafts_index):
+        assert aircrafts_index.search("  ") == []
+
+
+class TestStaticDataSearch:
+    @pytest.mark.asyncio
+    async def test_loads_from_collections_and_skips_invalid_entries(self):
+        collections = {
+            "aircrafts": [{"icao": "A320", "name": "Airbus A320"}],
+            "airlines": [
+                {"iata": "W6", "icao": "WZZ", "name": "Wizz Air"},
+                {"iata": "4K*", "icao": "AAS", "name": "Askari Aviation"},
+            ],
+        }
+
+        def get_collection(name):
+            collection = MagicMock()
+            collection.find.return_value.to_list = AsyncMock(return_value=collections[name])
+            return collection
+
+        db = MagicMock()
+        db.get_collection.side_effect = get_collection
+        logger = MagicMock()
+        static_search = StaticDataSearch()
+
+        await static_search.load(db, logger)
+
+        assert len(static_search.aircrafts) == 1
+        assert len(static_search.airlines) == 1
+        assert static_search.airlines_iata.search("w6")[0].name == "Wizz Air"
+        logger.warning.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_static_data_files(self):
+        db = MagicMock()
+        db.get_collection.side_effect = Exception("db down")
+        logger = MagicMock()
+        static_search = StaticDataSearch()
+
+        await static_search.load(db, logger)
+
+        assert len(static_search.aircrafts) == len(AIRCRAFTS)
+        assert len(static_search.airlines) == len(AIRLINES)
+        assert logger.error.call_count == 2
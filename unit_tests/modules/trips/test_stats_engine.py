@@ -0,0 +1,98 @@
+import random
+
+from app.modules.flights.flights_utils import to_flight
+from app.modules.trips.stats_engine import (
+    accumulate_flights_stats_columnar,
+    compute_flights_stats_columnar,
+)
+from app.modules.trips.trips_utils import compute_flights_stats
+
+
+AIRPORTS = [
+    ("FRA", "Frankfurt", "Germany"),
+    ("JFK", "New York", "USA"),
+    ("BUD", "Budapest", "Hungary"),
+    ("DEB", "Debrecen", "Hungary"),
+    ("UVF", "Vieux Fort", "St. Lucia"),
+    ("XXX", "Nowhere", "Atlantis"),
+]
+AIRLINES = [
+    {"iata": "LH", "icao": "DLH", "name": "Lufthansa"},
+    {"iata": "W6", "icao": "WZZ", "name": "Wizz Air"},
+    {"iata": "BA", "icao": "BAW", "name": "British Airways"},
+]
+AIRCRAFT = [
+    {"icao": "A320", "name": "Airbus A320"},
+    {"icao": "B738", "name": "Boeing 737-800"},
+]
+
+
+def make_raw_flight(rng: random.Random, i: int) -> dict:
+    dep, arr = rng.sample(AIRPORTS, 2)
+    if rng.random() < 0.1:
+        arr = next(a for a in AIRPORTS if a[2] == dep[2] and a != dep) if dep[2] == "Hungary" else arr
+
+    def airport(a: tuple[str, str, str]) -> dict:
+        return {
+            "iata": a[0], "icao": a[0] + "X", "name": f"{a[1]} Airport",
+            "city": a[1], "country": a[2], "lat": 1.0, "lng": 2.0,
+        }
+
+    return {
+        "id": f"f{i}",
+        "flight_number": "XX1",
+        "date": f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "departure_airport": airport(dep),
+        "arrival_airport": airport(arr),
+        "departure_time": "10:00",
+        "arrival_time": "12:00",
+        "duration": f"{rng.randint(0, 15):02d}:{rng.randint(0, 59):02d}",
+        "distance": round(rng.uniform(100, 9000), 1),
+        "airline": rng.choice(AIRLINES),
+        "aircraft": rng.choice(AIRCRAFT),
+        "seat_type": rng.choice(["Aisle", "Window", None]),
+        "flight_class": rng.choice(["Economy", "Business", None]),
+        "flight_reason": rng.choice(["Leisure", "Business", None]),
+        "is_planned": rng.random() < 0.1,
+    }
+
+
+def make_raw_flights(count: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    return [make_raw_flight(rng, i) for i in range(count)]
+
+
+class TestComputeFlightsStatsColumnar:
+    def test_matches_row_wise_computation(self):
+        raw_flights = make_raw_flights(2000)
+        expected = compute_flights_stats([to_flight(f) for f in raw_flights])
+        assert compute_flights_stats_columnar(raw_flights) == expected
+
+    def test_matches_row_wise_computation_with_years_filter(self):
+        raw_flights = make_raw_flights(500, seed=7)
+        years = ["2016", "2020", "2021"]
+        expected = compute_flights_stats([to_flight(f) for f in raw_flights], years_filter=years)
+        assert compute_flights_stats_columnar(raw_flights, years_filter=years) == expected
+
+    def test_empty_input(self):
+        assert compute_flights_stats_columnar([]) == compute_flights_stats([])
+        assert compute_flights_stats_columnar([], years_filter=["2020"]) == compute_flights_stats(
+            [], years_filter=["2020"]
+        )
+
+    def test_only_planned_flights(self):
+        raw_flights = [dict(f, is_planned=True) for f in make_raw_flights(10)]
+        result = compute_flights_stats_columnar(raw_flights)
+        assert result.total_count == 0
+        assert result.years == []
+
+    def test_accumulated_rollup_counts(self):
+        raw_flights = [f for f in make_raw_flights(300, seed=3) if not f["is_planned"]]
+        rollup = accumulate_flights_stats_columnar(raw_flights)
+
+        assert rollup.total_count == len(raw_flights)
+        assert sum(rollup.months.values()) == len(raw_flights)
+        assert sum(rollup.weekdays.values()) == len(raw_flights)
+        assert sum(rollup.airports.values()) == 2 * len(raw_flights)
+        assert rollup.domestic_count + rollup.intl_count == len(raw_flights)
+        assert rollup.airlines_map["W6"] == "Wizz Air"
@@ -0,0 +1,444 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.modules.trips.stats_engine import FLIGHT_STATS_PROJECTION
+from app.modules.trips.stats_rollups import (
+    ROLLUPS_MARKER_YEAR,
+    _rollup_update,
+    get_flights_stats_from_rollups,
+    rebuild_flight_stats_rollups,
+    rollups_by_year,
+    to_rollup,
+    to_rollup_doc,
+    update_flight_stats_rollups,
+)
+from app.modules.trips.trips_utils import (
+    compute_flights_stats,
+    finalize_flights_stats,
+    merge_flights_stats_rollups,
+)
+from app.modules.flights.flights_types import Aircraft, Airline, Airport, Flight
+
+
+def make_flight(
+    id: str = "f1",
+    date: str = "2024-03-15",
+    dep_iata: str = "FRA",
+    dep_city: str = "Frankfurt",
+    dep_country: str = "Germany",
+    arr_iata: str = "JFK",
+    arr_city: str = "New York",
+    arr_country: str = "USA",
+    distance: float = 6200.0,
+    duration: str = "08:30",
+    airline_iata: str = "LH",
+    airline_name: str = "Lufthansa",
+    is_planned: bool = False,
+) -> Flight:
+    return Flight(
+        id=id,
+        flight_number="LH001",
+        date=date,
+        departure_airport=Airport(iata=dep_iata, icao=dep_iata + "X", name=f"{dep_city} Airport", city=dep_city, country=dep_country, lat=50.0, lng=8.5),
+        arrival_airport=Airport(iata=arr_iata, icao=arr_iata + "X", name=f"{arr_city} Airport", city=arr_city, country=arr_country, lat=40.6, lng=-73.7),
+        departure_time="10:00",
+        arrival_time="18:30",
+        duration=duration,
+        distance=distance,
+        airline=Airline(iata=airline_iata, icao=airline_iata + "X", name=airline_name),
+        aircraft=Aircraft(icao="A388", name="Airbus A380"),
+        is_planned=is_planned,
+    )
+
+
+FLIGHTS = [
+    make_flight(id="f1", date="2022-05-01"),
+    make_flight(id="f2", date="2023-06-15", dep_iata="LHR", dep_city="London", dep_country="UK", airline_iata="BA", airline_name="British Airways"),
+    make_flight(id="f3", date="2023-08-20", arr_iata="CDG", arr_city="Paris", arr_country="France", distance=450.0, duration="01:10"),
+    make_flight(id="f4", date="2024-01-03", dep_country="St. Lucia"),
+    make_flight(id="f5", date="2024-02-03", is_planned=True),
+]
+RAW_FLIGHTS = [f.model_dump(mode="json") for f in FLIGHTS]
+
+
+def get_path(doc: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def evaluate(doc: dict, expression):
+    """Minimal emulation of the aggregation expressions used by the rollup updates."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_path(doc, expression[1:])
+    if not isinstance(expression, dict):
+        return expression
+    (op, args), = expression.items()
+    if op == "$literal":
+        return args
+    if op == "$ifNull":
+        value = evaluate(doc, args[0])
+        return evaluate(doc, args[1]) if value is None else value
+    if op == "$add":
+        return sum(evaluate(doc, arg) for arg in args)
+    raise NotImplementedError(op)
+
+
+def set_path(doc: dict, path: str, value) -> None:
+    *parents, leaf = path.split(".")
+    for parent in parents:
+        doc = doc.setdefault(parent, {})
+    doc[leaf] = value
+
+
+def apply_update(doc: dict, update: dict | list[dict]) -> None:
+    """Minimal in-memory emulation of MongoDB $inc / $set on dotted paths and $set pipelines."""
+    if isinstance(update, list):
+        for stage in update:
+            values = {path: evaluate(doc, expression) for path, expression in stage["$set"].items()}
+            for path, value in values.items():
+                set_path(doc, path, value)
+        return
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$inc":
+                value += get_path(doc, path) or 0
+            set_path(doc, path, value)
+
+
+class TestRollupDocs:
+    def test_doc_roundtrip_escapes_dotted_keys(self):
+        rollup = rollups_by_year(RAW_FLIGHTS)[2024]
+        doc = to_rollup_doc("user1", 2024, rollup)
+
+        assert "St. Lucia" not in doc["countries"]
+        assert all("." not in key for key in doc["countries"])
+        assert to_rollup(doc) == rollup
+
+    def test_planned_flights_are_not_rolled_up(self):
+        rollups = rollups_by_year(RAW_FLIGHTS)
+        assert sorted(rollups.keys()) == [2022, 2023, 2024]
+        assert rollups[2024].total_count == 1
+
+    def test_merged_rollups_match_full_computation(self):
+        rollups = rollups_by_year(RAW_FLIGHTS)
+        merged = finalize_flights_stats(merge_flights_stats_rollups(list(rollups.values())))
+        assert merged == compute_flights_stats(FLIGHTS)
+
+    def test_merged_year_subset_matches_filtered_computation(self):
+        rollups = rollups_by_year(RAW_FLIGHTS)
+        merged = finalize_flights_stats(
+            merge_flights_stats_rollups([rollups[2023]]), years_filter=["2023"]
+        )
+        expected = compute_flights_stats(
+            [f for f in FLIGHTS if f.date.startswith("2023")], years_filter=["2023"]
+        )
+        assert merged == expected
+
+    def test_incremental_updates_match_full_computation(self):
+        docs: dict[int, dict] = {}
+        for flight in FLIGHTS[:4]:
+            apply_update(docs.setdefault(int(flight.date[:4]), {}), _rollup_update(flight, 1))
+        removed = FLIGHTS[1]
+        apply_update(docs[2023], _rollup_update(removed, -1))
+
+        merged = finalize_flights_stats(
+            merge_flights_stats_rollups([to_rollup(doc) for _, doc in sorted(docs.items())])
+        )
+        remaining = [f for f in FLIGHTS if f.id != removed.id]
+        expected = compute_flights_stats(remaining)
+
+        assert merged.total_count == expected.total_count
+        assert merged.total_distance == pytest.approx(expected.total_distance)
+        assert merged.airports_by_count == expected.airports_by_count
+        assert merged.airlines_map == expected.airlines_map
+        assert merged.total_airlines == expected.total_airlines
+        assert merged.countries_by_count == expected.countries_by_count
+        assert merged.flights_per_year == expected.flights_per_year
+
+
+    def test_incremental_updates_keep_the_first_seen_name(self):
+        renamed = make_flight(id="f9", date="2022-06-01", airline_name="Deutsche Lufthansa")
+        doc: dict = {}
+        apply_update(doc, _rollup_update(FLIGHTS[0], 1))
+        apply_update(doc, _rollup_update(renamed, 1))
+
+        rebuilt = rollups_by_year(
+            [FLIGHTS[0].model_dump(mode="json"), renamed.model_dump(mode="json")]
+        )[2022]
+        assert to_rollup(doc).airlines_map == rebuilt.airlines_map == {"LH": "Lufthansa"}
+        assert merge_flights_stats_rollups(
+            [rollups_by_year([FLIGHTS[0].model_dump(mode="json")])[2022], to_rollup(doc)]
+        ).airlines_map == {"LH": "Lufthansa"}
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$nin" in condition:
+            if doc.get(field) in condition["$nin"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeRollupsCollection:
+    """In-memory stand-in for the rollups collection, with its unique (user_id, year) index."""
+
+    def __init__(self, docs: list[dict] | None = None):
+        self.docs = [dict(doc) for doc in docs or []]
+        self.fail_updates = False
+        # Called before each year replaced by a rebuild, to interleave concurrent changes
+        self.on_replace = None
+
+    def find(self, query):
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(side_effect=lambda length=None: [dict(d) for d in self.docs if matches(d, query)])
+        return cursor
+
+    def _one(self, query):
+        return next((doc for doc in self.docs if matches(doc, query)), None)
+
+    def _insert(self, doc):
+        if self._one({"user_id": doc["user_id"], "year": doc["year"]}):
+            raise DuplicateKeyError("duplicate key")
+        self.docs.append(doc)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=ReturnDocument.BEFORE):
+        doc = self._one(query)
+        before = dict(doc) if doc else None
+        if doc is None:
+            if not upsert:
+                return None
+            doc = {**query, **update.get("$setOnInsert", {})}
+            self._insert(doc)
+        apply_update(doc, {op: fields for op, fields in update.items() if op != "$setOnInsert"})
+        return dict(doc) if return_document == ReturnDocument.AFTER else before
+
+    async def update_one(self, query, update, upsert=False):
+        if self.fail_updates and query.get("year") != ROLLUPS_MARKER_YEAR:
+            raise Exception("db down")
+        doc = self._one(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = dict(query)
+            self._insert(doc)
+        apply_update(doc, update)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        if self.on_replace:
+            await self.on_replace()
+        doc = self._one(query)
+        if doc is None:
+            if upsert:
+                self._insert(dict(replacement))
+            return
+        doc.clear()
+        doc.update(replacement)
+
+    async def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+
+    def marker(self, user_id="user1"):
+        return self._one({"user_id": user_id, "year": ROLLUPS_MARKER_YEAR})
+
+    def years(self, user_id="user1"):
+        return sorted(d["year"] for d in self.docs if d["user_id"] == user_id and d["year"] != ROLLUPS_MARKER_YEAR)
+
+
+def make_db(rollups_collection: FakeRollupsCollection, raw_flights: list[dict]):
+    flights_collection = MagicMock()
+    flights_collection.find.return_value.to_list = AsyncMock(side_effect=lambda length=None: list(raw_flights))
+    db = MagicMock()
+    db.get_collection.side_effect = lambda name: (
+        flights_collection if name == "flights" else rollups_collection
+    )
+    return db, flights_collection
+
+
+def ready_docs(flights: list[Flight]) -> list[dict]:
+    rollups = rollups_by_year([f.model_dump(mode="json") for f in flights])
+    return [to_rollup_doc("user1", y, r) for y, r in rollups.items()] + [
+        {"user_id": "user1", "year": ROLLUPS_MARKER_YEAR, "ready": True, "writes": 0, "pending": 0}
+    ]
+
+
+class TestUpdateFlightStatsRollups:
+    @pytest.mark.asyncio
+    async def test_skips_users_without_rollups(self):
+        collection = FakeRollupsCollection()
+        db, _ = make_db(collection, [])
+
+        await update_flight_stats_rollups(db, "user1", MagicMock(), added=FLIGHTS[0])
+
+        assert collection.docs == []
+
+    @pytest.mark.asyncio
+    async def test_removes_previous_and_adds_new_flight(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS[:1]))
+        db, _ = make_db(collection, [])
+
+        await update_flight_stats_rollups(
+            db, "user1", MagicMock(), removed=FLIGHTS[0], added=FLIGHTS[1]
+        )
+
+        by_year = {doc["year"]: doc for doc in collection.docs}
+        assert by_year[2022]["total_count"] == 0
+        assert by_year[2023]["total_count"] == 1
+        assert by_year[2023]["airlines_map"]["BA"] == "British Airways"
+        assert collection.marker() == {
+            "user_id": "user1", "year": 0, "ready": True, "writes": 2, "pending": 0
+        }
+
+    @pytest.mark.asyncio
+    async def test_planned_flights_are_ignored(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS[:1]))
+        db, _ = make_db(collection, [])
+
+        await update_flight_stats_rollups(db, "user1", MagicMock(), added=FLIGHTS[4])
+
+        assert collection.years() == [2022]
+
+    @pytest.mark.asyncio
+    async def test_change_during_rebuild_only_bumps_writes(self):
+        collection = FakeRollupsCollection(
+            [{"user_id": "user1", "year": ROLLUPS_MARKER_YEAR, "ready": False, "writes": 3, "pending": 0}]
+        )
+        db, _ = make_db(collection, [])
+
+        await update_flight_stats_rollups(db, "user1", MagicMock(), added=FLIGHTS[0])
+
+        assert collection.years() == []
+        assert collection.marker()["writes"] == 5
+        assert collection.marker()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_sets_rollups_not_ready(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS[:1]))
+        collection.fail_updates = True
+        db, _ = make_db(collection, [])
+        logger = MagicMock()
+
+        await update_flight_stats_rollups(db, "user1", logger, added=FLIGHTS[0])
+
+        assert collection.marker()["ready"] is False
+        assert collection.marker()["pending"] == 0
+        logger.error.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_rebuild_during_update_is_not_set_ready(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS[:3]))
+        # The new flight is already stored when the update is applied
+        db, _ = make_db(collection, RAW_FLIGHTS[:4])
+        update_one = collection.update_one
+
+        async def rebuild_then_update(query, update, upsert=False):
+            if query["year"] != ROLLUPS_MARKER_YEAR and not collection.rebuilt:
+                # A rebuild runs entirely after the update saw the rollups ready
+                collection.rebuilt = True
+                await rebuild_flight_stats_rollups(db, "user1")
+            await update_one(query, update, upsert=upsert)
+
+        collection.rebuilt = False
+        collection.update_one = rebuild_then_update
+        await update_flight_stats_rollups(db, "user1", MagicMock(), added=FLIGHTS[3])
+
+        # The rebuild read the new flight and the update added it again, so the rollups are not ready
+        assert collection.rebuilt
+        assert collection.marker()["ready"] is False
+        assert collection.marker()["pending"] == 0
+
+        collection.update_one = update_one
+        result = await get_flights_stats_from_rollups(db, "user1")
+        assert result.total_count == 4
+        assert collection.marker()["ready"] is True
+
+
+class TestGetFlightsStatsFromRollups:
+    @pytest.mark.asyncio
+    async def test_merges_stored_rollups_for_requested_years(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS))
+        db, flights_collection = make_db(collection, [])
+
+        result = await get_flights_stats_from_rollups(db, "user1", years_filter=["2022", "2024"])
+
+        flights_collection.find.assert_not_called()
+        assert result.total_count == 2
+        assert result.flights_per_year == [("2022", 1), ("2024", 1)]
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_rollups_when_missing(self):
+        collection = FakeRollupsCollection()
+        db, flights_collection = make_db(collection, RAW_FLIGHTS[:4])
+
+        result = await get_flights_stats_from_rollups(db, "user1")
+
+        flights_collection.find.assert_called_once_with(
+            {"user_id": "user1", "is_planned": False}, projection=FLIGHT_STATS_PROJECTION
+        )
+        assert collection.years() == [2022, 2023, 2024]
+        assert collection.marker()["ready"] is True
+        assert result.total_count == 4
+
+    @pytest.mark.asyncio
+    async def test_rebuild_replaces_outdated_years(self):
+        collection = FakeRollupsCollection(ready_docs(FLIGHTS[:4]))
+        collection.marker()["ready"] = False
+        db, _ = make_db(collection, RAW_FLIGHTS[2:4])
+
+        result = await get_flights_stats_from_rollups(db, "user1")
+
+        assert collection.years() == [2023, 2024]
+        assert result.total_count == 2
+
+    @pytest.mark.asyncio
+    async def test_users_without_flights_are_not_rebuilt_again(self):
+        collection = FakeRollupsCollection()
+        db, flights_collection = make_db(collection, [])
+
+        first = await get_flights_stats_from_rollups(db, "user1")
+        await get_flights_stats_from_rollups(db, "user1")
+
+        assert first.total_count == 0
+        assert collection.marker()["ready"] is True
+        flights_collection.find.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_rebuilds_store_each_year_once(self):
+        collection = FakeRollupsCollection()
+        db, flights_collection = make_db(collection, RAW_FLIGHTS[:4])
+
+        results = await asyncio.gather(
+            get_flights_stats_from_rollups(db, "user1"), get_flights_stats_from_rollups(db, "user1")
+        )
+
+        assert [r.total_count for r in results] == [4, 4]
+        assert collection.years() == [2022, 2023, 2024]
+        assert collection.marker()["ready"] is True
+
+    @pytest.mark.asyncio
+    async def test_flight_changed_during_rebuild_is_not_lost(self):
+        collection = FakeRollupsCollection()
+        raw_flights = list(RAW_FLIGHTS[:3])
+        db, flights_collection = make_db(collection, raw_flights)
+
+        async def add_flight_once():
+            # The flight is written after the rebuild read the flights
+            collection.on_replace = None
+            raw_flights.append(RAW_FLIGHTS[3])
+            await update_flight_stats_rollups(db, "user1", MagicMock(), added=FLIGHTS[3])
+
+        collection.on_replace = add_flight_once
+        await get_flights_stats_from_rollups(db, "user1")
+        assert collection.marker()["ready"] is False
+
+        result = await get_flights_stats_from_rollups(db, "user1")
+        assert result.total_count == 4
+        assert collection.marker()["ready"] is True
+        assert flights_collection.find.call_count == 2
@@ -0,0 +1,174 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.modules.trips.trips_cache import (
+    TripsResultsCache,
+    bump_trips_data_version,
+    normalize_trips_filter,
+    trips_filter_hash,
+)
+from app.modules.trips.trips_types import VisitStats
+
+
+@pytest.fixture
+def versions_collection():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={"flights": 1, "visits": 1})
+    collection.update_one = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def results_collection():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=None)
+    collection.replace_one = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def db(versions_collection, results_collection):
+    db = MagicMock()
+    db.get_collection.side_effect = lambda name: (
+        versions_collection if name == "trips_data_versions" else results_collection
+    )
+    return db
+
+
+def compute_fn(result: VisitStats | None = None) -> AsyncMock:
+    return AsyncMock(return_value=result or VisitStats(cities_count=1, countries_count=1))
+
+
+class TestNormalizeTripsFilter:
+    def test_year_ignores_ids_order_and_duplicates(self):
+        assert normalize_trips_filter(["2024", "2023", "2024"], ["f1"], None) == {
+            "year": ["2023", "2024"]
+        }
+
+    def test_ids_are_sorted_and_none_is_kept(self):
+        assert normalize_trips_filter(None, ["f2", "f1"], None) == {
+            "flight_ids": ["f1", "f2"],
+            "visit_ids": None,
+        }
+
+    def test_empty_year_falls_back_to_ids(self):
+        assert normalize_trips_filter([], None, []) == {"flight_ids": None, "visit_ids": []}
+
+    def test_hash_depends_on_kind_and_filter(self):
+        stats = trips_filter_hash("stats", normalize_trips_filter(["2024"], None, None))
+        assert stats == trips_filter_hash("stats", normalize_trips_filter(["2024", "2024"], None, None))
+        assert stats != trips_filter_hash("maps", normalize_trips_filter(["2024"], None, None))
+        assert stats != trips_filter_hash("stats", normalize_trips_filter(["2023"], None, None))
+
+
+class TestTripsResultsCache:
+    @pytest.mark.asyncio
+    async def test_second_request_is_a_memory_hit(self, db):
+        cache = TripsResultsCache(MagicMock())
+        fn = compute_fn()
+
+        first = await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+        second = await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+
+        assert first is second
+        fn.assert_awaited_once()
+        metrics = cache.metrics()
+        assert (metrics.memory_hits, metrics.misses, metrics.requests) == (1, 1, 2)
+        assert metrics.hit_ratio == 0.5
+
+    @pytest.mark.asyncio
+    async def test_data_version_change_invalidates(self, db, versions_collection):
+        cache = TripsResultsCache(MagicMock())
+        fn = compute_fn()
+
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+        versions_collection.find_one.return_value = {"flights": 2, "visits": 1}
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+
+        assert fn.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_users_and_filters_are_cached_separately(self, db):
+        cache = TripsResultsCache(MagicMock())
+        fn = compute_fn()
+
+        await cache.get_or_compute(db, "user1", "stats", {"year": ["2024"]}, VisitStats, fn)
+        await cache.get_or_compute(db, "user2", "stats", {"year": ["2024"]}, VisitStats, fn)
+        await cache.get_or_compute(db, "user1", "stats", {"year": ["2023"]}, VisitStats, fn)
+
+        assert fn.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_persistent_tier_is_used_after_restart(self, db, results_collection):
+        result = VisitStats(cities_count=3, countries_count=2)
+        results_collection.find_one.return_value = {"result": result.model_dump(mode="json")}
+        cache = TripsResultsCache(MagicMock(), persistent=True)
+        fn = compute_fn()
+
+        loaded = await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+
+        assert loaded == result
+        fn.assert_not_awaited()
+        assert cache.metrics().db_hits == 1
+
+    @pytest.mark.asyncio
+    async def test_persistent_tier_stores_computed_results(self, db, results_collection):
+        cache = TripsResultsCache(MagicMock(), persistent=True)
+
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, compute_fn())
+
+        doc = results_collection.replace_one.call_args.args[1]
+        assert doc["user_id"] == "user1"
+        assert doc["result"] == {"cities_count": 1, "countries_count": 1}
+        assert "created_at" in doc
+
+    @pytest.mark.asyncio
+    async def test_memory_only_cache_does_not_touch_results_collection(self, db, results_collection):
+        cache = TripsResultsCache(MagicMock())
+
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, compute_fn())
+
+        results_collection.find_one.assert_not_awaited()
+        results_collection.replace_one.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_version_lookup_failure_computes_without_caching(self, db, versions_collection):
+        versions_collection.find_one.side_effect = Exception("db down")
+        logger = MagicMock()
+        cache = TripsResultsCache(logger)
+        fn = compute_fn()
+
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+        await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+
+        assert fn.await_count == 2
+        logger.error.assert_called()
+        assert cache.metrics().memory_size == 0
+
+    @pytest.mark.asyncio
+    async def test_compute_errors_are_not_cached(self, db):
+        cache = TripsResultsCache(MagicMock())
+        fn = AsyncMock(side_effect=Exception("boom"))
+
+        with pytest.raises(Exception):
+            await cache.get_or_compute(db, "user1", "stats", {}, VisitStats, fn)
+        assert cache.metrics().memory_size == 0
+
+
+class TestBumpTripsDataVersion:
+    @pytest.mark.asyncio
+    async def test_increments_the_version_of_the_kind(self, db, versions_collection):
+        await bump_trips_data_version(db, "user1", "visits", MagicMock())
+
+        versions_collection.update_one.assert_awaited_once_with(
+            {"user_id": "user1"}, {"$inc": {"visits": 1}}, upsert=True
+        )
+
+    @pytest.mark.asyncio
+    async def test_logs_errors(self, db, versions_collection):
+        versions_collection.update_one.side_effect = Exception("db down")
+        logger = MagicMock()
+
+        await bump_trips_data_version(db, "user1", "flights", logger)
+
+        logger.error.assert_called_once()
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import Request
+from starlette.datastructures import State
+
+from app.modules.trips.trips_data import (
+    FLIGHT_MAP_PROJECTION,
+    TripsDataLoader,
+    build_flights_query,
+    build_visits_query,
+    get_trips_data_loader,
+)
+
+
+class TestBuildQueries:
+    def test_flights_query_defaults_to_completed_flights(self):
+        assert build_flights_query("user1") == {"user_id": "user1", "is_planned": False}
+
+    def test_flights_query_with_planned_flights(self):
+        assert build_flights_query("user1", completed_only=False) == {"user_id": "user1"}
+
+    def test_flights_query_year_takes_priority_over_ids(self):
+        assert build_flights_query("user1", year=["2024"], flight_ids=["f1"]) == {
+            "user_id": "user1", "is_planned": False, "year": {"$in": [2024]}
+        }
+
+    def test_flights_query_with_ids(self):
+        assert build_flights_query("user1", flight_ids=[]) == {
+            "user_id": "user1", "is_planned": False, "id": {"$in": []}
+        }
+
+    def test_visits_query_year_takes_priority_over_ids(self):
+        assert build_visits_query("user1", year=["2023"], visit_ids=["v1"]) == {
+            "user_id": "user1", "year": {"$in": ["2023"]}
+        }
+
+    def test_visits_query_with_ids(self):
+        assert build_visits_query("user1", visit_ids=["v1"]) == {
+            "user_id": "user1", "id": {"$in": ["v1"]}
+        }
+
+
+class TestTripsDataLoader:
+    @pytest.fixture
+    def db(self):
+        flights_collection = MagicMock()
+        flights_collection.find.return_value.to_list = AsyncMock(return_value=[{"id": "f1"}])
+        visits_collection = MagicMock()
+        visits_collection.find.return_value.to_list = AsyncMock(return_value=[{"id": "v1"}])
+        db = MagicMock()
+        db.get_collection.side_effect = lambda name: (
+            flights_collection if name == "flights" else visits_collection
+        )
+        return db
+
+    @pytest.mark.asyncio
+    async def test_identical_queries_are_fetched_once(self, db):
+        loader = TripsDataLoader(db)
+        query = build_flights_query("user1")
+
+        first = await loader.find_flights(query, FLIGHT_MAP_PROJECTION)
+        second = await loader.find_flights(dict(query), FLIGHT_MAP_PROJECTION)
+
+        assert first == second == [{"id": "f1"}]
+        db.get_collection("flights").find.assert_called_once_with(
+            query, projection=FLIGHT_MAP_PROJECTION
+        )
+
+    @pytest.mark.asyncio
+    async def test_different_projections_are_fetched_separately(self, db):
+        loader = TripsDataLoader(db)
+        query = build_flights_query("user1")
+
+        await loader.find_flights(query, FLIGHT_MAP_PROJECTION)
+        await loader.find_flights(query)
+
+        assert db.get_collection("flights").find.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_flights_and_visits_use_their_collections(self, db):
+        loader = TripsDataLoader(db)
+        query = {"user_id": "user1"}
+
+        assert await loader.find_flights(query) == [{"id": "f1"}]
+        assert await loader.find_visits(query) == [{"id": "v1"}]
+
+    def test_loader_is_memoized_per_request(self):
+        req = MagicMock(spec=Request)
+        req.state = State()
+        other_req = MagicMock(spec=Request)
+        other_req.state = State()
+
+        loader = get_trips_data_loader(req)
+
+        assert get_trips_data_loader(req) is loader
+        assert get_trips_data_loader(other_req) is not loader
@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.common.geo import radius_geo_filter
+from app.common.responses import InternalServerErrorException
+from app.modules.visits.geo_visits import find_visits_by_location
+
+
+@pytest.fixture
+def collection():
+    return MagicMock()
+
+
+@pytest.fixture
+def request_mock(collection):
+    req = MagicMock()
+    req.app.state.db.get_collection.return_value = collection
+    return req
+
+
+@pytest.fixture
+def user():
+    user = MagicMock()
+    user.id = "user123"
+    return user
+
+
+VISIT_DOC = {"id": "v1", "city": "Budapest", "country": "Hungary", "lat": 47.5, "lng": 19.0, "year": "2024"}
+
+
+@pytest.mark.asyncio
+async def test_scopes_location_filter_to_user(request_mock, user, collection):
+    collection.find.return_value.to_list = AsyncMock(return_value=[VISIT_DOC])
+    location_filter = radius_geo_filter(47.5, 19.0, 10)
+
+    result = await find_visits_by_location(request_mock, user, location_filter)
+
+    collection.find.assert_called_once_with({"user_id": "user123", **location_filter})
+    assert [v.city for v in result.entities] == ["Budapest"]
+
+
+@pytest.mark.asyncio
+async def test_empty_result(request_mock, user, collection):
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+
+    result = await find_visits_by_location(request_mock, user, {})
+
+    assert result.entities == []
+
+
+@pytest.mark.asyncio
+async def test_db_error(request_mock, user, collection):
+    collection.find.side_effect = Exception("db fail")
+
+    with pytest.raises(InternalServerErrorException):
+        await find_visits_by_location(request_mock, user, {})
+    request_mock.app.state.logger.error.assert_called_once()